@@ -72,6 +72,7 @@ from stdm.data.pg_utils import (
     vector_layer
 )
 from stdm.data.database import STDMDb
+from stdm.data.tracing import traced
 from stdm.settings import (
     current_profile
 )
@@ -232,6 +233,7 @@ class DocumentGenerator(QObject):
 
         return composer_ds, ""
         
+    @traced('DocumentGenerator.run', 'composer')
     def run(self, *args, **kwargs):
         """
         :param templatePath: The file path to the user-defined template.
@@ -306,6 +308,9 @@ class DocumentGenerator(QObject):
             if records is None or len(records) == 0:
                 return False, QApplication.translate("DocumentGenerator",
                                                     "No matching records in the database")
+
+            #Resolve the display values used in file names in bulk
+            self._file_name_value_formatter.load_display_values(records)
             
             """
             Iterate through records where a single file output will be generated for each matching record.
@@ -0,0 +1,260 @@
+"""
+/***************************************************************************
+Name                 : Change Tracking
+Description          : Trigger-maintained log of the rows inserted, updated
+                       or deleted in entity tables, used for incremental
+                       backups and delta synchronization. Changes are
+                       identified by the id of the transaction that made
+                       them.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+
+from sqlalchemy.sql.expression import text
+
+from stdm.data.pg_utils import (
+    _execute,
+    pg_table_exists,
+    refresh_catalog
+)
+
+LOGGER = logging.getLogger('stdm')
+
+#Table containing a row for each change in a tracked table
+CHANGELOG_TABLE = 'stdm_changelog'
+
+_TRIGGER_FUNCTION = 'stdm_track_change'
+_TRIGGER_NAME = 'stdm_track_changes'
+
+#Operation codes in the changelog
+INSERT = 'I'
+UPDATE = 'U'
+DELETE = 'D'
+
+#Changelogs created without the txid column get it on the next update
+_CREATE_CHANGELOG_SQL = """
+CREATE TABLE IF NOT EXISTS {0} (
+    change_id bigserial PRIMARY KEY,
+    table_name character varying(100) NOT NULL,
+    row_id integer NOT NULL,
+    operation character(1) NOT NULL,
+    changed_at timestamp without time zone NOT NULL DEFAULT now(),
+    txid bigint NOT NULL DEFAULT txid_current()
+);
+ALTER TABLE {0} ADD COLUMN IF NOT EXISTS
+    txid bigint NOT NULL DEFAULT txid_current();
+CREATE INDEX IF NOT EXISTS {0}_table_idx ON {0} (table_name, change_id);
+CREATE INDEX IF NOT EXISTS {0}_txid_idx ON {0} (txid);
+CREATE INDEX IF NOT EXISTS {0}_table_txid_idx ON {0} (table_name, txid);
+""".format(CHANGELOG_TABLE)
+
+_CREATE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {0}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO {1} (table_name, row_id, operation)
+        VALUES (TG_TABLE_NAME, OLD.id, '{2}');
+
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO {1} (table_name, row_id, operation)
+    VALUES (TG_TABLE_NAME, NEW.id, substr(TG_OP, 1, 1));
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+""".format(_TRIGGER_FUNCTION, CHANGELOG_TABLE, DELETE)
+
+
+def tracking_enabled():
+    """
+    :return: True if change tracking has been enabled in the settings.
+    :rtype: bool
+    """
+    from stdm.settings.registryconfig import change_tracking
+
+    return change_tracking()
+
+
+def create_changelog():
+    """
+    Creates the changelog table and the trigger function, if they do not
+    exist, and adds the txid column to changelogs created without it.
+    """
+    _execute(text(_CREATE_CHANGELOG_SQL))
+    _execute(text(_CREATE_FUNCTION_SQL))
+
+    refresh_catalog()
+
+
+def is_tracked(table_name):
+    """
+    :param table_name: Name of the table.
+    :type table_name: str
+    :return: True if changes in the table are being logged.
+    :rtype: bool
+    """
+    sql = text(
+        'SELECT COUNT(*) FROM pg_trigger t JOIN pg_class c ON '
+        't.tgrelid = c.oid WHERE c.relname = :table AND t.tgname = :trigger'
+    )
+    result = _execute(sql, table=table_name, trigger=_TRIGGER_NAME)
+
+    return result.scalar() > 0
+
+
+def track_table(table_name):
+    """
+    Logs the changes in the table from now on. The table should have an
+    integer 'id' column.
+    :param table_name: Name of the table.
+    :type table_name: str
+    """
+    if not pg_table_exists(table_name, False):
+        return
+
+    if not pg_table_exists(CHANGELOG_TABLE, False):
+        create_changelog()
+
+    if is_tracked(table_name):
+        return
+
+    LOGGER.debug('Tracking changes in %s table.', table_name)
+
+    _execute(text(
+        'CREATE TRIGGER {0} AFTER INSERT OR UPDATE OR DELETE ON {1} '
+        'FOR EACH ROW EXECUTE PROCEDURE {2}()'.format(
+            _TRIGGER_NAME, table_name, _TRIGGER_FUNCTION
+        )
+    ))
+
+
+def untrack_table(table_name):
+    """
+    Stops logging the changes in the table.
+    :param table_name: Name of the table.
+    :type table_name: str
+    """
+    if not pg_table_exists(table_name, False):
+        return
+
+    _execute(text('DROP TRIGGER IF EXISTS {0} ON {1}'.format(
+        _TRIGGER_NAME, table_name
+    )))
+
+
+def track_profile(profile):
+    """
+    Logs the changes in the existing tables of the profile entities.
+    :param profile: Profile object.
+    :type profile: Profile
+    """
+    create_changelog()
+
+    for entity in profile.entities.values():
+        if not entity.is_proxy:
+            track_table(entity.name)
+
+
+def untrack_profile(profile):
+    """
+    Stops logging the changes in the tables of the profile entities. The
+    changes already logged are retained.
+    :param profile: Profile object.
+    :type profile: Profile
+    """
+    for entity in profile.entities.values():
+        if not entity.is_proxy:
+            untrack_table(entity.name)
+
+
+def current_watermark():
+    """
+    :return: Returns the id of the oldest transaction that may still be in
+    progress. Changes made by transactions with lower ids have all been
+    committed or rolled back.
+    :rtype: int
+    """
+    sql = text('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+
+    return _execute(sql).scalar()
+
+
+def cursor_watermark(cursor):
+    """
+    Gets the watermark of the snapshot of the transaction of a DB-API
+    cursor i.e. the id of the oldest transaction that was in progress when
+    the snapshot was taken. Changes made by transactions with lower ids are
+    visible in the snapshot while those made by transactions with the same
+    or higher ids are left to the next watermark, even if they committed
+    before the snapshot, since transactions do not commit in the order of
+    their ids.
+    :param cursor: psycopg2 cursor.
+    :type cursor: cursor
+    :return: Returns the watermark of the snapshot.
+    :rtype: int
+    """
+    cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+
+    return cursor.fetchone()[0]
+
+
+def cursor_changelog_exists(cursor):
+    """
+    :param cursor: psycopg2 cursor.
+    :type cursor: cursor
+    :return: True if the changelog table exists.
+    :rtype: bool
+    """
+    cursor.execute('SELECT to_regclass(%s)', (CHANGELOG_TABLE,))
+
+    return not cursor.fetchone()[0] is None
+
+
+def net_changes(cursor, since, until):
+    """
+    Gets the net changes in the tracked tables between two watermarks.
+    Only the most recent operation on each row is considered.
+    :param cursor: psycopg2 cursor.
+    :type cursor: cursor
+    :param since: Changes made by transactions with the same or higher ids
+    are included.
+    :type since: int
+    :param until: Changes made by transactions with lower ids are
+    included.
+    :type until: int
+    :return: Returns a dictionary of table names and a tuple containing the
+    ids of the inserted or updated rows and the ids of the deleted rows.
+    :rtype: dict
+    """
+    cursor.execute(
+        'SELECT DISTINCT ON (table_name, row_id) table_name, row_id, '
+        'operation FROM {0} WHERE txid >= %s AND txid < %s '
+        'ORDER BY table_name, row_id, change_id DESC'.format(CHANGELOG_TABLE),
+        (since, until)
+    )
+
+    changes = {}
+    for table_name, row_id, operation in cursor:
+        upserted, deleted = changes.setdefault(table_name, ([], []))
+
+        if operation == DELETE:
+            deleted.append(row_id)
+        else:
+            upserted.append(row_id)
+
+    return changes
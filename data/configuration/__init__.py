@@ -16,6 +16,7 @@ from stdm.data.database import (
     Model,
     STDMDb
 )
+from stdm.data.configuration.model_registry import EntityModelRegistry
 
 def _bind_metadata(metadata):
     #Ensures there is a connectable set in the metadata
@@ -58,13 +59,52 @@ def entity_model(entity, entity_only=False, with_supporting_document=False):
     specified entity. Remote entities and corresponding relationships will
     not be reflected.
     :type entity_only: bool
+    :param with_supporting_document: True to also return the model of the
+    entity's supporting documents.
+    :type with_supporting_document: bool
     :return: An SQLAlchemy model reflected from the table in the database
-    corresponding to the specified entity object.
+    corresponding to the specified entity object. Models are cached in the
+    EntityModelRegistry hence subsequent calls with the same arguments will
+    return the same class.
     """
     if entity.TYPE_INFO == 'ENTITY_SUPPORTING_DOCUMENT':
         raise TypeError('<EntitySupportingDocument> type not supported. '
                         'Please use the parent entity.')
 
+    registry = EntityModelRegistry.instance()
+    key = registry.key(entity, entity_only, with_supporting_document)
+
+    model = registry.get(key)
+    if model is not None:
+        return model
+
+    rf_entities = _reflected_entities(entity, entity_only)
+    model = _create_entity_model(
+        entity,
+        rf_entities,
+        entity_only,
+        with_supporting_document
+    )
+
+    #Only cache models whose table exists
+    if not with_supporting_document or entity_only:
+        mapped_cls = model
+    else:
+        mapped_cls = model[0]
+
+    if mapped_cls is not None:
+        tables = list(rf_entities)
+        if entity.supports_documents:
+            tables.append(entity.supporting_doc.name)
+            tables.append(entity.profile.supporting_document.name)
+
+        registry.add(key, model, tables)
+
+    return model
+
+
+def _reflected_entities(entity, entity_only):
+    #Names of the tables that will be reflected for the given entity
     rf_entities = [entity.name]
 
     if not entity_only:
@@ -76,6 +116,12 @@ def entity_model(entity, entity_only=False, with_supporting_document=False):
         rf_entities.extend(children)
         rf_entities.extend(associations)
 
+    return rf_entities
+
+
+def _create_entity_model(entity, rf_entities, entity_only,
+                         with_supporting_document):
+    #Reflects the tables and maps the classes for entity_model
     _bind_metadata(metadata)
 
     #We will use a different metadata object just for reflecting 'rf_entities'
@@ -36,6 +36,9 @@ from stdm.data.configuration.db_items import DbItem
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.data.configuration.exception import ConfigurationException
 from stdm.data.configuration import profile_foreign_keys
+from stdm.data.pg_utils import refresh_catalog
+from stdm.data.configuration.model_registry import EntityModelRegistry
+from stdm.data.tracing import traced
 
 LOGGER = logging.getLogger('stdm')
 
@@ -70,6 +73,11 @@ class ConfigurationSchemaUpdater(QObject):
         if self.metadata.bind is None:
             self.metadata.bind = self.engine
 
+        #Names of tables whose cached models will be invalidated on completion
+        self._updated_tables = set()
+        self.update_completed.connect(self._invalidate_entity_models)
+
+    @traced('ConfigurationSchemaUpdater.exec_', 'configuration')
     def exec_(self):
         """
         Initiate the process of updating the schema based on the specified
@@ -165,6 +173,7 @@ class ConfigurationSchemaUpdater(QObject):
                 #self.update_progress.emit(ConfigurationSchemaUpdater.WARNING, msg)
 
             else:
+                self._add_updated_relation(er)
                 del profile.relations[er.name]
 
                 msg = self.tr(u'{0} foreign key constraint successfully '
@@ -231,8 +240,34 @@ class ConfigurationSchemaUpdater(QObject):
 
                 e.update(self.engine, self.metadata)
 
+                self._updated_tables.add(e.name)
+
             QgsApplication.processEvents()
 
+    def _add_updated_relation(self, entity_relation):
+        #Models of both the parent and child are affected by the relation
+        refresh_catalog()
+
+        for e in (entity_relation.parent, entity_relation.child):
+            if not e is None:
+                self._updated_tables.add(e.name)
+
+    def _invalidate_entity_models(self, status):
+        """
+        Removes the cached models of the tables that have been created,
+        altered or dropped in the course of the update.
+        :param status: True if the update succeeded, else False.
+        :type status: bool
+        """
+        refresh_catalog()
+
+        registry = EntityModelRegistry.instance()
+
+        for t in self._updated_tables:
+            registry.invalidate_entity(t)
+
+        self._updated_tables = set()
+
     def update_entity_relations(self, profile):
         """
         Update entity relations in the profile by creating the corresponding
@@ -258,6 +293,7 @@ class ConfigurationSchemaUpdater(QObject):
                                   'constraint.'.format(er.name))
 
                 else:
+                    self._add_updated_relation(er)
                     msg = self.tr(u'{0} foreign key constraint successfully '
                                   'created.'.format(er.name))
 
@@ -28,9 +28,16 @@ from sqlalchemy import (
 
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.db_items import DbItem
+from stdm.data.configuration.model_registry import EntityModelRegistry
+from stdm.data.reference_cache import ReferenceDataCache
+from stdm.data.change_tracking import (
+    track_table,
+    tracking_enabled
+)
 from stdm.data.pg_utils import (
     drop_cascade_table,
     drop_view,
+    refresh_catalog,
     table_column_names
 )
 
@@ -77,6 +84,12 @@ def entity_updater(entity, engine, metadata):
         #drop_entity(entity, table, engine)
         drop_cascade_table(entity.name)
 
+    #Catalog snapshot, cached models and reference data of the entity are
+    #now outdated
+    refresh_catalog()
+    EntityModelRegistry.instance().invalidate_entity(entity.name)
+    ReferenceDataCache.instance().invalidate_table(entity.name)
+
 
 def create_entity(entity, table, engine):
     """
@@ -84,8 +97,13 @@ def create_entity(entity, table, engine):
     """
     #Create table
     table.create(engine, checkfirst=True)
+    refresh_catalog()
     update_entity_columns(entity, table, entity.columns.values())
 
+    #Log row changes for incremental backups
+    if tracking_enabled():
+        track_table(entity.name)
+
 
 def drop_entity(entity, table, engine):
     """
@@ -0,0 +1,176 @@
+"""
+/***************************************************************************
+Name                 : EntityModelRegistry
+Description          : Process-wide cache of SQLAlchemy classes mapped from
+                       entity objects.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+from threading import RLock
+
+from stdm.data.database import Singleton
+
+LOGGER = logging.getLogger('stdm')
+
+
+@Singleton
+class EntityModelRegistry(object):
+    """
+    Holds the models created by entity_model so that the database catalog
+    is only reflected once for each combination of profile, entity and
+    mapping options. Each entry also records the names of the tables that
+    were reflected when creating it so that it can be discarded when any of
+    those tables changes.
+    """
+    def __init__(self):
+        self._models = {}
+        self._tables = {}
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def instance(self, *args, **kwargs):
+        """
+        Dummy method. Eclipse IDE cannot handle the Singleton decorator in Python
+        """
+        pass
+
+    @staticmethod
+    def key(entity, entity_only=False, with_supporting_document=False):
+        """
+        :param entity: Entity object.
+        :type entity: Entity
+        :param entity_only: Mapping option as specified in entity_model.
+        :type entity_only: bool
+        :param with_supporting_document: Mapping option as specified in
+        entity_model.
+        :type with_supporting_document: bool
+        :return: Returns the key used to store the model of the given
+        entity in the registry.
+        :rtype: tuple
+        """
+        return (
+            unicode(entity.profile.name),
+            unicode(entity.name),
+            bool(entity_only),
+            bool(with_supporting_document)
+        )
+
+    def get(self, key):
+        """
+        :param key: Registry key as returned by the key method.
+        :type key: tuple
+        :return: Returns the model, or model and supporting document model
+        tuple, stored under the given key or None if not found.
+        """
+        with self._lock:
+            model = self._models.get(key, None)
+
+            if model is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return model
+
+    def add(self, key, model, tables):
+        """
+        Adds a model to the registry.
+        :param key: Registry key as returned by the key method.
+        :type key: tuple
+        :param model: Model or tuple of model and supporting document model.
+        :param tables: Names of the tables reflected when creating the model.
+        :type tables: list
+        """
+        if model is None:
+            return
+
+        with self._lock:
+            self._models[key] = model
+            self._tables[key] = set(tables)
+
+    def invalidate_entity(self, name):
+        """
+        Removes all models that were mapped from, or have a relationship
+        with, the table with the given name.
+        :param name: Name of the entity or table.
+        :type name: str
+        :return: Returns the number of models removed from the registry.
+        :rtype: int
+        """
+        name = unicode(name)
+
+        with self._lock:
+            keys = [k for k, tables in self._tables.iteritems()
+                    if name in tables]
+            for k in keys:
+                self._remove(k)
+
+        if len(keys) > 0:
+            LOGGER.debug('%d cached model(s) for %s invalidated.', len(keys),
+                         name)
+
+        return len(keys)
+
+    def invalidate_profile(self, profile_name):
+        """
+        Removes all models belonging to the profile with the given name.
+        :param profile_name: Name of the profile.
+        :type profile_name: str
+        :return: Returns the number of models removed from the registry.
+        :rtype: int
+        """
+        profile_name = unicode(profile_name)
+
+        with self._lock:
+            keys = [k for k in self._models if k[0] == profile_name]
+            for k in keys:
+                self._remove(k)
+
+        return len(keys)
+
+    def clear(self):
+        """
+        Removes all models and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._models = {}
+            self._tables = {}
+            self.hits = 0
+            self.misses = 0
+
+    def _remove(self, key):
+        self._models.pop(key, None)
+        self._tables.pop(key, None)
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def stats(self):
+        """
+        :return: Returns the number of cached models and the hit/miss
+        counters of the registry.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -29,7 +29,8 @@ from migrate.changeset import *
 from stdm.data.pg_utils import (
     _execute,
     drop_view,
-    pg_table_exists
+    pg_table_exists,
+    refresh_catalog
 )
 from stdm.data.configuration.columns import (
     ForeignKeyColumn,
@@ -184,6 +185,7 @@ def _create_primary_entity_view(
     normalized_create_view_sql = text(create_view_sql)
 
     result = _execute(normalized_create_view_sql)
+    refresh_catalog()
 
 
 def _entity_select_column(
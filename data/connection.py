@@ -41,6 +41,26 @@ class DatabaseConnection(object):
         else:
             return None
     
+    def toOgrConnection(self):
+        '''
+        Returns the corresponding connection string for the OGR PostgreSQL
+        driver
+        '''
+        if not self.User:
+            return None
+
+        props = [("host",self.Host),("port",self.Port),
+                 ("dbname",self.Database),("user",self.User.UserName),
+                 ("password",self.User.Password)]
+
+        #Values are quoted as they may contain spaces or quotes
+        conn_props = []
+        for k,v in props:
+            v = unicode(v).replace("\\","\\\\").replace("'","\\'")
+            conn_props.append(u"{0}='{1}'".format(k,v))
+
+        return u"PG:" + u" ".join(conn_props)
+
     def toPsycopg2Connection(self):
         '''
         Returns the corresponding connection string in Psycopg2 format
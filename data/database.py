@@ -124,11 +124,20 @@ class STDMDb(object):
         #Initialize database engine
         self.engine = create_engine(stdm.data.app_dbconn.toAlchemyConnection(), echo=False)
 
+        #Imported here since the statistics module depends on this module
+        from stdm.data.query_stats import QueryStatistics
+        QueryStatistics.instance().attach(self.engine)
+
         #Check for PostGIS extension
         self.postgis_state = self._check_spatial_extension()
 
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
+
+        #Reference data is discarded when its rows are changed in the session
+        from stdm.data.reference_cache import ReferenceDataCache
+        ReferenceDataCache.instance().attach(self.session)
+
         self.createMetadata()
 
     def createMetadata(self):
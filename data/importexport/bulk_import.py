@@ -0,0 +1,607 @@
+"""
+/***************************************************************************
+Name                 : Bulk Import
+Description          : Writes rows translated from an OGR data source to the
+                       database in chunks instead of one transaction per
+                       feature.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import math
+import struct
+import time
+from collections import OrderedDict
+from cStringIO import StringIO
+from datetime import (
+    date,
+    datetime
+)
+
+import psycopg2
+from sqlalchemy.exc import SQLAlchemyError
+
+from stdm.data.database import STDMDb
+from stdm.data.importexport.value_translators import IgnoreType
+
+LOGGER = logging.getLogger('stdm')
+
+#Default number of rows written in one transaction
+DEFAULT_CHUNK_SIZE = 1000
+
+#Default minimum number of seconds between progress dialog updates
+DEFAULT_PROGRESS_INTERVAL = 0.25
+
+#Flag in the geometry type of an EWKB geometry indicating an SRID is present
+_EWKB_SRID_FLAG = 0x20000000
+
+#Characters escaped in the text format of the COPY command
+_COPY_ESCAPES = (
+    ('\\', '\\\\'),
+    ('\t', '\\t'),
+    ('\n', '\\n'),
+    ('\r', '\\r')
+)
+
+
+def is_ignored_value(value):
+    """
+    :param value: Value returned by a value translator.
+    :return: True if the value should not be written to the database. Some
+    translators return the IgnoreType class rather than an instance.
+    :rtype: bool
+    """
+    return value is IgnoreType or isinstance(value, IgnoreType)
+
+
+def ewkb_hex(wkb, srid):
+    """
+    Converts an OGC WKB geometry, such as that exported by OGR, to
+    hex-encoded PostGIS EWKB containing the given SRID.
+    :param wkb: Geometry in WKB format.
+    :type wkb: str
+    :param srid: Spatial reference id of the geometry.
+    :type srid: int
+    :return: Hex-encoded EWKB geometry.
+    :rtype: str
+    """
+    byte_order = '<' if ord(wkb[0]) == 1 else '>'
+    geom_type = struct.unpack(byte_order + 'I', wkb[1:5])[0]
+
+    ewkb = wkb[0] + struct.pack(byte_order + 'I', geom_type | _EWKB_SRID_FLAG) \
+           + struct.pack(byte_order + 'i', int(srid)) + wkb[5:]
+
+    return ewkb.encode('hex')
+
+
+def copy_text_value(value):
+    """
+    :param value: Column value.
+    :return: Returns the value formatted for the text format of the
+    PostgreSQL COPY command.
+    :rtype: str
+    """
+    if value is None or is_ignored_value(value):
+        return '\\N'
+
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+
+    elif isinstance(value, float):
+        value = _copy_float(value)
+
+    elif isinstance(value, (date, datetime)):
+        value = value.isoformat()
+
+    elif not isinstance(value, str):
+        #str() of a Decimal keeps all its digits
+        value = str(value)
+
+    for char, escaped in _COPY_ESCAPES:
+        if char in value:
+            value = value.replace(char, escaped)
+
+    return value
+
+
+def _copy_float(value):
+    #str() of a float only keeps 12 significant digits
+    if math.isnan(value):
+        return 'NaN'
+
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+
+    return repr(value)
+
+
+def iter_features(layer, start_offset=0):
+    """
+    Reads the features of an OGR layer from the beginning, or from the
+    given position when resuming an interrupted import.
+    :param layer: Source layer.
+    :type layer: ogr.Layer
+    :param start_offset: Number of features to skip.
+    :type start_offset: int
+    :return: Generator of the features in the layer.
+    :rtype: generator
+    """
+    layer.ResetReading()
+
+    #Not all drivers support random reading hence fallback to skipping
+    if start_offset > 0 and layer.SetNextByIndex(start_offset) != 0:
+        layer.ResetReading()
+
+        for i in range(start_offset):
+            if layer.GetNextFeature() is None:
+                return
+
+    feat = layer.GetNextFeature()
+    while not feat is None:
+        yield feat
+        feat = layer.GetNextFeature()
+
+
+class ImportReport(object):
+    """
+    Summary of an import operation including the errors of the rows that
+    could not be written to the database.
+    """
+    def __init__(self, max_errors=1000):
+        #Only the first 'max_errors' messages are kept, all are counted
+        self.max_errors = max_errors
+        self.errors = []
+        self.imported = 0
+        self.failed = 0
+        self.cancelled = False
+        self.elapsed = 0.0
+
+        #Number of features imported in a previous, interrupted import
+        self.resumed_offset = 0
+
+        #Source values that could not be translated, grouped by column
+        self.unresolved = OrderedDict()
+
+    def add_error(self, fid, message):
+        """
+        Records a row that could not be imported.
+        :param fid: Feature id of the row in the source layer.
+        :type fid: int
+        :param message: Error message.
+        :type message: str
+        """
+        self.failed += 1
+
+        if len(self.errors) < self.max_errors:
+            self.errors.append((fid, unicode(message)))
+
+    def add_unresolved(self, column, values):
+        """
+        Records the source values that could not be translated by the
+        translator of the given destination column.
+        :param column: Name of the destination column.
+        :type column: str
+        :param values: Unresolved source values and the number of rows in
+        which each occurred.
+        :type values: Counter
+        """
+        if len(values) > 0:
+            self.unresolved[column] = values
+
+    @property
+    def has_errors(self):
+        """
+        :return: True if one or more rows could not be imported.
+        :rtype: bool
+        """
+        return self.failed > 0
+
+    @property
+    def rows_per_second(self):
+        """
+        :return: Number of rows imported per second.
+        :rtype: float
+        """
+        if self.elapsed <= 0:
+            return 0.0
+
+        return self.imported / self.elapsed
+
+    def summary(self, max_lines=10):
+        """
+        :param max_lines: Maximum number of row errors to include.
+        :type max_lines: int
+        :return: Returns a user-friendly summary of the import.
+        :rtype: unicode
+        """
+        lines = [u'{0:d} row(s) imported, {1:d} row(s) failed.'.format(
+            self.imported, self.failed
+        )]
+
+        if self.resumed_offset > 0:
+            lines.append(
+                u'Resumed after the first {0:d} feature(s).'.format(
+                    self.resumed_offset
+                )
+            )
+
+        for fid, msg in self.errors[:max_lines]:
+            lines.append(u'Feature {0}: {1}'.format(fid, msg))
+
+        if self.failed > max_lines:
+            lines.append(u'...')
+
+        for column, values in self.unresolved.iteritems():
+            examples = u', '.join(
+                [unicode(v) for v, count in values.most_common(5)]
+            )
+            lines.append(
+                u'{0}: {1:d} value(s) could not be resolved e.g. {2}'.format(
+                    column, len(values), examples
+                )
+            )
+
+        return u'\n'.join(lines)
+
+
+class ProgressThrottle(object):
+    """
+    Limits the frequency of updates to a QProgressDialog since updating the
+    label for every row is more expensive than importing the row itself.
+    """
+    def __init__(self, progress_dialog, label_template, total,
+                 interval=DEFAULT_PROGRESS_INTERVAL):
+        self._progress = progress_dialog
+        self._label_template = label_template
+        self._total = total
+        self._interval = interval
+        self._last_update = 0
+
+    def update(self, value, force=False):
+        """
+        Updates the progress dialog if the interval has elapsed since the
+        last update.
+        :param value: Number of processed rows.
+        :type value: int
+        :param force: True to update irrespective of the interval.
+        :type force: bool
+        """
+        now = time.time()
+        if not force and now - self._last_update < self._interval:
+            return
+
+        self._last_update = now
+        self._progress.setValue(value)
+        self._progress.setLabelText(
+            self._label_template.format(value, self._total)
+        )
+
+    def was_canceled(self):
+        """
+        :return: True if the user has cancelled the operation.
+        :rtype: bool
+        """
+        return self._progress.wasCanceled()
+
+
+class BulkInsertWriter(object):
+    """
+    Accumulates translated rows and writes them in chunks, one transaction
+    per chunk. Rows containing only column values are written with a single
+    Core 'executemany' per chunk, while those with relationship values (such
+    as supporting documents or multiple select items) are written through
+    the ORM session. Both are written in the transaction of the session so
+    that a chunk is committed as a whole before the checkpoint is updated.
+    When a chunk fails and savepoints are enabled, the chunk is replayed one
+    row at a time in a SAVEPOINT so that only the bad rows are rejected and
+    reported, otherwise the error is raised.
+    """
+    def __init__(self, mapped_cls, chunk_size=DEFAULT_CHUNK_SIZE,
+                 use_savepoints=True, report=None, session=None):
+        self._mapped_cls = mapped_cls
+        self._table = mapped_cls.__table__
+        self._column_names = set(self._table.c.keys())
+        self.chunk_size = max(1, int(chunk_size))
+        self.use_savepoints = use_savepoints
+        self.report = report if not report is None else ImportReport()
+
+        if session is None:
+            session = STDMDb.instance().session
+        self._session = session
+
+        self._rows = []
+
+        #Fid of the last row in the most recent committed chunk
+        self.last_committed_fid = None
+
+        #Number of rows in committed chunks, including the rejected ones
+        self.committed_rows = 0
+
+        #Callable invoked with the writer after each chunk is committed
+        self.chunk_committed = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, fid, values):
+        """
+        Adds a row to the current chunk, the chunk is written once it is full.
+        :param fid: Feature id of the row in the source layer.
+        :type fid: int
+        :param values: Destination column names and corresponding values.
+        :type values: dict
+        """
+        self._rows.append((fid, values))
+
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the current chunk to the database.
+        """
+        if len(self._rows) == 0:
+            return
+
+        rows = self._rows
+        self._rows = []
+
+        core_rows = []
+        orm_rows = []
+
+        for fid, values in rows:
+            if self._requires_orm(values):
+                orm_rows.append((fid, values))
+            else:
+                core_rows.append((fid, self._column_values(values)))
+
+        try:
+            self._write_chunk(core_rows, orm_rows)
+            self._session.commit()
+            self.report.imported += len(rows)
+
+        except SQLAlchemyError as db_error:
+            self._session.rollback()
+            LOGGER.debug(unicode(db_error))
+
+            if not self.use_savepoints:
+                raise
+
+            self._replay_rows(core_rows, orm_rows)
+
+        except:
+            self._session.rollback()
+            raise
+
+        self._chunk_written(rows)
+
+    def close(self):
+        """
+        Writes any remaining rows.
+        """
+        self.flush()
+
+    def _chunk_written(self, rows):
+        self.last_committed_fid = rows[-1][0]
+        self.committed_rows += len(rows)
+
+        if not self.chunk_committed is None:
+            self.chunk_committed(self)
+
+    def _requires_orm(self, values):
+        #Relationship values such as documents can only be set using the ORM
+        for col, value in values.iteritems():
+            if isinstance(value, (list, tuple)):
+                if len(value) > 0:
+                    return True
+
+            elif not col in self._column_names \
+                    and not is_ignored_value(value):
+                return True
+
+        return False
+
+    def _column_values(self, values):
+        #Strip ignored values and those without a corresponding column
+        return dict(
+            (col, value) for col, value in values.iteritems()
+            if col in self._column_names and not is_ignored_value(value)
+        )
+
+    def _write_chunk(self, core_rows, orm_rows):
+        #Core rows are executed on the connection of the session transaction
+        conn = self._session.connection()
+
+        #Group rows with the same columns so each group is one executemany
+        groups = OrderedDict()
+        for fid, values in core_rows:
+            groups.setdefault(tuple(sorted(values.keys())), []).append(values)
+
+        for group_rows in groups.values():
+            conn.execute(self._table.insert(), group_rows)
+
+        if len(orm_rows) > 0:
+            self._session.add_all(
+                [self._model_instance(values) for fid, values in orm_rows]
+            )
+            self._session.flush()
+
+    def _model_instance(self, values):
+        model_instance = self._mapped_cls()
+
+        for col, value in values.iteritems():
+            if hasattr(model_instance, col) and not is_ignored_value(value):
+                setattr(model_instance, col, value)
+
+        return model_instance
+
+    def _replay_rows(self, core_rows, orm_rows):
+        #Write each row in its own SAVEPOINT and report the failed ones
+        rows = [(fid, values, False) for fid, values in core_rows] + \
+               [(fid, values, True) for fid, values in orm_rows]
+
+        for fid, values, use_orm in rows:
+            self._session.begin_nested()
+
+            try:
+                if use_orm:
+                    self._session.add(self._model_instance(values))
+                else:
+                    self._session.connection().execute(
+                        self._table.insert(), values
+                    )
+                self._session.commit()
+                self.report.imported += 1
+
+            except SQLAlchemyError as db_error:
+                self._session.rollback()
+                self.report.add_error(fid, db_error)
+
+        self._session.commit()
+
+
+class CopyWriter(object):
+    """
+    Writes rows to the database using the PostgreSQL COPY command through
+    the psycopg2 connection of the STDM engine. Each chunk is formatted in an
+    in-memory buffer and streamed with 'COPY table (columns) FROM STDIN' in
+    its own transaction. Geometry values are expected as hex-encoded EWKB.
+    It is only suitable for rows whose values map directly to the
+    destination columns i.e. without value translators.
+    When a chunk fails and savepoints are enabled, the chunk is replayed one
+    row at a time in a SAVEPOINT so that only the bad rows are rejected.
+    """
+    def __init__(self, table_name, columns, chunk_size=DEFAULT_CHUNK_SIZE,
+                 use_savepoints=True, report=None, engine=None):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.chunk_size = max(1, int(chunk_size))
+        self.use_savepoints = use_savepoints
+        self.report = report if not report is None else ImportReport()
+
+        if engine is None:
+            engine = STDMDb.instance().engine
+        self._engine = engine
+
+        self._copy_sql = u'COPY {0} ({1}) FROM STDIN'.format(
+            table_name, ', '.join(self.columns)
+        )
+
+        self._rows = []
+
+        #Fid of the last row in the most recent committed chunk
+        self.last_committed_fid = None
+
+        #Number of rows in committed chunks, including the rejected ones
+        self.committed_rows = 0
+
+        #Callable invoked with the writer after each chunk is committed
+        self.chunk_committed = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, fid, values):
+        """
+        Adds a row to the current chunk, the chunk is written once it is full.
+        :param fid: Feature id of the row in the source layer.
+        :type fid: int
+        :param values: Destination column names and corresponding values.
+        Columns not in the values will be set to NULL.
+        :type values: dict
+        """
+        line = '\t'.join(
+            [copy_text_value(values.get(c, None)) for c in self.columns]
+        )
+        self._rows.append((fid, line))
+
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the current chunk to the database.
+        """
+        if len(self._rows) == 0:
+            return
+
+        rows = self._rows
+        self._rows = []
+
+        conn = self._engine.raw_connection()
+
+        try:
+            cursor = conn.cursor()
+
+            try:
+                self._copy(cursor, [line for fid, line in rows])
+                conn.commit()
+                self.report.imported += len(rows)
+
+            except psycopg2.Error as db_error:
+                conn.rollback()
+                LOGGER.debug(unicode(db_error))
+
+                if not self.use_savepoints:
+                    raise
+
+                self._replay_rows(conn, cursor, rows)
+
+            cursor.close()
+
+        finally:
+            conn.close()
+
+        self._chunk_written(rows)
+
+    def close(self):
+        """
+        Writes any remaining rows.
+        """
+        self.flush()
+
+    def _chunk_written(self, rows):
+        self.last_committed_fid = rows[-1][0]
+        self.committed_rows += len(rows)
+
+        if not self.chunk_committed is None:
+            self.chunk_committed(self)
+
+    def _copy(self, cursor, lines):
+        buf = StringIO()
+        buf.write('\n'.join(lines))
+        buf.write('\n')
+        buf.seek(0)
+
+        cursor.copy_expert(self._copy_sql, buf)
+
+    def _replay_rows(self, conn, cursor, rows):
+        #Copy each row in its own SAVEPOINT and report the failed ones
+        for fid, line in rows:
+            cursor.execute('SAVEPOINT stdm_copy_row')
+
+            try:
+                self._copy(cursor, [line])
+                cursor.execute('RELEASE SAVEPOINT stdm_copy_row')
+                self.report.imported += 1
+
+            except psycopg2.Error as db_error:
+                cursor.execute('ROLLBACK TO SAVEPOINT stdm_copy_row')
+                self.report.add_error(fid, db_error)
+
+        conn.commit()
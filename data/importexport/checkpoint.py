@@ -0,0 +1,290 @@
+"""
+/***************************************************************************
+Name                 : Import Checkpoint
+Description          : Persists the progress of an import job so that an
+                       interrupted import can be resumed from the last
+                       committed chunk.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from stdm import USER_PLUGIN_DIR
+
+LOGGER = logging.getLogger('stdm')
+
+#Directory containing the checkpoints of import jobs
+IMPORT_JOBS_DIR = u'{0}/import_jobs'.format(USER_PLUGIN_DIR)
+
+#Files accompanying a shapefile which also contain feature data
+_SHAPEFILE_PARTS = ['.shp', '.shx', '.dbf']
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def source_file_hash(source_file):
+    """
+    Computes the SHA-1 hash of the given source file. For shapefiles, the
+    index and attribute files are also included.
+    :param source_file: Path to the source file.
+    :type source_file: str
+    :return: Hex digest of the file contents.
+    :rtype: str
+    """
+    files = [source_file]
+
+    base_name, ext = os.path.splitext(source_file)
+    if ext.lower() == '.shp':
+        files = [base_name + p for p in _SHAPEFILE_PARTS]
+
+    sha = hashlib.sha1()
+
+    for f in files:
+        if not os.path.exists(f):
+            continue
+
+        with open(f, 'rb') as source:
+            block = source.read(_HASH_BLOCK_SIZE)
+            while block:
+                sha.update(block)
+                block = source.read(_HASH_BLOCK_SIZE)
+
+    return sha.hexdigest()
+
+
+def database_identity(db_conn=None):
+    """
+    :param db_conn: Database connection, defaults to the connection of the
+    current user.
+    :type db_conn: DatabaseConnection
+    :return: Returns the host, port, database name and user name of the
+    connection, or None if there is no connection.
+    :rtype: list
+    """
+    if db_conn is None:
+        from stdm import data
+
+        db_conn = data.app_dbconn
+
+    if db_conn is None:
+        return None
+
+    user_name = None
+    if not db_conn.User is None:
+        user_name = unicode(db_conn.User.UserName)
+
+    return [
+        unicode(db_conn.Host),
+        unicode(db_conn.Port),
+        unicode(db_conn.Database),
+        user_name
+    ]
+
+
+class ImportCheckpoint(object):
+    """
+    Records the progress of importing a source file into a table of a
+    database using a given column mapping. The checkpoint is saved as a JSON file in the
+    IMPORT_JOBS_DIR directory after each committed chunk and removed once
+    the import completes.
+    """
+    def __init__(self, source_file, target_table, column_mapping,
+                 geom_column=None, source_hash=None, database=None):
+        self.source_file = source_file
+        self.target_table = target_table
+        self.column_mapping = dict(column_mapping)
+        self.geom_column = geom_column
+
+        if database is None:
+            database = database_identity()
+        self.database = database
+
+        if source_hash is None:
+            source_hash = source_file_hash(source_file)
+        self.source_hash = source_hash
+
+        #Number of source features in committed chunks
+        self.offset = 0
+
+        #Id of the last feature in the last committed chunk
+        self.last_fid = None
+
+        self.imported = 0
+        self.failed = 0
+        self.updated = None
+
+    @property
+    def job_id(self):
+        """
+        :return: Returns an identifier derived from the source file
+        contents, target database and table and column mapping.
+        :rtype: str
+        """
+        mapping = sorted(
+            [(unicode(k), unicode(v)) for k, v in
+             self.column_mapping.iteritems()]
+        )
+        job_key = json.dumps([
+            self.source_hash,
+            self.database,
+            self.target_table,
+            mapping,
+            self.geom_column
+        ])
+
+        return hashlib.sha1(job_key.encode('utf-8')).hexdigest()
+
+    @property
+    def path(self):
+        """
+        :return: Returns the path of the checkpoint file.
+        :rtype: str
+        """
+        return u'{0}/{1}.json'.format(IMPORT_JOBS_DIR, self.job_id)
+
+    @property
+    def has_progress(self):
+        """
+        :return: True if one or more chunks were committed before the
+        import was interrupted.
+        :rtype: bool
+        """
+        return self.offset > 0
+
+    def update(self, offset, last_fid, imported, failed):
+        """
+        Updates and saves the checkpoint after a chunk has been committed.
+        :param offset: Number of source features in committed chunks.
+        :type offset: int
+        :param last_fid: Id of the last feature in the committed chunk.
+        :type last_fid: int
+        :param imported: Total number of imported rows.
+        :type imported: int
+        :param failed: Total number of rejected rows.
+        :type failed: int
+        """
+        self.offset = offset
+        self.last_fid = last_fid
+        self.imported = imported
+        self.failed = failed
+
+        self.save()
+
+    def save(self):
+        """
+        Writes the checkpoint file.
+        """
+        if not os.path.isdir(IMPORT_JOBS_DIR):
+            os.makedirs(IMPORT_JOBS_DIR)
+
+        self.updated = datetime.now().isoformat()
+
+        checkpoint = {
+            'source_file': self.source_file,
+            'source_hash': self.source_hash,
+            'database': self.database,
+            'target_table': self.target_table,
+            'column_mapping': self.column_mapping,
+            'geom_column': self.geom_column,
+            'offset': self.offset,
+            'last_fid': self.last_fid,
+            'imported': self.imported,
+            'failed': self.failed,
+            'updated': self.updated
+        }
+
+        #Write to a temporary file first so that a crash does not corrupt it
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            json.dump(checkpoint, f)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        """
+        Deletes the checkpoint file, if it exists.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def reset(self):
+        """
+        Discards the progress of a previous import so that the source file
+        is imported from the beginning.
+        """
+        self.offset = 0
+        self.last_fid = None
+        self.imported = 0
+        self.failed = 0
+        self.updated = None
+
+        self.remove()
+
+    @staticmethod
+    def load(source_file, target_table, column_mapping, geom_column=None,
+             database=None):
+        """
+        Loads the checkpoint of a previous import of the source file into
+        the target table using the same column mapping.
+        :param source_file: Path to the source file.
+        :type source_file: str
+        :param target_table: Name of the destination table.
+        :type target_table: str
+        :param column_mapping: Source column names and corresponding
+        destination column names.
+        :type column_mapping: dict
+        :param geom_column: Name of the destination geometry column.
+        :type geom_column: str
+        :param database: Host, port, database name and user name of the
+        destination database, defaults to those of the current connection.
+        :type database: list
+        :return: Returns the checkpoint which will be empty if the source
+        file has not been partially imported or it has changed since.
+        :rtype: ImportCheckpoint
+        """
+        checkpoint = ImportCheckpoint(source_file, target_table,
+                                      column_mapping, geom_column,
+                                      database=database)
+
+        if not os.path.exists(checkpoint.path):
+            return checkpoint
+
+        try:
+            with open(checkpoint.path, 'rb') as f:
+                saved = json.load(f)
+
+        except (IOError, ValueError) as ex:
+            LOGGER.debug(u'Import checkpoint could not be read: %s',
+                         unicode(ex))
+
+            return checkpoint
+
+        #The job id already guarantees this, but verify nonetheless
+        if saved.get('source_hash', None) != checkpoint.source_hash:
+            return checkpoint
+
+        checkpoint.offset = saved.get('offset', 0)
+        checkpoint.last_fid = saved.get('last_fid', None)
+        checkpoint.imported = saved.get('imported', 0)
+        checkpoint.failed = saved.get('failed', 0)
+        checkpoint.updated = saved.get('updated', None)
+
+        return checkpoint
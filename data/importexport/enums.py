@@ -17,13 +17,18 @@ drivers={
          "csv":"CSV",
          "tab":"MapInfo File",
          "gpx":"GPX",
-         "dxf":"DXF"
+         "dxf":"DXF",
+         "gpkg":"GPKG",
+         "sqlite":"SQLite"
          }
 
+#Drivers whose writes are considerably faster when batched in transactions
+transactionDrivers=["GPKG","SQLite"]
+
 ogrTypes={
           "character varying":ogr.OFTString,
-          "bigint":ogr.OFTInteger,
-          "bigserial":ogr.OFTInteger,
+          "bigint":getattr(ogr,"OFTInteger64",ogr.OFTInteger),
+          "bigserial":getattr(ogr,"OFTInteger64",ogr.OFTInteger),
           "boolean":ogr.OFTString,
           "bytea":ogr.OFTBinary,
           "character":ogr.OFTString,
@@ -0,0 +1,463 @@
+"""
+/***************************************************************************
+Name                 : Import Pipeline
+Description          : Multi-process pipeline for importing large OGR data
+                       sources. Features are read in one stage, translated
+                       by a pool of worker processes and written to the
+                       database in a single writer stage.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from collections import (
+    Counter,
+    defaultdict
+)
+from multiprocessing import TimeoutError as PoolTimeoutError
+from Queue import (
+    Empty,
+    Full,
+    Queue
+)
+
+from stdm.data.importexport.bulk_import import (
+    DEFAULT_CHUNK_SIZE,
+    ewkb_hex,
+    iter_features
+)
+from stdm.data.importexport.value_translators import normalize_key_value
+
+LOGGER = logging.getLogger('stdm')
+
+#Maximum number of batches waiting in each queue of the pipeline
+DEFAULT_QUEUE_SIZE = 4
+
+#Maximum number of worker processes used to translate the features
+MAX_PROCESSES = 4
+
+#Seconds to wait on a queue before checking whether the import was cancelled
+_QUEUE_TIMEOUT = 0.2
+
+#Marks the end of the features in the reader queue
+_END_OF_FEATURES = None
+
+#Translation plan of the current worker process, set by _init_worker
+_worker_plan = None
+
+
+class TranslationPlan(object):
+    """
+    Picklable description of how the values of a source feature are
+    translated to destination column values. It is created from the
+    translators after they have been prepared and is sent once to each
+    worker process.
+    """
+    def __init__(self, geom_column=None, srid=-1, geom_type=''):
+        #Indexes of the source fields read for each feature
+        self.field_indexes = []
+
+        #Tuples of position in the feature values and destination column
+        self.direct_columns = []
+
+        #Tuples of destination column, value positions and translation table
+        self.translated_columns = []
+
+        self.geom_column = geom_column
+        self.srid = srid
+        self.geom_type = geom_type or ''
+
+    @staticmethod
+    def create(feat_defn, columnmatch, translator_manager, geom_column=None,
+               srid=-1, geom_type=''):
+        """
+        Creates a translation plan for the given column mapping.
+        :param feat_defn: Feature definition of the source layer.
+        :type feat_defn: ogr.FeatureDefn
+        :param columnmatch: Source column names and corresponding
+        destination column names.
+        :type columnmatch: dict
+        :param translator_manager: Prepared value translators.
+        :type translator_manager: ValueTranslatorManager
+        :return: Returns the translation plan or None if one or more
+        translators do not support offline translation.
+        :rtype: TranslationPlan
+        """
+        plan = TranslationPlan(geom_column, srid, geom_type)
+
+        field_names = [feat_defn.GetFieldDefn(f).GetNameRef()
+                       for f in range(feat_defn.GetFieldCount())]
+
+        for f, field_name in enumerate(field_names):
+            if not field_name in columnmatch:
+                continue
+
+            dest_column = columnmatch[field_name]
+            value_translator = translator_manager.translator(dest_column)
+
+            if value_translator is None:
+                plan.direct_columns.append(
+                    (plan._field_position(f), dest_column)
+                )
+
+                continue
+
+            table = value_translator.translation_table()
+            if table is None:
+                return None
+
+            positions = []
+            for source_col in table['source_columns']:
+                if not source_col in field_names:
+                    return None
+
+                positions.append(
+                    plan._field_position(field_names.index(source_col))
+                )
+
+            plan.translated_columns.append((dest_column, positions, table))
+
+        return plan
+
+    def _field_position(self, field_index):
+        #Position of the field in the values read for each feature
+        if not field_index in self.field_indexes:
+            self.field_indexes.append(field_index)
+
+        return self.field_indexes.index(field_index)
+
+    def columns(self):
+        """
+        :return: Returns the names of the destination columns written by
+        the plan.
+        :rtype: list
+        """
+        columns = [c for p, c in self.direct_columns]
+        columns.extend([c for c, p, t in self.translated_columns])
+
+        if not self.geom_column is None:
+            columns.append(self.geom_column)
+
+        return columns
+
+    def translate(self, values, wkb, geom_name, unresolved):
+        """
+        Translates the values of a single feature.
+        :param values: Values of the fields in 'field_indexes'.
+        :type values: tuple
+        :param wkb: Geometry of the feature in WKB format or None.
+        :type wkb: str
+        :param geom_name: Geometry type name of the feature.
+        :type geom_name: str
+        :param unresolved: Container for the source values that could not
+        be translated grouped by destination column.
+        :type unresolved: defaultdict(Counter)
+        :return: Destination column names and corresponding values.
+        :rtype: dict
+        """
+        row = {}
+
+        for pos, dest_column in self.direct_columns:
+            row[dest_column] = values[pos]
+
+        for dest_column, positions, table in self.translated_columns:
+            if table['type'] == 'lookup':
+                source_value = values[positions[0]]
+                key = normalize_key_value(source_value)
+                if not key is None:
+                    key = key.lower()
+
+                value = table['values'].get(key, None)
+                if value is None:
+                    value = table['default']
+
+            else:
+                key = tuple([normalize_key_value(values[p], t)
+                             for p, t in zip(positions,
+                                             table['key_types'])])
+                source_value = key if len(key) > 1 else key[0]
+                value = table['values'].get(key, None)
+
+            if value is None:
+                unresolved[dest_column][source_value] += 1
+            else:
+                row[dest_column] = value
+
+        if not self.geom_column is None and not wkb is None:
+            if geom_name.lower() != self.geom_type.lower():
+                raise TypeError(
+                    "The geometries of the source and destination columns do "
+                    "not match.\nSource Geometry Type: {0}, Destination "
+                    "Geometry Type: {1}".format(geom_name, self.geom_type)
+                )
+
+            row[self.geom_column] = ewkb_hex(wkb, self.srid)
+
+        return row
+
+
+def _init_worker(plan):
+    #Sets the translation plan in a worker process
+    global _worker_plan
+    _worker_plan = plan
+
+
+def _translate_batch(batch):
+    """
+    Translates a batch of features in a worker process.
+    :param batch: List of tuples containing the feature id, field values,
+    WKB geometry and geometry type name of each feature.
+    :type batch: list
+    :return: Tuple containing the translated rows and the unresolved source
+    values grouped by destination column.
+    :rtype: tuple
+    """
+    unresolved = defaultdict(Counter)
+    rows = []
+
+    for fid, values, wkb, geom_name in batch:
+        rows.append(
+            (fid, _worker_plan.translate(values, wkb, geom_name, unresolved))
+        )
+
+    return rows, dict(unresolved)
+
+
+def default_processes():
+    """
+    :return: Returns the number of worker processes used when none is
+    specified. One processor is left for the reader, the writer and the
+    user interface and at most MAX_PROCESSES are used.
+    :rtype: int
+    """
+    return max(1, min(multiprocessing.cpu_count() - 1, MAX_PROCESSES))
+
+
+def _configure_multiprocessing():
+    #Inside QGIS on Windows, sys.executable is the QGIS binary
+    if sys.platform != 'win32':
+        return
+
+    exe_name = os.path.basename(sys.executable).lower()
+    if exe_name.startswith('python'):
+        return
+
+    python_exe = os.path.join(sys.exec_prefix, 'pythonw.exe')
+    if not os.path.exists(python_exe):
+        python_exe = os.path.join(sys.exec_prefix, 'python.exe')
+
+    multiprocessing.set_executable(python_exe)
+
+
+class ImportPipeline(object):
+    """
+    Imports the features of an OGR layer in three stages connected by
+    bounded queues: a reader thread which reads the features in batches, a
+    pool of worker processes which translate the batches using a
+    TranslationPlan and a writer thread which writes the translated rows
+    using a writer such as CopyWriter. The calling thread is free to keep
+    the user interface responsive and can cancel the pipeline at any time.
+    Features before 'start_offset' are skipped when resuming an import.
+    The number of worker processes is capped at MAX_PROCESSES.
+    """
+    def __init__(self, layer, plan, writer, processes=None,
+                 batch_size=DEFAULT_CHUNK_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                 start_offset=0):
+        self._layer = layer
+        self._plan = plan
+        self._writer = writer
+        self.processes = min(processes or default_processes(),
+                             MAX_PROCESSES)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.start_offset = start_offset
+
+        self._feature_queue = Queue(queue_size)
+        self._pending_batches = Queue(queue_size + self.processes)
+        self._cancel_event = threading.Event()
+
+        self._pool = None
+        self._reader_thread = None
+        self._writer_thread = None
+
+        self.processed = 0
+        self.unresolved = defaultdict(Counter)
+        self.error = None
+
+    def start(self):
+        """
+        Starts the reader, worker and writer stages.
+        """
+        _configure_multiprocessing()
+
+        self._pool = multiprocessing.Pool(
+            self.processes,
+            _init_worker,
+            (self._plan,)
+        )
+
+        self._reader_thread = threading.Thread(target=self._read_features)
+        self._reader_thread.daemon = True
+        self._reader_thread.start()
+
+        self._writer_thread = threading.Thread(target=self._write_rows)
+        self._writer_thread.daemon = True
+        self._writer_thread.start()
+
+    def is_running(self):
+        """
+        :return: True if the pipeline has not yet finished.
+        :rtype: bool
+        """
+        return not self._writer_thread is None \
+               and self._writer_thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the pipeline finishes or the timeout elapses.
+        :param timeout: Timeout in seconds.
+        :type timeout: float
+        """
+        if not self._writer_thread is None:
+            self._writer_thread.join(timeout)
+
+    def cancel(self):
+        """
+        Stops all stages. Rows in chunks that have already been committed
+        remain in the database.
+        """
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """
+        :return: True if the pipeline has been cancelled.
+        :rtype: bool
+        """
+        return self._cancel_event.is_set()
+
+    def _put(self, queue, item):
+        #Put the item in a bounded queue unless the pipeline is cancelled
+        while not self.cancelled:
+            try:
+                queue.put(item, True, _QUEUE_TIMEOUT)
+
+                return True
+
+            except Full:
+                continue
+
+        return False
+
+    def _read_features(self):
+        #Reader stage
+        field_indexes = self._plan.field_indexes
+        read_geometry = not self._plan.geom_column is None
+        batch = []
+
+        try:
+            for feat in iter_features(self._layer, self.start_offset):
+                if self.cancelled:
+                    return
+
+                fid = feat.GetFID()
+
+                wkb, geom_name = None, None
+                if read_geometry:
+                    geom = feat.GetGeometryRef()
+                    if not geom is None:
+                        wkb = geom.ExportToWkb()
+                        geom_name = geom.GetGeometryName()
+
+                values = tuple([feat.GetField(f) for f in field_indexes])
+                batch.append((fid, values, wkb, geom_name))
+
+                if len(batch) >= self.batch_size:
+                    if not self._put(self._feature_queue, batch):
+                        return
+
+                    batch = []
+
+            if len(batch) > 0:
+                self._put(self._feature_queue, batch)
+
+        except Exception as ex:
+            self.error = ex
+            self.cancel()
+
+        finally:
+            self._put(self._feature_queue, _END_OF_FEATURES)
+
+    def _feature_batches(self):
+        #Feeds the worker pool from the reader queue
+        while not self.cancelled:
+            try:
+                batch = self._feature_queue.get(True, _QUEUE_TIMEOUT)
+
+            except Empty:
+                continue
+
+            if batch is _END_OF_FEATURES:
+                return
+
+            #Limit the number of batches being translated
+            if not self._put(self._pending_batches, len(batch)):
+                return
+
+            yield batch
+
+    def _write_rows(self):
+        #Writer stage
+        try:
+            results = self._pool.imap(_translate_batch,
+                                      self._feature_batches())
+
+            while not self.cancelled:
+                try:
+                    rows, unresolved = results.next(_QUEUE_TIMEOUT)
+
+                except PoolTimeoutError:
+                    continue
+
+                except StopIteration:
+                    break
+
+                for fid, values in rows:
+                    self._writer.add(fid, values)
+
+                for column, values in unresolved.iteritems():
+                    self.unresolved[column].update(values)
+
+                self.processed += self._pending_batches.get()
+
+            #Write translated rows, including those read before a cancel
+            if self.error is None:
+                self._writer.close()
+
+        except Exception as ex:
+            LOGGER.debug(unicode(ex))
+            self.error = ex
+            self.cancel()
+
+        finally:
+            if self.cancelled:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+
+            self._pool.join()
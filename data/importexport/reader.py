@@ -20,6 +20,7 @@ email                : stdm@unhabitat.org
 """
 import logging
 import sys
+import time
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
@@ -34,6 +35,7 @@ except:
 from stdm.ui.stdmdialog import DeclareMapping
 from stdm.data.pg_utils import (
     delete_table_data,
+    fix_sequence,
     geometryType
 )
 from stdm.utils.util import getIndex
@@ -47,10 +49,29 @@ from stdm.data.importexport.value_translators import (
     IgnoreType,
     ValueTranslatorManager
 )
+from stdm.data.importexport.pipeline import (
+    ImportPipeline,
+    TranslationPlan
+)
+from stdm.data.importexport.bulk_import import (
+    BulkInsertWriter,
+    CopyWriter,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_PROGRESS_INTERVAL,
+    ewkb_hex,
+    ImportReport,
+    is_ignored_value,
+    iter_features,
+    ProgressThrottle
+)
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.exception import ConfigurationException
+from stdm.data.tracing import traced
 from stdm.ui.sourcedocument import SourceDocumentManager
 
+#Minimum number of features for the import to use worker processes
+PIPELINE_MIN_FEATURES = 20000
+
 class OGRReader(object):
     def __init__(self, source_file):
         self._ds = ogr.Open(source_file)
@@ -156,7 +177,7 @@ class OGRReader(object):
                 if col_is_enum:
                     value = enum_symbol
                 '''
-                if not isinstance(value, IgnoreType):
+                if not is_ignored_value(value):
                     setattr(model_instance, col, value)
 
         try:
@@ -167,8 +188,13 @@ class OGRReader(object):
             self._dbSession.rollback()
             raise
     
+    @traced('OGRReader.featToDb', 'import')
     def featToDb(self, targettable , columnmatch, append, parentdialog,
-                 geomColumn=None, geomCode=-1, translator_manager=None):
+                 geomColumn=None, geomCode=-1, translator_manager=None,
+                 bulk=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                 use_savepoints=True,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL,
+                 use_copy=True, processes=1, checkpoint=None):
         """
         Performs the data import from the source layer to the STDM database.
         :param targettable: Destination table name
@@ -178,6 +204,34 @@ class OGRReader(object):
         :param translator_manager: Instance of 'stdm.data.importexport.ValueTranslatorManager'
         containing value translators defined for the destination table columns.
         :type translator_manager: ValueTranslatorManager
+        :param bulk: True to write the rows in chunks, one transaction per
+        chunk, instead of one transaction per feature.
+        :type bulk: bool
+        :param chunk_size: Number of rows written per transaction in bulk
+        mode.
+        :type chunk_size: int
+        :param use_savepoints: In bulk mode, True to reject and report only
+        the bad rows in a failed chunk, otherwise the import is aborted.
+        :type use_savepoints: bool
+        :param progress_interval: Minimum number of seconds between updates
+        of the progress dialog.
+        :type progress_interval: float
+        :param use_copy: In bulk mode, True to write the rows using the
+        PostgreSQL COPY command if no value translators have been defined.
+        :type use_copy: bool
+        :param processes: In bulk mode, number of worker processes used to
+        translate the features. Worker processes are only used for layers
+        with at least PIPELINE_MIN_FEATURES features and if all the
+        translators have preloaded their referenced values.
+        :type processes: int
+        :param checkpoint: In bulk mode, checkpoint which is saved after each
+        committed chunk. If it has progress from a previous import, the
+        features in the committed chunks are skipped and the existing rows
+        are retained irrespective of 'append'. The checkpoint is removed
+        once all the features have been imported.
+        :type checkpoint: ImportCheckpoint
+        :return: Summary of the import operation.
+        :rtype: ImportReport
         """
         #Check current profile
         if self._current_profile is None:
@@ -191,16 +245,17 @@ class OGRReader(object):
         if translator_manager is None:
             translator_manager = ValueTranslatorManager()
 
+        #Resume after the features committed in a previous import
+        start_offset = 0
+        if bulk and not checkpoint is None:
+            start_offset = checkpoint.offset
+
         #Delete existing rows in the target table if user has chosen to overwrite
-        if not append:
+        if not append and start_offset == 0:
             delete_table_data(targettable)
 
-        #Container for mapping column names to their corresponding values
-        column_value_mapping = {}
-        
         lyr = self.getLayer()
         lyr.ResetReading()
-        feat_defn = lyr.GetLayerDefn()
         numFeat = lyr.GetFeatureCount() 
           
         #Configure progress dialog
@@ -209,125 +264,386 @@ class OGRReader(object):
                                    parentdialog)
         progress.setWindowModality(Qt.WindowModal)    
         lblMsgTemp = "Importing {0} of {1} to STDM..."
+        progress_throttle = ProgressThrottle(progress, lblMsgTemp, numFeat,
+                                             progress_interval)
 
         #Set entity for use in translators
         destination_entity = self._data_source_entity(targettable)
-           
-        for feat in lyr:
-            column_count = 0
-            progress.setValue(init_val)
-            progressMsg = lblMsgTemp.format((init_val + 1), numFeat)
-            progress.setLabelText(progressMsg)
+
+        self._init_mapped_class(targettable, destination_entity, geomColumn)
+
+        report = ImportReport()
+        report.resumed_offset = start_offset
+        bulk_writer = None
+
+        #Load referenced values used by the translators
+        translator_manager.prepare()
+
+        #Values are copied as-is hence no translators should be defined
+        copy_rows = bulk and use_copy and translator_manager.count() == 0
+
+        translation_plan = None
+        if bulk and processes > 1 and numFeat >= PIPELINE_MIN_FEATURES:
+            translation_plan = TranslationPlan.create(
+                lyr.GetLayerDefn(),
+                columnmatch,
+                translator_manager,
+                geomColumn,
+                self._targetGeomColSRID,
+                self._geomType
+            )
+
+        if not translation_plan is None:
+            #Translated values are scalars which can be copied
+            copy_rows = True
+            bulk_writer = CopyWriter(
+                targettable,
+                translation_plan.columns(),
+                chunk_size=chunk_size,
+                use_savepoints=use_savepoints,
+                report=report
+            )
+
+        elif copy_rows:
+            bulk_writer = CopyWriter(
+                targettable,
+                self._copy_columns(columnmatch, geomColumn),
+                chunk_size=chunk_size,
+                use_savepoints=use_savepoints,
+                report=report
+            )
+
+        elif bulk:
+            bulk_writer = BulkInsertWriter(
+                self._mapped_cls,
+                chunk_size=chunk_size,
+                use_savepoints=use_savepoints,
+                report=report
+            )
+
+        if not bulk_writer is None and not checkpoint is None:
+            bulk_writer.chunk_committed = self._checkpoint_updater(
+                checkpoint,
+                report
+            )
+
+        start_time = time.time()
+
+        if not translation_plan is None:
+            pipeline = ImportPipeline(
+                lyr,
+                translation_plan,
+                bulk_writer,
+                processes=processes,
+                batch_size=chunk_size,
+                start_offset=start_offset
+            )
+            self._run_pipeline(pipeline, progress, progress_throttle, report)
+
+        else:
+            self._import_rows(
+                lyr,
+                columnmatch,
+                destination_entity,
+                geomColumn,
+                translator_manager,
+                copy_rows,
+                bulk_writer,
+                progress,
+                progress_throttle,
+                report,
+                start_offset
+            )
+
+        #Rows written using COPY may contain explicit ids
+        if copy_rows:
+            fix_sequence(targettable)
+
+        for value_translator in translator_manager.translators():
+            report.add_unresolved(
+                value_translator.referencing_column(),
+                value_translator.unresolved_values()
+            )
+
+        report.elapsed = time.time() - start_time
+        progress.setValue(numFeat)
+
+        #A cancelled import can be resumed later
+        if not checkpoint is None and not report.cancelled:
+            checkpoint.remove()
+
+        return report
+
+    def _checkpoint_updater(self, checkpoint, report):
+        #Saves the checkpoint each time the writer commits a chunk
+        start_offset = checkpoint.offset
+        imported = checkpoint.imported
+        failed = checkpoint.failed
+
+        def update_checkpoint(writer):
+            checkpoint.update(
+                start_offset + writer.committed_rows,
+                writer.last_committed_fid,
+                imported + report.imported,
+                failed + report.failed
+            )
+
+        return update_checkpoint
+
+    def _import_rows(self, lyr, columnmatch, destination_entity, geomColumn,
+                     translator_manager, copy_rows, bulk_writer, progress,
+                     progress_throttle, report, start_offset=0):
+        #Translates and writes the features in the calling thread
+        init_val = start_offset
+
+        feature_rows = self._feature_rows(
+            lyr,
+            columnmatch,
+            destination_entity,
+            geomColumn,
+            translator_manager,
+            copy_rows,
+            start_offset=start_offset
+        )
+
+        try:
+            for fid, column_value_mapping in feature_rows:
+                progress_throttle.update(init_val)
+
+                if progress_throttle.was_canceled():
+                    report.cancelled = True
+
+                    break
+
+                if bulk_writer is None:
+                    #Insert the record
+                    self._insertRow(column_value_mapping)
+                    report.imported += 1
+
+                else:
+                    bulk_writer.add(fid, column_value_mapping)
+
+                init_val+=1
+
+            if not bulk_writer is None:
+                bulk_writer.close()
+
+        except:
+            progress.close()
+            raise
+
+    def _run_pipeline(self, pipeline, progress, progress_throttle, report):
+        #Runs the import pipeline while keeping the dialog responsive
+        pipeline.start()
+
+        while pipeline.is_running():
+            pipeline.wait(DEFAULT_PROGRESS_INTERVAL)
+            QApplication.processEvents()
+
+            progress_throttle.update(
+                pipeline.start_offset + pipeline.processed
+            )
+
+            if progress_throttle.was_canceled() and not pipeline.cancelled:
+                report.cancelled = True
+                pipeline.cancel()
+
+        for column, values in pipeline.unresolved.iteritems():
+            report.add_unresolved(column, values)
+
+        if not pipeline.error is None:
+            progress.close()
+            raise pipeline.error
+
+    def _init_mapped_class(self, targettable, destination_entity, geomColumn):
+        #Create mapped class only once
+        if not self._mapped_cls is None:
+            return
+
+        mapped_cls, mapped_doc_cls = self._get_mapped_class(targettable)
+
+        if mapped_cls is None:
+            msg = QApplication.translate(
+                "OGRReader",
+                "Something happened that caused the "
+                "database table not to be mapped to the "
+                "corresponding model class. Please contact"
+                " your system administrator."
+            )
+
+            raise RuntimeError(msg)
+
+        self._mapped_cls = mapped_cls
+        self._mapped_doc_cls = mapped_doc_cls
+
+        #Create source document manager if the entity supports them
+        if destination_entity.supports_documents:
+            self._source_doc_manager = SourceDocumentManager(
+                destination_entity.supporting_doc,
+                self._mapped_doc_cls
+            )
+
+        if geomColumn is not None:
+            #Use geometry column SRID in the target table
+            self._geomType,self._targetGeomColSRID = \
+                geometryType(targettable,geomColumn)
+
+    def _copy_columns(self, columnmatch, geomColumn):
+        #Destination columns written by the COPY command
+        columns = []
+        for dest_column in columnmatch.values():
+            if not dest_column in columns:
+                columns.append(dest_column)
+
+        if geomColumn is not None and not geomColumn in columns:
+            columns.append(geomColumn)
+
+        return columns
+
+    def _feature_rows(self, lyr, columnmatch, destination_entity, geomColumn,
+                      translator_manager, ewkb=False,
+                      batch_size=DEFAULT_CHUNK_SIZE, start_offset=0):
+        """
+        Reads the features in the source layer and translates them to
+        destination column values. Features are read in batches so that the
+        translators can prefetch the referenced values of each batch.
+        :param ewkb: True to return geometries as hex-encoded EWKB, otherwise
+        EWKT will be used.
+        :type ewkb: bool
+        :param batch_size: Number of features in each batch.
+        :type batch_size: int
+        :param start_offset: Number of features to skip.
+        :type start_offset: int
+        :return: Generator of tuples containing the feature id and the
+        corresponding destination column name-value pairs.
+        :rtype: generator
+        """
+        feat_defn = lyr.GetLayerDefn()
+        translators = translator_manager.translators()
+
+        for batch in self._feature_batches(lyr, batch_size, start_offset):
+            if len(translators) > 0:
+                self._prefetch_translations(batch, feat_defn, translators)
+
+            for feat in batch:
+                column_value_mapping = self._translate_feature(
+                    feat,
+                    feat_defn,
+                    columnmatch,
+                    destination_entity,
+                    geomColumn,
+                    translator_manager,
+                    ewkb
+                )
+
+                yield feat.GetFID(), column_value_mapping
+
+    def _feature_batches(self, lyr, batch_size, start_offset=0):
+        #Generator of lists of features in the layer
+        batch = []
+        for feat in iter_features(lyr, start_offset):
+            batch.append(feat)
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if len(batch) > 0:
+            yield batch
+
+    def _prefetch_translations(self, features, feat_defn, translators):
+        #Let translators load the referenced values for a batch of features
+        for value_translator in translators:
+            source_col_names = value_translator.source_column_names()
+
+            field_values_list = [
+                self._map_column_values(feat, feat_defn, source_col_names)
+                for feat in features
+            ]
+
+            value_translator.prefetch(field_values_list)
+
+    def _translate_feature(self, feat, feat_defn, columnmatch,
+                           destination_entity, geomColumn,
+                           translator_manager, ewkb=False):
+        """
+        Translates the values of a feature to destination column values.
+        :return: Destination column names and corresponding values.
+        :rtype: dict
+        """
+        #Container for mapping column names to their corresponding values
+        column_value_mapping = {}
+
+        #Reset source document manager for new records
+        if destination_entity.supports_documents:
+            if not self._source_doc_manager is None:
+                self._source_doc_manager.reset()
+        
+        for f in range(feat_defn.GetFieldCount()):
+            field_defn = feat_defn.GetFieldDefn(f) 
+            field_name = field_defn.GetNameRef()  
             
-            if progress.wasCanceled():
-                break
+            #Append value only if it has been defined by the user                         
+            if field_name in columnmatch:
+                dest_column = columnmatch[field_name]
 
-            #Reset source document manager for new records
-            if destination_entity.supports_documents:
-                if not self._source_doc_manager is None:
-                    self._source_doc_manager.reset()
+                field_value = feat.GetField(f)
+
+                '''
+                Check if there is a value translator defined for the
+                specified destination column.
+                '''
+                value_translator = translator_manager.translator(dest_column)
+
+                if not value_translator is None:
+                    #Set destination table entity
+                    value_translator.entity = destination_entity
+
+                    source_col_names = value_translator.source_column_names()
+
+                    field_value_mappings = self._map_column_values(feat, feat_defn,
+                                                                   source_col_names)
+                    #Set source document manager if required
+                    if value_translator.requires_source_document_manager():
+                        value_translator.source_document_manager = self._source_doc_manager
+
+                    field_value = value_translator.referencing_column_value(
+                        field_value_mappings
+                    )
+
+                if not is_ignored_value(field_value):
+                        column_value_mapping[dest_column] = field_value
+
+                #Set supporting documents
+                if destination_entity.supports_documents:
+                    column_value_mapping['documents'] = \
+                        self._source_doc_manager.model_objects()
+                                                   
+        #Only insert geometry if it has been defined by the user
+        if geomColumn is not None:
+            geom = feat.GetGeometryRef()
             
-            for f in range(feat_defn.GetFieldCount()):
-                field_defn = feat_defn.GetFieldDefn(f) 
-                field_name = field_defn.GetNameRef()  
-                
-                #Append value only if it has been defined by the user                         
-                if field_name in columnmatch:
-                    dest_column = columnmatch[field_name]
-
-                    field_value = feat.GetField(f)
-
-                    #Create mapped class only once
-                    if self._mapped_cls is None:
-                        mapped_cls, mapped_doc_cls = self._get_mapped_class(targettable)
-
-                        if mapped_cls is None:
-                            msg = QApplication.translate(
-                                "OGRReader",
-                                "Something happened that caused the "
-                                "database table not to be mapped to the "
-                                "corresponding model class. Please contact"
-                                " your system administrator."
-                            )
-
-                            raise RuntimeError(msg)
-
-                        self._mapped_cls = mapped_cls
-                        self._mapped_doc_cls = mapped_doc_cls
-
-                        #Create source document manager if the entity supports them
-                        if destination_entity.supports_documents:
-                            self._source_doc_manager = SourceDocumentManager(
-                                destination_entity.supporting_doc,
-                                self._mapped_doc_cls
-                            )
-
-                        if geomColumn is not None:
-                            #Use geometry column SRID in the target table
-                            self._geomType,self._targetGeomColSRID = \
-                                geometryType(targettable,geomColumn)
-
-                    '''
-                    Check if there is a value translator defined for the
-                    specified destination column.
-                    '''
-                    value_translator = translator_manager.translator(dest_column)
-
-                    if not value_translator is None:
-                        #Set destination table entity
-                        value_translator.entity = destination_entity
-
-                        source_col_names = value_translator.source_column_names()
-
-                        field_value_mappings = self._map_column_values(feat, feat_defn,
-                                                                       source_col_names)
-                        #Set source document manager if required
-                        if value_translator.requires_source_document_manager:
-                            value_translator.source_document_manager = self._source_doc_manager
-
-                        field_value = value_translator.referencing_column_value(
-                            field_value_mappings
-                        )
-
-                    if not isinstance(field_value, IgnoreType):
-                            column_value_mapping[dest_column] = field_value
-
-                    #Set supporting documents
-                    if destination_entity.supports_documents:
-                        column_value_mapping['documents'] = \
-                            self._source_doc_manager.model_objects()
-
-                    column_count += 1
-                                                       
-            #Only insert geometry if it has been defined by the user
-            if geomColumn is not None:
-                geom = feat.GetGeometryRef()
-                
-                if geom is not None:
-                    #Get geometry in WKT/WKB format
+            if geom is not None:
+                #Get geometry in WKT/WKB format
+                if ewkb:
+                    column_value_mapping[geomColumn] = ewkb_hex(
+                        geom.ExportToWkb(),
+                        self._targetGeomColSRID
+                    )
+
+                else:
                     geomWkb = geom.ExportToWkt()
                     column_value_mapping[geomColumn] = "SRID={0!s};{1}".format(self._targetGeomColSRID,geomWkb)
-                    
-                    #Check if the geometry types match
-                    layerGeomType = geom.GetGeometryName()
-                    
-                    if layerGeomType.lower() != self._geomType.lower():
-                        raise TypeError("The geometries of the source and destination columns do not match.\n" \
-                                        "Source Geometry Type: {0}, Destination Geometry Type: {1}".format(layerGeomType,
-                                                                                                           self._geomType))
-                        return
-            
-            try:               
-                #Insert the record
-                self._insertRow(column_value_mapping)
+                
+                #Check if the geometry types match
+                layerGeomType = geom.GetGeometryName()
+                
+                if layerGeomType.lower() != self._geomType.lower():
+                    raise TypeError("The geometries of the source and destination columns do not match.\n" \
+                                    "Source Geometry Type: {0}, Destination Geometry Type: {1}".format(layerGeomType,
+                                                                                                       self._geomType))
 
-            except:
-                progress.close()
-                raise
-            
-            init_val+=1
-            
-        progress.setValue(numFeat)
+        return column_value_mapping
 
     def _enumeration_column_type(self, column_name, value):
         """
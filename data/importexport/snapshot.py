@@ -0,0 +1,548 @@
+"""
+/***************************************************************************
+Name                 : Profile Snapshot
+Description          : Exports the tables of a profile to a single
+                       GeoPackage and loads such a snapshot into the tables
+                       of an empty profile.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import os
+
+try:
+    from osgeo import ogr
+    from osgeo import osr
+except:
+    import ogr
+    import osr
+
+from stdm.data.pg_utils import (
+    catalog_snapshot,
+    DEFAULT_FETCH_SIZE,
+    export_data_from_columns,
+    fix_sequence,
+    pg_table_exists,
+    pg_table_has_rows,
+    stream_query,
+    table_dependency_order
+)
+from stdm.data.importexport.bulk_import import (
+    CopyWriter,
+    DEFAULT_CHUNK_SIZE,
+    ewkb_hex,
+    ImportReport
+)
+from stdm.data.importexport.enums import (
+    ogrTypes,
+    wkbTypes
+)
+from stdm.data.importexport.writer import (
+    setFieldValue,
+    TRANSACTION_SIZE
+)
+
+LOGGER = logging.getLogger('stdm')
+
+#Name of the layer describing the tables in a snapshot
+SNAPSHOT_METADATA_LAYER = 'stdm_snapshot'
+
+#Name of the GeoPackage FID column, the id column is kept as a field
+_SNAPSHOT_FID = 'snapshot_fid'
+
+_METADATA_FIELDS = [
+    ('table_name', ogr.OFTString),
+    ('position', ogr.OFTInteger),
+    ('geom_column', ogr.OFTString),
+    ('srid', ogr.OFTInteger),
+    ('extra_geom_columns', ogr.OFTString),
+    ('row_count', ogr.OFTInteger),
+    ('profile', ogr.OFTString)
+]
+
+
+def profile_table_order(profile):
+    """
+    Sorts the tables of the profile entities so that each table comes
+    after the tables it references. Dependencies are determined from the
+    entity relations of the profile as well as the foreign keys in the
+    database, which also cover supporting document and association tables.
+    :param profile: Profile object.
+    :type profile: Profile
+    :return: Returns the names of the profile tables which exist in the
+    database in dependency order.
+    :rtype: list
+    """
+    entities = profile.entities.values()
+    table_names = [e.name for e in entities if pg_table_exists(e.name, False)]
+
+    parent_tables = {}
+    for entity in entities:
+        parent_tables[entity.name] = set(
+            [er.parent.name for er in profile.child_relations(entity)]
+        )
+
+    return table_dependency_order(table_names, parent_tables)
+
+
+def _is_null(feat, index):
+    #IsFieldSetAndNotNull is only available from GDAL 2.2
+    if hasattr(feat, 'IsFieldSetAndNotNull'):
+        return not feat.IsFieldSetAndNotNull(index)
+
+    return not feat.IsFieldSet(index)
+
+
+def _feature_value(feat, index, field_type):
+    """
+    :return: Returns the value of the field formatted for the PostgreSQL
+    COPY command.
+    """
+    if _is_null(feat, index):
+        return None
+
+    if field_type in (ogr.OFTDate, ogr.OFTDateTime):
+        return feat.GetFieldAsString(index).replace('/', '-')
+
+    if field_type == ogr.OFTBinary:
+        #OGR formats binary values as hex strings
+        return '\\x' + feat.GetFieldAsString(index)
+
+    if field_type == ogr.OFTReal:
+        return repr(feat.GetFieldAsDouble(index))
+
+    return feat.GetField(index)
+
+
+class ProfileSnapshotWriter(object):
+    """
+    Writes every table of a profile, including value lists, association
+    tables and supporting document tables, to a single GeoPackage. Each
+    table is written to a layer of the same name with its rows read from
+    a server-side cursor so that the whole profile is exported in a single
+    streaming pass. Ids and foreign key values are exported as-is.
+    """
+    def __init__(self, profile, path, fetch_size=DEFAULT_FETCH_SIZE,
+                 transaction_size=TRANSACTION_SIZE):
+        self.profile = profile
+        self.path = path
+        self.fetch_size = fetch_size
+        self.transaction_size = transaction_size
+
+        #Number of rows written per table
+        self.row_counts = {}
+
+    def write(self, progress_callback=None):
+        """
+        Writes the snapshot, an existing file in the same path is replaced.
+        :param progress_callback: Callable which is invoked with the table
+        name, the position of the table and the number of tables before
+        each table is written. Returning False cancels the export.
+        :type progress_callback: callable
+        :return: True if the snapshot was written or False if it was
+        cancelled.
+        :rtype: bool
+        """
+        drv = ogr.GetDriverByName('GPKG')
+        if drv is None:
+            raise Exception('GeoPackage driver not available.')
+
+        if os.path.exists(self.path):
+            drv.DeleteDataSource(self.path)
+
+        ds = drv.CreateDataSource(self.path)
+        if ds is None:
+            raise Exception(
+                'Creation of {0} failed.'.format(self.path)
+            )
+
+        tables = profile_table_order(self.profile)
+        metadata = []
+
+        for position, table in enumerate(tables):
+            if not progress_callback is None:
+                if progress_callback(table, position, len(tables)) is False:
+                    ds = None
+                    drv.DeleteDataSource(self.path)
+
+                    return False
+
+            metadata.append(self._write_table(ds, table, position))
+
+        self._write_metadata(ds, metadata)
+
+        #Close the data source to flush it to the file
+        ds = None
+
+        return True
+
+    def _write_table(self, ds, table, position):
+        #Writes the rows of a table to a layer of the same name
+        col_types = catalog_snapshot().column_types(table)
+        spatial_cols = catalog_snapshot().spatial_columns(table)
+        geom_cols = [c[1] for c in spatial_cols]
+
+        geom_column, geom_type, srs, srid = None, ogr.wkbNone, None, -1
+        if len(spatial_cols) > 0:
+            schema, geom_column, pg_geom_type, srid = spatial_cols[0]
+            geom_type = wkbTypes.get(pg_geom_type.upper(), ogr.wkbUnknown)
+            srs = osr.SpatialReference()
+            srs.ImportFromEPSG(srid)
+
+        lyr = ds.CreateLayer(table, srs, geom_type,
+                             ['FID={0}'.format(_SNAPSHOT_FID)])
+        if lyr is None:
+            raise Exception('Creating the {0} layer failed.'.format(table))
+
+        select_cols = []
+        field_types = []
+
+        for col, data_type in col_types.iteritems():
+            if col == geom_column:
+                continue
+
+            if col in geom_cols:
+                #Additional geometry columns are kept as hex-encoded EWKB
+                ogr_type = ogr.OFTString
+                select_cols.append(
+                    'encode(ST_AsEWKB("{0}"), \'hex\')'.format(col)
+                )
+
+            elif data_type in ogrTypes:
+                ogr_type = ogrTypes[data_type]
+                select_cols.append('"{0}"'.format(col))
+
+            else:
+                #Use the PostgreSQL text representation of other types
+                ogr_type = ogr.OFTString
+                select_cols.append('"{0}"::text'.format(col))
+
+            if lyr.CreateField(ogr.FieldDefn(col.encode('utf-8'),
+                                             ogr_type)) != 0:
+                raise Exception(
+                    'Creating the {0}.{1} field failed.'.format(table, col)
+                )
+
+            field_types.append(ogr_type)
+
+        if not geom_column is None:
+            select_cols.append('ST_AsBinary("{0}")'.format(geom_column))
+
+        order_by = ' ORDER BY id' if 'id' in col_types else ''
+        sql = 'SELECT {0} FROM {1}{2}'.format(
+            ', '.join(select_cols), table, order_by
+        )
+
+        num_fields = len(field_types)
+        layer_defn = lyr.GetLayerDefn()
+        row_count = 0
+
+        lyr.StartTransaction()
+
+        rows = stream_query(sql, self.fetch_size, 'stdm_snapshot_cursor')
+
+        try:
+            for r in rows:
+                feat = ogr.Feature(layer_defn)
+
+                for i in range(num_fields):
+                    setFieldValue(feat, i, field_types[i], r[i])
+
+                if not geom_column is None and not r[num_fields] is None:
+                    feat.SetGeometry(
+                        ogr.CreateGeometryFromWkb(str(r[num_fields]))
+                    )
+
+                if lyr.CreateFeature(feat) != 0:
+                    raise Exception(
+                        'Failed to write a feature in {0}.'.format(table)
+                    )
+
+                row_count += 1
+
+                if row_count % self.transaction_size == 0:
+                    lyr.CommitTransaction()
+                    lyr.StartTransaction()
+
+            lyr.CommitTransaction()
+
+        finally:
+            rows.close()
+
+        self.row_counts[table] = row_count
+
+        return {
+            'table_name': table,
+            'position': position,
+            'geom_column': geom_column or '',
+            'srid': srid,
+            'extra_geom_columns': ','.join(
+                [c for c in geom_cols if c != geom_column]
+            ),
+            'row_count': row_count,
+            'profile': self.profile.name
+        }
+
+    def _write_metadata(self, ds, metadata):
+        #Writes the layer describing the tables in the snapshot
+        lyr = ds.CreateLayer(SNAPSHOT_METADATA_LAYER, None, ogr.wkbNone)
+
+        for name, field_type in _METADATA_FIELDS:
+            lyr.CreateField(ogr.FieldDefn(name, field_type))
+
+        for table_info in metadata:
+            feat = ogr.Feature(lyr.GetLayerDefn())
+
+            for i, (name, field_type) in enumerate(_METADATA_FIELDS):
+                setFieldValue(feat, i, field_type, table_info[name])
+
+            lyr.CreateFeature(feat)
+
+
+class ProfileSnapshotReader(object):
+    """
+    Loads a snapshot created by ProfileSnapshotWriter into the tables of
+    a profile. The tables should exist and be empty, except for the value
+    list tables which are filled when a profile is created. The lookups in
+    the snapshot are matched to the existing lookups by value or code and
+    the missing ones are added, the lookup ids in the referencing columns
+    are updated accordingly. Tables are loaded in dependency order using
+    the COPY command and the id sequences are updated once all the rows
+    have been loaded.
+    """
+    def __init__(self, profile, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.profile = profile
+        self.path = path
+        self.chunk_size = chunk_size
+
+        self._ds = ogr.Open(path)
+        if self._ds is None:
+            raise Exception('{0} could not be opened.'.format(path))
+
+        self.metadata = self._read_metadata()
+
+        self._value_lists = set([vl.name for vl in profile.value_lists()])
+
+        #Snapshot lookup ids and corresponding ids in the database
+        self._lookup_ids = {}
+
+    def _read_metadata(self):
+        lyr = self._ds.GetLayerByName(SNAPSHOT_METADATA_LAYER)
+        if lyr is None:
+            raise Exception(
+                '{0} is not a profile snapshot.'.format(self.path)
+            )
+
+        metadata = {}
+        for feat in lyr:
+            table_info = dict(
+                (name, feat.GetField(name)) for name, t in _METADATA_FIELDS
+            )
+            metadata[table_info['table_name']] = table_info
+
+        return metadata
+
+    def tables(self):
+        """
+        :return: Returns the names of the tables in the snapshot in the
+        dependency order of the target profile.
+        :rtype: list
+        """
+        profile_tables = profile_table_order(self.profile)
+
+        tables = [t for t in profile_tables if t in self.metadata]
+
+        #Snapshot tables missing in the profile are reported by validate
+        tables.extend(sorted(
+            [t for t in self.metadata.keys() if not t in profile_tables]
+        ))
+
+        return tables
+
+    def validate(self):
+        """
+        :return: Returns a list of messages for the tables that cannot be
+        loaded, the list is empty if the snapshot can be loaded.
+        :rtype: list
+        """
+        msgs = []
+
+        for table in self.tables():
+            if not pg_table_exists(table, False):
+                msgs.append(
+                    u'{0} table does not exist in the database.'.format(table)
+                )
+
+            elif not table in self._value_lists and \
+                    pg_table_has_rows(table):
+                msgs.append(u'{0} table is not empty.'.format(table))
+
+        return msgs
+
+    def load(self, progress_callback=None):
+        """
+        Loads the snapshot. Rows are written in chunks and a failure aborts
+        the load, leaving the rows of committed chunks in the database.
+        :param progress_callback: Callable which is invoked with the table
+        name, the position of the table and the number of tables before
+        each table is loaded. Returning False cancels the load.
+        :type progress_callback: callable
+        :return: Summary of the load.
+        :rtype: ImportReport
+        """
+        report = ImportReport()
+        tables = self.tables()
+
+        for position, table in enumerate(tables):
+            if not progress_callback is None:
+                if progress_callback(table, position, len(tables)) is False:
+                    report.cancelled = True
+
+                    break
+
+            if table in self._value_lists and pg_table_has_rows(table):
+                self._merge_value_list(table, report)
+
+            else:
+                self._load_table(table, report)
+
+        return report
+
+    def _merge_value_list(self, table, report):
+        """
+        Matches the lookups in the snapshot to those in the value list
+        table, first by value as is done when updating value lists, then by
+        code. Lookups that do not exist are added with new ids.
+        """
+        ids_by_value, ids_by_code = {}, {}
+        next_id = 1
+
+        for r in export_data_from_columns('id, code, value', table):
+            ids_by_value.setdefault(r['value'], r['id'])
+            if r['code']:
+                ids_by_code.setdefault(r['code'], r['id'])
+
+            next_id = max(next_id, r['id'] + 1)
+
+        lookup_ids = {}
+        writer = CopyWriter(
+            table,
+            ['id', 'code', 'value'],
+            chunk_size=self.chunk_size,
+            use_savepoints=False,
+            report=report
+        )
+
+        lyr = self._ds.GetLayerByName(table)
+        lyr.ResetReading()
+
+        for feat in lyr:
+            snapshot_id = feat.GetField('id')
+            code, value = feat.GetField('code'), feat.GetField('value')
+
+            if isinstance(code, str):
+                code = code.decode('utf-8')
+            if isinstance(value, str):
+                value = value.decode('utf-8')
+
+            if value in ids_by_value:
+                lookup_ids[snapshot_id] = ids_by_value[value]
+
+            elif code and code in ids_by_code:
+                lookup_ids[snapshot_id] = ids_by_code[code]
+
+            else:
+                lookup_ids[snapshot_id] = next_id
+                ids_by_value[value] = next_id
+                writer.add(feat.GetFID(), {
+                    'id': next_id,
+                    'code': code,
+                    'value': value
+                })
+
+                next_id += 1
+
+        writer.close()
+        fix_sequence(table)
+
+        self._lookup_ids[table] = lookup_ids
+
+    def _lookup_columns(self, table):
+        """
+        :return: Returns the columns of the table which reference the ids of
+        merged value lists and the corresponding id mappings.
+        :rtype: dict
+        """
+        entity = self.profile.entity_by_name(table)
+        if entity is None:
+            return {}
+
+        lookup_columns = {}
+        for er in self.profile.child_relations(entity):
+            if er.parent_column == 'id' and er.parent.name in self._lookup_ids:
+                lookup_columns[er.child_column] = self._lookup_ids[
+                    er.parent.name
+                ]
+
+        return lookup_columns
+
+    def _load_table(self, table, report):
+        table_info = self.metadata[table]
+        lyr = self._ds.GetLayerByName(table)
+        layer_defn = lyr.GetLayerDefn()
+
+        fields = [layer_defn.GetFieldDefn(i)
+                  for i in range(layer_defn.GetFieldCount())]
+        columns = [f.GetNameRef() for f in fields]
+        field_types = [f.GetType() for f in fields]
+
+        geom_column = table_info['geom_column']
+        if geom_column:
+            columns.append(geom_column)
+
+        writer = CopyWriter(
+            table,
+            columns,
+            chunk_size=self.chunk_size,
+            use_savepoints=False,
+            report=report
+        )
+
+        num_fields = len(field_types)
+        lookup_columns = self._lookup_columns(table)
+        lyr.ResetReading()
+
+        for feat in lyr:
+            values = {}
+
+            for i in range(num_fields):
+                values[columns[i]] = _feature_value(feat, i, field_types[i])
+
+            for col, lookup_ids in lookup_columns.iteritems():
+                lookup_id = values.get(col, None)
+                values[col] = lookup_ids.get(lookup_id, lookup_id)
+
+            if geom_column:
+                geom = feat.GetGeometryRef()
+                if not geom is None:
+                    values[geom_column] = ewkb_hex(geom.ExportToWkb(),
+                                                   table_info['srid'])
+
+            writer.add(feat.GetFID(), values)
+
+        writer.close()
+
+        if 'id' in columns:
+            fix_sequence(table)
@@ -19,7 +19,15 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
-from collections import OrderedDict
+from collections import (
+    Counter,
+    OrderedDict
+)
+from datetime import (
+    date,
+    datetime
+)
+from decimal import Decimal
 import itertools
 
 from PyQt4.QtGui import (
@@ -33,7 +41,12 @@ from PyQt4.QtCore import (
     QFile
 )
 
-from sqlalchemy import func
+from sqlalchemy import (
+    func,
+    literal_column,
+    select,
+    tuple_
+)
 from sqlalchemy.schema import (
     Table,
     MetaData
@@ -43,7 +56,10 @@ from stdm.data.database import (
     STDMDb,
     table_mapper
 )
-from stdm.data.pg_utils import table_column_names
+from stdm.data.pg_utils import (
+    pg_table_estimated_count,
+    table_column_names
+)
 
 from stdm.utils.util import (
     getIndex
@@ -54,6 +70,13 @@ from .exceptions import TranslatorException
 __all__ = ["SourceValueTranslator", "ValueTranslatorManager",
            "RelatedTableTranslator", "IgnoreType"]
 
+#Referenced tables with more rows than this are not loaded into memory
+MAX_PRELOAD_ROWS = 100000
+
+#Number of values in each IN (...) clause when prefetching referenced rows
+PREFETCH_CHUNK_SIZE = 1000
+
+
 class IgnoreType(object):
     """
     Placeholder object that instructs the reader to ignore inserting any
@@ -63,6 +86,176 @@ class IgnoreType(object):
     pass
 
 
+#Text formats of date and time values, '/' and 'T' separators are replaced
+DATETIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y%m%d'
+]
+
+TRUE_VALUES = ('t', 'true', 'y', 'yes', 'on', '1')
+FALSE_VALUES = ('f', 'false', 'n', 'no', 'off', '0')
+
+
+def key_value_type(sql_type):
+    """
+    Returns the type that the values of a referenced column are converted
+    to when used as translator cache keys.
+    :param sql_type: Type of the referenced column.
+    :type sql_type: TypeEngine
+    :return: Decimal for numeric columns; date, datetime or bool for
+    the corresponding columns and None for text and other columns.
+    :rtype: type
+    """
+    try:
+        python_type = sql_type.python_type
+
+    except NotImplementedError:
+        return None
+
+    if python_type in (int, long, float, Decimal):
+        return Decimal
+
+    if python_type in (datetime, date, bool):
+        return python_type
+
+    return None
+
+
+def _text_value(value):
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+
+    return unicode(value)
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        #Offset-aware values cannot be compared with naive ones
+        if not value.utcoffset() is None:
+            value = (value - value.utcoffset()).replace(tzinfo=None)
+
+        return value
+
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+
+    text = _text_value(value).strip().replace('/', '-').replace('T', ' ')
+
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+
+        except ValueError:
+            pass
+
+    raise ValueError('Invalid date value: {0}'.format(text))
+
+
+def _parse_date(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+
+    return _parse_datetime(value).date()
+
+
+def _parse_decimal(value):
+    if isinstance(value, bool):
+        raise ValueError('Invalid numeric value: {0}'.format(value))
+
+    if isinstance(value, Decimal):
+        return value
+
+    if isinstance(value, float):
+        #repr gives the shortest text that round-trips, e.g. 12.5
+        return Decimal(repr(value))
+
+    if isinstance(value, (int, long)):
+        return Decimal(value)
+
+    return Decimal(_text_value(value).strip())
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+
+    text = _text_value(value).strip().lower()
+
+    if text in TRUE_VALUES:
+        return True
+
+    if text in FALSE_VALUES:
+        return False
+
+    raise ValueError('Invalid boolean value: {0}'.format(text))
+
+
+_KEY_PARSERS = {
+    Decimal: _parse_decimal,
+    datetime: _parse_datetime,
+    date: _parse_date,
+    bool: _parse_bool
+}
+
+
+def normalize_key_value(value, key_type=None):
+    """
+    Converts a source or referenced value to a form that can be used as a
+    key in the translator caches. Values are converted to the key type of
+    the referenced column, as PostgreSQL would cast them, so that for
+    instance a source value of '12.5' matches a numeric value of 12.50 in
+    the database.
+    :param value: Source or referenced value.
+    :param key_type: Key type of the referenced column as returned by
+    key_value_type or None to compare the values as text.
+    :type key_type: type
+    :return: Value converted to the key type. Values which cannot be
+    converted, and all values if there is no key type, are returned as
+    unicode so that they do not match any referenced value.
+    """
+    if value is None:
+        return None
+
+    if not key_type is None:
+        try:
+            return _KEY_PARSERS[key_type](value)
+
+        except (ValueError, TypeError, ArithmeticError):
+            pass
+
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return _text_value(value)
+
+
+def is_typed_key(key, key_types):
+    """
+    :param key: Normalized key values.
+    :type key: tuple
+    :param key_types: Key types of the corresponding referenced columns.
+    :type key_types: list
+    :return: True if the key values could be converted to the key types
+    of the referenced columns, otherwise False.
+    :rtype: bool
+    """
+    for value, key_type in zip(key, key_types):
+        if value is None or key_type is None:
+            continue
+
+        #datetime is a subclass of date
+        if key_type is date and isinstance(value, datetime):
+            return False
+
+        if not isinstance(value, key_type):
+            return False
+
+    return True
+
+
 class SourceValueTranslator(object):
     """
     Abstract class for translating values from one or more columns in the
@@ -79,6 +272,12 @@ class SourceValueTranslator(object):
         #Primary entity
         self.entity = None
 
+        #Referenced tables with more rows are queried in batches
+        self.max_preload_rows = MAX_PRELOAD_ROWS
+
+        #Source values that could not be translated and their frequency
+        self._unresolved = Counter()
+
     def clear(self):
         self._referencing_table = ""
         self._referenced_table = ""
@@ -237,6 +436,52 @@ class SourceValueTranslator(object):
         """
         return False
 
+    def prepare(self):
+        """
+        Called once before the first row is translated. Subclasses can
+        override this method to load the referenced values into memory.
+        Default implementation does nothing.
+        """
+        pass
+
+    def prefetch(self, field_values_list):
+        """
+        Called with the source values of a batch of rows before each row in
+        the batch is translated. Subclasses which do not load all the
+        referenced values in prepare can override this method to load those
+        required by the batch in a few queries. Default implementation does
+        nothing.
+        :param field_values_list: List containing the column name-value
+        pairings of each row in the batch.
+        :type field_values_list: list
+        """
+        pass
+
+    def translation_table(self):
+        """
+        :return: Returns a picklable dictionary containing everything
+        required to translate source values without database access, for
+        use by import worker processes. None if the translator does not
+        support offline translation (default).
+        :rtype: dict
+        """
+        return None
+
+    def add_unresolved(self, value):
+        """
+        Records a source value that could not be translated.
+        :param value: Source value.
+        """
+        self._unresolved[value] += 1
+
+    def unresolved_values(self):
+        """
+        :return: Returns the source values that could not be translated
+        and the number of rows in which each occurred.
+        :rtype: Counter
+        """
+        return self._unresolved
+
     def referencing_column_value(self, field_values):
         """
         Abstract method to be implemented by subclasses.
@@ -377,14 +622,172 @@ class ValueTranslatorManager(object):
         if isinstance(translator, SourceValueTranslator):
             self.remove_translator_by_name(translator.name())
 
+    def translators(self):
+        """
+        :return: Returns all the translators in the collection.
+        :rtype: list
+        """
+        return self._translators.values()
+
+    def prepare(self):
+        """
+        Prepares all the translators in the collection prior to translating
+        the source rows.
+        """
+        for translator in self._translators.values():
+            translator.prepare()
+
 
 class RelatedTableTranslator(SourceValueTranslator):
     """
     This class translates values from one or more columns in the referenced
     table to the specified column in the referencing table.
+    The referenced values are loaded into memory in prepare. If the
+    referenced table has more than 'max_preload_rows' rows then the values
+    are loaded in batches using chunked IN (...) queries.
     """
     def __init__(self):
         SourceValueTranslator.__init__(self)
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._link_table = None
+        self._key_columns = None
+        self._key_types = []
+        self._cache = {}
+        self._preloaded = False
+        self._unresolved = Counter()
+
+    def _query_columns(self):
+        #Pairs of source columns and corresponding columns in the link table
+        link_table_columns = self._table_columns(self._referenced_table)
+
+        return [(source_col, ref_col) for source_col, ref_col in
+                self._input_referenced_columns.iteritems()
+                if getIndex(link_table_columns, ref_col) != -1]
+
+    def _row_key(self, field_values):
+        #Cache key for the source values of a row, None if not applicable
+        if len(self._key_columns) == 0:
+            return None
+
+        key = []
+        for (source_col, ref_col), key_type in zip(self._key_columns,
+                                                   self._key_types):
+            if not source_col in field_values:
+                return None
+
+            key.append(normalize_key_value(field_values[source_col],
+                                           key_type))
+
+        return tuple(key)
+
+    def _link_column(self, name):
+        return getattr(self._link_table.c, name)
+
+    def _exceeds_max_preload_rows(self):
+        """
+        :return: True if the referenced table has more than
+        'max_preload_rows' rows. The estimate of PostgreSQL is used so that
+        the table is not counted on every import. Tables which have not
+        been analyzed are counted up to 'max_preload_rows' + 1 rows.
+        :rtype: bool
+        """
+        num_rows = pg_table_estimated_count(self._referenced_table)
+
+        if num_rows is None:
+            limited = select(
+                [literal_column('1')]
+            ).select_from(self._link_table).limit(
+                self.max_preload_rows + 1
+            ).alias('limited')
+
+            num_rows = self._db_session.query(
+                func.count()
+            ).select_from(limited).scalar()
+
+        return num_rows > self.max_preload_rows
+
+    def prepare(self):
+        """
+        Loads the key and output values of the referenced table into memory
+        unless the table has more than 'max_preload_rows' rows.
+        """
+        self._reset_cache()
+        self._link_table = self._table(self._referenced_table)
+        self._key_columns = self._query_columns()
+        self._key_types = [key_value_type(self._link_column(ref_col).type)
+                           for source_col, ref_col in self._key_columns]
+
+        if len(self._key_columns) == 0:
+            return
+
+        if self._exceeds_max_preload_rows():
+            return
+
+        self._load_cache()
+        self._preloaded = True
+
+    def _load_cache(self, where_clause=None):
+        key_cols = [self._link_column(ref_col)
+                    for source_col, ref_col in self._key_columns]
+        output_col = self._link_column(self._output_referenced_column)
+
+        sel = select(key_cols + [output_col])
+        if not where_clause is None:
+            sel = sel.where(where_clause)
+
+        for r in self._db_session.execute(sel):
+            key = tuple([normalize_key_value(v, t)
+                         for v, t in zip(r[:-1], self._key_types)])
+
+            #Retain first match similar to a query's first() result
+            if not key in self._cache or self._cache[key] is None:
+                self._cache[key] = r[-1]
+
+    def prefetch(self, field_values_list):
+        """
+        Loads the referenced values for a batch of source rows using chunked
+        IN (...) queries if the referenced table was too big to be loaded in
+        prepare.
+        :param field_values_list: List containing the column name-value
+        pairings of each row in the batch.
+        :type field_values_list: list
+        """
+        if self._preloaded or self._key_columns is None \
+                or len(self._key_columns) == 0:
+            return
+
+        keys = set()
+        for field_values in field_values_list:
+            key = self._row_key(field_values)
+            if key is None or key in self._cache:
+                continue
+
+            #Values which PostgreSQL could not cast are not queried
+            if is_typed_key(key, self._key_types):
+                keys.add(key)
+
+            else:
+                self._cache[key] = None
+
+        keys = list(keys)
+        key_cols = [self._link_column(ref_col)
+                    for source_col, ref_col in self._key_columns]
+
+        for i in range(0, len(keys), PREFETCH_CHUNK_SIZE):
+            chunk = keys[i:i + PREFETCH_CHUNK_SIZE]
+
+            #Keys not found in the database are cached as misses
+            for key in chunk:
+                self._cache[key] = None
+
+            if len(key_cols) == 1:
+                where_clause = key_cols[0].in_([k[0] for k in chunk])
+            else:
+                where_clause = tuple_(*key_cols).in_(chunk)
+
+            self._load_cache(where_clause)
 
     def referencing_column_value(self, field_values):
         """
@@ -396,25 +799,66 @@ class RelatedTableTranslator(SourceValueTranslator):
         :return: Value of the referenced column in the linked table.
         :rtype: object
         """
-        link_table_columns = self._table_columns(self._referenced_table)
+        if self._key_columns is None:
+            self.prepare()
 
-        query_attrs = {}
+        key = self._row_key(field_values)
+
+        if key is None:
+            return self._query_referencing_column_value(field_values)
 
-        for source_col, val in field_values.iteritems():
-            ref_table_col = self._input_referenced_columns.get(source_col, None)
+        if not key in self._cache:
+            if self._preloaded or not is_typed_key(key, self._key_types):
+                self._cache[key] = None
+            else:
+                #Row was not prefetched
+                self._cache[key] = self._query_value(field_values)
 
-            if not ref_table_col is None:
-                col_idx = getIndex(link_table_columns, ref_table_col)
+        value = self._cache[key]
 
-                #If column is found, add it to the query fields collection
-                if col_idx != -1:
-                    query_attrs[ref_table_col] = val
+        if value is None:
+            self.add_unresolved(key if len(key) > 1 else key[0])
 
-        #Create link table object
-        link_table = self._table(self._referenced_table)
+            return IgnoreType()
+
+        return value
+
+    def translation_table(self):
+        """
+        :return: Returns the preloaded referenced values for use by import
+        worker processes or None if they have not been preloaded.
+        :rtype: dict
+        """
+        if not self._preloaded:
+            return None
+
+        return {
+            'type': 'related',
+            'source_columns': [source_col for source_col, ref_col in
+                               self._key_columns],
+            'key_types': list(self._key_types),
+            'values': dict(self._cache)
+        }
+
+    def _query_value(self, field_values):
+        val = self._query_referencing_column_value(field_values)
+        if isinstance(val, IgnoreType):
+            return None
+
+        return val
+
+    def _query_referencing_column_value(self, field_values):
+        #Searches the referenced value using a database query
+        query_attrs = {}
+
+        for source_col, ref_table_col in self._key_columns:
+            if source_col in field_values:
+                query_attrs[ref_table_col] = field_values[source_col]
 
         #Use AND operator
-        link_table_rec = self._db_session.query(link_table).filter_by(**query_attrs).first()
+        link_table_rec = self._db_session.query(
+            self._link_table
+        ).filter_by(**query_attrs).first()
 
         if link_table_rec is None:
             return IgnoreType()
@@ -425,7 +869,8 @@ class RelatedTableTranslator(SourceValueTranslator):
 
 class LookupValueTranslator(RelatedTableTranslator):
     """
-    Translator for lookup values.
+    Translator for lookup values. The lookup values are loaded in prepare
+    and indexed both by value and case-folded value.
     """
     def __init__(self, **kwargs):
         super(LookupValueTranslator, self).__init__()
@@ -433,6 +878,119 @@ class LookupValueTranslator(RelatedTableTranslator):
         self.default_value = kwargs.get('default', '')
         self._lk_value_column = 'value'
 
+    def _reset_cache(self):
+        super(LookupValueTranslator, self)._reset_cache()
+        self._lookup_ids = {}
+        self._casefold_lookup_ids = {}
+        self._default_loaded = False
+
+    def prepare(self):
+        """
+        Loads the lookup values into memory unless the lookup table has
+        more than 'max_preload_rows' rows.
+        """
+        if not self._referenced_table:
+            msg = QApplication.translate(
+                'LookupValueTranslator',
+                'Lookup table has not been set.'
+            )
+            raise ValueError(msg)
+
+        self._reset_cache()
+        self._link_table = self._table(self._referenced_table)
+        self._key_columns = []
+
+        if self._exceeds_max_preload_rows():
+            return
+
+        self._load_lookups()
+        self._preloaded = True
+
+    def _load_lookups(self, where_clause=None):
+        lk_value_column_obj = self._link_column(self._lk_value_column)
+        sel = select([self._link_column('id'), lk_value_column_obj])
+        if not where_clause is None:
+            sel = sel.where(where_clause)
+
+        for r in self._db_session.execute(sel):
+            lk_id, lk_value = r[0], r[1]
+            if lk_value is None:
+                continue
+
+            if not lk_value in self._lookup_ids:
+                self._lookup_ids[lk_value] = lk_id
+
+            casefold_value = lk_value.lower()
+            if not casefold_value in self._casefold_lookup_ids:
+                self._casefold_lookup_ids[casefold_value] = lk_id
+
+    def translation_table(self):
+        """
+        :return: Returns the preloaded lookup values for use by import
+        worker processes or None if they have not been preloaded.
+        :rtype: dict
+        """
+        if not self._preloaded:
+            return None
+
+        default_id = None
+        if self.default_value:
+            default_id = self._lookup_ids.get(self.default_value, None)
+
+        return {
+            'type': 'lookup',
+            'source_columns': self.source_column_names()[:1],
+            'values': dict(self._casefold_lookup_ids),
+            'default': default_id
+        }
+
+    def _casefold_value(self, value):
+        value = normalize_key_value(value)
+        if value is None:
+            return None
+
+        return value.lower()
+
+    def prefetch(self, field_values_list):
+        """
+        Loads the lookup values for a batch of source rows using chunked
+        IN (...) queries if the lookup table was too big to be loaded in
+        prepare.
+        :param field_values_list: List containing the column name-value
+        pairings of each row in the batch.
+        :type field_values_list: list
+        """
+        if self._preloaded or self._link_table is None:
+            return
+
+        values = set()
+        for field_values in field_values_list:
+            if len(field_values) == 0:
+                continue
+
+            casefold_value = self._casefold_value(field_values.values()[0])
+            if not casefold_value is None and \
+                    not casefold_value in self._cache:
+                values.add(casefold_value)
+
+        if self.default_value and not self._default_loaded:
+            self._load_lookups(
+                self._link_column(self._lk_value_column) == self.default_value
+            )
+            self._default_loaded = True
+
+        values = list(values)
+        lk_value_column_obj = self._link_column(self._lk_value_column)
+
+        for i in range(0, len(values), PREFETCH_CHUNK_SIZE):
+            chunk = values[i:i + PREFETCH_CHUNK_SIZE]
+
+            #Flag values as fetched so that misses are not queried again
+            for v in chunk:
+                self._cache[v] = None
+
+            self._load_lookups(func.lower(lk_value_column_obj).in_(chunk))
+
     def referencing_column_value(self, field_values):
         """
         Searches a corresponding record from the linked table using one or more
@@ -443,46 +1001,34 @@ class LookupValueTranslator(RelatedTableTranslator):
         :return: Value of the referenced column in the linked table.
         :rtype: object
         """
-        if not self._referenced_table:
-            msg = QApplication.translate(
-                'LookupValueTranslator',
-                'Lookup table has not been set.'
-            )
-            raise ValueError(msg)
+        if self._link_table is None:
+            self.prepare()
 
         if len(field_values) == 0:
             return IgnoreType
 
-        source_column = field_values.keys()[0]
-
-        # Check if the source column is in the field_values
-        if not source_column in field_values:
-            return IgnoreType
-
         # Assume the source column is the first (and only) one in field_values
         source_column = field_values.keys()[0]
         lookup_value = field_values.get(source_column)
+        casefold_value = self._casefold_value(lookup_value)
 
-        # Create lookup table object
-        lookup_table = self._table(self._referenced_table)
-
-        lk_value_column_obj = getattr(lookup_table.c, self._lk_value_column)
+        if not self._preloaded and not casefold_value is None \
+                and not casefold_value in self._cache:
+            #Value was not prefetched
+            self.prefetch([field_values])
 
-        # Get corresponding lookup value record
-        lookup_rec = self._db_session.query(lookup_table).filter(
-            func.lower(lk_value_column_obj) == func.lower(lookup_value)
-        ).first()
+        lookup_id = self._casefold_lookup_ids.get(casefold_value, None)
 
         # Use default value if record is empty
-        if lookup_rec is None and self.default_value:
-            lookup_rec = self._db_session.query(lookup_table).filter(
-                lk_value_column_obj == self.default_value
-            ).first()
+        if lookup_id is None and self.default_value:
+            lookup_id = self._lookup_ids.get(self.default_value, None)
+
+        if lookup_id is None:
+            self.add_unresolved(lookup_value)
 
-        if lookup_rec is None:
             return IgnoreType()
 
-        return getattr(lookup_rec, 'id', IgnoreType())
+        return lookup_id
 
 
 class MultipleEnumerationTranslator(SourceValueTranslator):
@@ -4,6 +4,10 @@
 #about:            Wrapper class for writing PostgreSQL/PostGIS tables to user-defined OGR formats
 
 import sys, logging
+from datetime import (
+    date,
+    datetime
+)
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
@@ -16,11 +20,59 @@ except:
     import ogr
 
 from stdm.data.pg_utils import (
+    catalog_snapshot,
     columnType,
-    geometryType
+    DEFAULT_FETCH_SIZE,
+    geometryType,
+    report_filter_count,
+    report_filter_sql,
+    stream_query
 )
+import stdm.data
+from stdm.data.importexport.bulk_import import ProgressThrottle
+from stdm.data.tracing import traced
 from enums import *
 
+#Number of features written in each transaction of transactional drivers
+TRANSACTION_SIZE = 10000
+
+def gdalExportSupported():
+    #VectorTranslate is only available from GDAL 2.1
+    return hasattr(gdal,"VectorTranslate")
+
+def setFieldValue(feat,index,ogrType,value):
+    #Set the value using the native OGR type of the field
+    if value is None:
+        return
+
+    if ogrType == ogr.OFTReal:
+        feat.SetField(index,float(value))
+
+    elif ogrType in (ogr.OFTDate,ogr.OFTDateTime) \
+            and isinstance(value,date):
+        hour, minute, second = 0, 0, 0
+        if isinstance(value,datetime):
+            hour, minute, second = value.hour, value.minute, value.second
+
+        feat.SetField(index,value.year,value.month,value.day,hour,minute,
+                      second,0)
+
+    elif ogrType == ogr.OFTBinary:
+        feat.SetFieldBinaryFromHexString(index,str(value).encode('hex'))
+
+    elif ogrType in (ogr.OFTString,ogr.OFTDate,ogr.OFTDateTime):
+        if isinstance(value,unicode):
+            value = value.encode('utf-8')
+
+        elif not isinstance(value,str):
+            value = str(value)
+
+        feat.SetField(index,value)
+
+    else:
+        #Integer types
+        feat.SetField(index,int(value))
+
 class OGRWriter():
    
     def __init__(self,targetFile): 
@@ -44,23 +96,29 @@ class OGRWriter():
         
         return str(fi.baseName()) 
     
-    def createField(self,table,field):
+    def createField(self,table,field,colType=None):
         #Creates an OGR field
-        colType = columnType(table,field)
-        
+        if colType is None:
+            colType = columnType(table,field)
+
         #Get OGR type
         ogrType = ogrTypes[colType]
         field_defn = ogr.FieldDefn(field,ogrType)
-        
+
         return field_defn
-        
-    def db2Feat(self,parent,table,results,columns,geom=""):
-        #Execute the export process
+
+    def _createLayer(self,table,columns,geom=""):
+        """
+        Creates the output data source and layer together with the fields
+        for the given columns.
+        :return: Returns the layer and the OGR types of the fields.
+        :rtype: tuple
+        """
         #Create driver
-        drv = ogr.GetDriverByName(self.getDriverName())        
+        drv = ogr.GetDriverByName(self.getDriverName())
         if drv is None:
             raise Exception("{0} driver not available.".format(self.getDriverName()))
-        
+
         #Create data source
         self._ds = drv.CreateDataSource(self._targetFile)
         if self._ds is None:
@@ -77,80 +135,239 @@ class OGRWriter():
             geomType=ogr.wkbNone
 
         lyr = self._ds.CreateLayer(self.getLayerName(), dest_crs, geomType)
-        
+
         if lyr is None:
             raise Exception("Layer creation failed")
-        
+
+        #Resolve the types of all the columns at once
+        colTypes = catalog_snapshot().column_types(table)
+        fieldTypes = []
+
         #Create fields
         for c in columns:
             #SQLAlchemy string values are in unicode so decoding is required in order to use in OGR
             encodedFieldName = c.encode('utf-8')
-            field_defn = self.createField(table,encodedFieldName)
+            field_defn = self.createField(
+                table,
+                encodedFieldName,
+                colTypes.get(c, "")
+            )
             if lyr.CreateField(field_defn) != 0:
                 raise Exception("Creating %s field failed"%(c))
-            
-        #Add Geometry column to list for referencing in the result set
+
+            fieldTypes.append(field_defn.GetType())
+
+        return lyr, fieldTypes
+
+    @traced("OGRWriter.db2Feat","export")
+    def db2Feat(self,parent,table,results,columns,geom=""):
+        #Execute the export process using a buffered result set
+        lyr, fieldTypes = self._createLayer(table,columns,geom)
+
+        return self._writeFeatures(
+            parent,
+            lyr,
+            results,
+            results.rowcount,
+            fieldTypes,
+            geom != "",
+            False
+        )
+
+    @traced("OGRWriter.streamDb2Feat","export")
+    def streamDb2Feat(self,parent,table,columns,geom="",whereStr="",
+                      sortStmnt="",fetchSize=DEFAULT_FETCH_SIZE):
+        """
+        Exports the rows of a table matching the given filter. The rows are
+        read from a server-side cursor, 'fetchSize' rows at a time, and the
+        geometries are read in WKB format so that tables of any size can be
+        exported with a constant amount of memory.
+        :param parent: Parent widget of the progress dialog.
+        :type parent: QWidget
+        :param table: Name of the table or view.
+        :type table: str
+        :param columns: Names of the non-spatial columns to export.
+        :type columns: list
+        :param geom: Name of the geometry column to export, if any.
+        :type geom: str
+        :param whereStr: Filter expression.
+        :type whereStr: str
+        :param sortStmnt: ORDER BY clause.
+        :type sortStmnt: str
+        :param fetchSize: Number of rows fetched in each round trip.
+        :type fetchSize: int
+        :return: Returns the number of exported features.
+        :rtype: int
+        """
+        numFeat = report_filter_count(table,whereStr)
+
+        lyr, fieldTypes = self._createLayer(table,columns,geom)
+
+        selectCols = list(columns)
         if geom != "":
-            columns.append(geom) 
-            
-        featGeom=None  
-             
+            selectCols.append("ST_AsBinary({0})".format(geom))
+
+        sql = report_filter_sql(table,",".join(selectCols),whereStr,sortStmnt)
+        rows = stream_query(sql,fetchSize,"stdm_export_cursor")
+
+        try:
+            return self._writeFeatures(
+                parent,
+                lyr,
+                rows,
+                numFeat,
+                fieldTypes,
+                geom != "",
+                True
+            )
+
+        finally:
+            #Release the cursor if the export was cancelled or failed
+            rows.close()
+
+    @traced("OGRWriter.gdalDb2Feat","export")
+    def gdalDb2Feat(self,parent,table,columns,geom="",whereStr="",
+                    sortStmnt=""):
+        """
+        Exports the rows of a table matching the given filter using
+        gdal.VectorTranslate with the PostgreSQL data source of the current
+        connection. The rows are copied by GDAL without being read in Python
+        hence values are written as-is.
+        :param parent: Parent widget of the progress dialog.
+        :type parent: QWidget
+        :param table: Name of the table or view.
+        :type table: str
+        :param columns: Names of the non-spatial columns to export.
+        :type columns: list
+        :param geom: Name of the geometry column to export, if any.
+        :type geom: str
+        :param whereStr: Filter expression.
+        :type whereStr: str
+        :param sortStmnt: ORDER BY clause.
+        :type sortStmnt: str
+        :return: True if the export completed or False if it was cancelled.
+        :rtype: bool
+        """
+        srcDs = gdal.OpenEx(stdm.data.app_dbconn.toOgrConnection(),
+                            gdal.OF_VECTOR)
+        if srcDs is None:
+            raise Exception("Connection to the database failed.")
+
+        selectCols = list(columns)
+        if geom != "":
+            selectCols.append(geom)
+
+        sql = report_filter_sql(table,",".join(selectCols),whereStr,sortStmnt)
+
+        #Configure progress dialog, GDAL reports the fraction completed
+        progress = QProgressDialog("","&Cancel",0,100,parent)
+        progress.setWindowModality(Qt.WindowModal)
+        lblMsgTemp = "Writing to file... {0}%"
+        progressThrottle = ProgressThrottle(progress,lblMsgTemp,100)
+
+        def onProgress(complete,message,data):
+            progressThrottle.update(int(complete * 100))
+
+            #Returning 0 stops the translation
+            return 0 if progressThrottle.was_canceled() else 1
+
+        options = gdal.VectorTranslateOptions(
+            format=self.getDriverName(),
+            SQLStatement=sql,
+            layerName=self.getLayerName(),
+            callback=onProgress
+        )
+
+        self._ds = gdal.VectorTranslate(self._targetFile,srcDs,
+                                        options=options)
+        srcDs = None
+
+        if progressThrottle.was_canceled():
+            self.reset()
+
+            return False
+
+        if self._ds is None:
+            progress.close()
+            raise Exception(
+                "Failed to export to {0}\n{1}".format(
+                    self._targetFile,gdal.GetLastErrorMsg()
+                )
+            )
+
+        #Flush the features to the file
+        self.reset()
+        progress.setValue(100)
+
+        return True
+
+    def _writeFeatures(self,parent,lyr,rows,numFeat,fieldTypes,hasGeom,
+                       geomWkb):
+        """
+        Writes rows whose values are in the same order as the layer fields,
+        followed by the geometry in WKB or WKT format if 'hasGeom' is True.
+        :return: Returns the number of features written.
+        :rtype: int
+        """
         #Configure progress dialog
-        initVal=0 
-        numFeat = results.rowcount
-        progress = QProgressDialog("","&Cancel",initVal,numFeat,parent)        
-        progress.setWindowModality(Qt.WindowModal)    
-        lblMsgTemp = "Writing {0} of {1} to file..." 
-         
-        #Iterate the result set        
-        for r in results:
-            #Progress dialog 
-            progress.setValue(initVal) 
-            progressMsg = lblMsgTemp.format(str(initVal+1),str(numFeat))
-            progress.setLabelText(progressMsg)
-            
-            if progress.wasCanceled():
-                break  
-            
-            #Create OGR Feature
-            feat = ogr.Feature(lyr.GetLayerDefn())    
-                    
-            for i in range(len(columns)):
-                colName = columns[i]   
-                             
-                #Check if its the geometry column in the iteration
-                if colName==geom: 
-                    if r[i] is not None:                                                                               
-                        featGeom=ogr.CreateGeometryFromWkt(r[i])
+        initVal=0
+        progress = QProgressDialog("","&Cancel",initVal,numFeat,parent)
+        progress.setWindowModality(Qt.WindowModal)
+        lblMsgTemp = "Writing {0} of {1} to file..."
+        progressThrottle = ProgressThrottle(progress,lblMsgTemp,numFeat)
+
+        #Batch writes in transactions where the driver benefits from it
+        useTransactions = self.getDriverName() in transactionDrivers
+
+        layerDefn = lyr.GetLayerDefn()
+        numFields = len(fieldTypes)
+
+        if useTransactions:
+            lyr.StartTransaction()
+
+        try:
+            #Iterate the result set
+            for r in rows:
+                progressThrottle.update(initVal)
+
+                if progressThrottle.was_canceled():
+                    break
+
+                #Create OGR Feature
+                feat = ogr.Feature(layerDefn)
+
+                for i in range(numFields):
+                    setFieldValue(feat,i,fieldTypes[i],r[i])
+
+                if hasGeom and r[numFields] is not None:
+                    if geomWkb:
+                        featGeom = ogr.CreateGeometryFromWkb(str(r[numFields]))
                     else:
-                        featGeom=ogr.CreateGeometryFromWkt("")
-                        
+                        featGeom = ogr.CreateGeometryFromWkt(r[numFields])
+
                     feat.SetGeometry(featGeom)
-                    
-                else:
-                    fieldValue = r[i]  
-
-                    fieldValue = str(fieldValue).encode('utf-8')
-                        
-                    feat.SetField(i,fieldValue)
-                          
-            if lyr.CreateFeature(feat) != 0:
-                progress.close()
-                raise Exception(
-                    "Failed to create feature in %s"%(self._targetFile)
-                )
-            
-            if featGeom is not None:                
-                featGeom.Destroy()
-                
-            feat.Destroy()
-            initVal+=1
-            
+
+                if lyr.CreateFeature(feat) != 0:
+                    raise Exception(
+                        "Failed to create feature in %s"%(self._targetFile)
+                    )
+
+                initVal+=1
+
+                if useTransactions and initVal % TRANSACTION_SIZE == 0:
+                    lyr.CommitTransaction()
+                    lyr.StartTransaction()
+
+            if useTransactions:
+                lyr.CommitTransaction()
+
+        except:
+            if useTransactions:
+                lyr.RollbackTransaction()
+
+            progress.close()
+            raise
+
         progress.setValue(numFeat)
-                
-  
-        
-            
 
-        
-        
\ No newline at end of file
+        return initVal
@@ -17,6 +17,12 @@ email                : gkahiu@gmail.com
  *                                                                         *
  ***************************************************************************/
 """
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+from threading import RLock
+
 from PyQt4.QtCore import (
     QFile,
     QIODevice,
@@ -55,18 +61,240 @@ _text_col_types = ["character varying", "text"]
 VIEWS = 2500
 TABLES = 2501
 
+_excluded_catalog_schemas = ("pg_catalog", "information_schema")
+
+#Default number of rows fetched in each round trip by server-side cursors
+DEFAULT_FETCH_SIZE = 2000
+
+
+class CatalogSnapshot(object):
+    """
+    In-memory copy of the tables, views, columns, geometry columns and
+    foreign key references in the database. The snapshot is loaded in a
+    handful of set-based queries the first time it is accessed and reloaded
+    on the next access after refresh() has been called, which should be done
+    whenever a DDL statement is executed against the database.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = RLock()
+        self._loaded = False
+
+        self.tables = defaultdict(list)
+        self.views = defaultdict(list)
+        self.columns = OrderedDict()
+        self.geometry_columns = OrderedDict()
+        self.foreign_keys = []
+
+    @property
+    def is_loaded(self):
+        """
+        :return: True if the catalog information is in memory, otherwise
+        False if it will be (re)loaded on next access.
+        :rtype: bool
+        """
+        return self._loaded
+
+    def refresh(self):
+        """
+        Flags the snapshot as stale so that the catalog information is
+        reloaded from the database on next access.
+        """
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+
+    def load(self):
+        """
+        Loads the catalog information from the database.
+        """
+        tables = defaultdict(list)
+        views = defaultdict(list)
+        columns = OrderedDict()
+        geometry_columns = OrderedDict()
+        foreign_keys = []
+
+        conn = self.engine.connect()
+
+        try:
+            #Tables and views
+            t = text("SELECT table_schema, table_name, table_type FROM "
+                     "information_schema.tables WHERE table_schema NOT IN "
+                     ":excl_schemas ORDER BY table_name ASC")
+            result = conn.execute(t, excl_schemas=_excluded_catalog_schemas)
+            for r in result:
+                if r["table_type"] == "VIEW":
+                    views[r["table_schema"]].append(r["table_name"])
+                else:
+                    tables[r["table_schema"]].append(r["table_name"])
+
+            #Columns in creation order, those in the public schema come first
+            t = text("SELECT table_name, column_name, data_type FROM "
+                     "information_schema.columns WHERE table_schema NOT IN "
+                     ":excl_schemas ORDER BY table_schema <> 'public', "
+                     "table_schema, table_name, ordinal_position")
+            result = conn.execute(t, excl_schemas=_excluded_catalog_schemas)
+            for r in result:
+                tb_cols = columns.setdefault(r["table_name"], OrderedDict())
+                col_name = r["column_name"]
+                if not col_name in tb_cols:
+                    tb_cols[col_name] = r["data_type"]
+
+            #Geometry columns
+            if STDMDb.instance().postgis_state:
+                t = text("SELECT f_table_schema, f_table_name, "
+                         "f_geometry_column, type, srid FROM geometry_columns")
+                result = conn.execute(t)
+                for r in result:
+                    geom_cols = geometry_columns.setdefault(
+                        r["f_table_name"], []
+                    )
+                    geom_cols.append((
+                        r["f_table_schema"],
+                        r["f_geometry_column"],
+                        r["type"],
+                        r["srid"]
+                    ))
+
+            #Foreign key references
+            t = text("SELECT tc.table_name, kcu.column_name, "
+                     "ccu.table_name AS foreign_table_name, "
+                     "ccu.column_name AS foreign_column_name "
+                     "FROM information_schema.table_constraints AS tc "
+                     "JOIN information_schema.key_column_usage AS kcu "
+                     "ON tc.constraint_name = kcu.constraint_name "
+                     "JOIN information_schema.constraint_column_usage AS ccu "
+                     "ON ccu.constraint_name = tc.constraint_name "
+                     "WHERE tc.constraint_type = 'FOREIGN KEY'")
+            result = conn.execute(t)
+            for r in result:
+                foreign_keys.append((
+                    r["table_name"],
+                    r["column_name"],
+                    r["foreign_table_name"],
+                    r["foreign_column_name"]
+                ))
+
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.tables = tables
+            self.views = views
+            self.columns = columns
+            self.geometry_columns = geometry_columns
+            self.foreign_keys = foreign_keys
+            self._loaded = True
+
+    def table_names(self, schema="public"):
+        """
+        :return: Returns the names of the base tables in the given schema
+        sorted in ascending order.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        return list(self.tables.get(schema, []))
+
+    def view_names(self, schema="public"):
+        """
+        :return: Returns the names of the views in the given schema sorted in
+        ascending order.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        return list(self.views.get(schema, []))
+
+    def column_types(self, table_name):
+        """
+        :param table_name: Name of the table or view.
+        :type table_name: str
+        :return: Returns an ordered dictionary of column names and
+        corresponding PostgreSQL data types in creation order.
+        :rtype: OrderedDict
+        """
+        self._ensure_loaded()
+
+        return self.columns.get(table_name, OrderedDict())
+
+    def spatial_columns(self, table_name):
+        """
+        :param table_name: Name of the table or view.
+        :type table_name: str
+        :return: Returns a list of tuples containing the schema, geometry
+        column name, geometry type and SRID of the geometry columns in the
+        given table.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        return list(self.geometry_columns.get(table_name, []))
+
+    def spatial_table_names(self):
+        """
+        :return: Returns the names of tables and views which have at least
+        one geometry column.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        return self.geometry_columns.keys()
+
+    def foreign_key_references(self):
+        """
+        :return: Returns a list of tuples containing the table name, column
+        name, foreign table name and foreign column name of each foreign
+        key reference in the database.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        return list(self.foreign_keys)
+
+
+_catalog = None
+_catalog_lock = RLock()
+
+def catalog_snapshot():
+    """
+    :return: Returns the catalog snapshot for the current database
+    connection. A new snapshot is created if the connection has changed.
+    :rtype: CatalogSnapshot
+    """
+    global _catalog
+
+    engine = STDMDb.instance().engine
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.engine is not engine:
+            _catalog = CatalogSnapshot(engine)
+
+        return _catalog
+
+def refresh_catalog():
+    """
+    Flags the catalog snapshot as stale so that it is reloaded on next
+    access. Should be called after executing DDL statements.
+    """
+    with _catalog_lock:
+        if not _catalog is None:
+            _catalog.refresh()
+
 def spatial_tables(exclude_views=False):
     """
     Returns a list of spatial table names in the STDM database.
     """
-    t = text("select DISTINCT f_table_name from geometry_columns")
-    result = _execute(t)
+    result = catalog_snapshot().spatial_table_names()
 
     spTables = []
     views = pg_views()
 
-    for r in result:
-        spTable = r["f_table_name"]
+    for spTable in result:
         if exclude_views:
             tableIndex = getIndex(views,spTable)
             if tableIndex == -1:
@@ -82,14 +310,11 @@ def pg_tables(schema="public", exclude_lookups=False):
     Views are also excluded. See separate function for retrieving views.
     :rtype: list
     """
-    t = text("SELECT table_name FROM information_schema.tables WHERE table_schema = :tschema and table_type = :tbtype " \
-             "ORDER BY table_name ASC")
-    result = _execute(t, tschema=schema, tbtype="BASE TABLE")
+    result = catalog_snapshot().table_names(schema)
         
     pgTables = []
         
-    for r in result:
-        tableName = r["table_name"]
+    for tableName in result:
         
         #Remove default PostGIS tables
         tableIndex = getIndex(_postGISTables, tableName)
@@ -111,15 +336,11 @@ def pg_views(schema="public"):
     """
     Returns the views in the given schema minus the default PostGIS views.
     """
-    t = text("SELECT table_name FROM information_schema.tables WHERE table_schema = :tschema and table_type = :tbtype " \
-             "ORDER BY table_name ASC")
-    result = _execute(t, tschema = schema, tbtype = "VIEW")
+    result = catalog_snapshot().view_names(schema)
         
     pgViews = []
         
-    for r in result:
-
-        viewName = r["table_name"]
+    for viewName in result:
         
         #Remove default PostGIS tables
         viewIndex = getIndex(_postGISViews, viewName)
@@ -145,16 +366,16 @@ def pg_table_exists(table_name, include_views=True, schema="public"):
     currently connected database.
     :rtype: bool
     """
-    tables = pg_tables(schema=schema)
-    if include_views:
-        tables.extend(pg_views(schema=schema))
+    catalog = catalog_snapshot()
 
-    if getIndex(tables, table_name) == -1:
-        return False
+    if table_name in catalog.table_names(schema):
+        return True
 
-    else:
+    if include_views and table_name in catalog.view_names(schema):
         return True
 
+    return False
+
 def pg_table_count(table_name):
     """
     Returns a count of records in a table
@@ -171,8 +392,48 @@ def pg_table_count(table_name):
 
     return cnt
 
-def process_report_filter(tableName, columns, whereStr="", sortStmnt=""):
-    #Process the report builder filter    
+def pg_table_estimated_count(table_name, schema="public"):
+    """
+    Returns the number of records in a table estimated by the last VACUUM or
+    ANALYZE of the table, without reading the table.
+    :param table_name: Table to get count of.
+    :type table_name: str
+    :param schema: Schema of the table. Default is "public" schema.
+    :type schema: str
+    :return: Returns the estimated number of records or None if the table
+    does not exist or has not been analyzed.
+    :rtype: int
+    """
+    sql = text(
+        "SELECT c.reltuples::bigint AS cnt, c.relpages FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :table_name AND n.nspname = :schema"
+    )
+
+    result = _execute(sql, table_name=table_name, schema=schema).first()
+
+    #Empty tables which have never been analyzed have no pages
+    if result is None or result['cnt'] < 0 or \
+            (result['relpages'] == 0 and result['cnt'] == 0):
+        return None
+
+    return result['cnt']
+
+def pg_table_has_rows(table_name):
+    """
+    Checks whether a table contains records without counting them.
+    :param table_name: Name of the table.
+    :type table_name: str
+    :rtype: bool
+    """
+    sql_str = "SELECT EXISTS (SELECT 1 FROM {0}) AS has_rows".format(
+        table_name
+    )
+
+    return _execute(text(sql_str)).scalar()
+
+def report_filter_sql(tableName, columns, whereStr="", sortStmnt=""):
+    #SQL statement of the report builder filter
     sql = "SELECT {0} FROM {1}".format(columns,tableName)
     
     if whereStr != "":
@@ -180,11 +441,69 @@ def process_report_filter(tableName, columns, whereStr="", sortStmnt=""):
         
     if sortStmnt !="":
         sql += sortStmnt
-        
+
+    return sql
+
+def process_report_filter(tableName, columns, whereStr="", sortStmnt=""):
+    #Process the report builder filter    
+    sql = report_filter_sql(tableName, columns, whereStr, sortStmnt)
+
     t = text(sql)
     
     return _execute(t)
 
+def report_filter_count(tableName, whereStr=""):
+    """
+    Returns the number of rows in the table matching the report builder
+    filter without fetching the rows.
+    :param tableName: Name of the table or view.
+    :type tableName: str
+    :param whereStr: Filter expression.
+    :type whereStr: str
+    :rtype: int
+    """
+    sql = report_filter_sql(tableName, "COUNT(*) AS cnt", whereStr)
+
+    results = _execute(text(sql))
+
+    return results.scalar()
+
+def stream_query(sql, fetch_size=DEFAULT_FETCH_SIZE,
+                 cursor_name="stdm_stream_cursor"):
+    """
+    Executes the SQL statement using a named (server-side) cursor and
+    fetches the rows in chunks so that only 'fetch_size' rows are held in
+    memory at any time.
+    :param sql: SQL SELECT statement.
+    :type sql: str
+    :param fetch_size: Number of rows fetched in each round trip.
+    :type fetch_size: int
+    :param cursor_name: Name of the server-side cursor.
+    :type cursor_name: str
+    :return: Generator of the result rows as tuples.
+    :rtype: generator
+    """
+    conn = STDMDb.instance().engine.raw_connection()
+
+    try:
+        cursor = conn.cursor(cursor_name)
+        cursor.itersize = fetch_size
+        cursor.execute(sql)
+
+        rows = cursor.fetchmany(fetch_size)
+        while len(rows) > 0:
+            for row in rows:
+                yield row
+
+            rows = cursor.fetchmany(fetch_size)
+
+        cursor.close()
+
+    finally:
+        #The cursor only reads hence end the transaction without changes
+        conn.rollback()
+        conn.close()
+
 def export_data(table_name):
     sql = "SELECT * FROM {0}".format(table_name, )
 
@@ -246,25 +565,15 @@ def table_column_names(tableName, spatialColumns=False, creation_order=False):
     If 'spatialColumns' then the function will lookup for spatial columns in the given 
     table or view.
     """
+    catalog = catalog_snapshot()
+
     if spatialColumns:
-        sql = "select f_geometry_column from geometry_columns where f_table_name = :tbname ORDER BY f_geometry_column ASC"
-        columnName = "f_geometry_column"
-    else:
-        if not creation_order:
-            sql = "select column_name from information_schema.columns where table_name = :tbname ORDER BY column_name ASC"
-            columnName = "column_name"
-        else:
-            sql = "select column_name from information_schema.columns where table_name = :tbname"
-            columnName = "column_name"
+        return sorted([sc[1] for sc in catalog.spatial_columns(tableName)])
 
-    t = text(sql)
-    result = _execute(t, tbname=tableName)
-        
-    columnNames = []
-       
-    for r in result:
-        colName = r[columnName]
-        columnNames.append(colName)
+    columnNames = catalog.column_types(tableName).keys()
+
+    if not creation_order:
+        columnNames = sorted(columnNames)
            
     return columnNames
 
@@ -301,19 +610,15 @@ def geometryType(tableName, spatialColumnName, schemaName="public"):
     Returns a tuple of geometry type and EPSG code of the given column name in
     the table within the given schema.
     """
-    sql = "select type,srid from geometry_columns where f_table_name = :tbname " \
-          "and f_geometry_column = :spcolumn and f_table_schema = :tbschema"
-    t = text(sql)
-    
-    result = _execute(t,tbname = tableName,spcolumn=spatialColumnName,tbschema=schemaName)
-        
     geomType,epsg_code = "", -1
-       
-    for r in result:
-        geomType = r["type"]
-        epsg_code = r["srid"]
-        
-        break
+
+    for sc in catalog_snapshot().spatial_columns(tableName):
+        schema, column, geom_type, srid = sc
+        if schema == schemaName and column == spatialColumnName:
+            geomType = geom_type
+            epsg_code = srid
+
+            break
         
     return (geomType,epsg_code)
 
@@ -350,17 +655,7 @@ def columnType(tableName, columnName):
     """
     Returns the PostgreSQL data type of the specified column.
     """
-    sql = "SELECT data_type FROM information_schema.columns where table_name=:tbName AND column_name=:colName"
-    t = text(sql)
-    
-    result = _execute(t, tbName=tableName, colName=columnName)
-
-    dataType = ""
-    for r in result:
-        dataType = r["data_type"]
-        
-        break
-    return dataType
+    return catalog_snapshot().column_types(tableName).get(columnName, "")
 
 def columns_by_type(table, data_types):
     """
@@ -479,6 +774,8 @@ def safely_delete_tables(tables):
         Base.metadata._remove_table(table, 'public')
         flush_session_activity()
 
+    refresh_catalog()
+
 def flush_session_activity():
     STDMDb.instance().session._autoflush()
 
@@ -506,6 +803,52 @@ def vector_layer(table_name, sql='', key='id', geom_column='', layer_name=''):
 
     return v_layer
 
+def table_dependency_order(table_names, parent_tables=None):
+    """
+    Sorts the given tables so that each table comes after the tables it
+    references through foreign keys. Self references and cycles do not
+    affect the order.
+    :param table_names: Names of the tables to sort.
+    :type table_names: list
+    :param parent_tables: Additional dependencies as a dictionary of table
+    names and the names of the tables they reference.
+    :type parent_tables: dict
+    :return: Returns the table names in dependency order.
+    :rtype: list
+    """
+    parents = dict((t, set()) for t in table_names)
+
+    for table, column, ref_table, ref_column in \
+            catalog_snapshot().foreign_key_references():
+        if table in parents:
+            parents[table].add(ref_table)
+
+    if not parent_tables is None:
+        for table, refs in parent_tables.iteritems():
+            if table in parents:
+                parents[table].update(refs)
+
+    ordered = []
+    visiting = set()
+
+    def visit(table):
+        if table in ordered or table in visiting:
+            return
+
+        visiting.add(table)
+
+        for parent in sorted(parents[table]):
+            if parent in parents:
+                visit(parent)
+
+        visiting.discard(table)
+        ordered.append(table)
+
+    for table in table_names:
+        visit(table)
+
+    return ordered
+
 def foreign_key_parent_tables(table_name, search_parent=True, filter_exp=None):
     """
     Functions that searches for foreign key references in the specified table.
@@ -521,48 +864,20 @@ def foreign_key_parent_tables(table_name, search_parent=True, filter_exp=None):
     name and corresponding foreign column name.
     :rtype: list
     """
-    #Check if the view for listing foreign key references exists
-    fk_ref_view = pg_table_exists("foreign_key_references")
-
-    #Create if it does not exist
-    if not fk_ref_view:
-        script_path = PLUGIN_DIR + "/scripts/foreign_key_references.sql"
-
-        script_file = QFile(script_path)
-        if script_file.exists():
-            if not script_file.open(QIODevice.ReadOnly):
-                return None
+    fk_refs = []
 
-            reader = QTextStream(script_file)
-            sql = reader.readAll()
-            if sql:
-                t = text(sql)
-                _execute(t)
+    for r in catalog_snapshot().foreign_key_references():
+        local_table, column_name, foreign_table, foreign_column = r
 
+        if search_parent:
+            search_table, rel_table = local_table, foreign_table
         else:
-            return None
-
-    if search_parent:
-        ref_table = "foreign_table_name"
-        search_table = "table_name"
-    else:
-        ref_table = "table_name"
-        search_table = "foreign_table_name"
+            search_table, rel_table = foreign_table, local_table
 
-    #Fetch foreign key references
-    sql = u"SELECT column_name,{0},foreign_column_name FROM " \
-          u"foreign_key_references where {1} =:tb_name".format(ref_table,
-                                                               search_table)
-    t = text(sql)
-    result = _execute(t, tb_name=table_name)
+        if search_table != table_name:
+            continue
 
-    fk_refs = []
-
-    for r in result:
-        rel_table = r[ref_table]
-
-        fk_ref = r["column_name"], rel_table,\
-                 r["foreign_column_name"]
+        fk_ref = column_name, rel_table, foreign_column
 
         if not filter_exp is None:
             if filter_exp.indexIn(rel_table) >= 0:
@@ -645,6 +960,7 @@ def drop_cascade_table(table_name):
 
     try:
         _execute(t)
+        refresh_catalog()
 
         return True
 
@@ -671,6 +987,7 @@ def drop_cascade_column(table_name, column):
 
     try:
         _execute(t)
+        refresh_catalog()
 
         return True
 
@@ -691,6 +1008,8 @@ def drop_view(view_name):
 
     try:
         _execute(t)
+        refresh_catalog()
+
         return True
 
     #Error such as view dependencies or the current user is not the owner.
@@ -732,6 +1051,7 @@ def remove_constraint(child, child_col):
     )
     t = text(sql)
     _execute(t)
+    refresh_catalog()
 
 
 def add_constraint(child_table, child_column, parent_table):
@@ -755,6 +1075,7 @@ def add_constraint(child_table, child_column, parent_table):
     )
     t = text(sql)
     _execute(t)
+    refresh_catalog()
 
 
 def drop_column(table, column):
@@ -770,6 +1091,7 @@ def drop_column(table, column):
     )
     t = text(sql)
     _execute(t)
+    refresh_catalog()
 
 
 def postgis_exists():
@@ -792,6 +1114,7 @@ def create_postgis():
     sql = 'CREATE EXTENSION postgis;'
     t = text(sql)
     _execute(t)
+    refresh_catalog()
 
 def profile_sequences(prefix):
     """
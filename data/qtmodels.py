@@ -19,6 +19,9 @@ email                : gkahiu@gmail.com
  ***************************************************************************/
 """
 
+import bisect
+from array import array
+from collections import OrderedDict
 from decimal import Decimal
 
 from PyQt4.QtCore import *
@@ -31,6 +34,17 @@ from .modelformatters import (
 #Standard colors for widgets supporting alternating rows
 ALT_COLOR_EVEN = QColor(255,165,79)
 ALT_COLOR_ODD = QColor(135,206,255)
+
+#Number of records loaded in each page by the paged table model
+PAGE_SIZE = 500
+
+#Maximum number of records whose values are kept in the paged table model
+MAX_RESIDENT_ROWS = 10000
+
+#Match types of the indexed filter
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_CONTAINS = 2
  
 class EnumeratorTableModel(QAbstractTableModel):
     '''
@@ -504,10 +518,9 @@ class BaseSTDMTableModel(QAbstractTableModel):
 
         self.beginInsertRows(parent, position, position + rows - 1)
 
-        #Initialize column values for the new row
-        initRowVals = ["" for c in range(self.columnCount())]
-
+        #Initialize column values for each new row
         for i in range(rows):
+            initRowVals = ["" for c in range(self.columnCount())]
             self._initData.insert(position,initRowVals)
 
         self.endInsertRows()
@@ -532,6 +545,1027 @@ class BaseSTDMTableModel(QAbstractTableModel):
         return True
 
 
+class TableColumn(object):
+    """
+    Values of a column in a ColumnarTableModel. Integer and float columns
+    are kept in typed arrays with a null mask, other columns in a list where
+    equal strings added together share a single object. Decimal values are
+    converted to their display string when they are added.
+    """
+    INTEGER = 'l'
+    FLOAT = 'd'
+
+    def __init__(self):
+        self._type_code = None
+        self._values = []
+        self._nulls = None
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def type_code(self):
+        """
+        :return: Returns the type code of the array containing the values or
+        None if the values are kept in a list.
+        :rtype: str
+        """
+        return self._type_code
+
+    @staticmethod
+    def display_value(value):
+        """
+        :param value: Column value.
+        :type value: object
+        :return: Returns the value in a type supported by QVariant.
+        :rtype: object
+        """
+        #Decimal not supported by QVariant so we adapt it to a supported type
+        if isinstance(value, Decimal):
+            return str(value)
+
+        return value
+
+    @classmethod
+    def values_type_code(cls, values):
+        """
+        :param values: Column values.
+        :type values: list
+        :return: Returns the type code of the array which can hold the
+        values, None if they cannot be held in an array or an empty string
+        if all the values are null.
+        :rtype: str
+        """
+        type_code = ''
+
+        for v in values:
+            if v is None:
+                continue
+
+            #Booleans would be displayed as integers
+            if isinstance(v, (int, long)) and not isinstance(v, bool):
+                v_type_code = cls.INTEGER
+
+            elif isinstance(v, float):
+                v_type_code = cls.FLOAT
+
+            else:
+                return None
+
+            if not type_code:
+                type_code = v_type_code
+
+            elif type_code != v_type_code:
+                return None
+
+        return type_code
+
+    def _to_list(self):
+        #Moves the values to a list once a value does not fit in the array
+        self._values = [self.value(i) for i in range(len(self))]
+        self._type_code = None
+        self._nulls = None
+
+    def extend(self, values):
+        """
+        Appends values to the column.
+        :param values: Column values.
+        :type values: list
+        """
+        values = [self.display_value(v) for v in values]
+        type_code = self.values_type_code(values)
+
+        #The type of an empty column is set by the first values
+        if len(self) == 0:
+            self._type_code = type_code or None
+
+            if self._type_code is None:
+                self._values = []
+                self._nulls = None
+
+            else:
+                self._values = array(self._type_code)
+                self._nulls = bytearray()
+
+        if not self._type_code is None:
+            if type_code in ('', self._type_code):
+                try:
+                    typed_values = array(
+                        self._type_code,
+                        [0 if v is None else v for v in values]
+                    )
+
+                    self._values.extend(typed_values)
+                    self._nulls.extend(
+                        [1 if v is None else 0 for v in values]
+                    )
+
+                    return
+
+                #Integer does not fit in a C long
+                except OverflowError:
+                    pass
+
+            self._to_list()
+
+        #Equal strings share the same object
+        pool = {}
+        self._values.extend([
+            pool.setdefault(v, v) if isinstance(v, basestring) else v
+            for v in values
+        ])
+
+    def value(self, row):
+        """
+        :param row: Row number.
+        :type row: int
+        :return: Returns the value in the given row.
+        :rtype: object
+        """
+        if not self._type_code is None and self._nulls[row]:
+            return None
+
+        return self._values[row]
+
+    def values(self, position, count):
+        """
+        :param position: Row number of the first value.
+        :type position: int
+        :param count: Number of values.
+        :type count: int
+        :return: Returns the values in the given rows.
+        :rtype: list
+        """
+        values = self._values[position:position + count]
+
+        if self._type_code is None:
+            return values
+
+        return [None if n else v for v, n in
+                zip(values, self._nulls[position:position + count])]
+
+    def set_value(self, row, value):
+        """
+        Sets the value in the given row.
+        :param row: Row number.
+        :type row: int
+        :param value: Column value.
+        :type value: object
+        """
+        value = self.display_value(value)
+
+        if not self._type_code is None:
+            if value is None:
+                self._values[row] = 0
+                self._nulls[row] = 1
+
+                return
+
+            if self.values_type_code([value]) == self._type_code:
+                try:
+                    self._values[row] = value
+                    self._nulls[row] = 0
+
+                    return
+
+                except OverflowError:
+                    pass
+
+            self._to_list()
+
+        self._values[row] = value
+
+    def insert(self, position, count):
+        """
+        Inserts empty values, which are nulls in typed columns and empty
+        strings otherwise.
+        :param position: Row number of the first value.
+        :type position: int
+        :param count: Number of values.
+        :type count: int
+        """
+        if self._type_code is None:
+            self._values[position:position] = [''] * count
+
+        else:
+            self._values[position:position] = array(
+                self._type_code, [0] * count
+            )
+            self._nulls[position:position] = bytearray([1] * count)
+
+    def remove(self, position, count):
+        """
+        Removes values from the column.
+        :param position: Row number of the first value.
+        :type position: int
+        :param count: Number of values.
+        :type count: int
+        """
+        del self._values[position:position + count]
+
+        if not self._type_code is None:
+            del self._nulls[position:position + count]
+
+
+class ColumnIndex(object):
+    """
+    Index of the lower-cased display values of a column. Each distinct value
+    is mapped to the keys of its rows and the distinct values are kept
+    sorted for prefix searches. Substring searches scan a text joining the
+    distinct values, which is rebuilt on the first search after values have
+    been added or removed.
+    """
+    #Number of values changed at once above which the sorted values are
+    #rebuilt rather than updated
+    _BULK_SIZE = 64
+
+    _SEPARATOR = u'\x00'
+
+    def __init__(self):
+        self._rows = {}
+        self._sorted = []
+        self._text = None
+        self._offsets = None
+
+    @staticmethod
+    def text(value):
+        """
+        :param value: Column value.
+        :type value: object
+        :return: Returns the value as displayed in a view.
+        :rtype: unicode
+        """
+        if value is None:
+            return u''
+
+        if isinstance(value, str):
+            return value.decode('utf-8', 'replace')
+
+        return unicode(value)
+
+    @classmethod
+    def normalize(cls, value):
+        """
+        :param value: Column value.
+        :type value: object
+        :return: Returns the lower-cased text of the value.
+        :rtype: unicode
+        """
+        if isinstance(value, unicode):
+            return value.lower()
+
+        return cls.text(value).lower()
+
+    def add(self, keys, values):
+        """
+        Adds rows to the index.
+        :param keys: Keys of the rows.
+        :type keys: list
+        :param values: Column values of the rows.
+        :type values: list
+        """
+        rows = self._rows
+        new_values = []
+
+        for k, v in zip(keys, values):
+            v = self.normalize(v)
+            row_keys = rows.get(v, None)
+
+            #Single keys are not wrapped in a set to save memory
+            if row_keys is None:
+                rows[v] = k
+                new_values.append(v)
+
+            elif isinstance(row_keys, set):
+                row_keys.add(k)
+
+            else:
+                rows[v] = set([row_keys, k])
+
+        if len(new_values) == 0:
+            return
+
+        self._text = None
+
+        if len(new_values) > self._BULK_SIZE:
+            self._sorted.extend(new_values)
+            self._sorted.sort()
+
+        else:
+            for v in new_values:
+                bisect.insort(self._sorted, v)
+
+    def remove(self, keys, values):
+        """
+        Removes rows from the index.
+        :param keys: Keys of the rows.
+        :type keys: list
+        :param values: Column values of the rows.
+        :type values: list
+        """
+        rows = self._rows
+        old_values = []
+
+        for k, v in zip(keys, values):
+            v = self.normalize(v)
+            row_keys = rows.get(v, None)
+
+            if isinstance(row_keys, set):
+                row_keys.discard(k)
+                if len(row_keys) == 1:
+                    rows[v] = row_keys.pop()
+
+            elif not row_keys is None and row_keys == k:
+                del rows[v]
+                old_values.append(v)
+
+        if len(old_values) == 0:
+            return
+
+        self._text = None
+
+        if len(old_values) > self._BULK_SIZE:
+            self._sorted = sorted(rows)
+
+        else:
+            for v in old_values:
+                del self._sorted[bisect.bisect_left(self._sorted, v)]
+
+    def _keys(self, values):
+        keys = set()
+
+        for v in values:
+            row_keys = self._rows[v]
+
+            if isinstance(row_keys, set):
+                keys.update(row_keys)
+            else:
+                keys.add(row_keys)
+
+        return keys
+
+    def exact(self, text):
+        """
+        :param text: Text to search for.
+        :type text: unicode
+        :return: Returns the keys of the rows whose value is equal to the
+        text, ignoring the case.
+        :rtype: set
+        """
+        text = self.normalize(text)
+
+        if not text in self._rows:
+            return set()
+
+        return self._keys([text])
+
+    def prefix(self, text):
+        """
+        :param text: Text to search for.
+        :type text: unicode
+        :return: Returns the keys of the rows whose value starts with the
+        text, ignoring the case.
+        :rtype: set
+        """
+        text = self.normalize(text)
+        values = []
+
+        for i in range(bisect.bisect_left(self._sorted, text),
+                       len(self._sorted)):
+            if not self._sorted[i].startswith(text):
+                break
+
+            values.append(self._sorted[i])
+
+        return self._keys(values)
+
+    def contains(self, text):
+        """
+        :param text: Text to search for.
+        :type text: unicode
+        :return: Returns the keys of the rows whose value contains the text,
+        ignoring the case.
+        :rtype: set
+        """
+        text = self.normalize(text)
+
+        if not text:
+            return self._keys(self._rows)
+
+        if self._text is None:
+            self._text = self._SEPARATOR.join(self._sorted)
+            self._offsets = array('l')
+
+            offset = 0
+            for v in self._sorted:
+                self._offsets.append(offset)
+                offset += len(v) + 1
+
+        values = []
+        pos = self._text.find(text)
+
+        while pos != -1:
+            #Value containing the match, the search resumes after it
+            i = bisect.bisect_right(self._offsets, pos) - 1
+            values.append(self._sorted[i])
+
+            pos = self._text.find(
+                text, self._offsets[i] + len(self._sorted[i]) + 1
+            )
+
+        return self._keys(values)
+
+
+class ColumnarTableModel(BaseSTDMTableModel):
+    """
+    Table model with the same interface as BaseSTDMTableModel which keeps
+    the values column by column in TableColumn objects instead of a list
+    for each row. This takes a fraction of the memory for large tables and
+    values are only converted for display when they are added.
+    Each row has a key which does not change when rows are inserted or
+    removed, the row numbers of the keys are updated from the first
+    inserted or removed row. Columns are indexed on their first search and
+    the indexes are then updated with the rows.
+    """
+    def __init__(self, initdata, headerdata, parent=None):
+        BaseSTDMTableModel.__init__(self, [], headerdata, parent)
+        self._columns = [TableColumn() for h in headerdata]
+        self._row_count = 0
+        self._row_keys = array('l')
+        self._key_rows = {}
+        self._next_key = 0
+        self._indexes = {}
+
+        #Incremented whenever the rows or values change
+        self.revision = 0
+
+        self.append_rows(initdata)
+
+    def rowCount(self, parent=QModelIndex()):
+        return self._row_count
+
+    def row_key(self, row):
+        """
+        :param row: Row number.
+        :type row: int
+        :return: Returns the key of the row.
+        :rtype: int
+        """
+        return self._row_keys[row]
+
+    def key_row(self, key):
+        """
+        :param key: Key of a row.
+        :type key: int
+        :return: Returns the row number of the key or -1 if the row has
+        been removed.
+        :rtype: int
+        """
+        return self._key_rows.get(key, -1)
+
+    def _new_keys(self, position, count):
+        #Assigns keys to rows inserted at the given position
+        keys = range(self._next_key, self._next_key + count)
+        self._next_key += count
+        self._row_keys[position:position] = array('l', keys)
+        self._map_rows(position)
+
+        return keys
+
+    def _map_rows(self, position):
+        #Updates the row numbers of the keys from the given row
+        key_rows = self._key_rows
+        row_keys = self._row_keys
+
+        for row in xrange(position, len(row_keys)):
+            key_rows[row_keys[row]] = row
+
+    def _column_values(self, column, position, count):
+        return self._columns[column].values(position, count)
+
+    def _index_rows(self, position, count, remove=False):
+        #Adds or removes rows in the column indexes
+        keys = self._row_keys[position:position + count]
+
+        for column, index in self._indexes.iteritems():
+            values = self._column_values(column, position, count)
+
+            if remove:
+                index.remove(keys, values)
+            else:
+                index.add(keys, values)
+
+    def column_index(self, column):
+        """
+        :param column: Column number.
+        :type column: int
+        :return: Returns the index of the column, which is built if it does
+        not exist.
+        :rtype: ColumnIndex
+        """
+        index = self._indexes.get(column, None)
+
+        if index is None:
+            index = ColumnIndex()
+            index.add(self._row_keys,
+                      self._column_values(column, 0, self._row_count))
+            self._indexes[column] = index
+
+        return index
+
+    def match_keys(self, column, text, match=MATCH_CONTAINS):
+        """
+        Searches the rows using the index of the column.
+        :param column: Column number.
+        :type column: int
+        :param text: Text to search for, the case is ignored.
+        :type text: unicode
+        :param match: MATCH_EXACT, MATCH_PREFIX or MATCH_CONTAINS.
+        :type match: int
+        :return: Returns the keys of the matching rows.
+        :rtype: set
+        """
+        index = self.column_index(column)
+
+        if match == MATCH_EXACT:
+            return index.exact(text)
+
+        if match == MATCH_PREFIX:
+            return index.prefix(text)
+
+        return index.contains(text)
+
+    def find_row(self, column, value):
+        """
+        Finds the first row with the given value in a column.
+        :param column: Column number.
+        :type column: int
+        :param value: Value to search for.
+        :type value: object
+        :return: Returns the row number or -1 if no row has the value.
+        :rtype: int
+        """
+        text = ColumnIndex.text(value)
+        rows = [self._key_rows[k]
+                for k in self.match_keys(column, text, MATCH_EXACT)]
+
+        #The index ignores the case of the values
+        for row in sorted(rows):
+            if ColumnIndex.text(self._columns[column].value(row)) == text:
+                return row
+
+        return -1
+
+    def column(self, column):
+        """
+        :param column: Column number.
+        :type column: int
+        :return: Returns the values of the given column.
+        :rtype: TableColumn
+        """
+        return self._columns[column]
+
+    def append_rows(self, rows):
+        """
+        Appends rows at the end of the model. This is faster than inserting
+        and setting the values of each row.
+        :param rows: List containing a list of values for each row.
+        :type rows: list
+        """
+        if len(rows) == 0:
+            return
+
+        self.beginInsertRows(
+            QModelIndex(), self._row_count, self._row_count + len(rows) - 1
+        )
+
+        position = self._row_count
+        for i, c in enumerate(self._columns):
+            c.extend([r[i] if i < len(r) else '' for r in rows])
+
+        self._row_count += len(rows)
+        self._new_keys(position, len(rows))
+        self._index_rows(position, len(rows))
+        self.revision += 1
+
+        self.endInsertRows()
+
+    def data(self, index, role):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        return self._columns[index.column()].value(index.row())
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if index.isValid() and role == Qt.EditRole:
+            row, column = index.row(), index.column()
+            col_index = self._indexes.get(column, None)
+            key = [self._row_keys[row]]
+
+            if not col_index is None:
+                col_index.remove(key, self._column_values(column, row, 1))
+
+            self._columns[column].set_value(row, value)
+
+            if not col_index is None:
+                col_index.add(key, self._column_values(column, row, 1))
+
+            self.revision += 1
+            self.dataChanged.emit(index,index)
+
+            return True
+
+        return False
+
+    def insertRows(self, position, rows, parent=QModelIndex()):
+        if position < 0 or position > self._row_count:
+            return False
+
+        self.beginInsertRows(parent, position, position + rows - 1)
+
+        for c in self._columns:
+            c.insert(position, rows)
+
+        self._row_count += rows
+        self._new_keys(position, rows)
+        self._index_rows(position, rows)
+        self.revision += 1
+
+        self.endInsertRows()
+
+        return True
+
+    def removeRows(self, position, count, parent=QModelIndex()):
+        if position < 0 or position > self._row_count:
+            return False
+
+        count = min(count, self._row_count - position)
+        if count <= 0:
+            return True
+
+        self.beginRemoveRows(parent,position,position + count - 1)
+
+        self._index_rows(position, count, True)
+
+        for c in self._columns:
+            c.remove(position, count)
+
+        for key in self._row_keys[position:position + count]:
+            del self._key_rows[key]
+
+        del self._row_keys[position:position + count]
+        self._map_rows(position)
+        self._row_count -= count
+        self.revision += 1
+
+        self.endRemoveRows()
+
+        return True
+
+
+class PagedEntityTableModel(BaseSTDMTableModel):
+    """
+    Table model which loads the records of an entity in pages as the view
+    is scrolled. Sorting is delegated to the fetch callable, which is
+    expected to page through the records in the order of 'sort_column'
+    using the id of the last loaded record. Only the ids of the loaded
+    records are kept for all rows, the values of at most
+    'max_resident_rows' rows are cached and evicted pages are reloaded from
+    the database when they are displayed again. The first column must
+    contain the record id.
+    """
+    def __init__(self, fetch_rows, headerdata, page_size=PAGE_SIZE,
+                 max_resident_rows=MAX_RESIDENT_ROWS, parent=None,
+                 request_page=None):
+        """
+        :param fetch_rows: Callable which returns the page of rows following
+        the record whose id is the first argument (or the first page if it
+        is None), limited to the number of rows in the second argument. If
+        the optional 'ids' keyword argument is specified, the rows with the
+        given ids are returned instead.
+        :type fetch_rows: callable
+        :param headerdata: Column headers.
+        :type headerdata: list
+        :param page_size: Number of rows loaded in each query.
+        :type page_size: int
+        :param max_resident_rows: Maximum number of cached rows.
+        :type max_resident_rows: int
+        :param request_page: Optional callable which loads the pages
+        requested by the view asynchronously. It is invoked with the request
+        number, the id of the last loaded record and the number of rows, and
+        the loaded rows are passed to 'append_page' with the request number.
+        :type request_page: callable
+        """
+        BaseSTDMTableModel.__init__(self, [], headerdata, parent)
+        self._fetch_rows = fetch_rows
+        self._request_page = request_page
+        self._page_size = page_size
+        self._max_resident_rows = max(max_resident_rows, page_size)
+
+        #Keys of all the rows, the record id or a key for rows inserted in the view
+        self._keys = []
+        self._rows = OrderedDict()
+        self._last_id = None
+        self._more = True
+        self._inserted = []
+        self._num_inserted = 0
+        self._request = 0
+        self._loading = False
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self._keys)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+
+        return self._more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._more or self._loading:
+            return
+
+        if self._request_page is None:
+            self.load_page()
+
+            return
+
+        self._request += 1
+        self._loading = True
+        self._request_page(self._request, self._last_id, self._page_size)
+
+    @property
+    def request(self):
+        """
+        :return: Returns the number of the latest page request. Loaders can
+        compare it with the number of their request to detect cancellation.
+        :rtype: int
+        """
+        return self._request
+
+    @property
+    def loading(self):
+        """
+        :return: Returns True if a page is being loaded asynchronously.
+        :rtype: bool
+        """
+        return self._loading
+
+    def cancel(self):
+        """
+        Cancels the pending asynchronous page request, its rows will be
+        ignored.
+        """
+        self._request += 1
+        self._loading = False
+
+    def load_page(self):
+        """
+        Loads the next page synchronously, any pending asynchronous request
+        is cancelled.
+        """
+        self.cancel()
+
+        self._append_rows(self._fetch_rows(self._last_id, self._page_size))
+
+    def append_page(self, request, rows):
+        """
+        Adds the rows of a page loaded asynchronously.
+        :param request: Request number passed to the loader.
+        :type request: int
+        :param rows: Rows of the page.
+        :type rows: list
+        :return: Returns False if the request has been cancelled and the rows
+        were ignored.
+        :rtype: bool
+        """
+        if request != self._request:
+            return False
+
+        self._loading = False
+        self._append_rows(rows)
+
+        return True
+
+    def _append_rows(self, rows):
+        if len(rows) < self._page_size:
+            self._more = False
+
+        if len(rows) > 0:
+            self._last_id = rows[-1][0]
+
+        #Exclude records which have been inserted in the view
+        inserted_ids = set(self._rows[k][0] for k in self._inserted)
+        rows = [r for r in rows if not r[0] in inserted_ids]
+
+        if len(rows) > 0:
+            position = len(self._keys)
+            self.beginInsertRows(QModelIndex(), position,
+                                 position + len(rows) - 1)
+
+            for row in rows:
+                self._keys.append(row[0])
+                self._cache(row[0], row)
+
+            self.endInsertRows()
+
+    def refresh(self):
+        """
+        Removes all the rows and loads the first page again, for instance
+        after the filter of the fetch callable has changed.
+        """
+        self.cancel()
+        self.beginResetModel()
+
+        self._keys = []
+        self._rows = OrderedDict()
+        self._last_id = None
+        self._more = True
+        self._inserted = []
+
+        self.endResetModel()
+
+        self.fetchMore()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sets the sort column and order used by the fetch callable and
+        reloads the rows.
+        :param column: Column index.
+        :type column: int
+        :param order: Sort order.
+        :type order: Qt.SortOrder
+        """
+        if column == self.sort_column and order == self.sort_order:
+            return
+
+        self.sort_column = column
+        self.sort_order = order
+
+        self.refresh()
+
+    def fetch_until(self, record_id):
+        """
+        Synchronously loads pages until the record with the given id has been
+        loaded or there are no more records.
+        :param record_id: Record id.
+        :type record_id: int
+        :return: Returns the row number of the record or -1 if it does not
+        exist.
+        :rtype: int
+        """
+        row = self.row_for_id(record_id)
+
+        while row == -1 and self._more:
+            position = len(self._keys)
+            self.load_page()
+
+            if record_id in self._keys[position:]:
+                row = self._keys.index(record_id, position)
+
+        return row
+
+    def row_for_id(self, record_id):
+        """
+        :param record_id: Record id.
+        :type record_id: int
+        :return: Returns the row number of a loaded record or -1 if it has
+        not been loaded.
+        :rtype: int
+        """
+        for key in self._inserted:
+            if self._rows[key][0] == record_id:
+                return self._keys.index(key)
+
+        try:
+            return self._keys.index(record_id)
+
+        except ValueError:
+            return -1
+
+    def record_id(self, row):
+        """
+        :param row: Row number.
+        :type row: int
+        :return: Returns the id of the record in the given row or None if
+        the row has been inserted in the view and the id has not been set.
+        :rtype: int
+        """
+        if row < 0 or row >= len(self._keys):
+            return None
+
+        return self._row(row)[0]
+
+    def _cache(self, key, row):
+        self._rows[key] = row
+
+        #Rows inserted in the view are not in the database yet
+        while len(self._rows) > self._max_resident_rows:
+            for k in self._rows:
+                if not isinstance(k, tuple):
+                    del self._rows[k]
+                    break
+            else:
+                break
+
+    def _row(self, row):
+        key = self._keys[row]
+
+        if key in self._rows:
+            #Most recently used row is moved to the end
+            row_data = self._rows.pop(key)
+            self._rows[key] = row_data
+
+            return row_data
+
+        self._reload_page(row)
+
+        return self._rows.get(key, [None] * self.columnCount())
+
+    def _reload_page(self, row):
+        #Reloads the evicted rows of the page containing the row
+        start = row - row % self._page_size
+        ids = [k for k in self._keys[start:start + self._page_size]
+               if not isinstance(k, tuple) and not k in self._rows]
+
+        if len(ids) == 0:
+            return
+
+        for r in self._fetch_rows(None, len(ids), ids=ids):
+            self._cache(r[0], r)
+
+    def data(self, index, role):
+        if not index.isValid() or index.row() >= len(self._keys):
+            return None
+
+        if role != Qt.DisplayRole:
+            return None
+
+        #Ids are used for sorting and selection without reloading evicted rows
+        key = self._keys[index.row()]
+        if index.column() == 0 and not isinstance(key, tuple):
+            return key
+
+        indexData = self._row(index.row())[index.column()]
+
+        #Decimal not supported by QVariant so we adapt it to a supported type
+        if isinstance(indexData, Decimal):
+            return str(indexData)
+
+        return indexData
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if index.isValid() and role == Qt.EditRole:
+            self._row(index.row())[index.column()] = value
+            self.dataChanged.emit(index, index)
+
+            return True
+
+        return False
+
+    def insertRows(self, position, rows, parent=QModelIndex()):
+        if position < 0 or position > len(self._keys):
+            return False
+
+        self.beginInsertRows(parent, position, position + rows - 1)
+
+        for i in range(rows):
+            #Inserted rows are never evicted
+            self._num_inserted += 1
+            key = ('inserted', self._num_inserted)
+            self._keys.insert(position, key)
+            self._inserted.append(key)
+            self._rows[key] = ["" for c in range(self.columnCount())]
+
+        self.endInsertRows()
+
+        return True
+
+    def removeRows(self, position, count, parent=QModelIndex()):
+        if position < 0 or position >= len(self._keys):
+            return False
+
+        count = min(count, len(self._keys) - position)
+
+        self.beginRemoveRows(parent, position, position + count - 1)
+
+        for key in self._keys[position:position + count]:
+            self._rows.pop(key, None)
+            if key in self._inserted:
+                self._inserted.remove(key)
+
+        del self._keys[position:position + count]
+
+        self.endRemoveRows()
+
+        return True
+
+
 class VerticalHeaderSortFilterProxyModel(QSortFilterProxyModel):
     """
     A sort/filter proxy model that ensures row numbers in vertical headers
@@ -543,6 +1577,84 @@ class VerticalHeaderSortFilterProxyModel(QSortFilterProxyModel):
 
         return super(VerticalHeaderSortFilterProxyModel, self).headerData(section, orientation, role)
 
+    def sort(self, column, order=Qt.AscendingOrder):
+        #Paged models are sorted in the database since not all rows are loaded
+        if isinstance(self.sourceModel(), PagedEntityTableModel):
+            self.sourceModel().sort(column, order)
+
+            return
+
+        super(VerticalHeaderSortFilterProxyModel, self).sort(column, order)
+
+
+class IndexedSortFilterProxyModel(VerticalHeaderSortFilterProxyModel):
+    """
+    Sort/filter proxy model which filters a ColumnarTableModel using the
+    index of the filter column, so that each row is only looked up in the
+    set of matching rows instead of being matched against a regular
+    expression. Other source models are filtered using a case insensitive
+    fixed string.
+    """
+    def __init__(self, parent=None):
+        VerticalHeaderSortFilterProxyModel.__init__(self, parent)
+        self._filter_text = u''
+        self._filter_match = MATCH_CONTAINS
+        self._filter_keys = None
+        self._filter_revision = None
+
+    def _indexed(self):
+        return isinstance(self.sourceModel(), ColumnarTableModel) and \
+            self.filterKeyColumn() >= 0
+
+    def set_filter_text(self, text, match=MATCH_CONTAINS):
+        """
+        Filters the rows whose value in the filter key column matches the
+        given text, ignoring the case.
+        :param text: Text to search for, all rows are shown if empty.
+        :type text: unicode
+        :param match: MATCH_EXACT, MATCH_PREFIX or MATCH_CONTAINS.
+        :type match: int
+        """
+        self._filter_text = unicode(text)
+        self._filter_match = match
+        self._filter_revision = None
+
+        if not self._indexed():
+            self.setFilterRegExp(
+                QRegExp(self._filter_text, Qt.CaseInsensitive,
+                        QRegExp.FixedString)
+            )
+
+            return
+
+        if not self.filterRegExp().isEmpty():
+            self.setFilterRegExp(QRegExp())
+
+        self.invalidateFilter()
+
+    def setFilterKeyColumn(self, column):
+        self._filter_revision = None
+
+        super(IndexedSortFilterProxyModel, self).setFilterKeyColumn(column)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._filter_text or not self._indexed():
+            return super(IndexedSortFilterProxyModel, self).filterAcceptsRow(
+                source_row, source_parent
+            )
+
+        #Matching rows are searched again once the source rows change
+        source = self.sourceModel()
+        if self._filter_revision != source.revision:
+            self._filter_keys = source.match_keys(
+                self.filterKeyColumn(),
+                self._filter_text,
+                self._filter_match
+            )
+            self._filter_revision = source.revision
+
+        return source.row_key(source_row) in self._filter_keys
+
 class STRTreeViewModel(QAbstractItemModel):
     """
     Model for rendering social tenure relationship nodes in a tree view.
@@ -561,6 +1673,39 @@ class STRTreeViewModel(QAbstractItemModel):
 
         return parentNode.childCount()
 
+    def hasChildren(self, parent=QModelIndex()):
+        return self._getNode(parent).hasChildren()
+
+    def canFetchMore(self, parent):
+        """
+        True if the children of the node at the given index have not been
+        loaded yet.
+        """
+        if not parent.isValid():
+            return False
+
+        return self._getNode(parent).canFetchChildren()
+
+    def fetchMore(self, parent):
+        """
+        Loads the children of the node at the given index, the rows are
+        inserted once the node has added its children.
+        """
+        if not parent.isValid():
+            return
+
+        node = self._getNode(parent)
+        index = QPersistentModelIndex(parent)
+
+        def on_children_fetched():
+            #Model has been cleared while the children were loaded
+            if not index.isValid() or node.childCount() == 0:
+                return
+
+            self.insertRows(0, node.childCount(), QModelIndex(index))
+
+        node.fetchChildren(on_children_fetched)
+
     def columnCount(self, parent=QModelIndex()):
         return self._rootNode.columnCount()
 
@@ -0,0 +1,367 @@
+"""
+/***************************************************************************
+Name                 : Query Statistics
+Description          : Records the SQL statements executed through the STDM
+                       engine, grouped by user action, and flags statements
+                       repeated within an action as probable N+1 queries.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import inspect
+import logging
+import re
+import threading
+import time
+from collections import (
+    deque,
+    OrderedDict
+)
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+
+from stdm.data.database import Singleton
+
+LOGGER = logging.getLogger('stdm')
+
+#Executions of the same statement in one action flagged as N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+#Number of completed actions kept for the statistics panel
+MAX_ACTIONS = 50
+
+_MAX_FINGERPRINTS = 2000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|(?<!:):\w+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """
+    Normalizes an SQL statement by replacing literals and bind parameters
+    with '?' so that statements differing only by their values are grouped
+    together.
+    :param statement: SQL statement.
+    :type statement: str
+    :return: Returns the normalized statement.
+    :rtype: str
+    """
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('(?)', sql)
+
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class StatementStatistics(object):
+    """
+    Aggregated statistics of the statements with the same fingerprint.
+    """
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+
+    def add(self, elapsed, rows):
+        self.count += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.rows += rows
+
+    @property
+    def is_n_plus_one(self):
+        """
+        :return: True if the statement was executed often enough in the
+        action to be a probable N+1 query.
+        :rtype: bool
+        """
+        return self.count >= N_PLUS_ONE_THRESHOLD
+
+
+class ActionStatistics(object):
+    """
+    Statements executed while a named user action was running.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.statements = OrderedDict()
+
+    def add(self, fingerprint, elapsed, rows):
+        stats = self.statements.get(fingerprint, None)
+        if stats is None:
+            stats = StatementStatistics(fingerprint)
+            self.statements[fingerprint] = stats
+
+        stats.add(elapsed, rows)
+
+    def finish(self):
+        self.elapsed = time.time() - self.started
+
+    @property
+    def query_count(self):
+        return sum(s.count for s in self.statements.values())
+
+    @property
+    def query_time(self):
+        return sum(s.total_time for s in self.statements.values())
+
+    def n_plus_one(self):
+        """
+        :return: Returns the statistics of the probable N+1 statements.
+        :rtype: list
+        """
+        return [s for s in self.statements.values() if s.is_n_plus_one]
+
+    def log(self):
+        """
+        Writes a summary of the action to the debug log.
+        """
+        LOGGER.debug(
+            'Action "%s": %d queries, %.1f ms in queries, %.1f ms in total.',
+            self.name,
+            self.query_count,
+            self.query_time * 1000,
+            self.elapsed * 1000
+        )
+
+        for s in self.n_plus_one():
+            LOGGER.warning(
+                'Probable N+1 query in "%s", executed %d times in %.1f ms: %s',
+                self.name,
+                s.count,
+                s.total_time * 1000,
+                s.fingerprint
+            )
+
+
+@Singleton
+class QueryStatistics(object):
+    """
+    Hooks the cursor execution events of the STDM engine while enabled.
+    When disabled, no event listeners are registered hence statements are
+    executed without any overhead. Statements are only recorded while an
+    action is running in the same thread.
+    """
+    def __init__(self):
+        self._engine = None
+        self._enabled = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self.actions = deque(maxlen=MAX_ACTIONS)
+
+    def instance(self, *args, **kwargs):
+        """
+        Dummy method. Eclipse IDE cannot handle the Singleton decorator in Python
+        """
+        pass
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def attach(self, engine, enabled=None):
+        """
+        Sets the engine whose statements are recorded.
+        :param engine: SQLAlchemy engine.
+        :type engine: Engine
+        :param enabled: True to record the statements, defaults to the
+        debug logging setting.
+        :type enabled: bool
+        """
+        if enabled is None:
+            from stdm.settings.registryconfig import debug_logging
+
+            enabled = debug_logging()
+
+        self._remove_listeners()
+        self._enabled = False
+        self._engine = engine
+        self.set_enabled(enabled)
+
+    def set_enabled(self, state):
+        """
+        Enables or disables the recording of statements.
+        :param state: True to record the statements.
+        :type state: bool
+        """
+        state = bool(state)
+        if state == self._enabled and not self._engine is None:
+            return
+
+        self._remove_listeners()
+        self._enabled = state
+
+        if state and not self._engine is None:
+            event.listen(self._engine, 'before_cursor_execute',
+                         self._before_execute)
+            event.listen(self._engine, 'after_cursor_execute',
+                         self._after_execute)
+
+    def _remove_listeners(self):
+        if self._engine is None or not self._enabled:
+            return
+
+        event.remove(self._engine, 'before_cursor_execute',
+                     self._before_execute)
+        event.remove(self._engine, 'after_cursor_execute',
+                     self._after_execute)
+
+    def _active_actions(self):
+        stack = getattr(self._local, 'actions', None)
+        if stack is None:
+            stack = []
+            self._local.actions = stack
+
+        return stack
+
+    def _fingerprint(self, statement):
+        #Statements are mostly parameterized hence few distinct texts
+        fp = self._fingerprints.get(statement, None)
+        if fp is None:
+            fp = fingerprint(statement)
+            if len(self._fingerprints) >= _MAX_FINGERPRINTS:
+                self._fingerprints.clear()
+            self._fingerprints[statement] = fp
+
+        return fp
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        #The start time is kept with the execution so that statements which
+        #raise an error do not leave it behind on the connection
+        start = time.time()
+        if context is None:
+            conn.info['stdm_query_start'] = start
+        else:
+            context.stdm_query_start = start
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        if context is None:
+            start = conn.info.pop('stdm_query_start', None)
+        else:
+            start = getattr(context, 'stdm_query_start', None)
+
+        #Recording was enabled while the statement was being executed
+        if start is None:
+            return
+
+        elapsed = time.time() - start
+
+        actions = self._active_actions()
+        if len(actions) == 0:
+            return
+
+        fp = self._fingerprint(statement)
+        rows = max(cursor.rowcount, 0)
+
+        #Nested actions include the statements of the inner actions
+        for action in actions:
+            action.add(fp, elapsed, rows)
+
+    def begin_action(self, name):
+        """
+        Starts recording the statements executed in the current thread
+        under the given action name.
+        :param name: Name of the action.
+        :type name: str
+        :return: Returns the statistics of the action.
+        :rtype: ActionStatistics
+        """
+        action = ActionStatistics(name)
+        self._active_actions().append(action)
+
+        return action
+
+    def end_action(self, action):
+        """
+        Stops recording the statements of the action and writes its summary
+        to the debug log.
+        :param action: Action returned by begin_action.
+        :type action: ActionStatistics
+        """
+        actions = self._active_actions()
+        if action in actions:
+            actions.remove(action)
+
+        action.finish()
+
+        with self._lock:
+            self.actions.append(action)
+
+        action.log()
+
+    def clear(self):
+        """
+        Removes the statistics of the completed actions.
+        """
+        with self._lock:
+            self.actions.clear()
+
+
+@contextmanager
+def query_action(name):
+    """
+    Groups the statements executed within the block under the given action
+    name. Does nothing if the statistics are disabled.
+    :param name: Name of the action.
+    :type name: str
+    """
+    stats = QueryStatistics.instance()
+    if not stats.enabled:
+        yield
+
+        return
+
+    action = stats.begin_action(name)
+
+    try:
+        yield
+
+    finally:
+        stats.end_action(action)
+
+
+def instrumented_action(name):
+    """
+    Decorator which groups the statements executed by a function under the
+    given action name. Extra positional arguments, such as those passed by
+    Qt signals to slots, are ignored as it is the case for undecorated
+    slots.
+    :param name: Name of the action.
+    :type name: str
+    """
+    def decorator(func):
+        arg_spec = inspect.getargspec(func)
+        num_args = None if arg_spec.varargs else len(arg_spec.args)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_action(name):
+                return func(*args[:num_args], **kwargs)
+
+        return wrapper
+
+    return decorator
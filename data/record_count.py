@@ -0,0 +1,160 @@
+"""
+/***************************************************************************
+Name                 : Record Count
+Description          : Counts the records of entity queries either exactly
+                       or using the estimates of PostgreSQL, and counts
+                       records exactly in a worker thread.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import logging
+from collections import namedtuple
+
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QObject,
+    QRunnable
+)
+
+from sqlalchemy.orm import sessionmaker
+
+from stdm.data.database import STDMDb
+from stdm.data.pg_utils import pg_table_estimated_count
+
+LOGGER = logging.getLogger('stdm')
+
+#Count policies
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATED = 'estimated'
+COUNT_AUTO = 'auto'
+
+#Tables estimated to have fewer records are counted exactly by the auto
+#policy
+EXACT_COUNT_LIMIT = 100000
+
+RecordCount = namedtuple('RecordCount', ['count', 'exact'])
+
+
+def exact_count(query):
+    """
+    Counts the records returned by the query. The ordering of the query is
+    removed since PostgreSQL would otherwise sort the records in the
+    subquery used for counting.
+    :param query: Query of the records.
+    :type query: Query
+    :return: Returns the number of records.
+    :rtype: int
+    """
+    return query.order_by(None).count()
+
+
+def planner_count(query):
+    """
+    Returns the number of records returned by the query as estimated by the
+    PostgreSQL planner, the query is not run.
+    :param query: Query of the records.
+    :type query: Query
+    :return: Returns the estimated number of records.
+    :rtype: int
+    """
+    session = query.session
+    compiled = query.order_by(None).statement.compile(
+        dialect=session.get_bind().dialect
+    )
+
+    plan = session.connection().execute(
+        u'EXPLAIN (FORMAT JSON) {0}'.format(compiled),
+        compiled.params
+    ).scalar()
+
+    #Older versions of psycopg2 do not decode json values
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def record_count(query, table_name, policy=COUNT_AUTO):
+    """
+    Counts the records returned by the query using the given policy.
+    COUNT_EXACT always counts the records, COUNT_ESTIMATED uses the estimate
+    unless the table has not been analyzed and COUNT_AUTO only counts the
+    records if the table is estimated to have less than EXACT_COUNT_LIMIT
+    records.
+    :param query: Query of the records in the table.
+    :type query: Query
+    :param table_name: Name of the queried table.
+    :type table_name: str
+    :param policy: Count policy.
+    :type policy: str
+    :return: Returns the number of records and whether it is exact.
+    :rtype: RecordCount
+    """
+    if policy != COUNT_EXACT:
+        table_count = pg_table_estimated_count(table_name)
+
+        if not table_count is None and (policy == COUNT_ESTIMATED or
+                                        table_count >= EXACT_COUNT_LIMIT):
+            #Filtered queries are estimated by the planner
+            if not query.whereclause is None:
+                table_count = planner_count(query)
+
+            return RecordCount(table_count, False)
+
+    return RecordCount(exact_count(query), True)
+
+
+class _CountSignals(QObject):
+    """
+    Signals of the record counter, QRunnable is not a QObject.
+    """
+    counted = pyqtSignal(int, object)
+
+
+class ExactRecordCounter(QRunnable):
+    """
+    Counts the records of a query in a thread of the global thread pool
+    using a separate database session, since the shared STDMDb session is
+    not thread-safe. Nothing is emitted if the records cannot be counted.
+    The query should only use models mapped on the main thread since
+    reflecting and mapping tables is not thread-safe.
+    """
+    def __init__(self, request, query_func):
+        """
+        :param request: Number identifying the count, emitted with the
+        result so that outdated counts can be ignored.
+        :type request: int
+        :param query_func: Callable which returns the query of the records
+        using the given session.
+        :type query_func: callable
+        """
+        QRunnable.__init__(self)
+        self.signals = _CountSignals()
+        self._request = request
+        self._query_func = query_func
+
+    def run(self):
+        session = sessionmaker(bind=STDMDb.instance().engine)()
+
+        try:
+            count = exact_count(self._query_func(session))
+            self.signals.counted.emit(self._request, count)
+
+        except Exception as ex:
+            LOGGER.debug('Records could not be counted: %s', ex)
+
+        finally:
+            session.close()
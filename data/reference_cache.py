@@ -0,0 +1,354 @@
+"""
+/***************************************************************************
+Name                 : ReferenceDataCache
+Description          : Session-wide cache of the lookup values,
+                       administrative units and parent entity records used
+                       to format and edit column values.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+from collections import OrderedDict
+from threading import RLock
+
+from sqlalchemy import event
+from sqlalchemy.orm import (
+    object_mapper,
+    sessionmaker
+)
+from sqlalchemy.orm.exc import UnmappedInstanceError
+
+from stdm.data.database import (
+    Singleton,
+    STDMDb
+)
+
+LOGGER = logging.getLogger('stdm')
+
+#Maximum number of ids in a single 'IN' query
+_MAX_IN_IDS = 1000
+
+
+@Singleton
+class ReferenceDataCache(object):
+    """
+    Caches the values of value lists and administrative units, which are
+    loaded once per profile, and the most recently used records of parent
+    entities, which are loaded in batches and bounded by the reference cache
+    size setting. Records are read using a separate session and detached
+    from it so that commits in the shared session do not expire them. The
+    cached data of a table is discarded when rows of the table are flushed
+    in the shared session. Methods called from worker threads should be
+    given the models of the entities, mapped on the main thread, since
+    reflecting and mapping tables is not thread-safe.
+    """
+    def __init__(self):
+        self._values = {}
+        self._records = {}
+        self._lock = RLock()
+        self._session = None
+        self.hits = 0
+        self.misses = 0
+
+    def instance(self, *args, **kwargs):
+        """
+        Dummy method. Eclipse IDE cannot handle the Singleton decorator in Python
+        """
+        pass
+
+    @staticmethod
+    def key(entity):
+        """
+        :param entity: Entity object.
+        :type entity: Entity
+        :return: Returns the key of the cached data of the entity.
+        :rtype: tuple
+        """
+        return unicode(entity.profile.name), unicode(entity.name)
+
+    def attach(self, session):
+        """
+        Invalidates the cached data of the tables whose rows are inserted,
+        updated or deleted in the given session.
+        :param session: Shared session.
+        :type session: Session
+        """
+        if not self._session is None and \
+                event.contains(self._session, 'after_flush', self._on_flush):
+            event.remove(self._session, 'after_flush', self._on_flush)
+
+        self._session = session
+        event.listen(session, 'after_flush', self._on_flush)
+
+    def _on_flush(self, session, flush_context):
+        tables = set()
+
+        for obj in list(session.new) + list(session.dirty) + \
+                list(session.deleted):
+            try:
+                tables.add(object_mapper(obj).local_table.name)
+
+            except (UnmappedInstanceError, AttributeError):
+                continue
+
+        for t in tables:
+            self.invalidate_table(t)
+
+    def _query(self, model, criterion=None):
+        #Loads detached objects using a separate session
+        session = sessionmaker(bind=STDMDb.instance().engine)()
+
+        try:
+            query = session.query(model)
+            if not criterion is None:
+                query = query.filter(criterion)
+
+            return query.all()
+
+        finally:
+            session.close()
+
+    @staticmethod
+    def model(entity):
+        """
+        Maps the table of the entity, should be called on the main thread.
+        :param entity: Entity object.
+        :type entity: Entity
+        :return: Returns the model of the entity passed to the methods of
+        the cache.
+        """
+        from stdm.data.configuration import entity_model
+
+        return entity_model(entity, entity_only=True)
+
+    def values(self, entity, attrs, model=None):
+        """
+        Returns the values of the given attributes of all the rows of a
+        small reference table such as a value list. The table is only queried
+        the first time.
+        :param entity: Value list or administrative unit entity.
+        :type entity: Entity
+        :param attrs: Names of the attributes.
+        :type attrs: list
+        :param model: Model of the entity, mapped if not specified.
+        :return: Returns a dictionary containing a list with the values of
+        the attributes indexed by the row id. The dictionary should not be
+        modified.
+        :rtype: OrderedDict
+        """
+        key = self.key(entity)
+
+        with self._lock:
+            values = self._values.get(key, None)
+            if not values is None:
+                self.hits += 1
+
+                return values
+
+            self.misses += 1
+
+        if model is None:
+            model = self.model(entity)
+
+        values = OrderedDict()
+
+        for r in sorted(self._query(model), key=lambda r: r.id):
+            values[r.id] = [getattr(r, a) for a in attrs]
+
+        with self._lock:
+            self._values[key] = values
+
+        return values
+
+    def load_values(self, entity, attrs, ids, model=None):
+        """
+        Loads the rows with the given ids that have been added since the
+        values of the table were cached.
+        :param entity: Value list or administrative unit entity.
+        :type entity: Entity
+        :param attrs: Names of the attributes.
+        :type attrs: list
+        :param ids: Row ids.
+        :type ids: list
+        :param model: Model of the entity, mapped if not specified.
+        :return: Returns the cached values of the table.
+        :rtype: OrderedDict
+        """
+        if model is None:
+            model = self.model(entity)
+
+        values = self.values(entity, attrs, model)
+        missing = [i for i in set(ids) if not i is None and not i in values]
+
+        if len(missing) == 0:
+            return values
+
+        loaded = []
+        for chunk in self._chunks(missing):
+            loaded.extend(self._query(model, model.id.in_(chunk)))
+
+        with self._lock:
+            for r in loaded:
+                values[r.id] = [getattr(r, a) for a in attrs]
+
+        return values
+
+    def lookup_values(self, value_list, model=None):
+        """
+        :param value_list: Value list entity.
+        :type value_list: ValueList
+        :param model: Model of the value list, mapped if not specified.
+        :return: Returns the value and code of each lookup indexed by id.
+        :rtype: OrderedDict
+        """
+        return self.values(value_list, ('value', 'code'), model)
+
+    def admin_units(self, profile):
+        """
+        :param profile: Profile whose administrative units are returned.
+        :type profile: Profile
+        :return: Returns the name and code of each administrative unit
+        indexed by id.
+        :rtype: OrderedDict
+        """
+        return self.values(
+            profile.administrative_spatial_unit,
+            ('name', 'code')
+        )
+
+    def parent_records(self, entity, ids, model=None):
+        """
+        Returns the records of the parent entity with the given ids. Records
+        which are not cached are loaded in a single query and the least
+        recently used records are discarded when the number of cached records
+        of the entity exceeds the reference cache size.
+        :param entity: Parent entity.
+        :type entity: Entity
+        :param ids: Primary keys of the records.
+        :type ids: list
+        :param model: Model of the parent entity, mapped if not specified.
+        :return: Returns the records found indexed by id.
+        :rtype: dict
+        """
+        from stdm.settings.registryconfig import reference_cache_size
+
+        key = self.key(entity)
+        ids = set([i for i in ids if not i is None])
+        found = {}
+
+        with self._lock:
+            records = self._records.setdefault(key, OrderedDict())
+
+            for i in ids:
+                if i in records:
+                    #Most recently used records are moved to the end
+                    found[i] = records.pop(i)
+                    records[i] = found[i]
+
+            self.hits += len(found)
+
+        missing = list(ids.difference(found))
+        if len(missing) == 0:
+            return found
+
+        if model is None:
+            model = self.model(entity)
+
+        loaded = []
+        for chunk in self._chunks(missing):
+            loaded.extend(self._query(model, model.id.in_(chunk)))
+
+        max_records = reference_cache_size()
+
+        with self._lock:
+            self.misses += len(missing)
+            records = self._records.setdefault(key, OrderedDict())
+
+            for r in loaded:
+                found[r.id] = r
+                records[r.id] = r
+
+            while len(records) > max_records:
+                records.popitem(last=False)
+
+        return found
+
+    def parent_record(self, entity, id, model=None):
+        """
+        :param entity: Parent entity.
+        :type entity: Entity
+        :param id: Primary key of the record.
+        :type id: int
+        :param model: Model of the parent entity, mapped if not specified.
+        :return: Returns the record of the parent entity with the given id
+        or None if it does not exist.
+        """
+        return self.parent_records(entity, [id], model).get(id, None)
+
+    @staticmethod
+    def _chunks(ids):
+        for i in range(0, len(ids), _MAX_IN_IDS):
+            yield ids[i:i + _MAX_IN_IDS]
+
+    def invalidate_table(self, name):
+        """
+        Discards the cached data of the table with the given name in all
+        profiles.
+        :param name: Name of the entity or table.
+        :type name: str
+        """
+        name = unicode(name)
+
+        with self._lock:
+            for cache in (self._values, self._records):
+                for k in [k for k in cache if k[1] == name]:
+                    del cache[k]
+
+    def invalidate_profile(self, profile_name):
+        """
+        Discards the cached data of the profile with the given name.
+        :param profile_name: Name of the profile.
+        :type profile_name: str
+        """
+        profile_name = unicode(profile_name)
+
+        with self._lock:
+            for cache in (self._values, self._records):
+                for k in [k for k in cache if k[0] == profile_name]:
+                    del cache[k]
+
+    def clear(self):
+        """
+        Discards all the cached data and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._values = {}
+            self._records = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :return: Returns the number of cached tables and records and the
+        hit/miss counters of the cache.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'tables': len(self._values),
+                'records': sum([len(r) for r in self._records.values()]),
+                'hits': self.hits,
+                'misses': self.misses
+            }
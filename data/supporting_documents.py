@@ -28,6 +28,9 @@ from .pg_utils import foreign_key_parent_tables
 
 SUPPORTING_DOC_TAGS = ["supporting_document"]
 
+#Maximum number of values in a single 'IN' query
+_MAX_IN_VALUES = 1000
+
 def supporting_doc_tables_regexp():
     """
     :return: Returns an instance of a Regex class for filtering supporting
@@ -95,3 +98,52 @@ def document_models(entity, link_column, link_value):
 
     doc_objs = OrderedDict(doc_objs)
     return doc_objs
+
+def documents_by_link_value(entity, link_column, link_values,
+                            session=None):
+    """
+    Create the supporting document models of several records using a
+    single query for every 1000 records.
+    :param entity: The entity in which the supporting document are uploaded.
+    :type entity: Class
+    :param link_column: Name of the column linking the
+    source document tables to the primary entity table.
+    :type link_column: str
+    :param link_values: Values of the linked column of the records.
+    :type link_values: list
+    :param session: Session used to query the documents, the shared
+    session is used if None.
+    :type session: Session
+    :return: Supporting document models of each record, grouped by
+    document type, indexed by the value of the linked column. Records
+    without documents are not included.
+    :rtype: dict
+    """
+    _str_model, _doc_model = entity_model(
+        entity, False, True
+    )
+
+    if _doc_model is None or not hasattr(_doc_model, link_column):
+        return {}
+
+    entity_doc_col_obj = getattr(_doc_model, link_column)
+    if session is None:
+        query_obj = _doc_model().queryObject()
+    else:
+        query_obj = session.query(_doc_model)
+
+    link_values = list(set([v for v in link_values if not v is None]))
+    doc_objs = {}
+
+    for i in range(0, len(link_values), _MAX_IN_VALUES):
+        result = query_obj.filter(
+            entity_doc_col_obj.in_(link_values[i:i + _MAX_IN_VALUES])
+        ).all()
+
+        for doc_obj in result:
+            record_docs = doc_objs.setdefault(
+                getattr(doc_obj, link_column), OrderedDict()
+            )
+            record_docs.setdefault(doc_obj.document_type, []).append(doc_obj)
+
+    return doc_objs
@@ -0,0 +1,290 @@
+"""
+/***************************************************************************
+Name                 : Tracing
+Description          : Records the wall time of nested spans in the main
+                       entry points and writes them as Chrome trace events
+                       which can be opened in a trace viewer.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import glob
+import json
+import logging
+import os
+import thread
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from stdm import USER_PLUGIN_DIR
+from stdm.data.database import Singleton
+
+LOGGER = logging.getLogger('stdm')
+
+#Directory of the trace files
+TRACE_DIR = u'{0}/traces'.format(USER_PLUGIN_DIR)
+
+#Number of trace files kept, the oldest ones are removed
+MAX_TRACE_FILES = 20
+
+DEFAULT_CATEGORY = 'stdm'
+
+
+class Span(object):
+    """
+    A timed section of code in a thread.
+    """
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = time.time()
+        self.duration = 0.0
+
+    def finish(self):
+        self.duration = time.time() - self.start
+
+    def trace_event(self, pid, tid):
+        """
+        :return: Returns the span as a complete trace event.
+        :rtype: dict
+        """
+        event = {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': int(self.start * 1000000),
+            'dur': int(self.duration * 1000000),
+            'pid': pid,
+            'tid': tid
+        }
+        if self.args:
+            event['args'] = self.args
+
+        return event
+
+
+@Singleton
+class Tracer(object):
+    """
+    Collects the spans of each thread and appends them to the trace file of
+    the session once the outermost span of the thread has finished. The file
+    is in the JSON array format of the trace event specification, which
+    trace viewers also accept when the closing bracket is missing. Spans are
+    only recorded while debug logging is enabled.
+    """
+    def __init__(self):
+        from stdm.settings.registryconfig import debug_logging
+
+        self._enabled = debug_logging()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._thread_names = {}
+        self._file = None
+        self._num_events = 0
+        self._pid = os.getpid()
+        self.path = None
+
+    def instance(self, *args, **kwargs):
+        """
+        Dummy method. Eclipse IDE cannot handle the Singleton decorator in Python
+        """
+        pass
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def set_enabled(self, state):
+        """
+        Enables or disables tracing. The trace file is closed when tracing is
+        disabled and a new file is created when it is enabled again.
+        :param state: True to record spans.
+        :type state: bool
+        """
+        self._enabled = bool(state)
+
+        if not self._enabled:
+            self.close()
+
+    def _spans(self):
+        stack = getattr(self._local, 'spans', None)
+        if stack is None:
+            stack = []
+            self._local.spans = stack
+
+        return stack
+
+    def begin(self, name, category=DEFAULT_CATEGORY, args=None):
+        """
+        Starts a span in the current thread.
+        :param name: Name of the span.
+        :type name: str
+        :param category: Category of the span.
+        :type category: str
+        :param args: Values shown with the span in the trace viewer.
+        :type args: dict
+        :return: Returns the span.
+        :rtype: Span
+        """
+        span = Span(name, category, args)
+        self._spans().append(span)
+
+        return span
+
+    def end(self, span):
+        """
+        Finishes the span and writes the spans of the thread to the trace
+        file if it is the outermost span.
+        :param span: Span returned by begin.
+        :type span: Span
+        """
+        span.finish()
+
+        spans = self._spans()
+        if span in spans:
+            spans.remove(span)
+
+        tid = thread.get_ident()
+
+        with self._lock:
+            if not tid in self._thread_names:
+                self._thread_names[tid] = threading.current_thread().name
+                self._pending.append({
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': self._pid,
+                    'tid': tid,
+                    'args': {'name': self._thread_names[tid]}
+                })
+
+            self._pending.append(span.trace_event(self._pid, tid))
+
+            if len(spans) == 0:
+                self._flush()
+
+    def _open(self):
+        if not os.path.isdir(TRACE_DIR):
+            os.makedirs(TRACE_DIR)
+
+        self._remove_old_files()
+
+        self.path = os.path.join(
+            TRACE_DIR,
+            u'stdm_trace_{0:%Y%m%d_%H%M%S}_{1}.json'.format(
+                datetime.now(), self._pid
+            )
+        )
+        self._file = open(self.path, 'wb')
+        self._file.write('[\n')
+        self._num_events = 0
+
+    def _remove_old_files(self):
+        paths = sorted(glob.glob(os.path.join(TRACE_DIR, 'stdm_trace_*.json')))
+
+        for path in paths[:max(0, len(paths) - MAX_TRACE_FILES + 1)]:
+            try:
+                os.remove(path)
+
+            except OSError as os_error:
+                LOGGER.debug(u'Trace file not removed: %s',
+                             unicode(os_error))
+
+    def _flush(self):
+        #Tracing should never interrupt the traced operation
+        try:
+            if self._file is None:
+                self._open()
+
+            for event in self._pending:
+                if self._num_events > 0:
+                    self._file.write(',\n')
+                self._file.write(json.dumps(event))
+                self._num_events += 1
+
+            self._file.flush()
+
+        except (IOError, OSError) as io_error:
+            LOGGER.debug(u'Trace events not written: %s', unicode(io_error))
+
+        self._pending = []
+
+    def close(self):
+        """
+        Writes any pending spans and closes the trace file.
+        """
+        with self._lock:
+            if len(self._pending) > 0:
+                self._flush()
+
+            if self._file is None:
+                return
+
+            self._file.write('\n]\n')
+            self._file.close()
+            self._file = None
+            self._thread_names = {}
+
+
+@contextmanager
+def trace_span(name, category=DEFAULT_CATEGORY, **kwargs):
+    """
+    Records the wall time of the block as a span. Keyword arguments are
+    shown with the span in the trace viewer. Does nothing if tracing is
+    disabled.
+    :param name: Name of the span.
+    :type name: str
+    :param category: Category of the span.
+    :type category: str
+    """
+    tracer = Tracer.instance()
+    if not tracer.enabled:
+        yield
+
+        return
+
+    span = tracer.begin(name, category, kwargs)
+
+    try:
+        yield
+
+    except Exception as ex:
+        span.args['error'] = ex.__class__.__name__
+        raise
+
+    finally:
+        tracer.end(span)
+
+
+def traced(name, category=DEFAULT_CATEGORY):
+    """
+    Decorator which records each call of the function as a span.
+    :param name: Name of the span.
+    :type name: str
+    :param category: Category of the span.
+    :type category: str
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -20,7 +20,16 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import logging
 from collections import OrderedDict
+from functools import partial
+
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QObject,
+    QRunnable,
+    QThreadPool
+)
 from PyQt4.QtGui import (
     QApplication,
     QMessageBox
@@ -30,15 +39,20 @@ from sqlalchemy import (
     func,
     String
 )
+from sqlalchemy.orm import sessionmaker
 
 from stdm.settings import current_profile
 from stdm.data.configuration import entity_model
+from stdm.data.database import STDMDb
+from stdm.data.reference_cache import ReferenceDataCache
+from stdm.data.tracing import traced
 from stdm.ui.stdmdialog import DeclareMapping
 from stdm.utils.util import (
     getIndex,
     entity_display_columns,
     profile_spatial_tables,
     lookup_id_to_value,
+    lookup_parent_entity,
     format_name,
     profile_lookup_columns
 )
@@ -52,6 +66,301 @@ from .nodes import (
     InvalidSTRNode
 )
 
+LOGGER = logging.getLogger('stdm')
+
+#Maximum number of values in a single 'IN' query
+_MAX_IN_VALUES = 1000
+
+class STRTreeLoader(object):
+    """
+    Loads the data of the social tenure relationship tree of a result set
+    using one query per table: the STRs related to the records, the
+    records referenced by the STRs in each related table and the supporting
+    documents of the STRs. Nodes are then created using the loaded data.
+    """
+    def __init__(self, str_model, str_entity, doc_link_column,
+                 fk_references, session=None):
+        """
+        :param str_model: Social tenure relationship model.
+        :type str_model: object
+        :param str_entity: Social tenure relationship entity.
+        :type str_entity: SocialTenure
+        :param doc_link_column: Column of the supporting documents table
+        referencing the STR or None if STRs do not have documents.
+        :type doc_link_column: str
+        :param fk_references: Tuples containing the STR column, the
+        referenced table and column of each foreign key of the STR table.
+        :type fk_references: list
+        :param session: Session used to query the data, the shared session
+        is used if None. A separate session is required to load the data in
+        a worker thread.
+        :type session: Session
+        """
+        self._str_model = str_model
+        self._str_entity = str_entity
+        self._doc_link_column = doc_link_column
+        self._fk_references = fk_references
+        self._session = session
+
+        #Models of the related tables are mapped in the calling thread
+        self._ref_models = dict(
+            (mod_table, DeclareMapping.instance().tableMapping(mod_table))
+            for str_col, mod_table, mod_col in fk_references
+        )
+
+        self._str_reference = None
+        self._strs = ({}, False)
+        self._related = {}
+        self._documents = {}
+
+    @staticmethod
+    def _key(value, is_string):
+        #String references are compared ignoring the case
+        if is_string and not value is None:
+            return unicode(value).lower()
+
+        return value
+
+    def _records_by_value(self, model, column_name, values):
+        """
+        Queries the records whose column value is in the given values.
+        :return: Returns the records grouped by the column value and whether
+        the column is a string column.
+        :rtype: tuple
+        """
+        if model is None or not hasattr(model, column_name):
+            return {}, False
+
+        col_prop = getattr(model, column_name)
+        is_string = isinstance(col_prop.property.columns[0].type, String)
+
+        col_expr = func.lower(col_prop) if is_string else col_prop
+        values = list(set([self._key(v, is_string) for v in values
+                           if not v is None]))
+
+        records = {}
+        if self._session is None:
+            query_obj = model().queryObject()
+        else:
+            query_obj = self._session.query(model)
+
+        for i in range(0, len(values), _MAX_IN_VALUES):
+            results = query_obj.filter(
+                col_expr.in_(values[i:i + _MAX_IN_VALUES])
+            ).all()
+
+            for r in results:
+                key = self._key(getattr(r, column_name), is_string)
+                records.setdefault(key, []).append(r)
+
+        return records, is_string
+
+    @staticmethod
+    def _records(grouped_records, value):
+        records, is_string = grouped_records
+
+        return records.get(STRTreeLoader._key(value, is_string), [])
+
+    def load(self, records, data_source_name, str_reference=None):
+        """
+        Loads the tree data of the given records.
+        :param records: Records of the data source, STRs are loaded if the
+        data source is not the STR table.
+        :type records: list
+        :param data_source_name: Name of the table of the records.
+        :type data_source_name: str
+        :param str_reference: Tuple containing the column of the data source
+        and the column of the STR table referencing it, None if the records
+        are STRs.
+        :type str_reference: tuple
+        """
+        if str_reference is None:
+            self._str_reference = None
+            self._load_str_data(records, data_source_name)
+
+        else:
+            self.load_by_reference(
+                [getattr(r, str_reference[0], None) for r in records],
+                data_source_name,
+                str_reference
+            )
+
+    def load_by_reference(self, values, data_source_name, str_reference):
+        """
+        Loads the tree data of the records with the given values in the
+        column referenced by the STR table. The records themselves are not
+        accessed so that the data can be loaded in a worker thread.
+        :param values: Values of the referenced column of the records.
+        :type values: list
+        :param data_source_name: Name of the table of the records.
+        :type data_source_name: str
+        :param str_reference: Tuple containing the column of the data source
+        and the column of the STR table referencing it.
+        :type str_reference: tuple
+        """
+        self._str_reference = str_reference
+        self._strs = self._records_by_value(
+            self._str_model,
+            str_reference[1],
+            values
+        )
+
+        self._load_str_data(
+            [s for strs in self._strs[0].values() for s in strs],
+            data_source_name
+        )
+
+    def _load_str_data(self, str_models, data_source_name):
+        #Loads the related records and documents of the STRs
+        for str_col, mod_table, mod_col in self._fk_references:
+            if mod_table == data_source_name:
+                continue
+
+            self._related[str_col, mod_table] = self._records_by_value(
+                self._ref_models[mod_table],
+                mod_col,
+                [getattr(s, str_col, None) for s in str_models]
+            )
+
+        if not self._doc_link_column is None:
+            from stdm.data.supporting_documents import \
+                documents_by_link_value
+
+            self._documents = documents_by_link_value(
+                self._str_entity,
+                self._doc_link_column,
+                [getattr(s, 'id', None) for s in str_models],
+                self._session
+            )
+
+    def merge(self, session):
+        """
+        Adds the loaded records to the given session without querying the
+        database. Records loaded in a separate session are detached once it
+        is closed, they are merged into the shared session before creating
+        the nodes so that they can be edited.
+        :param session: Shared session.
+        :type session: Session
+        """
+        merge = lambda records: [session.merge(r, load=False)
+                                 for r in records]
+
+        self._strs = (
+            dict((k, merge(v)) for k, v in self._strs[0].iteritems()),
+            self._strs[1]
+        )
+
+        for key, (records, is_string) in self._related.items():
+            self._related[key] = (
+                dict((k, merge(v)) for k, v in records.iteritems()),
+                is_string
+            )
+
+        for docs in self._documents.values():
+            for doc_type, doc_models in docs.items():
+                docs[doc_type] = merge(doc_models)
+
+    def str_models(self, record):
+        """
+        :param record: Record of the data source.
+        :type record: object
+        :return: Returns the STRs related to the record.
+        :rtype: list
+        """
+        if self._str_reference is None:
+            return []
+
+        return self._records(
+            self._strs,
+            getattr(record, self._str_reference[0], None)
+        )
+
+    def related_models(self, str_model, str_column, table_name):
+        """
+        :param str_model: STR model.
+        :type str_model: object
+        :param str_column: Foreign key column of the STR table.
+        :type str_column: str
+        :param table_name: Table referenced by the column.
+        :type table_name: str
+        :return: Returns the records of the table referenced by the STR.
+        :rtype: list
+        """
+        grouped_records = self._related.get((str_column, table_name), None)
+        if grouped_records is None or not hasattr(str_model, str_column):
+            return []
+
+        return self._records(grouped_records, getattr(str_model, str_column))
+
+    def document_models(self, str_model):
+        """
+        :param str_model: STR model.
+        :type str_model: object
+        :return: Returns the supporting documents of the STR grouped by
+        document type.
+        :rtype: OrderedDict
+        """
+        if self._doc_link_column is None:
+            return []
+
+        return self._documents.get(getattr(str_model, 'id', None),
+                                   OrderedDict())
+
+class _STRTreeWorkerSignals(QObject):
+    """
+    Signals of the STR tree worker, QRunnable is not a QObject.
+    """
+    loaded = pyqtSignal(object)
+    error = pyqtSignal(unicode)
+
+
+class STRTreeWorker(QRunnable):
+    """
+    Loads the STR tree data of a record in a thread of the global thread
+    pool. The loader uses a separate database session, since the shared
+    STDMDb session is not thread-safe, which is closed once the data has
+    been loaded.
+    """
+    def __init__(self, loader, session, values, data_source_name,
+                 str_reference):
+        """
+        :param loader: Loader using the given session.
+        :type loader: STRTreeLoader
+        :param session: Separate session of the loader.
+        :type session: Session
+        :param values: Values of the column of the records referenced by
+        the STR table.
+        :type values: list
+        :param data_source_name: Name of the table of the records.
+        :type data_source_name: str
+        :param str_reference: Tuple containing the column of the data source
+        and the column of the STR table referencing it.
+        :type str_reference: tuple
+        """
+        QRunnable.__init__(self)
+        self.signals = _STRTreeWorkerSignals()
+        self._loader = loader
+        self._session = session
+        self._values = values
+        self._data_source_name = data_source_name
+        self._str_reference = str_reference
+
+    def run(self):
+        try:
+            self._loader.load_by_reference(
+                self._values,
+                self._data_source_name,
+                self._str_reference
+            )
+            self.signals.loaded.emit(self._loader)
+
+        except Exception as ex:
+            self.signals.error.emit(unicode(ex))
+
+        finally:
+            self._session.close()
+
+
 class STRNodeFormatter(object):
     """
     Base class for all STR formatters.
@@ -151,6 +460,13 @@ class EntityNodeFormatter(STRNodeFormatter):
         )
         self._spatial_data_sources = profile_spatial_tables(self.curr_profile).keys()
 
+        #Display columns of the related entities and value lists of the
+        #lookup columns, by name
+        self._entity_display_columns = {}
+        self._lookup_value_lists = {}
+
+        self._loader = None
+
     def _format_display_mapping(self, model, display_cols, filter_cols):
         """
         Creates a collection containing a tuple of column name and display
@@ -167,12 +483,56 @@ class EntityNodeFormatter(STRNodeFormatter):
                     else:
                         k = c, header
 
-                    disp_mapping[k] = lookup_id_to_value(
-                        self.curr_profile, c, getattr(model, c)
+                    disp_mapping[k] = self._lookup_value(
+                        c, getattr(model, c)
                     )
 
         return disp_mapping
 
+    def _lookup_value(self, column, id):
+        """
+        Converts a lookup id into its value like lookup_id_to_value but
+        using the lookup values in the reference data cache.
+        :param column: Column name.
+        :type column: str
+        :param id: Value of the column.
+        :type id: object
+        :return: Returns the lookup value or the id if the column is not a
+        lookup column or the lookup does not exist.
+        :rtype: object
+        """
+        if not column in self._lookup_value_lists:
+            value_list = None
+            if column in profile_lookup_columns(self.curr_profile):
+                value_list = lookup_parent_entity(self.curr_profile, column)
+
+            self._lookup_value_lists[column] = value_list
+
+        value_list = self._lookup_value_lists[column]
+        if value_list is None:
+            return id
+
+        lookups = ReferenceDataCache.instance().load_values(
+            value_list,
+            ('value', 'code'),
+            [id]
+        )
+
+        if not id in lookups:
+            return id
+
+        return lookups[id][0]
+
+    def _display_columns(self, table_name):
+        #Display columns of the entity with the given table name
+        if not table_name in self._entity_display_columns:
+            self._entity_display_columns[table_name] = \
+                entity_display_columns(
+                    self.curr_profile.entity_by_name(table_name), True
+                )
+
+        return self._entity_display_columns[table_name]
+
     def _foreign_key_reference_by_tablename(self, table_name):
         """
         :param table_name:
@@ -260,11 +620,30 @@ class EntityNodeFormatter(STRNodeFormatter):
         :rtype: list
         """
 
-        from stdm.data.supporting_documents import (
-            supporting_doc_tables,
-            document_models
+        from stdm.data.supporting_documents import document_models
+
+        doc_link_col = self._supporting_doc_link_column(entity_table)
+
+        if doc_link_col is None or not hasattr(model_obj, 'id'):
+            return []
+
+        return document_models(
+            self.curr_profile.social_tenure,
+            doc_link_col,
+            model_obj.id
         )
 
+    def _supporting_doc_link_column(self, entity_table):
+        """
+        :param entity_table: Name of the entity table.
+        :type entity_table: str
+        :return: Returns the column of the supporting documents table
+        referencing the entity table or None if the entity does not have
+        supporting documents.
+        :rtype: str
+        """
+        from stdm.data.supporting_documents import supporting_doc_tables
+
         #Only one document table per entity for now
         if entity_table in self._entity_supporting_doc_tables:
             doc_table_ref = self._entity_supporting_doc_tables[entity_table]
@@ -276,35 +655,178 @@ class EntityNodeFormatter(STRNodeFormatter):
                 self._entity_supporting_doc_tables[entity_table] = doc_table_ref
 
             else:
-                return []
+                return None
 
-        doc_link_col, doc_link_table = doc_table_ref[0], doc_table_ref[1]
+        return doc_table_ref[0]
 
-        if not hasattr(model_obj, 'id'):
-            return []
+    def load(self, records):
+        """
+        Loads the STRs, related entity records and supporting documents of
+        the given records with one query per table. The nodes of the
+        records are then created without querying the database.
+        :param records: Records of the data source.
+        :type records: list
+        """
+        str_reference = None
+        if self._config.data_source_name != self._str_ref:
+            str_reference = self._current_data_source_fk_ref
 
-        return document_models(
+        self._loader = self._new_loader()
+
+        #Records are not related to STRs
+        if self._config.data_source_name != self._str_ref and \
+                str_reference is None:
+            return
+
+        self._loader.load(
+            records,
+            self._config.data_source_name,
+            str_reference
+        )
+
+    def _new_loader(self, session=None):
+        #Creates a loader of the STR tree data
+        return STRTreeLoader(
+            self._str_model,
             self.curr_profile.social_tenure,
-            doc_link_col,
-            model_obj.id
+            self._supporting_doc_link_column(self._str_ref),
+            self._fk_references,
+            session
+        )
+
+    def _fetch_str_nodes(self, record, valid_str_ids, node, callback):
+        """
+        Loads the STRs of the record in a worker thread and adds their nodes
+        under the node of the record. Used as the children loader of the
+        record nodes when the tree is loaded lazily.
+        :param record: Record of the data source.
+        :type record: object
+        :param valid_str_ids: Ids of the STRs within the validity period or
+        None if no validity period is specified.
+        :type valid_str_ids: list
+        :param node: Node of the record.
+        :type node: BaseSTRNode
+        :param callback: Callable invoked once the nodes have been added.
+        :type callback: callable
+        """
+        if self._current_data_source_fk_ref is None:
+            self._add_str_nodes(node, [], valid_str_ids)
+            callback()
+
+            return
+
+        session = sessionmaker(bind=STDMDb.instance().engine)()
+        ent_col = self._current_data_source_fk_ref[0]
+
+        worker = STRTreeWorker(
+            self._new_loader(session),
+            session,
+            [getattr(record, ent_col, None)],
+            self._config.data_source_name,
+            self._current_data_source_fk_ref
+        )
+        worker.signals.loaded.connect(
+            lambda loader: self._on_str_data_loaded(
+                loader, record, valid_str_ids, node, callback
+            )
+        )
+        worker.signals.error.connect(
+            lambda msg: self._on_str_data_error(
+                msg, record, valid_str_ids, node
+            )
+        )
+
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_str_data_loaded(self, loader, record, valid_str_ids, node,
+                            callback):
+        #Slot raised when the worker has loaded the STRs of the record
+        loader.merge(STDMDb.instance().session)
+
+        self._add_str_nodes(
+            node,
+            loader.str_models(record),
+            valid_str_ids,
+            loader
+        )
+        callback()
+
+    def _on_str_data_error(self, message, record, valid_str_ids, node):
+        #STRs are loaded again the next time the node is expanded
+        LOGGER.debug('STRs could not be loaded: %s', message)
+
+        node.set_children_loader(
+            partial(self._fetch_str_nodes, record, valid_str_ids)
         )
 
-    def _create_str_node(self, parent_node, str_model, **kwargs):
+    def _add_str_nodes(self, entity_node, str_entities, valid_str_ids,
+                       loader=None):
+        """
+        Adds the nodes of the STRs of a record under the node of the record.
+        :param entity_node: Node of the record.
+        :type entity_node: BaseSTRNode
+        :param str_entities: STRs of the record.
+        :type str_entities: list
+        :param valid_str_ids: Ids of the STRs within the validity period or
+        None if no validity period is specified.
+        :type valid_str_ids: list
+        :param loader: Loader containing the data of the STRs.
+        :type loader: STRTreeLoader
+        """
+        #Show no STR
+        if len(str_entities) == 0:
+            no_str_node = NoSTRNode(entity_node)
+
+        else:
+            for s in str_entities:
+                # if no validity period is specified
+                if valid_str_ids is None:
+
+                    str_node = self._create_str_node(
+                        entity_node, s,
+                        loader=loader,
+                        isChild=True,
+                        header=self._str_title
+                    )
+                # if validity period is specified
+                else:
+                    # the str is within the validity period specified
+                    if s.id in valid_str_ids:
+                        str_node = self._create_str_node(
+                            entity_node, s,
+                            loader=loader,
+                            isChild=True,
+                            header=self._str_title
+                        )
+                    # if the str is not valid, show invalid STR
+                    else:
+                        no_str_node = InvalidSTRNode(entity_node)
+
+    def _create_str_node(self, parent_node, str_model, loader=None,
+                         **kwargs):
         """
         Creates an STR Node and corresponding child nodes (from related
         entities).
         :param parent_node: Parent node
         :param str_model: STR model
+        :param loader: Loader containing the data of the STR, the loader of
+        the result set is used if None.
+        :type loader: STRTreeLoader
         :param kwargs: Optional arguments to be passed to the STR node.
         :return: STR Node
         :rtype: STRNode
         """
+        if loader is None:
+            loader = self._loader
 
         display_mapping = self._format_display_mapping(str_model,
                                                       self._str_model_disp_mapping,
                                                       self._str_num_char_cols)
 
-        doc_models = self._supporting_doc_models(self._str_ref, str_model)
+        if loader is None:
+            doc_models = self._supporting_doc_models(self._str_ref, str_model)
+        else:
+            doc_models = loader.document_models(str_model)
 
         str_node = STRNode(display_mapping, parent=parent_node,
                            document_models=doc_models,
@@ -317,11 +839,16 @@ class EntityNodeFormatter(STRNodeFormatter):
             if mod_table != self._config.data_source_name:
                 mod_fk_ref = mod_col, mod_table, str_col
 
-                r_entities = self._models_from_fk_reference(str_model, str_col,
-                                                            mod_table, mod_col)
-                curr_entity = self.curr_profile.entity_by_name(mod_table)
+                if loader is None:
+                    r_entities = self._models_from_fk_reference(
+                        str_model, str_col, mod_table, mod_col
+                    )
+                else:
+                    r_entities = loader.related_models(
+                        str_model, str_col, mod_table
+                    )
 
-                col_name_header = entity_display_columns(curr_entity, True)
+                col_name_header = self._display_columns(mod_table)
 
                 for r in r_entities:
                     dm = self._format_display_mapping(r,
@@ -407,16 +934,29 @@ class EntityNodeFormatter(STRNodeFormatter):
         else:
             return EntityNode
 
-    def root(self, valid_str_ids=None):
+    @traced('EntityNodeFormatter.root', 'navigation')
+    def root(self, valid_str_ids=None, lazy=False):
         """
         Root method shows the different tree nodes based on data.
 
         :param valid_str_ids: List of valid str nodes
         within the validity period.
         :type valid_str_ids: List
+        :param lazy: True to only create the nodes of the records, the STR
+        nodes of a record are then loaded in a worker thread when its node
+        is expanded. Not applicable if the data source is the STR table.
+        :type lazy: bool
         :return:
         :rtype:
         """
+        lazy = lazy and self._config.data_source_name != self._str_ref
+
+        #Data of all the records is loaded before creating the nodes
+        if lazy:
+            self._loader = None
+        else:
+            self.load(self._data)
+
         for ed in self._data:
             disp_mapping = self._format_display_mapping(ed,
                                                         self._config.displayColumns,
@@ -428,34 +968,18 @@ class EntityNodeFormatter(STRNodeFormatter):
                 node = self._spatial_textual_node(self._config.data_source_name)
                 entity_node = node(disp_mapping, parent=self.rootNode,
                                    model=ed)
-                str_entities = self._related_str_models(ed)
 
-                #Show no STR
-                if len(str_entities) == 0:
-                    no_str_node = NoSTRNode(entity_node)
+                if lazy:
+                    entity_node.set_children_loader(
+                        partial(self._fetch_str_nodes, ed, valid_str_ids)
+                    )
 
                 else:
-                    for s in str_entities:
-                        # if no validity period is specified
-                        if valid_str_ids is None:
-
-                            str_node = self._create_str_node(
-                                entity_node, s,
-                                isChild=True,
-                                header=self._str_title
-                            )
-                        # if validity period is specified
-                        else:
-                            # the str is within the validity period specified
-                            if s.id in valid_str_ids:
-                                str_node = self._create_str_node(
-                                    entity_node, s,
-                                    isChild=True,
-                                    header=self._str_title
-                                )
-                            # if the str is not valid, show invalid STR
-                            else:
-                                no_str_node = InvalidSTRNode(entity_node)
+                    self._add_str_nodes(
+                        entity_node,
+                        self._loader.str_models(ed),
+                        valid_str_ids
+                    )
 
             else:
                 # The parent node now refers to STR data so we render accordingly
@@ -66,6 +66,7 @@ class BaseSTRNode(object):
         self._view = view
         self._parentWidget = parentWidget
         self._model = model
+        self._children_loader = None
 
         if parent is not None:
             parent.addChild(self)
@@ -164,6 +165,42 @@ class BaseSTRNode(object):
         '''
         return self._children
 
+    def set_children_loader(self, loader):
+        """
+        Sets the callable which loads the children of the node the first
+        time it is expanded. The loader is invoked with the node and a
+        callable which must be invoked once the children have been added.
+        :param loader: Children loader or None if the node has no children
+        to load.
+        :type loader: callable
+        """
+        self._children_loader = loader
+
+    def canFetchChildren(self):
+        '''
+        True if the children of the node have not been loaded yet.
+        '''
+        return not self._children_loader is None
+
+    def fetchChildren(self, callback):
+        '''
+        Loads the children of the node using the children loader, which is
+        only invoked once.
+        '''
+        loader = self._children_loader
+        if loader is None:
+            return
+
+        self._children_loader = None
+        loader(self, callback)
+
+    def hasChildren(self):
+        '''
+        True if the node has children or children which have not been loaded
+        yet.
+        '''
+        return len(self._children) > 0 or self.canFetchChildren()
+
     def hasParent(self):
         '''
         True if the node has a parent. Otherwise returns False.
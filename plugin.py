@@ -37,6 +37,8 @@ from stdm.data.configuration.exception import ConfigurationException
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.settings.config_file_updater import ConfigurationFileUpdater
 from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
+from stdm.data.configuration.model_registry import EntityModelRegistry
+from stdm.data.reference_cache import ReferenceDataCache
 
 from stdm.ui.change_pwd_dlg import changePwdDlg
 from stdm.ui.doc_generator_dlg import (
@@ -61,6 +63,18 @@ from stdm.ui.wizard.wizard import ConfigWizard
 
 from stdm.ui.import_data import ImportData
 from stdm.ui.export_data import ExportData
+from stdm.data.tracing import Tracer
+from stdm.ui.query_stats_dialog import QueryStatisticsDialog
+from stdm.ui.database_backup import (
+    apply_changes_backup,
+    create_changes_backup,
+    create_database_backup,
+    restore_database_backup
+)
+from stdm.ui.profile_snapshot import (
+    export_profile_snapshot,
+    import_profile_snapshot
+)
 
 from stdm.ui.spatial_unit_manager import SpatialUnitManagerDockWidget
 
@@ -190,6 +204,9 @@ class STDMQGISLoader(object):
         QApplication.translate("STDMQGISLoader","Help Contents"), self.iface.mainWindow(),
         "7A61CEA9-2A64-45F6-A40F-D83987D416EB")
         self.helpAct.setShortcut(Qt.Key_F10)
+        self.queryStatsAct = STDMAction(QIcon(":/plugins/stdm/images/icons/chart.png"),
+        QApplication.translate("STDMQGISLoader","Query Statistics"), self.iface.mainWindow(),
+        "5D0B7E3A-2C91-4F68-B4A7-9E13C6F8D052")
 
         # connect the actions to their respective methods
         self.loginAct.triggered.connect(self.login)
@@ -197,6 +214,7 @@ class STDMQGISLoader(object):
         self.logoutAct.triggered.connect(self.logout)
         self.aboutAct.triggered.connect(self.about)
         self.helpAct.triggered.connect(self.help_contents)
+        self.queryStatsAct.triggered.connect(self.query_statistics)
         self.initToolbar()
         self.initMenuItems()
 
@@ -255,6 +273,7 @@ class STDMQGISLoader(object):
     def initMenuItems(self):
         self.stdmMenu.addAction(self.loginAct)
         self.stdmMenu.addSeparator()
+        self.stdmMenu.addAction(self.queryStatsAct)
         self.stdmMenu.addAction(self.helpAct)
         self.stdmMenu.addAction(self.aboutAct)
 
@@ -263,6 +282,8 @@ class STDMQGISLoader(object):
         del self.stdmInitToolbar
         # Remove connection info
         self.logoutCleanUp()
+        # Complete the trace file of the session
+        Tracer.instance().close()
 
     def login(self):
         '''
@@ -803,6 +824,54 @@ class STDMQGISLoader(object):
         self.exportAct = QAction(QIcon(":/plugins/stdm/images/icons/export.png"), \
         QApplication.translate("ReportBuilderAction","Export Data"), self.iface.mainWindow())
 
+        self.snapshotExportAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/export.png"),
+            QApplication.translate(
+                "SnapshotExportAction", "Export Profile Snapshot"
+            ),
+            self.iface.mainWindow()
+        )
+
+        self.snapshotImportAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/import.png"),
+            QApplication.translate(
+                "SnapshotImportAction", "Import Profile Snapshot"
+            ),
+            self.iface.mainWindow()
+        )
+
+        self.dbBackupAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/export.png"),
+            QApplication.translate(
+                "DatabaseBackupAction", "Backup Database"
+            ),
+            self.iface.mainWindow()
+        )
+
+        self.dbRestoreAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/import.png"),
+            QApplication.translate(
+                "DatabaseRestoreAction", "Restore Database"
+            ),
+            self.iface.mainWindow()
+        )
+
+        self.changesBackupAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/export.png"),
+            QApplication.translate(
+                "ChangesBackupAction", "Backup Database Changes"
+            ),
+            self.iface.mainWindow()
+        )
+
+        self.changesApplyAct = QAction(
+            QIcon(":/plugins/stdm/images/icons/import.png"),
+            QApplication.translate(
+                "ChangesApplyAction", "Apply Database Changes"
+            ),
+            self.iface.mainWindow()
+        )
+
         self.docDesignerAct = QAction(QIcon(":/plugins/stdm/images/icons/cert_designer.png"), \
         QApplication.translate("DocumentDesignerAction","Document Designer"), self.iface.mainWindow())
 
@@ -840,6 +909,12 @@ class STDMQGISLoader(object):
         self.manageAdminUnitsAct.triggered.connect(self.onManageAdminUnits)
         self.exportAct.triggered.connect(self.onExportData)
         self.importAct.triggered.connect(self.onImportData)
+        self.snapshotExportAct.triggered.connect(self.onExportSnapshot)
+        self.snapshotImportAct.triggered.connect(self.onImportSnapshot)
+        self.dbBackupAct.triggered.connect(self.onBackupDatabase)
+        self.dbRestoreAct.triggered.connect(self.onRestoreDatabase)
+        self.changesBackupAct.triggered.connect(self.onBackupChanges)
+        self.changesApplyAct.triggered.connect(self.onApplyChanges)
         self.docDesignerAct.triggered.connect(self.onDocumentDesigner)
         self.docGeneratorAct.triggered.connect(self.onDocumentGenerator)
         self.spatialLayerManager.triggered.connect(self.spatialLayerMangerActivate)
@@ -872,6 +947,32 @@ class STDMQGISLoader(object):
         exportCnt = ContentGroup.contentItemFromQAction(self.exportAct)
         exportCnt.code = "D0C34436-619D-434E-928C-2CBBDA79C060"
 
+        snapshotExportCnt = ContentGroup.contentItemFromQAction(
+            self.snapshotExportAct
+        )
+        snapshotExportCnt.code = "6E1A4F0B-93C7-4D2E-A8B1-5F2C7D90E341"
+
+        snapshotImportCnt = ContentGroup.contentItemFromQAction(
+            self.snapshotImportAct
+        )
+        snapshotImportCnt.code = "B3D85C27-1F64-4A9E-9C0D-7E4A2B61F58C"
+
+        dbBackupCnt = ContentGroup.contentItemFromQAction(self.dbBackupAct)
+        dbBackupCnt.code = "9A2F6C41-58D3-4E07-B1C9-3E8D5F0A7B26"
+
+        dbRestoreCnt = ContentGroup.contentItemFromQAction(self.dbRestoreAct)
+        dbRestoreCnt.code = "C7E04B95-2D1A-4F68-8E3B-61A9D4F2C805"
+
+        changesBackupCnt = ContentGroup.contentItemFromQAction(
+            self.changesBackupAct
+        )
+        changesBackupCnt.code = "4E6B1D93-A7C2-4F05-8B3E-D91F26C7A540"
+
+        changesApplyCnt = ContentGroup.contentItemFromQAction(
+            self.changesApplyAct
+        )
+        changesApplyCnt.code = "E81C5A2F-3B94-4D6E-A0F7-5C29B8D31E67"
+
         documentDesignerCnt = ContentGroup.contentItemFromQAction(self.docDesignerAct)
         documentDesignerCnt.code = "C4826C19-2AE3-486E-9FF0-32C00A0A517F"
 
@@ -996,6 +1097,38 @@ class STDMQGISLoader(object):
         self.exportCntGroup.addContentItem(exportCnt)
         self.exportCntGroup.register()
 
+        self.snapshotExportCntGroup = ContentGroup(
+            username, self.snapshotExportAct
+        )
+        self.snapshotExportCntGroup.addContentItem(snapshotExportCnt)
+        self.snapshotExportCntGroup.register()
+
+        self.snapshotImportCntGroup = ContentGroup(
+            username, self.snapshotImportAct
+        )
+        self.snapshotImportCntGroup.addContentItem(snapshotImportCnt)
+        self.snapshotImportCntGroup.register()
+
+        self.dbBackupCntGroup = ContentGroup(username, self.dbBackupAct)
+        self.dbBackupCntGroup.addContentItem(dbBackupCnt)
+        self.dbBackupCntGroup.register()
+
+        self.dbRestoreCntGroup = ContentGroup(username, self.dbRestoreAct)
+        self.dbRestoreCntGroup.addContentItem(dbRestoreCnt)
+        self.dbRestoreCntGroup.register()
+
+        self.changesBackupCntGroup = ContentGroup(
+            username, self.changesBackupAct
+        )
+        self.changesBackupCntGroup.addContentItem(changesBackupCnt)
+        self.changesBackupCntGroup.register()
+
+        self.changesApplyCntGroup = ContentGroup(
+            username, self.changesApplyAct
+        )
+        self.changesApplyCntGroup.addContentItem(changesApplyCnt)
+        self.changesApplyCntGroup.register()
+
         # Add Design Forms menu and tool bar actions
         self.toolbarLoader.addContent(self.wzdConfigCntGroup)
         self.menubarLoader.addContent(self.wzdConfigCntGroup)
@@ -1031,6 +1164,16 @@ class STDMQGISLoader(object):
         self.toolbarLoader.addContent(self.exportCntGroup)
         self.menubarLoader.addContent(self.exportCntGroup)
 
+        #Profile snapshots are only available in the menu
+        self.menubarLoader.addContent(self.snapshotExportCntGroup)
+        self.menubarLoader.addContent(self.snapshotImportCntGroup)
+
+        #Database backups are only available in the menu
+        self.menubarLoader.addContent(self.dbBackupCntGroup)
+        self.menubarLoader.addContent(self.dbRestoreCntGroup)
+        self.menubarLoader.addContent(self.changesBackupCntGroup)
+        self.menubarLoader.addContent(self.changesApplyCntGroup)
+
         self.menubarLoader.addContent(self._action_separator())
         self.toolbarLoader.addContent(self._action_separator())
 
@@ -1523,6 +1666,51 @@ class STDMQGISLoader(object):
         exportData = ExportData(self.iface.mainWindow())
         exportData.exec_()
 
+    def onExportSnapshot(self):
+        """
+        Export the tables of the current profile to a GeoPackage.
+        """
+        if self.current_profile is None:
+            self.default_profile()
+            return
+
+        export_profile_snapshot(self.iface.mainWindow(), self.current_profile)
+
+    def onImportSnapshot(self):
+        """
+        Load a GeoPackage snapshot into the tables of the current profile.
+        """
+        if self.current_profile is None:
+            self.default_profile()
+            return
+
+        import_profile_snapshot(self.iface.mainWindow(), self.current_profile)
+
+    def onBackupDatabase(self):
+        """
+        Back up the tables of the STDM database.
+        """
+        create_database_backup(self.iface.mainWindow())
+
+    def onRestoreDatabase(self):
+        """
+        Restore the tables of the STDM database from a backup.
+        """
+        restore_database_backup(self.iface.mainWindow())
+
+    def onBackupChanges(self):
+        """
+        Back up the changes in the tracked tables since the most recent
+        backup.
+        """
+        create_changes_backup(self.iface.mainWindow())
+
+    def onApplyChanges(self):
+        """
+        Apply an incremental backup to the tables of the STDM database.
+        """
+        apply_changes_backup(self.iface.mainWindow())
+
     def onToggleSpatialUnitManger(self,toggled):
         '''
         Slot raised on toggling to activate/deactivate
@@ -1623,6 +1811,13 @@ class STDMQGISLoader(object):
             finally:
                 STDMDb.instance().session.rollback()
 
+    def query_statistics(self):
+        """
+        Show the queries executed by the recent actions.
+        """
+        stats_dlg = QueryStatisticsDialog(self.iface.mainWindow())
+        stats_dlg.exec_()
+
     def about(self):
         """
         STDM Description
@@ -1725,6 +1920,8 @@ class STDMQGISLoader(object):
                 if not data.app_dbconn is None:
                     STDMDb.cleanUp()
                     DeclareMapping.cleanUp()
+                    EntityModelRegistry.instance().clear()
+                    ReferenceDataCache.instance().clear()
                 #Remove database reference
                 data.app_dbconn = None
             else:
@@ -37,10 +37,19 @@ def save_current_profile(name):
     if not name:
         return
 
+    from stdm.data.configuration.model_registry import EntityModelRegistry
+    from stdm.data.reference_cache import ReferenceDataCache
+
     #Save profile in the registry/settings
     reg_config = RegistryConfig()
+    prev_profile = reg_config.read([CURRENT_PROFILE]).get(CURRENT_PROFILE, '')
     reg_config.write({CURRENT_PROFILE: name})
 
+    #Discard cached models of the profile that has been switched from
+    if prev_profile and unicode(prev_profile) != unicode(name):
+        EntityModelRegistry.instance().invalidate_profile(prev_profile)
+        ReferenceDataCache.instance().invalidate_profile(prev_profile)
+
 def save_configuration():
     """
     A util method for saving the configuration instance to the default
@@ -18,55 +18,722 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
-import csv
+import gzip
+import hashlib
+import json
+import logging
 import os
-import sys
-
-import stat
 
 import datetime
+from multiprocessing.pool import ThreadPool
+
+import psycopg2
 from PyQt4.QtGui import QDesktopServices
-from sqlalchemy.sql.expression import text
 
-from sqlalchemy import MetaData
-from stdm.data.pg_utils import _execute, pg_views, pg_tables
+from stdm.data.change_tracking import (
+    CHANGELOG_TABLE,
+    cursor_changelog_exists,
+    cursor_watermark,
+    net_changes
+)
+from stdm.data.database import STDMDb
+from stdm.data.pg_utils import (
+    catalog_snapshot,
+    pg_tables,
+    table_dependency_order
+)
+
+LOGGER = logging.getLogger('stdm')
 
 home = QDesktopServices.storageLocation(
             QDesktopServices.HomeLocation
         )
 
+#Default directory of the database backup
+BACKUP_DIR = '{}/.stdm/db_backup'.format(home)
+
+MANIFEST_FILE = 'manifest.json'
+
+#Records the change watermark of the most recent backup
+WATERMARK_FILE = 'watermark.json'
+
+#Subdirectory of the incremental backups
+DELTA_DIR = 'deltas'
+
+#Default number of tables backed up at the same time
+DEFAULT_BACKUP_WORKERS = 4
+
+#Compression level of the backup files, favours speed over size
+COMPRESS_LEVEL = 6
+
+_BACKUP_FILE_EXT = '.copy.gz'
+
+
+class BackupError(Exception):
+    """
+    Raised when a backup cannot be created or restored.
+    """
+    pass
+
+
+class _ChecksumFile(object):
+    """
+    Wraps a file object and computes the SHA-256 checksum, size and number
+    of rows of the data in the COPY text format written to or read from it.
+    """
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._sha = hashlib.sha256()
+        self.size = 0
+        self.rows = 0
+
+    def _update(self, data):
+        self._sha.update(data)
+        self.size += len(data)
+
+        #Line breaks in values are escaped hence each line is a row
+        self.rows += data.count('\n')
+
+    def write(self, data):
+        self._update(data)
+        self._file.write(data)
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._update(data)
+
+        return data
+
+    @property
+    def checksum(self):
+        return self._sha.hexdigest()
+
+
+class DatabaseBackup(object):
+    """
+    Backs up and restores the tables of the STDM database using client-side
+    'COPY ... TO STDOUT' and 'COPY ... FROM STDIN' through psycopg2, hence
+    the database server can be on a different machine. Each table is
+    streamed into a gzip-compressed file and a manifest with the row count
+    and checksum of each table is written once all the tables have been
+    backed up.
+    Tables are backed up in parallel on separate connections which share
+    the same transaction snapshot so that the backup is consistent. They are
+    restored in foreign key dependency order in a single transaction.
+    Each backup records the transaction snapshot watermark of its data and
+    an incremental backup only contains the rows changed in the tracked
+    tables by transactions from the previous watermark onwards. Rows changed
+    by transactions that were still in progress are included in the next
+    incremental backup. Incremental backups can be applied to another
+    database to synchronize it.
+    """
+    def __init__(self, backup_dir=BACKUP_DIR, workers=DEFAULT_BACKUP_WORKERS,
+                 engine=None):
+        self.backup_dir = backup_dir
+        self.workers = max(1, workers)
+
+        if engine is None:
+            engine = STDMDb.instance().engine
+        self._engine = engine
+
+    @property
+    def manifest_path(self):
+        """
+        :return: Returns the path of the manifest file.
+        :rtype: str
+        """
+        return os.path.join(self.backup_dir, MANIFEST_FILE)
+
+    def _table_path(self, table, directory=None):
+        if directory is None:
+            directory = self.backup_dir
+
+        return os.path.join(directory, table + _BACKUP_FILE_EXT)
+
+    def manifest(self, directory=None):
+        """
+        :param directory: Directory of an incremental backup, defaults to
+        the directory of the full backup.
+        :type directory: str
+        :return: Returns the manifest of the existing backup.
+        :rtype: dict
+        """
+        if directory is None:
+            directory = self.backup_dir
+
+        path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise BackupError('No backup found in {0}.'.format(directory))
+
+        with open(path, 'rb') as f:
+            return json.load(f)
+
+    def _write_manifest(self, directory, manifest):
+        with open(os.path.join(directory, MANIFEST_FILE), 'wb') as f:
+            json.dump(manifest, f, indent=2)
+
+    def watermark(self):
+        """
+        :return: Returns the transaction snapshot watermark recorded by the
+        most recent full or incremental backup.
+        :rtype: int
+        """
+        path = os.path.join(self.backup_dir, WATERMARK_FILE)
+        if not os.path.exists(path):
+            raise BackupError(
+                'No change watermark found in {0}, a full backup is '
+                'required first.'.format(self.backup_dir)
+            )
+
+        with open(path, 'rb') as f:
+            return json.load(f)['watermark']
+
+    def _record_watermark(self, watermark):
+        path = os.path.join(self.backup_dir, WATERMARK_FILE)
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            json.dump({'watermark': watermark}, f)
+
+        #Rename is not atomic on Windows if the file exists
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+    def delta_dirs(self):
+        """
+        :return: Returns the directories of the incremental backups in the
+        order in which they should be applied.
+        :rtype: list
+        """
+        root = os.path.join(self.backup_dir, DELTA_DIR)
+        if not os.path.isdir(root):
+            return []
+
+        return [os.path.join(root, d) for d in sorted(os.listdir(root))
+                if os.path.exists(os.path.join(root, d, MANIFEST_FILE))]
+
+    def backup(self, tables=None, progress_callback=None):
+        """
+        Backs up the given tables, any previous backup in the directory is
+        replaced.
+        :param tables: Names of the tables, defaults to all the tables in
+        the public schema.
+        :type tables: list
+        :param progress_callback: Callable which is invoked with the table
+        name, the number of tables backed up and the total number of tables
+        after each table is backed up.
+        :type progress_callback: callable
+        :return: Returns the manifest of the backup.
+        :rtype: dict
+        """
+        if tables is None:
+            tables = pg_tables()
+
+        if not os.path.isdir(self.backup_dir):
+            os.makedirs(self.backup_dir)
+
+        #An incomplete backup should not have a manifest
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+        #Keeps the snapshot exported to the workers open during the backup
+        snapshot_conn = self._engine.raw_connection()
+
+        try:
+            snapshot_id = self._export_snapshot(snapshot_conn)
+
+            #Changes by transactions in progress when the snapshot was taken
+            #are left to the next incremental backup
+            cursor = snapshot_conn.cursor()
+            watermark = cursor_watermark(cursor)
+            cursor.close()
+
+            tasks = [(t, snapshot_id) for t in tables]
+            pool = ThreadPool(min(self.workers, max(1, len(tasks))))
+
+            entries = {}
+
+            try:
+                for entry in pool.imap_unordered(self._backup_table_task,
+                                                 tasks):
+                    entries[entry['table']] = entry
+
+                    if not progress_callback is None:
+                        progress_callback(entry['table'], len(entries),
+                                          len(tasks))
+
+            finally:
+                pool.close()
+                pool.join()
+
+        finally:
+            snapshot_conn.rollback()
+            snapshot_conn.close()
+
+        manifest = {
+            'created': datetime.datetime.now().isoformat(),
+            'format': 'postgresql-copy-text',
+            'compression': 'gzip',
+            'watermark': watermark,
+            'tables': [entries[t] for t in table_dependency_order(tables)]
+        }
+
+        self._write_manifest(self.backup_dir, manifest)
+        self._record_watermark(watermark)
+
+        return manifest
+
+    def _export_snapshot(self, conn):
+        #Snapshot shared by the worker connections, PostgreSQL 9.2+
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY'
+            )
+            cursor.execute('SELECT pg_export_snapshot()')
+
+            return cursor.fetchone()[0]
+
+        except psycopg2.Error as db_error:
+            LOGGER.debug(u'Backup snapshot not exported: %s',
+                         unicode(db_error))
+            conn.rollback()
+
+            return None
+
+        finally:
+            cursor.close()
+
+    def _backup_table_task(self, task):
+        table, snapshot_id = task
+
+        return self.backup_table(table, snapshot_id)
+
+    def backup_table(self, table, snapshot_id=None):
+        """
+        Streams the rows of the table into a compressed file.
+        :param table: Name of the table.
+        :type table: str
+        :param snapshot_id: Id of an exported transaction snapshot to use.
+        :type snapshot_id: str
+        :return: Returns the manifest entry of the table.
+        :rtype: dict
+        """
+        columns = catalog_snapshot().column_types(table).keys()
+        column_list = ', '.join(['"{0}"'.format(c) for c in columns])
+        sql = 'COPY {0} ({1}) TO STDOUT'.format(table, column_list)
+
+        path = self._table_path(table)
+        conn = self._engine.raw_connection()
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY'
+            )
+            if not snapshot_id is None:
+                cursor.execute('SET TRANSACTION SNAPSHOT %s', (snapshot_id,))
+
+            entry = self._copy_to_file(cursor, sql, path)
+            cursor.close()
+
+        finally:
+            conn.rollback()
+            conn.close()
+
+        entry['table'] = table
+        entry['columns'] = columns
+
+        return entry
+
+    def _copy_to_file(self, cursor, sql, path):
+        #Streams the output of a 'COPY ... TO STDOUT' statement
+        with gzip.open(path, 'wb', COMPRESS_LEVEL) as gz_file:
+            out_file = _ChecksumFile(gz_file)
+            cursor.copy_expert(sql, out_file)
+
+        return {
+            'file': os.path.basename(path),
+            'rows': out_file.rows,
+            'size': out_file.size,
+            'sha256': out_file.checksum
+        }
+
+    def backup_changes(self, since=None, progress_callback=None):
+        """
+        Backs up the rows inserted, updated or deleted in the tracked tables
+        by the transactions from the given watermark up to the watermark of
+        the current snapshot into a new subdirectory of the backup
+        directory. Only the current values of the inserted or updated rows
+        and the ids of the deleted rows are backed up.
+        :param since: Watermark of the changes already backed up, defaults
+        to the watermark of the most recent backup.
+        :type since: int
+        :param progress_callback: Callable which is invoked with the table
+        name, the number of tables backed up and the total number of tables
+        after each table is backed up.
+        :type progress_callback: callable
+        :return: Returns the manifest of the incremental backup or None if
+        there are no changes.
+        :rtype: dict
+        """
+        if since is None:
+            since = self.watermark()
+
+        existing_tables = set(pg_tables())
+        conn = self._engine.raw_connection()
+        entries = {}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY'
+            )
+
+            if not cursor_changelog_exists(cursor):
+                return None
+
+            until = cursor_watermark(cursor)
+            if until <= since:
+                return None
+
+            changes = net_changes(cursor, since, until)
+            if len(changes) == 0:
+                return None
+
+            delta_dir = os.path.join(
+                self.backup_dir, DELTA_DIR, '{0:012d}'.format(until)
+            )
+            if not os.path.isdir(delta_dir):
+                os.makedirs(delta_dir)
+
+            #Changes in dropped tables cannot be applied
+            tables = [t for t in changes if t in existing_tables]
+
+            for table in tables:
+                upserted, deleted = changes[table]
+                entry = self._backup_table_changes(
+                    cursor, delta_dir, table, since, until, len(upserted) > 0
+                )
+                entry['deleted'] = deleted
+                entries[table] = entry
+
+                if not progress_callback is None:
+                    progress_callback(table, len(entries), len(tables))
+
+            cursor.close()
+
+        finally:
+            conn.rollback()
+            conn.close()
+
+        manifest = {
+            'created': datetime.datetime.now().isoformat(),
+            'format': 'postgresql-copy-text',
+            'compression': 'gzip',
+            'since': since,
+            'until': until,
+            'tables': [entries[t] for t in
+                       table_dependency_order(entries.keys())]
+        }
+
+        self._write_manifest(delta_dir, manifest)
+        self._record_watermark(until)
+
+        return manifest
+
+    def _backup_table_changes(self, cursor, delta_dir, table, since, until,
+                              has_upserts):
+        columns = catalog_snapshot().column_types(table).keys()
+        entry = {
+            'table': table,
+            'columns': columns,
+            'file': None,
+            'rows': 0
+        }
+
+        if not has_upserts:
+            return entry
+
+        #Deleted rows are not visible in the snapshot hence are left out
+        column_list = ', '.join(['"{0}"'.format(c) for c in columns])
+        sql = (
+            'COPY (SELECT {0} FROM {1} WHERE id IN (SELECT row_id FROM {2} '
+            'WHERE table_name = {3} AND txid >= {4:d} AND '
+            'txid < {5:d})) TO STDOUT'
+        ).format(
+            column_list,
+            table,
+            CHANGELOG_TABLE,
+            cursor.mogrify('%s', (table,)),
+            since,
+            until
+        )
+
+        entry.update(
+            self._copy_to_file(cursor, sql, self._table_path(table, delta_dir))
+        )
+
+        return entry
+
+    def apply_changes(self, delta_dir, progress_callback=None):
+        """
+        Applies an incremental backup in a single transaction. Inserted or
+        updated rows are upserted in foreign key dependency order, then the
+        deleted rows are removed in the reverse order. Incremental backups
+        should be applied in the order in which they were created.
+        :param delta_dir: Directory of the incremental backup.
+        :type delta_dir: str
+        :param progress_callback: Callable which is invoked with the table
+        name, the number of tables applied and the total number of tables
+        after the rows of each table are upserted.
+        :type progress_callback: callable
+        :return: Returns a tuple with the number of rows upserted and
+        deleted in each table.
+        :rtype: dict
+        """
+        entries = dict(
+            (e['table'], e) for e in self.manifest(delta_dir)['tables']
+        )
+        tables = table_dependency_order(entries.keys())
+
+        conn = self._engine.raw_connection()
+        applied = {}
+
+        try:
+            cursor = conn.cursor()
+
+            for table in tables:
+                entry = entries[table]
+                upserted = 0
+                if not entry['file'] is None:
+                    upserted = self._upsert_table(cursor, delta_dir, entry)
+
+                applied[table] = (upserted, len(entry['deleted']))
+
+                if not progress_callback is None:
+                    progress_callback(table, len(applied), len(tables))
+
+            for table in reversed(tables):
+                deleted = entries[table]['deleted']
+                if len(deleted) > 0:
+                    cursor.execute(
+                        'DELETE FROM {0} WHERE id = ANY(%s)'.format(table),
+                        (deleted,)
+                    )
+
+            for table in tables:
+                self._fix_sequence(cursor, table)
+
+            conn.commit()
+            cursor.close()
+
+        except:
+            conn.rollback()
+            raise
+
+        finally:
+            conn.close()
+
+        return applied
+
+    def _upsert_table(self, cursor, delta_dir, entry):
+        table = entry['table']
+        columns = ['"{0}"'.format(c) for c in entry['columns']]
+        column_list = ', '.join(columns)
+
+        #Stage the rows then merge them with the existing rows by id
+        cursor.execute(
+            'CREATE TEMP TABLE stdm_delta (LIKE {0}) ON COMMIT DROP'.format(
+                table
+            )
+        )
+        self._copy_from_file(
+            cursor,
+            'stdm_delta',
+            entry,
+            os.path.join(delta_dir, entry['file'])
+        )
+
+        updates = ['{0} = EXCLUDED.{0}'.format(c) for c in columns
+                   if c != '"id"']
+        if len(updates) > 0:
+            conflict_action = 'UPDATE SET ' + ', '.join(updates)
+        else:
+            conflict_action = 'NOTHING'
+
+        cursor.execute(
+            'INSERT INTO {0} ({1}) SELECT {1} FROM stdm_delta '
+            'ON CONFLICT (id) DO {2}'.format(
+                table, column_list, conflict_action
+            )
+        )
+        cursor.execute('DROP TABLE stdm_delta')
+
+        return entry['rows']
+
+    def verify(self):
+        """
+        Verifies the row counts and checksums of the backup files against
+        the manifest.
+        :return: Returns the names of the tables whose files are missing or
+        do not match the manifest.
+        :rtype: list
+        """
+        invalid = []
+
+        for entry in self.manifest()['tables']:
+            path = os.path.join(self.backup_dir, entry['file'])
+            if not os.path.exists(path):
+                invalid.append(entry['table'])
+
+                continue
+
+            with gzip.open(path, 'rb') as gz_file:
+                in_file = _ChecksumFile(gz_file)
+                while in_file.read(1024 * 1024):
+                    pass
+
+            if in_file.checksum != entry['sha256'] \
+                    or in_file.rows != entry['rows']:
+                invalid.append(entry['table'])
+
+        return invalid
+
+    def restore(self, truncate=False, progress_callback=None):
+        """
+        Restores the backup in foreign key dependency order in a single
+        transaction. A table whose data does not match the checksum in the
+        manifest aborts the restore.
+        :param truncate: True to delete the existing rows in the tables
+        before restoring, otherwise the tables should be empty.
+        :type truncate: bool
+        :param progress_callback: Callable which is invoked with the table
+        name, the number of tables restored and the total number of tables
+        after each table is restored.
+        :type progress_callback: callable
+        :return: Returns the number of rows restored in each table.
+        :rtype: dict
+        """
+        entries = dict((e['table'], e) for e in self.manifest()['tables'])
+        tables = table_dependency_order(entries.keys())
+
+        conn = self._engine.raw_connection()
+        restored = {}
+
+        try:
+            cursor = conn.cursor()
+
+            if truncate:
+                cursor.execute('TRUNCATE {0} CASCADE'.format(
+                    ', '.join(tables)
+                ))
+
+            for table in tables:
+                entry = entries[table]
+                restored[table] = self._restore_table(cursor, entry)
+
+                if not progress_callback is None:
+                    progress_callback(table, len(restored), len(tables))
+
+            for table in tables:
+                if 'id' in entries[table]['columns']:
+                    self._fix_sequence(cursor, table)
+
+            conn.commit()
+            cursor.close()
+
+        except:
+            conn.rollback()
+            raise
+
+        finally:
+            conn.close()
+
+        return restored
+
+    def _restore_table(self, cursor, entry):
+        path = os.path.join(self.backup_dir, entry['file'])
+
+        return self._copy_from_file(cursor, entry['table'], entry, path)
+
+    def _copy_from_file(self, cursor, table, entry, path):
+        column_list = ', '.join(['"{0}"'.format(c) for c in entry['columns']])
+        sql = 'COPY {0} ({1}) FROM STDIN'.format(table, column_list)
+
+        with gzip.open(path, 'rb') as gz_file:
+            in_file = _ChecksumFile(gz_file)
+            cursor.copy_expert(sql, in_file)
+
+        if in_file.checksum != entry['sha256']:
+            raise BackupError(
+                'The backup of {0} does not match its checksum.'.format(
+                    entry['table']
+                )
+            )
+
+        return in_file.rows
+
+    def _fix_sequence(self, cursor, table):
+        #Tables without a serial id column have no sequence
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id')", (table,)
+        )
+        sequence = cursor.fetchone()[0]
+
+        if not sequence is None:
+            cursor.execute(
+                'SELECT setval(%s, COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) '
+                'FROM {0}'.format(table),
+                (sequence,)
+            )
+
 
-def db_to_csv():
-    file_path = '{}/.stdm/db_backup/'.format(home)
-    if not os.path.isdir(file_path):
-        os.makedirs(os.path.dirname(file_path))
+def backup_database(backup_dir=BACKUP_DIR, workers=DEFAULT_BACKUP_WORKERS,
+                    progress_callback=None):
+    """
+    Backs up all the tables in the STDM database.
+    :return: Returns the manifest of the backup.
+    :rtype: dict
+    """
+    db_backup = DatabaseBackup(backup_dir, workers)
 
-        statistics = os.stat(file_path)
-        os.chmod(file_path, statistics.st_mode | stat.S_IEXEC)
-        os.chmod(file_path, 0777)
+    return db_backup.backup(progress_callback=progress_callback)
 
-    for table in pg_tables():
-        backup_path = '{}/{}.csv'.format(file_path, table)
-        out_file = open(backup_path, 'wb')
-        out_csv = csv.writer(out_file)
 
-        f = open(backup_path, 'wb')
+def restore_database(backup_dir=BACKUP_DIR, truncate=False,
+                     progress_callback=None):
+    """
+    Restores the tables in the STDM database from a backup.
+    :return: Returns the number of rows restored in each table.
+    :rtype: dict
+    """
+    db_backup = DatabaseBackup(backup_dir)
 
-        sql = 'SELECT * FROM {}'.format(table)
+    return db_backup.restore(truncate, progress_callback)
 
-        result = _execute(sql)
-        cursor = result.cursor
 
-        out_csv.writerow([x[0] for x in cursor.description])
+def backup_changes(backup_dir=BACKUP_DIR, progress_callback=None):
+    """
+    Backs up the changes in the tracked tables since the most recent backup.
+    :return: Returns the manifest of the incremental backup or None if there
+    are no changes.
+    :rtype: dict
+    """
+    db_backup = DatabaseBackup(backup_dir)
 
-        out_csv.writerows(cursor.fetchall())
-        f.close()
+    return db_backup.backup_changes(progress_callback=progress_callback)
 
 
-def csv_to_db():
-    file_path = '{}/.stdm/db_backup/'.format(home)
+def apply_changes(delta_dir, backup_dir=BACKUP_DIR, progress_callback=None):
+    """
+    Applies an incremental backup to the tables in the STDM database.
+    :return: Returns a tuple with the number of rows upserted and deleted in
+    each table.
+    :rtype: dict
+    """
+    db_backup = DatabaseBackup(backup_dir)
 
-    for table in pg_tables():
-        csv_path = '{}/{}.csv'.format(file_path, table)
-        sql = "COPY {0} FROM '{1}' DELIMITER ',' CSV HEADER".format(table, csv_path)
-        _execute(sql)
+    return db_backup.apply_changes(delta_dir, progress_callback)
@@ -18,6 +18,8 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import logging
+import os
 from collections import OrderedDict
 from datetime import datetime
 from PyQt4.QtCore import QObject, pyqtSignal
@@ -33,9 +35,15 @@ from stdm.data.pg_utils import (
     table_column_names
 )
 from stdm.data.configfile_paths import FilePaths
+from stdm.settings.database_backup import (
+    BACKUP_DIR,
+    DatabaseBackup
+)
 
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 
+LOGGER = logging.getLogger('stdm')
+
 class DatabaseUpdater(QObject):
     db_update_complete = pyqtSignal(QDomDocument)
     db_update_progress = pyqtSignal(str)
@@ -204,22 +212,48 @@ class DatabaseVersionUpdater13(DatabaseVersionUpdater):
 
     def backup_database(self):
         """
-        Backups up the database and emits signals on the progress.
+        Backs up the database into a subdirectory of the default backup
+        directory named after the version, and emits signals on the
+        progress.
         """
         self.append_log('Started the backup the database version {}.'
             .format(self.FROM_VERSION)
         )
-        self.append_log('Successfully backed up up the database to version {}.'
-            .format(self.TO_VERSION)
+        backup_dir = os.path.join(
+            BACKUP_DIR, 'version_{}'.format(self.FROM_VERSION)
+        )
+
+        try:
+            DatabaseBackup(backup_dir).backup()
+
+        except Exception as ex:
+            LOGGER.debug(unicode(ex))
+            self.append_log('Failed to back up the database version {}: {}'
+                .format(self.FROM_VERSION, unicode(ex))
+            )
+            message = QApplication.translate(
+                'DatabaseVersionUpdater13',
+                'Failed to back up the database version {}.'.format(
+                    self.FROM_VERSION
+                )
+            )
+            self.db_update_progress.emit(message)
+
+            return False
+
+        self.append_log('Successfully backed up the database version {} to {}.'
+            .format(self.FROM_VERSION, backup_dir)
         )
         message = QApplication.translate(
             'DatabaseVersionUpdater13',
             'Successfully backed up the database version {}.'.format(
-                self.TO_VERSION
+                self.FROM_VERSION
             )
         )
         self.db_update_progress.emit(message)
 
+        return True
+
     def update_str_table(self):
         """
         Updates the database to the next version.
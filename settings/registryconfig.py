@@ -35,10 +35,16 @@ CONFIG_UPDATED = 'ConfigUpdated'
 SUB_QGIS = '/Qgis'
 QGIS_PYTHON_PLUGINS = '/PythonPlugins'
 DEBUG_LOG = 'Debug'
+CHANGE_TRACKING = 'ChangeTracking'
+REFERENCE_CACHE_SIZE = 'ReferenceCacheSize'
+IMPORT_PROCESSES = 'ImportProcesses'
 HOST = 'Host'
 FIRST_LOGIN = 'FirstLogin'
 STDM_PLUGIN = 'stdm'
 
+#Default number of records of each parent entity in the reference data cache
+DEFAULT_REFERENCE_CACHE_SIZE = 10000
+
 def registry_value(key_name):
     """
     Util method for reading the value for the given key.
@@ -127,6 +133,83 @@ def set_debug_logging(state):
 
     set_registry_value(DEBUG_LOG, lvl)
 
+def change_tracking():
+    """
+    :return: Returns whether changes to the rows of entity tables should be
+    tracked for incremental backups.
+    :rtype: bool
+    """
+    tracking = registry_value(CHANGE_TRACKING)
+
+    #QSettings may return the value as a string
+    if tracking is None or int(tracking) == 0:
+        return False
+
+    return True
+
+
+def set_change_tracking(state):
+    """
+    Enable or disable change tracking of new entity tables.
+    :param state: True to enable, False to disable.
+    :type state: bool
+    """
+    tracking = 0
+    if state:
+        tracking = 1
+
+    set_registry_value(CHANGE_TRACKING, tracking)
+
+def reference_cache_size():
+    """
+    :return: Returns the maximum number of records of each parent entity
+    kept in the reference data cache.
+    :rtype: int
+    """
+    size = registry_value(REFERENCE_CACHE_SIZE)
+
+    #QSettings may return the value as a string
+    try:
+        return max(int(size), 0)
+
+    except (TypeError, ValueError):
+        return DEFAULT_REFERENCE_CACHE_SIZE
+
+def set_reference_cache_size(size):
+    """
+    Sets the maximum number of records of each parent entity kept in the
+    reference data cache.
+    :param size: Number of records.
+    :type size: int
+    """
+    set_registry_value(REFERENCE_CACHE_SIZE, int(size))
+
+def import_processes():
+    """
+    :return: Returns the number of worker processes used to translate the
+    features of large imports. Features are translated in the QGIS process
+    unless the user has set more than one process (default is 1).
+    :rtype: int
+    """
+    processes = registry_value(IMPORT_PROCESSES)
+
+    #QSettings may return the value as a string
+    try:
+        return max(int(processes), 1)
+
+    except (TypeError, ValueError):
+        return 1
+
+def set_import_processes(processes):
+    """
+    Sets the number of worker processes used to translate the features of
+    large imports.
+    :param processes: Number of processes, 1 to translate the features in
+    the QGIS process.
+    :type processes: int
+    """
+    set_registry_value(IMPORT_PROCESSES, int(processes))
+
 def set_last_document_path(path):
     """
     Sets the latest path used for uploading supporting documents.
@@ -48,7 +48,8 @@ from stdm.data.pg_utils import (
     pg_views,
     table_column_names,
     pg_table_exists,
-    foreign_key_parent_tables
+    foreign_key_parent_tables,
+    refresh_catalog
 )
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 
@@ -513,6 +514,7 @@ class TemplateViewHandler:
 
             try:
                 _execute(query, view_name=view)
+                refresh_catalog()
                 return 'new_{}'.format(view)
             except Exception as ex:
                 self.updater.append_log(str(ex))
@@ -0,0 +1,283 @@
+"""
+Generates synthetic records for the entities of a profile directly in the
+database using 'INSERT ... SELECT ... FROM generate_series()' so that
+millions of rows can be created in a few minutes.
+"""
+import logging
+from datetime import (
+    date,
+    datetime,
+    timedelta
+)
+
+from stdm.data.pg_utils import table_dependency_order
+
+LOGGER = logging.getLogger('stdm')
+
+#Number of parties, spatial units and STRs for each named scale
+SCALES = {
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000
+}
+
+#Centre and extent of the random geometries, in EPSG:4326
+CENTRE_X = 36.82
+CENTRE_Y = -1.29
+EXTENT = 0.5
+GEOMETRY_SIZE = 0.0005
+
+_MAX_DAYS = 7000
+_MAX_TEXT_LENGTH = 20
+_NUM_LOOKUP_VALUES = 10
+
+_GENERATED_TYPES = (
+    'ENTITY',
+    'SOCIAL_TENURE',
+    'SUPPORTING_DOCUMENT',
+    'ENTITY_SUPPORTING_DOCUMENT',
+    'ADMINISTRATIVE_SPATIAL_UNIT',
+    'VALUE_LIST'
+)
+
+_FOREIGN_KEY_TYPES = ('FOREIGN_KEY', 'LOOKUP', 'ADMIN_SPATIAL_UNIT')
+
+
+class SyntheticDataGenerator(object):
+    """
+    Populates the tables of the profile entities in foreign key dependency
+    order. Foreign keys reference random rows of the parent tables and
+    spatial units get random polygons around a fixed centre. Value lists
+    are only populated if they are empty.
+    """
+    def __init__(self, profile, engine, scale, seed=0.5):
+        """
+        :param profile: Profile whose tables will be populated.
+        :type profile: Profile
+        :param engine: Engine of the database.
+        :type engine: Engine
+        :param scale: Number of parties, spatial units and STRs.
+        :type scale: int
+        :param seed: Seed of the PostgreSQL random number generator, between
+        -1 and 1.
+        :type seed: float
+        """
+        self.profile = profile
+        self.scale = scale
+        self.seed = seed
+        self._engine = engine
+
+    def row_count(self, entity):
+        """
+        :param entity: Entity whose table will be populated.
+        :type entity: Entity
+        :return: Returns the number of rows to generate for the entity.
+        :rtype: int
+        """
+        if entity.TYPE_INFO == 'ENTITY_SUPPORTING_DOCUMENT':
+            return self.scale / 2
+
+        if entity.TYPE_INFO == 'ADMINISTRATIVE_SPATIAL_UNIT':
+            return min(self.scale, 100)
+
+        if entity.TYPE_INFO == 'VALUE_LIST':
+            return _NUM_LOOKUP_VALUES
+
+        return self.scale
+
+    def _entities(self):
+        return dict(
+            (e.name, e) for e in self.profile.entities.values()
+            if e.TYPE_INFO in _GENERATED_TYPES and not e.is_proxy
+        )
+
+    def generate(self, progress_callback=None):
+        """
+        Generates the rows of all the entities.
+        :param progress_callback: Callable which is invoked with the table
+        name and the number of rows after each table is populated.
+        :type progress_callback: callable
+        :return: Returns the number of rows generated in each table.
+        :rtype: dict
+        """
+        entities = self._entities()
+        conn = self._engine.raw_connection()
+        counts = {}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT setseed({0:f})'.format(self.seed))
+
+            for table in table_dependency_order(entities.keys()):
+                entity = entities[table]
+
+                num_rows = self._populate(cursor, entity)
+                conn.commit()
+
+                counts[table] = num_rows
+
+                if not progress_callback is None:
+                    progress_callback(table, num_rows)
+
+            #Planner statistics for the benchmarked queries
+            for table in counts:
+                cursor.execute('ANALYZE {0}'.format(table))
+            conn.commit()
+
+            cursor.close()
+
+        finally:
+            conn.rollback()
+            conn.close()
+
+        return counts
+
+    def _populate(self, cursor, entity):
+        if entity.TYPE_INFO == 'VALUE_LIST':
+            cursor.execute('SELECT COUNT(*) FROM {0}'.format(entity.name))
+            if cursor.fetchone()[0] > 0:
+                return 0
+
+        num_rows = self.row_count(entity)
+        columns, expressions, parents = [], [], []
+
+        for c in entity.columns.values():
+            expression = self._column_expression(c, parents)
+            if expression is None:
+                continue
+
+            columns.append(c.name)
+            expressions.append(expression)
+
+        if len(columns) == 0 or num_rows == 0:
+            return 0
+
+        #Single row with the ids of each parent table
+        parent_ids = ''.join([
+            ', (SELECT array_agg(id) AS ids FROM {0}) p{1:d}'.format(p, i)
+            for i, p in enumerate(parents)
+        ])
+
+        sql = (
+            'INSERT INTO {0} ({1}) SELECT {2} FROM generate_series(1, {3:d}) '
+            'g{4}'
+        ).format(
+            entity.name,
+            ', '.join(['"{0}"'.format(c) for c in columns]),
+            ', '.join(expressions),
+            num_rows,
+            parent_ids
+        )
+
+        LOGGER.debug('Generating %d rows in %s', num_rows, entity.name)
+        cursor.execute(sql)
+
+        return cursor.rowcount
+
+    def _column_expression(self, column, parents):
+        #Returns the SQL expression of the column value for row 'g'
+        type_info = column.TYPE_INFO
+        salt = column.name
+
+        if type_info in ('SERIAL', 'VIRTUAL', 'MULTIPLE_SELECT'):
+            return None
+
+        if type_info in _FOREIGN_KEY_TYPES:
+            parent = column.parent
+            if parent is None or parent.name == column.entity.name:
+                return None
+
+            parents.append(parent.name)
+            alias = 'p{0:d}'.format(len(parents) - 1)
+
+            return (
+                '{0}.ids[1 + floor(random() * '
+                'coalesce(array_length({0}.ids, 1), 0))::integer]'
+            ).format(alias)
+
+        if type_info in ('VARCHAR', 'TEXT', 'AUTO_GENERATED'):
+            length = max(column.minimum,
+                         min(column.maximum, _MAX_TEXT_LENGTH))
+
+            return (
+                "substr(repeat(md5(g::text || '{0}'), {1:d}), 1, {2:d})"
+            ).format(salt, length / 32 + 1, length)
+
+        if type_info in ('INT', 'DOUBLE', 'PERCENT'):
+            minimum, maximum = column.minimum, column.maximum
+
+            if type_info == 'INT':
+                if column.unique:
+                    return 'g'
+
+                return '{0:d} + (g % {1:d})'.format(
+                    int(minimum), int(maximum - minimum) + 1
+                )
+
+            return '{0!r} + random() * {1!r}'.format(
+                float(minimum), float(maximum - minimum)
+            )
+
+        if type_info == 'DATE':
+            start, days = self._date_range(column, date)
+
+            return "DATE '{0}' + (g % {1:d})".format(start.isoformat(), days)
+
+        if type_info == 'DATETIME':
+            start, days = self._date_range(column, datetime)
+
+            return (
+                "TIMESTAMP '{0}' + (g % {1:d}) * INTERVAL '1 day' + "
+                "random() * INTERVAL '1 day'"
+            ).format(start.isoformat(' '), days)
+
+        if type_info == 'BOOL':
+            return '(g % 2 = 0)'
+
+        if type_info == 'GEOMETRY':
+            return self._geometry_expression(column)
+
+        return None
+
+    def _date_range(self, column, date_type):
+        start = column.minimum
+        if start == date_type.min:
+            start = date_type(2000, 1, 1)
+
+        end = column.maximum
+        if end == date_type.max:
+            end = start + timedelta(days=_MAX_DAYS)
+
+        return start, max(1, min((end - start).days, _MAX_DAYS))
+
+    def _geometry_expression(self, column):
+        point = (
+            'ST_SetSRID(ST_MakePoint({0!r} + (random() - 0.5) * {2!r}, '
+            '{1!r} + (random() - 0.5) * {2!r}), 4326)'
+        ).format(CENTRE_X, CENTRE_Y, EXTENT)
+
+        geom_type = column.geometry_type()
+
+        if geom_type.endswith('POINT'):
+            geom = point
+
+        elif geom_type.endswith('LINESTRING'):
+            #Half of the boundary of a small polygon
+            geom = (
+                'ST_LineSubstring(ST_ExteriorRing(ST_Buffer({0}, {1!r}, 2)), '
+                '0, 0.5)'
+            ).format(point, GEOMETRY_SIZE)
+
+        else:
+            #Irregular polygon with a random size
+            geom = 'ST_Buffer({0}, {1!r} * (0.5 + random()), 2)'.format(
+                point, GEOMETRY_SIZE
+            )
+
+        if geom_type.startswith('MULTI'):
+            geom = 'ST_Multi({0})'.format(geom)
+
+        if column.srid != 4326:
+            geom = 'ST_Transform({0}, {1:d})'.format(geom, column.srid)
+
+        return geom
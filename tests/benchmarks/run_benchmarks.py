@@ -0,0 +1,516 @@
+"""
+Benchmarks the hot paths of STDM against a throwaway PostgreSQL/PostGIS
+database populated with synthetic data and writes the timings as JSON so
+that the results of different versions can be compared.
+
+Run from a shell with the QGIS Python environment, for example:
+
+    python -m stdm.tests.benchmarks.run_benchmarks --scale 100k \
+        --port 5432 --user postgres --password admin
+
+Document generation is only benchmarked when a template is specified and
+the script is run from the QGIS Python console, since the document
+generator requires the QGIS interface.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import psycopg2
+
+from PyQt4.QtCore import QThreadPool
+from PyQt4.QtGui import (
+    QApplication,
+    QTreeView
+)
+
+from stdm import data
+from stdm.data.connection import DatabaseConnection
+from stdm.data.database import STDMDb
+from stdm.security.user import User
+
+from stdm.tests.benchmarks.data_generator import (
+    SCALES,
+    SyntheticDataGenerator
+)
+from stdm.tests.utils import qgis_app
+
+LOGGER = logging.getLogger('stdm')
+
+PLUGIN_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+#Configuration with the default profiles
+DEFAULT_CONFIG = os.path.join(PLUGIN_DIR, 'templates', 'configuration.stc')
+
+DEFAULT_PROFILE = 'Local_Government'
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def _plugin_version():
+    with open(os.path.join(PLUGIN_DIR, 'metadata.txt'), 'rb') as f:
+        for line in f:
+            if line.startswith('version='):
+                return line.split('=', 1)[1].strip()
+
+    return ''
+
+
+class BenchmarkRunner(object):
+    """
+    Provisions the database, creates the profile tables through the
+    configuration schema updater, generates the synthetic data and times
+    each benchmark. The database is dropped once the benchmarks have been
+    run unless 'keep_database' is True.
+    """
+    def __init__(self, host, port, user, password, scale,
+                 template_db='template0', config_path=DEFAULT_CONFIG,
+                 profile_name=DEFAULT_PROFILE, repeat=3, template_path=None,
+                 keep_database=False):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.scale = scale
+        self.template_db = template_db
+        self.config_path = config_path
+        self.profile_name = profile_name
+        self.repeat = max(1, repeat)
+        self.template_path = template_path
+        self.keep_database = keep_database
+
+        self.db_name = 'stdm_bench_{0:%Y%m%d%H%M%S}'.format(datetime.now())
+        self.profile = None
+        self.timings = {}
+        self.row_counts = {}
+        self._tmp_dir = None
+
+    def _connection(self, db_name='postgres'):
+        conn = psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            dbname=db_name
+        )
+        conn.autocommit = True
+
+        return conn
+
+    def provision(self):
+        """
+        Creates the benchmark database from the template database and
+        connects STDM to it.
+        """
+        conn = self._connection()
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "CREATE DATABASE {0} WITH ENCODING='UTF8' TEMPLATE={1}".format(
+                    self.db_name, self.template_db
+                )
+            )
+
+        finally:
+            conn.close()
+
+        #STDM creates its core tables when it connects
+        conn = self._connection(self.db_name)
+
+        try:
+            conn.cursor().execute('CREATE EXTENSION IF NOT EXISTS postgis')
+
+        finally:
+            conn.close()
+
+        db_conn = DatabaseConnection(self.host, self.port, self.db_name)
+        db_conn.User = User(self.user, self.password)
+        data.app_dbconn = db_conn
+        STDMDb.instance()
+
+        self._tmp_dir = tempfile.mkdtemp(prefix='stdm_bench_')
+
+    def teardown(self):
+        """
+        Disconnects STDM and drops the benchmark database.
+        """
+        if not self._tmp_dir is None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+        try:
+            stdm_db = STDMDb.instance()
+            stdm_db.session.close()
+            stdm_db.engine.dispose()
+            STDMDb.cleanUp()
+
+        except AttributeError:
+            pass
+
+        if self.keep_database:
+            return
+
+        conn = self._connection()
+
+        try:
+            conn.cursor().execute('DROP DATABASE IF EXISTS {0}'.format(
+                self.db_name
+            ))
+
+        finally:
+            conn.close()
+
+    def timed(self, name, func, repeat=None):
+        """
+        Runs the function and records the wall time of each run.
+        :param name: Name of the benchmark.
+        :type name: str
+        :param func: Callable without arguments.
+        :type func: callable
+        :param repeat: Number of runs, defaults to the runner setting.
+        :type repeat: int
+        :return: Returns the value returned by the last run.
+        :rtype: object
+        """
+        if repeat is None:
+            repeat = self.repeat
+
+        runs = []
+        result = None
+
+        for i in range(repeat):
+            start = time.time()
+            result = func()
+            runs.append(time.time() - start)
+
+        runs.sort()
+        self.timings[name] = {
+            'runs': runs,
+            'min': runs[0],
+            'median': runs[len(runs) / 2],
+            'max': runs[-1]
+        }
+
+        LOGGER.info('%s: %.3f s (median of %d)', name,
+                    self.timings[name]['median'], repeat)
+
+        return result
+
+    def create_schema(self):
+        from stdm.data.configuration.config_updater import \
+            ConfigurationSchemaUpdater
+        from stdm.data.configuration.stdm_configuration import \
+            StdmConfiguration
+        from stdm.settings import save_current_profile
+        from stdm.settings.config_serializer import \
+            ConfigurationFileSerializer
+
+        ConfigurationFileSerializer(self.config_path).load()
+
+        config = StdmConfiguration.instance()
+        self.profile = config.profile(self.profile_name)
+        if self.profile is None:
+            raise ValueError(
+                '{0} profile not found in {1}.'.format(
+                    self.profile_name, self.config_path
+                )
+            )
+
+        save_current_profile(self.profile_name)
+
+        updater = ConfigurationSchemaUpdater()
+        self.timed('schema_create', updater.exec_, 1)
+
+    def generate_data(self):
+        generator = SyntheticDataGenerator(
+            self.profile, STDMDb.instance().engine, self.scale
+        )
+        self.row_counts = self.timed('generate_data', generator.generate, 1)
+
+    def _benchmark_entities(self):
+        social_tenure = self.profile.social_tenure
+
+        return social_tenure.parties + [social_tenure.spatial_unit]
+
+    def bench_entity_model(self):
+        from stdm.data.configuration import entity_model
+        from stdm.data.configuration.model_registry import EntityModelRegistry
+
+        entities = [e for e in self.profile.entities.values()
+                    if e.TYPE_INFO in ('ENTITY', 'SOCIAL_TENURE')]
+
+        def reflect_models():
+            #Measure the reflection rather than the cache
+            EntityModelRegistry.instance().clear()
+            for e in entities:
+                entity_model(e)
+
+        self.timed('entity_model', reflect_models)
+
+    def bench_entity_browser(self, parent):
+        from stdm.ui.admin_unit_manager import VIEW
+        from stdm.ui.entity_browser import EntityBrowser
+
+        for entity in self._benchmark_entities():
+            def load_browser():
+                browser = EntityBrowser(entity, parent, VIEW)
+                browser._initializeData()
+
+                #The first page is loaded in the global thread pool and
+                #added to the model by a queued signal
+                QThreadPool.globalInstance().waitForDone()
+                QApplication.processEvents()
+
+                browser.deleteLater()
+
+            self.timed('entity_browser.{0}'.format(entity.name),
+                       load_browser)
+
+    def _search_config(self, entity):
+        from stdm.data.configuration import entity_model
+        from stdm.ui.view_str import EntityConfiguration
+        from stdm.utils.util import (
+            entity_display_columns,
+            entity_searchable_columns,
+            format_name
+        )
+
+        config = EntityConfiguration()
+        config.Title = format_name(entity.short_name)
+        config.STRModel = entity_model(entity)
+        config.data_source_name = entity.name
+
+        for c in entity_searchable_columns(entity):
+            if c != 'id':
+                config.filterColumns[c] = format_name(c)
+
+        for c in entity_display_columns(entity):
+            if c != 'id':
+                config.displayColumns[c] = format_name(c)
+
+        return config
+
+    def bench_str_search(self, parent):
+        from sqlalchemy import func
+        from stdm.navigation.socialtenure import EntityNodeFormatter
+
+        party = self.profile.social_tenure.parties[0]
+        config = self._search_config(party)
+
+        search_columns = [c for c in config.filterColumns
+                          if party.columns[c].TYPE_INFO == 'VARCHAR']
+        if len(search_columns) == 0:
+            LOGGER.info('No text column to search in %s.', party.name)
+
+            return
+
+        model = config.STRModel
+        search_attr = getattr(model, search_columns[0])
+        tree_view = QTreeView(parent)
+
+        def search_and_build_tree():
+            #Values are md5 hashes hence about 1 in 256 rows match
+            results = model().queryObject().filter(
+                func.lower(search_attr).like('a0%')
+            ).all()
+
+            formatter = EntityNodeFormatter(config, tree_view, parent)
+            formatter.setData(results)
+            formatter.root()
+
+        self.timed('str_search', search_and_build_tree)
+
+    def _export_columns(self, entity):
+        columns = [c.name for c in entity.columns.values()
+                   if not c.TYPE_INFO in ('SERIAL', 'GEOMETRY', 'VIRTUAL',
+                                          'MULTIPLE_SELECT')]
+        geom_columns = [c.name for c in entity.columns.values()
+                        if c.TYPE_INFO == 'GEOMETRY']
+        geom = geom_columns[0] if len(geom_columns) > 0 else ''
+
+        return columns, geom
+
+    def bench_export_import(self):
+        from stdm.data.importexport.reader import OGRReader
+        from stdm.data.importexport.writer import OGRWriter
+
+        spatial_unit = self.profile.social_tenure.spatial_unit
+        columns, geom = self._export_columns(spatial_unit)
+        paths = []
+
+        def export_table():
+            path = os.path.join(
+                self._tmp_dir, 'export_{0:d}.gpkg'.format(len(paths))
+            )
+            paths.append(path)
+
+            writer = OGRWriter(path)
+            writer.streamDb2Feat(None, spatial_unit.name, columns, geom)
+            writer.reset()
+
+        self.timed('export', export_table)
+
+        #Import the exported features back into the table
+        column_match = dict((c, c) for c in columns)
+        geom_column = geom if geom else None
+
+        def import_file():
+            reader = OGRReader(paths[0])
+            reader.featToDb(spatial_unit.name, column_match, True, None,
+                            geom_column, bulk=True)
+
+        self.timed('import', import_file, 1)
+
+    def bench_document_generation(self):
+        from qgis.utils import iface
+
+        if self.template_path is None or iface is None:
+            LOGGER.info('Document generation skipped, it requires a '
+                        'template and the QGIS interface.')
+
+            return
+
+        from stdm.composer.document_generator import DocumentGenerator
+
+        generator = DocumentGenerator(iface)
+        party = self.profile.social_tenure.parties[0]
+        output_dir = os.path.join(self._tmp_dir, 'documents')
+        os.makedirs(output_dir)
+
+        def generate():
+            generator.run(self.template_path, 'id', 1, DocumentGenerator.PDF,
+                          filePath=os.path.join(output_dir, 'document.pdf'),
+                          data_source=party.name)
+
+        self.timed('document_generation', generate)
+
+    def bench_schema_update(self):
+        from stdm.data.configuration.config_updater import \
+            ConfigurationSchemaUpdater
+
+        self.timed('schema_update', ConfigurationSchemaUpdater().exec_)
+
+    def run(self):
+        """
+        Runs all the benchmarks.
+        :return: Returns the results.
+        :rtype: dict
+        """
+        app, canvas, parent = qgis_app()
+
+        self.provision()
+
+        try:
+            self.create_schema()
+            self.generate_data()
+
+            self.bench_entity_model()
+            self.bench_entity_browser(parent)
+            self.bench_str_search(parent)
+            self.bench_document_generation()
+            self.bench_export_import()
+            self.bench_schema_update()
+
+        finally:
+            self.teardown()
+
+        return self.results()
+
+    def results(self):
+        """
+        :return: Returns the timings together with the details of the run.
+        :rtype: dict
+        """
+        return {
+            'created': datetime.now().isoformat(),
+            'stdm_version': _plugin_version(),
+            'python': sys.version.split()[0],
+            'profile': self.profile_name,
+            'scale': self.scale,
+            'repeat': self.repeat,
+            'rows': self.row_counts,
+            'timings': self.timings
+        }
+
+
+def write_results(results, path):
+    """
+    Writes the benchmark results to a JSON file.
+    :param results: Results returned by the runner.
+    :type results: dict
+    :param path: Path of the JSON file.
+    :type path: str
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with open(path, 'wb') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='STDM benchmarks')
+    parser.add_argument('--scale', default='10k',
+                        help='One of {0} or a number of parties.'.format(
+                            ', '.join(sorted(SCALES))))
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--template-db', default='template0',
+                        help='Database cloned to create the benchmark '
+                             'database.')
+    parser.add_argument('--config', default=DEFAULT_CONFIG)
+    parser.add_argument('--profile', default=DEFAULT_PROFILE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--document-template', default=None)
+    parser.add_argument('--keep-database', action='store_true')
+    parser.add_argument('--output', default=None,
+                        help='Path of the JSON results file.')
+    options = parser.parse_args(args)
+
+    scale = SCALES.get(options.scale.lower(), None)
+    if scale is None:
+        scale = int(options.scale)
+
+    logging.basicConfig(level=logging.INFO)
+
+    runner = BenchmarkRunner(
+        options.host,
+        options.port,
+        options.user,
+        options.password,
+        scale,
+        options.template_db,
+        options.config,
+        options.profile,
+        options.repeat,
+        options.document_template,
+        options.keep_database
+    )
+    results = runner.run()
+
+    output = options.output
+    if output is None:
+        output = os.path.join(
+            DEFAULT_RESULTS_DIR,
+            'benchmark_{0}_{1:d}_{2:%Y%m%d_%H%M%S}.json'.format(
+                results['stdm_version'], scale, datetime.now()
+            )
+        )
+
+    write_results(results, output)
+    LOGGER.info('Results written to %s', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import struct
+from datetime import datetime
+from decimal import Decimal
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from stdm.data.importexport.bulk_import import (
+    BulkInsertWriter,
+    copy_text_value,
+    ewkb_hex,
+    ImportReport
+)
+from stdm.data.importexport.value_translators import IgnoreType
+
+#POINT(1 2) in little endian WKB
+POINT_WKB = '\x01' + struct.pack('<I', 1) + struct.pack('<dd', 1.0, 2.0)
+
+
+class Table(object):
+    c = {'id': None, 'name': None}
+
+    def insert(self):
+        return 'INSERT'
+
+
+class Model(object):
+    __table__ = Table()
+    name = None
+    documents = None
+
+
+class Session(object):
+    """
+    Session whose transactions and savepoints keep the inserted names,
+    rows named 'bad' cannot be inserted.
+    """
+    def __init__(self):
+        self.committed = []
+        self._pending = []
+        self._savepoints = []
+
+    def connection(self):
+        return self
+
+    def execute(self, statement, rows):
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        self._insert([r['name'] for r in rows])
+
+    def _insert(self, names):
+        if 'bad' in names:
+            raise SQLAlchemyError('bad row')
+
+        self._pending.extend(names)
+
+    def add(self, obj):
+        self._pending.append(obj)
+
+    def add_all(self, objs):
+        self._pending.extend(objs)
+
+    def flush(self):
+        objs = [o for o in self._pending if isinstance(o, Model)]
+        self._pending = [o for o in self._pending if not o in objs]
+        self._insert([o.name for o in objs])
+
+    def begin_nested(self):
+        self._savepoints.append(len(self._pending))
+
+    def commit(self):
+        self.flush()
+
+        if len(self._savepoints) > 0:
+            self._savepoints.pop()
+        else:
+            self.committed.extend(self._pending)
+            self._pending = []
+
+    def rollback(self):
+        if len(self._savepoints) > 0:
+            del self._pending[self._savepoints.pop():]
+        else:
+            self._pending = []
+
+
+class TestBulkImport(TestCase):
+    def test_ewkb_hex(self):
+        ewkb = ewkb_hex(POINT_WKB, 4326).decode('hex')
+        geom_type, srid = struct.unpack('<Ii', ewkb[1:9])
+
+        self.assertEqual(geom_type, 0x20000001)
+        self.assertEqual(srid, 4326)
+        self.assertEqual(ewkb[9:], POINT_WKB[5:])
+
+    def test_ewkb_hex_big_endian(self):
+        wkb = '\x00' + struct.pack('>I', 1) + struct.pack('>dd', 1.0, 2.0)
+        ewkb = ewkb_hex(wkb, 32737).decode('hex')
+
+        self.assertEqual(struct.unpack('>Ii', ewkb[1:9]), (0x20000001, 32737))
+
+    def test_copy_text_value(self):
+        self.assertEqual(copy_text_value(None), '\\N')
+        self.assertEqual(copy_text_value(IgnoreType), '\\N')
+        self.assertEqual(copy_text_value(True), 't')
+        self.assertEqual(copy_text_value(12), '12')
+        self.assertEqual(float(copy_text_value(1234567.123456789)),
+                         1234567.123456789)
+        self.assertEqual(copy_text_value(float('-inf')), '-Infinity')
+        self.assertEqual(copy_text_value(Decimal('0.1234567890123456789')),
+                         '0.1234567890123456789')
+        self.assertEqual(copy_text_value(datetime(2016, 6, 8, 9, 30, 0, 5)),
+                         '2016-06-08T09:30:00.000005')
+        self.assertEqual(copy_text_value(u'Nyer\xed'), 'Nyer\xc3\xad')
+        self.assertEqual(copy_text_value('a\tb\\c\nd'), 'a\\tb\\\\c\\nd')
+
+    def _writer(self, use_savepoints):
+        self.session = Session()
+        writer = BulkInsertWriter(Model, chunk_size=10,
+                                  use_savepoints=use_savepoints,
+                                  session=self.session)
+        writer.add(1, {'name': 'a'})
+        writer.add(2, {'name': 'bad', 'documents': ['doc']})
+        writer.add(3, {'name': 'c'})
+
+        return writer
+
+    def test_failed_chunk_is_not_committed(self):
+        writer = self._writer(False)
+
+        self.assertRaises(SQLAlchemyError, writer.flush)
+        self.assertEqual(self.session.committed, [])
+        self.assertEqual(writer.last_committed_fid, None)
+        self.assertEqual(writer.report.imported, 0)
+
+    def test_failed_rows_are_replayed(self):
+        writer = self._writer(True)
+        writer.flush()
+
+        self.assertEqual(sorted(self.session.committed), ['a', 'c'])
+        self.assertEqual(writer.last_committed_fid, 3)
+        self.assertEqual(writer.report.imported, 2)
+        self.assertEqual(writer.report.failed, 1)
+
+    def test_import_report(self):
+        report = ImportReport(max_errors=1)
+        report.imported = 8
+        report.add_error(3, 'duplicate key')
+        report.add_error(7, 'duplicate key')
+
+        self.assertTrue(report.has_errors)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(len(report.errors), 1)
+
+
+def suite():
+    suite = makeSuite(TestBulkImport, 'test')
+
+    return suite
@@ -0,0 +1,109 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy import text
+
+from stdm.data.change_tracking import (
+    CHANGELOG_TABLE,
+    current_watermark,
+    is_tracked,
+    net_changes,
+    track_profile,
+    untrack_profile
+)
+from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.data.database import STDMDb
+from stdm.data.pg_utils import delete_table_data
+
+from stdm.tests.data.utils import (
+    BASIC_PROFILE,
+    COMMUNITY_ENTITY,
+    create_alchemy_engine,
+    populate_configuration
+)
+
+
+class TestChangeTracking(TestCase):
+    def setUp(self):
+        self.config = StdmConfiguration.instance()
+        populate_configuration(self.config)
+
+        config_updater = ConfigurationSchemaUpdater(create_alchemy_engine())
+        config_updater.exec_()
+
+        self.profile = self.config.profile(BASIC_PROFILE)
+        self.community = self.profile.entity(COMMUNITY_ENTITY)
+        self.engine = STDMDb.instance().engine
+
+        delete_table_data(self.community.name)
+
+        #Tables created before tracking was enabled
+        track_profile(self.profile)
+        self.engine.execute(text('DELETE FROM {0}'.format(CHANGELOG_TABLE)))
+
+    def tearDown(self):
+        untrack_profile(self.profile)
+        self.config = None
+
+    def _insert(self, conn, name):
+        sql = text(
+            'INSERT INTO {0} (comm_name) VALUES (:name) RETURNING id'.format(
+                self.community.name
+            )
+        )
+
+        return conn.execute(sql, name=name).scalar()
+
+    def _upserted(self, since, until):
+        conn = self.engine.raw_connection()
+
+        try:
+            cursor = conn.cursor()
+            changes = net_changes(cursor, since, until)
+            cursor.close()
+
+        finally:
+            conn.rollback()
+            conn.close()
+
+        return changes.get(self.community.name, ([], []))[0]
+
+    def test_track_existing_tables(self):
+        self.assertTrue(is_tracked(self.community.name))
+
+        untrack_profile(self.profile)
+
+        self.assertFalse(is_tracked(self.community.name))
+
+    def test_out_of_order_commit(self):
+        since = current_watermark()
+
+        #The earlier transaction commits after the later one
+        early_conn = self.engine.connect()
+        early_trans = early_conn.begin()
+        early_id = self._insert(early_conn, 'Early')
+
+        late_conn = self.engine.connect()
+        late_id = self._insert(late_conn, 'Late')
+        late_conn.close()
+
+        until = current_watermark()
+
+        self.assertEqual(self._upserted(since, until), [])
+
+        early_trans.commit()
+        early_conn.close()
+
+        next_until = current_watermark()
+
+        self.assertEqual(sorted(self._upserted(until, next_until)),
+                         sorted([early_id, late_id]))
+
+
+def suite():
+    suite = makeSuite(TestChangeTracking, 'test')
+
+    return suite
@@ -0,0 +1,149 @@
+from decimal import Decimal
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from PyQt4.QtCore import Qt
+
+from stdm.data.qtmodels import (
+    ColumnarTableModel,
+    MATCH_CONTAINS,
+    MATCH_EXACT,
+    MATCH_PREFIX,
+    TableColumn
+)
+
+
+class TestColumnarTableModel(TestCase):
+    def setUp(self):
+        self.rows = [
+            [1, u'Kenya', Decimal('2.50'), None],
+            [2, u'Uganda', Decimal('3.75'), 4.5],
+            [3, u'Kenya', None, 1.0]
+        ]
+        self.model = ColumnarTableModel(
+            self.rows,
+            ['id', 'country', 'area', 'width']
+        )
+
+    def _value(self, row, column):
+        return self.model.data(self.model.index(row, column), Qt.DisplayRole)
+
+    def _set_value(self, row, column, value):
+        self.model.setData(self.model.index(row, column), value)
+
+    def test_column_types(self):
+        self.assertEqual(self.model.column(0).type_code, TableColumn.INTEGER)
+        self.assertIsNone(self.model.column(1).type_code)
+        self.assertEqual(self.model.column(3).type_code, TableColumn.FLOAT)
+
+    def test_values(self):
+        self.assertEqual(self.model.rowCount(), 3)
+        self.assertEqual(self._value(1, 0), 2)
+        self.assertEqual(self._value(1, 2), '3.75')
+        self.assertIsNone(self._value(0, 3))
+        self.assertIsNone(self._value(2, 2))
+
+    def test_repeated_strings_are_shared(self):
+        column = self.model.column(1)
+
+        self.assertIs(column.value(0), column.value(2))
+
+    def test_insert_and_set_rows(self):
+        self.model.insertRows(1, 2)
+        self._set_value(1, 0, 10)
+        self._set_value(2, 1, u'Tanzania')
+
+        self.assertEqual(self.model.rowCount(), 5)
+        self.assertEqual(self._value(1, 0), 10)
+        self.assertIsNone(self._value(2, 0))
+        self.assertEqual(self._value(1, 1), '')
+        self.assertEqual(self._value(2, 1), u'Tanzania')
+        self.assertEqual(self._value(3, 0), 2)
+
+    def test_value_not_fitting_in_array(self):
+        self._set_value(0, 0, u'A1')
+
+        self.assertIsNone(self.model.column(0).type_code)
+        self.assertEqual([self._value(r, 0) for r in range(3)],
+                         [u'A1', 2, 3])
+
+    def test_remove_rows(self):
+        self.model.removeRows(0, 2)
+
+        self.assertEqual(self.model.rowCount(), 1)
+        self.assertEqual(self._value(0, 0), 3)
+        self.assertEqual(self._value(0, 3), 1.0)
+
+    def test_append_rows(self):
+        self.model.append_rows([[4, u'Rwanda', None, 2]])
+
+        self.assertEqual(self.model.rowCount(), 4)
+        #Integer in a float column
+        self.assertIsNone(self.model.column(3).type_code)
+        self.assertEqual(self._value(3, 3), 2)
+        self.assertEqual(self._value(1, 3), 4.5)
+
+
+class TestColumnIndex(TestCase):
+    def setUp(self):
+        self.rows = [[i, u'Name {0:d}'.format(i)] for i in range(200)]
+        self.model = ColumnarTableModel(self.rows, ['id', 'name'])
+
+    def _rows(self, text, match=MATCH_CONTAINS):
+        keys = self.model.match_keys(1, text, match)
+
+        return sorted([r for r in range(self.model.rowCount())
+                       if self.model.row_key(r) in keys])
+
+    def test_match_types(self):
+        self.assertEqual(self._rows(u'name 12', MATCH_EXACT), [12])
+        self.assertEqual(self._rows(u'NAME 19', MATCH_PREFIX),
+                         [19, 190, 191, 192, 193, 194, 195, 196, 197, 198,
+                          199])
+        self.assertEqual(self._rows(u'e 15'), [15] + range(150, 160))
+        self.assertEqual(self._rows(u'99'), [99, 199])
+        self.assertEqual(self._rows(u'x'), [])
+
+    def test_index_is_updated(self):
+        self.assertEqual(self._rows(u'me 5', MATCH_EXACT), [])
+
+        self.model.removeRows(0, 100)
+        self.model.insertRows(0, 1)
+        self.model.setData(self.model.index(0, 1), u'Name 5')
+        self.model.setData(self.model.index(1, 1), u'Other')
+
+        self.assertEqual(self._rows(u'name 5', MATCH_EXACT), [0])
+        self.assertEqual(self._rows(u'name 10', MATCH_PREFIX),
+                         range(2, 11))
+        self.assertEqual(self._rows(u'other'), [1])
+
+    def test_find_row(self):
+        self.model.setData(self.model.index(5, 1), u'name 7')
+
+        self.assertEqual(self.model.find_row(1, u'Name 7'), 7)
+        self.assertEqual(self.model.find_row(1, u'name 7'), 5)
+        self.assertEqual(self.model.find_row(1, u'Name 5'), -1)
+        self.assertEqual(self.model.find_row(0, 42), 42)
+
+    def test_find_row_after_insert_and_remove(self):
+        key = self.model.row_key(150)
+
+        self.model.insertRows(10, 3)
+        self.assertEqual(self.model.find_row(1, u'Name 150'), 153)
+
+        self.model.removeRows(0, 20)
+        self.assertEqual(self.model.find_row(1, u'Name 150'), 133)
+        self.assertEqual(self.model.find_row(1, u'Name 5'), -1)
+        self.assertEqual(self.model.key_row(key), 133)
+
+        self.model.append_rows([[200, u'Name 200']])
+        self.assertEqual(self.model.find_row(1, u'Name 200'), 183)
+
+
+def suite():
+    suite = makeSuite(TestColumnarTableModel, 'test')
+    suite.addTests(makeSuite(TestColumnIndex, 'test'))
+
+    return suite
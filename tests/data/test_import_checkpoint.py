@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data.importexport import checkpoint
+from stdm.data.importexport.checkpoint import ImportCheckpoint
+
+COLUMN_MAPPING = {'first_name': 'first_name', 'gender': 'gender'}
+
+DATABASE = [u'localhost', u'5432', u'stdm', u'postgres']
+
+
+class TestImportCheckpoint(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.jobs_dir = checkpoint.IMPORT_JOBS_DIR
+        checkpoint.IMPORT_JOBS_DIR = os.path.join(self.tmp_dir, 'import_jobs')
+
+        self.source_file = os.path.join(self.tmp_dir, 'people.csv')
+        with open(self.source_file, 'wb') as f:
+            f.write('first_name,gender\nAchieng,Female\nOtieno,Male\n')
+
+    def tearDown(self):
+        checkpoint.IMPORT_JOBS_DIR = self.jobs_dir
+        shutil.rmtree(self.tmp_dir)
+
+    def _load(self, column_mapping=COLUMN_MAPPING, database=DATABASE):
+        return ImportCheckpoint.load(self.source_file, 'hl_person',
+                                     column_mapping, database=database)
+
+    def test_load_without_checkpoint(self):
+        self.assertFalse(self._load().has_progress)
+
+    def test_update_and_load(self):
+        self._load().update(1000, 999, 995, 5)
+        saved = self._load()
+
+        self.assertEqual(saved.offset, 1000)
+        self.assertEqual(saved.last_fid, 999)
+        self.assertEqual(saved.imported, 995)
+        self.assertEqual(saved.failed, 5)
+
+    def test_changed_mapping(self):
+        self._load().update(1000, 999, 1000, 0)
+
+        self.assertFalse(self._load({'first_name': 'last_name'}).has_progress)
+
+    def test_changed_database(self):
+        self._load().update(1000, 999, 1000, 0)
+
+        other_database = [u'10.0.0.5', u'5432', u'stdm', u'postgres']
+
+        self.assertFalse(self._load(database=other_database).has_progress)
+        self.assertTrue(self._load().has_progress)
+
+    def test_changed_source_file(self):
+        self._load().update(1000, 999, 1000, 0)
+
+        with open(self.source_file, 'ab') as f:
+            f.write('Wanjiru,Female\n')
+
+        self.assertFalse(self._load().has_progress)
+
+    def test_reset(self):
+        saved = self._load()
+        saved.update(1000, 999, 1000, 0)
+        saved.reset()
+
+        self.assertFalse(os.path.exists(saved.path))
+        self.assertFalse(self._load().has_progress)
+
+
+def suite():
+    suite = makeSuite(TestImportCheckpoint, 'test')
+
+    return suite
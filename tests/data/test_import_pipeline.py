@@ -0,0 +1,158 @@
+from collections import Counter
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data.importexport.pipeline import (
+    ImportPipeline,
+    MAX_PROCESSES,
+    TranslationPlan
+)
+
+
+class _Geometry(object):
+    def __init__(self, name):
+        self._name = name
+
+    def ExportToWkb(self):
+        return '\x01'
+
+    def GetGeometryName(self):
+        return self._name
+
+
+class _Feature(object):
+    def __init__(self, fid, values, geom_name=None):
+        self._fid = fid
+        self._values = values
+        self._geom = None if geom_name is None else _Geometry(geom_name)
+
+    def GetFID(self):
+        return self._fid
+
+    def GetField(self, index):
+        return self._values[index]
+
+    def GetGeometryRef(self):
+        return self._geom
+
+
+class _Layer(object):
+    def __init__(self, features):
+        self._features = features
+        self._pos = 0
+
+    def ResetReading(self):
+        self._pos = 0
+
+    def SetNextByIndex(self, index):
+        self._pos = index
+
+        return 0
+
+    def GetNextFeature(self):
+        if self._pos >= len(self._features):
+            return None
+
+        feat = self._features[self._pos]
+        self._pos += 1
+
+        return feat
+
+
+class _Writer(object):
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    def add(self, fid, values):
+        self.rows.append((fid, values))
+
+    def close(self):
+        self.closed = True
+
+
+def _plan():
+    #Copies the name and translates the party code to the party id
+    plan = TranslationPlan()
+    plan.field_indexes = [0, 1]
+    plan.direct_columns = [(0, 'name')]
+    plan.translated_columns = [(
+        'party_id',
+        [1],
+        {
+            'type': 'related',
+            'source_columns': ['code'],
+            'key_types': [None],
+            'values': {(u'A',): 1, (u'B',): 2}
+        }
+    )]
+
+    return plan
+
+
+class TestImportPipeline(TestCase):
+    def _features(self, count):
+        codes = ['A', 'B', 'C']
+
+        return [_Feature(i, ('name{0}'.format(i), codes[i % 3]))
+                for i in range(count)]
+
+    def test_rows_are_written_in_order(self):
+        writer = _Writer()
+        pipeline = ImportPipeline(_Layer(self._features(25)), _plan(),
+                                  writer, processes=2, batch_size=4)
+        pipeline.start()
+        pipeline.wait()
+
+        self.assertIsNone(pipeline.error)
+        self.assertTrue(writer.closed)
+        self.assertEqual(pipeline.processed, 25)
+        self.assertEqual([fid for fid, values in writer.rows], range(25))
+        self.assertEqual(writer.rows[1][1],
+                         {'name': 'name1', 'party_id': 2})
+        self.assertNotIn('party_id', writer.rows[2][1])
+        self.assertEqual(pipeline.unresolved['party_id'], Counter({u'C': 8}))
+
+    def test_resume_from_offset(self):
+        writer = _Writer()
+        pipeline = ImportPipeline(_Layer(self._features(10)), _plan(),
+                                  writer, processes=2, batch_size=3,
+                                  start_offset=6)
+        pipeline.start()
+        pipeline.wait()
+
+        self.assertEqual([fid for fid, values in writer.rows], range(6, 10))
+
+    def test_worker_error(self):
+        #Geometry type mismatch raises an error in the worker process
+        plan = _plan()
+        plan.geom_column = 'geom'
+        plan.geom_type = 'POINT'
+
+        features = self._features(10)
+        features[7] = _Feature(7, ('name7', 'A'), 'POLYGON')
+
+        writer = _Writer()
+        pipeline = ImportPipeline(_Layer(features), plan, writer,
+                                  processes=2, batch_size=2)
+        pipeline.start()
+        pipeline.wait()
+
+        self.assertIsInstance(pipeline.error, TypeError)
+        self.assertTrue(pipeline.cancelled)
+        self.assertFalse(writer.closed)
+        self.assertFalse(pipeline.is_running())
+
+    def test_processes_are_capped(self):
+        pipeline = ImportPipeline(_Layer([]), _plan(), _Writer(),
+                                  processes=64)
+
+        self.assertEqual(pipeline.processes, MAX_PROCESSES)
+
+
+def suite():
+    suite = makeSuite(TestImportPipeline, 'test')
+
+    return suite
@@ -0,0 +1,87 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.tests.utils import qgis_app
+
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.data.configuration.model_registry import EntityModelRegistry
+
+from stdm.tests.data.utils import (
+    add_basic_profile,
+    add_household_entity,
+    add_person_entity,
+    BASIC_PROFILE
+)
+
+
+class PersonModel(object):
+    pass
+
+
+class HouseholdModel(object):
+    pass
+
+
+class TestEntityModelRegistry(TestCase):
+    def setUp(self):
+        self.config = StdmConfiguration.instance()
+        self.profile = add_basic_profile(self.config)
+        self.person = add_person_entity(self.profile)
+        self.household = add_household_entity(self.profile)
+
+        self.registry = EntityModelRegistry.instance()
+        self.registry.clear()
+
+        self.person_key = self.registry.key(self.person)
+        self.household_key = self.registry.key(self.household, True)
+
+        self.registry.add(self.person_key, PersonModel,
+                          [self.person.name, self.household.name])
+        self.registry.add(self.household_key, HouseholdModel,
+                          [self.household.name])
+
+    def tearDown(self):
+        self.registry.clear()
+        self.config.remove_profile(BASIC_PROFILE)
+
+    def test_key(self):
+        self.assertEqual(self.person_key, (BASIC_PROFILE, self.person.name,
+                                           False, False))
+
+    def test_hit_miss_counters(self):
+        self.assertIs(self.registry.get(self.person_key), PersonModel)
+        self.assertIsNone(self.registry.get(self.registry.key(self.person,
+                                                              True)))
+
+        stats = self.registry.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['models'], 2)
+
+    def test_invalidate_related_entity(self):
+        #Household is reflected in both models
+        num_removed = self.registry.invalidate_entity(self.household.name)
+
+        self.assertEqual(num_removed, 2)
+        self.assertEqual(len(self.registry), 0)
+
+    def test_invalidate_entity(self):
+        num_removed = self.registry.invalidate_entity(self.person.name)
+
+        self.assertEqual(num_removed, 1)
+        self.assertIn(self.household_key, self.registry)
+
+    def test_invalidate_profile(self):
+        self.registry.invalidate_profile('Rural')
+        self.assertEqual(len(self.registry), 2)
+
+        self.registry.invalidate_profile(BASIC_PROFILE)
+        self.assertEqual(len(self.registry), 0)
+
+
+def suite():
+    suite = makeSuite(TestEntityModelRegistry, 'test')
+
+    return suite
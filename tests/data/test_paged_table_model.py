@@ -0,0 +1,124 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from PyQt4.QtCore import Qt
+
+from stdm.data.qtmodels import PagedEntityTableModel
+
+NUM_RECORDS = 95
+
+
+class TestPagedEntityTableModel(TestCase):
+    def setUp(self):
+        #Ids with gaps as left by deleted records
+        self.records = [[i * 2, u'Name {0:d}'.format(i)]
+                        for i in range(1, NUM_RECORDS + 1)]
+        self.num_queries = 0
+
+        self.model = PagedEntityTableModel(
+            self.fetch_rows,
+            ['id', 'name'],
+            page_size=10,
+            max_resident_rows=30
+        )
+
+    def fetch_rows(self, after_id, limit, ids=None):
+        self.num_queries += 1
+
+        if not ids is None:
+            return [list(r) for r in self.records if r[0] in ids]
+
+        records = sorted(self.records,
+                         reverse=self.model.sort_order == Qt.DescendingOrder)
+        ids = [r[0] for r in records]
+        start = 0 if after_id is None else ids.index(after_id) + 1
+
+        return [list(r) for r in records[start:start + limit]]
+
+    def _name(self, row):
+        return self.model.data(self.model.index(row, 1), Qt.DisplayRole)
+
+    def test_fetch_pages(self):
+        self.assertTrue(self.model.canFetchMore())
+
+        self.model.fetchMore()
+        self.assertEqual(self.model.rowCount(), 10)
+
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+
+        self.assertEqual(self.model.rowCount(), NUM_RECORDS)
+        self.assertEqual(self.model.record_id(NUM_RECORDS - 1),
+                         NUM_RECORDS * 2)
+
+    def test_evicted_rows_are_reloaded(self):
+        self.assertEqual(self.model.fetch_until(150), 74)
+        self.assertEqual(self.num_queries, 8)
+
+        #First page has been evicted
+        self.assertEqual(self._name(3), u'Name 4')
+        self.assertEqual(self.num_queries, 9)
+
+    def test_sort_reloads_rows(self):
+        self.model.fetchMore()
+        self.model.sort(0, Qt.DescendingOrder)
+
+        self.assertEqual(self.model.rowCount(), 10)
+        self.assertEqual(self.model.record_id(0), NUM_RECORDS * 2)
+        self.assertEqual(self.model.fetch_until(2), NUM_RECORDS - 1)
+
+    def test_asynchronous_pages(self):
+        requests = []
+        model = PagedEntityTableModel(
+            self.fetch_rows,
+            ['id', 'name'],
+            page_size=10,
+            request_page=lambda *args: requests.append(args)
+        )
+        self.model = model
+
+        model.fetchMore()
+        model.fetchMore()
+        self.assertEqual(len(requests), 1)
+        self.assertTrue(model.loading)
+
+        request, after_id, limit = requests[0]
+        self.assertTrue(model.append_page(request,
+                                          self.fetch_rows(after_id, limit)))
+        self.assertEqual(model.rowCount(), 10)
+
+        #Rows of a cancelled request are ignored
+        model.fetchMore()
+        model.cancel()
+        request, after_id, limit = requests[1]
+        self.assertFalse(model.append_page(request,
+                                           self.fetch_rows(after_id, limit)))
+        self.assertEqual(model.rowCount(), 10)
+        self.assertFalse(model.loading)
+
+    def test_insert_and_remove_rows(self):
+        self.model.fetchMore()
+
+        #New record added by the entity browser
+        self.records.append([500, u'New'])
+        self.model.insertRows(10, 1)
+        self.model.setData(self.model.index(10, 0), 500)
+        self.model.setData(self.model.index(10, 1), u'New')
+
+        self.model.removeRows(0, 1)
+
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+
+        self.assertEqual(self.model.rowCount(), NUM_RECORDS)
+        self.assertEqual(self.model.row_for_id(500), 9)
+        self.assertEqual(self.model.row_for_id(2), -1)
+        self.assertEqual(self._name(9), u'New')
+
+
+def suite():
+    suite = makeSuite(TestPagedEntityTableModel, 'test')
+
+    return suite
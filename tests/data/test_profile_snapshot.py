@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy import text
+
+from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.data.database import STDMDb
+from stdm.data.importexport.snapshot import (
+    ProfileSnapshotReader,
+    ProfileSnapshotWriter
+)
+from stdm.data.pg_utils import delete_table_data
+
+from stdm.tests.data.utils import (
+    BASIC_PROFILE,
+    create_alchemy_engine,
+    HOUSEHOLD_ENTITY,
+    PERSON_ENTITY,
+    populate_configuration
+)
+
+
+class TestProfileSnapshot(TestCase):
+    def setUp(self):
+        self.config = StdmConfiguration.instance()
+        populate_configuration(self.config)
+
+        #Creating the profile tables fills the value lists
+        config_updater = ConfigurationSchemaUpdater(create_alchemy_engine())
+        config_updater.exec_()
+
+        self.profile = self.config.profile(BASIC_PROFILE)
+        self.person = self.profile.entity(PERSON_ENTITY)
+        self.household = self.profile.entity(HOUSEHOLD_ENTITY)
+        self.gender = self.person.columns['gender'].value_list
+
+        #Also removes the person records
+        delete_table_data(self.household.name)
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'snapshot.gpkg')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        self.config = None
+
+    def _execute(self, sql, **kwargs):
+        return STDMDb.instance().engine.execute(text(sql), **kwargs)
+
+    def _lookup_id(self, value):
+        return self._execute(
+            'SELECT id FROM {0} WHERE value = :value'.format(self.gender.name),
+            value=value
+        ).scalar()
+
+    def test_import_into_new_profile(self):
+        self._execute(
+            'INSERT INTO {0} (id) VALUES (1)'.format(self.household.name)
+        )
+        self._execute(
+            'INSERT INTO {0} (id, household_id, first_name, last_name, '
+            'gender) VALUES (1, 1, :first_name, :last_name, :gender)'.format(
+                self.person.name
+            ),
+            first_name='Jane',
+            last_name='Doe',
+            gender=self._lookup_id('Female')
+        )
+
+        self.assertTrue(ProfileSnapshotWriter(self.profile, self.path).write())
+
+        #Profile created afresh, its lookups have different ids
+        delete_table_data(self.household.name)
+        delete_table_data(self.gender.name)
+        for value in ('Other', 'Female', 'Male'):
+            self._execute(
+                'INSERT INTO {0} (value) VALUES (:value)'.format(
+                    self.gender.name
+                ),
+                value=value
+            )
+
+        reader = ProfileSnapshotReader(self.profile, self.path)
+        self.assertEqual(reader.validate(), [])
+
+        report = reader.load()
+        self.assertFalse(report.has_errors)
+
+        person_gender = self._execute(
+            'SELECT g.value FROM {0} p JOIN {1} g ON g.id = p.gender'.format(
+                self.person.name, self.gender.name
+            )
+        ).scalar()
+        self.assertEqual(person_gender, 'Female')
+
+        num_lookups = self._execute(
+            'SELECT COUNT(*) FROM {0}'.format(self.gender.name)
+        ).scalar()
+        self.assertEqual(num_lookups, 3)
+
+    def test_entity_tables_should_be_empty(self):
+        self.assertTrue(ProfileSnapshotWriter(self.profile, self.path).write())
+
+        self._execute(
+            'INSERT INTO {0} (id) VALUES (1)'.format(self.household.name)
+        )
+
+        reader = ProfileSnapshotReader(self.profile, self.path)
+        msgs = reader.validate()
+
+        self.assertEqual(len(msgs), 1)
+        self.assertIn(self.household.name, msgs[0])
+
+
+def suite():
+    suite = makeSuite(TestProfileSnapshot, 'test')
+
+    return suite
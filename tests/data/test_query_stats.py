@@ -0,0 +1,84 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy.exc import DBAPIError
+
+from stdm.data.database import STDMDb
+from stdm.data.query_stats import (
+    ActionStatistics,
+    fingerprint,
+    instrumented_action,
+    N_PLUS_ONE_THRESHOLD,
+    QueryStatistics
+)
+
+
+class TestQueryStatistics(TestCase):
+    def test_fingerprint_replaces_values(self):
+        fp_a = fingerprint("SELECT * FROM ho_household WHERE id = 15 "
+                           "AND name = 'Otieno'")
+        fp_b = fingerprint("SELECT *  FROM ho_household\nWHERE id = 27 "
+                           "AND name = 'O''Brien'")
+
+        self.assertEqual(fp_a, fp_b)
+        self.assertEqual(
+            fp_a, 'SELECT * FROM ho_household WHERE id = ? AND name = ?'
+        )
+
+    def test_fingerprint_replaces_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT geom::text FROM t WHERE id IN '
+                        '(%(id_1)s, %(id_2)s, %(id_3)s)'),
+            'SELECT geom::text FROM t WHERE id IN (?)'
+        )
+
+    def test_n_plus_one(self):
+        action = ActionStatistics('Open entity browser')
+        action.add('SELECT * FROM ho_household', 0.01, 100)
+
+        for i in range(N_PLUS_ONE_THRESHOLD):
+            action.add('SELECT * FROM ho_person WHERE id = ?', 0.001, 1)
+
+        n_plus_one = action.n_plus_one()
+
+        self.assertEqual(action.query_count, N_PLUS_ONE_THRESHOLD + 1)
+        self.assertEqual(len(n_plus_one), 1)
+        self.assertEqual(n_plus_one[0].rows, N_PLUS_ONE_THRESHOLD)
+
+    def test_instrumented_action_ignores_extra_args(self):
+        @instrumented_action('Search')
+        def search():
+            return True
+
+        #Qt signals may pass more arguments than the slot accepts
+        self.assertTrue(search(False))
+
+    def test_failed_statement(self):
+        stats = QueryStatistics.instance()
+        enabled = stats.enabled
+        stats.set_enabled(True)
+
+        action = stats.begin_action('Failed statement')
+        conn = STDMDb.instance().engine.connect()
+
+        try:
+            self.assertRaises(DBAPIError, conn.execute,
+                              'SELECT * FROM stdm_missing_table')
+            conn.execute('SELECT 1')
+
+            self.assertFalse('stdm_query_start' in conn.info)
+
+        finally:
+            conn.close()
+            stats.end_action(action)
+            stats.set_enabled(enabled)
+
+        self.assertEqual(action.query_count, 1)
+
+
+def suite():
+    suite = makeSuite(TestQueryStatistics, 'test')
+
+    return suite
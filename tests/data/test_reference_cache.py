@@ -0,0 +1,122 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.tests.utils import qgis_app
+
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.data.reference_cache import ReferenceDataCache
+from stdm.settings import registryconfig
+
+from stdm.tests.data.utils import (
+    add_basic_profile,
+    add_household_entity,
+    add_person_entity,
+    BASIC_PROFILE
+)
+
+
+class Record(object):
+    def __init__(self, id):
+        self.id = id
+        self.name = u'Name {0}'.format(id)
+        self.code = u'C{0}'.format(id)
+
+
+class RecordModel(object):
+    """
+    Stands in for the model of an entity, criteria are the ids to load.
+    """
+    class id(object):
+        @staticmethod
+        def in_(ids):
+            return list(ids)
+
+
+class TestReferenceDataCache(TestCase):
+    def setUp(self):
+        self.config = StdmConfiguration.instance()
+        self.profile = add_basic_profile(self.config)
+        self.person = add_person_entity(self.profile)
+        self.household = add_household_entity(self.profile)
+
+        self.cache = ReferenceDataCache.instance()
+        self.cache.clear()
+
+        self.queries = []
+        self.cache.model = lambda entity: RecordModel
+        self.cache._query = self._query
+
+        self.cache_size = registryconfig.reference_cache_size
+        registryconfig.reference_cache_size = lambda: 3
+
+    def tearDown(self):
+        registryconfig.reference_cache_size = self.cache_size
+
+        del self.cache.model
+        del self.cache._query
+        self.cache.clear()
+
+        self.config.remove_profile(BASIC_PROFILE)
+
+    def _query(self, model, criterion=None):
+        self.queries.append(criterion)
+        ids = range(1, 6) if criterion is None else criterion
+
+        return [Record(i) for i in ids if i <= 5]
+
+    def test_values_are_loaded_once(self):
+        values = self.cache.values(self.household, ('name', 'code'))
+        self.cache.values(self.household, ('name', 'code'))
+
+        self.assertEqual(values.keys(), [1, 2, 3, 4, 5])
+        self.assertEqual(values[2], [u'Name 2', u'C2'])
+        self.assertEqual(len(self.queries), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_parent_records_are_batched_and_bounded(self):
+        found = self.cache.parent_records(self.person, [1, 2, 2, 9, None])
+
+        self.assertEqual(sorted(found.keys()), [1, 2])
+        self.assertEqual(len(self.queries), 1)
+
+        self.cache.parent_record(self.person, 1)
+        self.cache.parent_records(self.person, [3, 4])
+
+        #Record 2 is the least recently used one
+        self.assertEqual(self.cache.stats()['records'], 3)
+        self.cache.parent_record(self.person, 2)
+        self.assertEqual(len(self.queries), 3)
+
+    def test_given_models_are_not_mapped(self):
+        def model(entity):
+            raise AssertionError('Model mapped outside the main thread.')
+
+        self.cache.model = model
+
+        values = self.cache.load_values(self.household, ('name', 'code'),
+                                        [1, 9], RecordModel)
+        found = self.cache.parent_records(self.person, [1, 2], RecordModel)
+
+        self.assertEqual(len(values), 5)
+        self.assertEqual(sorted(found.keys()), [1, 2])
+
+    def test_invalidate_table(self):
+        self.cache.values(self.household, ('name', 'code'))
+        self.cache.parent_records(self.person, [1])
+
+        self.cache.invalidate_table(self.household.name)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['tables'], 0)
+        self.assertEqual(stats['records'], 1)
+
+        self.cache.invalidate_profile(BASIC_PROFILE)
+        self.assertEqual(self.cache.stats()['records'], 0)
+
+
+def suite():
+    suite = makeSuite(TestReferenceDataCache, 'test')
+
+    return suite
@@ -0,0 +1,79 @@
+import json
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data import tracing
+from stdm.data.tracing import (
+    trace_span,
+    traced,
+    Tracer
+)
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        self.trace_dir = tracing.TRACE_DIR
+        tracing.TRACE_DIR = tempfile.mkdtemp()
+
+        self.tracer = Tracer.instance()
+        self.was_enabled = self.tracer.enabled
+        self.tracer.set_enabled(False)
+        self.tracer.set_enabled(True)
+
+    def tearDown(self):
+        self.tracer.set_enabled(False)
+        self.tracer.set_enabled(self.was_enabled)
+
+        shutil.rmtree(tracing.TRACE_DIR)
+        tracing.TRACE_DIR = self.trace_dir
+
+    def _trace_events(self):
+        path = self.tracer.path
+        self.tracer.close()
+
+        with open(path, 'rb') as f:
+            events = json.load(f)
+
+        return dict((e['name'], e) for e in events if e['ph'] == 'X')
+
+    def test_nested_spans(self):
+        @traced('OGRReader.featToDb', 'import')
+        def import_features():
+            with trace_span('write_chunk', rows=500):
+                pass
+
+        import_features()
+        events = self._trace_events()
+
+        parent = events['OGRReader.featToDb']
+        child = events['write_chunk']
+
+        self.assertEqual(parent['cat'], 'import')
+        self.assertEqual(child['args'], {'rows': 500})
+        self.assertTrue(child['ts'] >= parent['ts'])
+        #Microsecond rounding
+        self.assertTrue(
+            child['ts'] + child['dur'] <= parent['ts'] + parent['dur'] + 1
+        )
+
+    def test_failed_span_is_written(self):
+        try:
+            with trace_span('generate'):
+                raise ValueError('No template')
+
+        except ValueError:
+            pass
+
+        events = self._trace_events()
+
+        self.assertEqual(events['generate']['args'], {'error': 'ValueError'})
+
+
+def suite():
+    suite = makeSuite(TestTracing, 'test')
+
+    return suite
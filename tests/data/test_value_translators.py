@@ -0,0 +1,95 @@
+from datetime import (
+    date,
+    datetime
+)
+from decimal import Decimal
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy.types import (
+    Boolean,
+    Date,
+    DateTime,
+    Integer,
+    Numeric,
+    String
+)
+
+from stdm.data.importexport.value_translators import (
+    is_typed_key,
+    key_value_type,
+    normalize_key_value
+)
+
+
+class TestValueTranslatorKeys(TestCase):
+    def test_key_value_type(self):
+        self.assertEqual(key_value_type(Integer()), Decimal)
+        self.assertEqual(key_value_type(Numeric()), Decimal)
+        self.assertEqual(key_value_type(Date()), date)
+        self.assertEqual(key_value_type(DateTime()), datetime)
+        self.assertEqual(key_value_type(Boolean()), bool)
+        self.assertIsNone(key_value_type(String()))
+
+    def test_numeric_keys(self):
+        db_key = normalize_key_value(Decimal('12.50'), Decimal)
+
+        self.assertEqual(normalize_key_value('12.5', Decimal), db_key)
+        self.assertEqual(normalize_key_value(12.5, Decimal), db_key)
+        self.assertEqual(
+            hash(normalize_key_value(' 12.500 ', Decimal)), hash(db_key)
+        )
+
+    def test_integer_keys(self):
+        db_key = normalize_key_value(12, Decimal)
+        cache = {(db_key,): 'found'}
+
+        for source_value in ('12', u'12.0', 12.0, 12L, Decimal('12')):
+            key = (normalize_key_value(source_value, Decimal),)
+            self.assertEqual(cache.get(key), 'found')
+
+    def test_date_keys(self):
+        db_key = normalize_key_value(date(2014, 10, 22), date)
+
+        self.assertEqual(normalize_key_value('2014-10-22', date), db_key)
+        self.assertEqual(normalize_key_value('2014/10/22', date), db_key)
+        self.assertEqual(
+            normalize_key_value(datetime(2014, 10, 22, 8, 30), date), db_key
+        )
+
+    def test_datetime_keys(self):
+        db_key = normalize_key_value(datetime(2014, 10, 22, 8, 30), datetime)
+
+        self.assertEqual(
+            normalize_key_value('2014/10/22 08:30:00', datetime), db_key
+        )
+        self.assertEqual(
+            normalize_key_value('2014-10-22T08:30', datetime), db_key
+        )
+
+    def test_bool_keys(self):
+        self.assertEqual(normalize_key_value('Yes', bool), True)
+        self.assertEqual(normalize_key_value('f', bool), False)
+
+    def test_text_keys(self):
+        self.assertEqual(normalize_key_value(12.0), u'12')
+        self.assertEqual(normalize_key_value('Nyer\xc3\xad'), u'Nyer\xed')
+        self.assertIsNone(normalize_key_value(None, Decimal))
+
+    def test_invalid_keys_do_not_match(self):
+        key = (normalize_key_value('twelve', Decimal),
+               normalize_key_value('2014-22-10', date))
+
+        self.assertEqual(key, (u'twelve', u'2014-22-10'))
+        self.assertFalse(is_typed_key(key, [Decimal, date]))
+        self.assertTrue(
+            is_typed_key((Decimal('12'), None), [Decimal, date])
+        )
+
+
+def suite():
+    suite = makeSuite(TestValueTranslatorKeys, 'test')
+
+    return suite
@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data import pg_utils
+from stdm.settings import database_backup
+from stdm.settings.database_backup import (
+    BackupError,
+    DatabaseBackup,
+    DELTA_DIR
+)
+
+TABLE_COLUMNS = {
+    'party': ['id', 'name'],
+    'spatial_unit': ['id', 'code'],
+    'str': ['id', 'party_id', 'spatial_unit_id']
+}
+
+TABLE_DATA = {
+    'party': '1\tJane\n2\tJohn\n',
+    'spatial_unit': '1\tSU-001\n',
+    'str': '1\t1\t1\n2\t2\t1\n'
+}
+
+FOREIGN_KEYS = [
+    ('str', 'party_id', 'party', 'id'),
+    ('str', 'spatial_unit_id', 'spatial_unit', 'id')
+]
+
+
+class Catalog(object):
+    def column_types(self, table):
+        return OrderedDict((c, 'integer') for c in TABLE_COLUMNS[table])
+
+    def foreign_key_references(self):
+        return FOREIGN_KEYS
+
+
+class Database(object):
+    """
+    Records the statements and COPY operations of the backup.
+    """
+    def __init__(self):
+        self.statements = []
+        self.restored = []
+        self.committed = False
+        self.rolled_back = False
+        #Oldest transaction in progress and the changelog rows
+        self.xmin = 100
+        self.changelog = None
+
+    def raw_connection(self):
+        return Connection(self)
+
+
+class Connection(object):
+    def __init__(self, db):
+        self._db = db
+
+    def cursor(self):
+        return Cursor(self._db)
+
+    def commit(self):
+        self._db.committed = True
+
+    def rollback(self):
+        self._db.rolled_back = True
+
+    def close(self):
+        pass
+
+
+class Cursor(object):
+    def __init__(self, db):
+        self._db = db
+        self._result = None
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self._db.statements.append(sql)
+        self._rows = []
+
+        if 'pg_export_snapshot' in sql:
+            self._result = ('00000003-1',)
+        elif 'txid_snapshot_xmin' in sql:
+            self._result = (self._db.xmin,)
+        elif 'to_regclass' in sql:
+            self._result = (None,)
+            if not self._db.changelog is None:
+                self._result = ('stdm_changelog',)
+        elif 'DISTINCT ON' in sql:
+            since, until = params
+            self._rows = [(t, r, o) for t, r, o, txid in self._db.changelog
+                          if since <= txid < until]
+        else:
+            self._result = (None,)
+
+    def fetchone(self):
+        return self._result
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def mogrify(self, sql, params):
+        return "'{0}'".format(params[0])
+
+    def copy_expert(self, sql, file_obj):
+        self._db.statements.append(sql)
+
+        #Table name of 'COPY table ...' or 'COPY (SELECT ... FROM table'
+        table = re.search(r'(?:COPY|FROM) (\w+)', sql).group(1)
+
+        if 'TO STDOUT' in sql:
+            file_obj.write(TABLE_DATA[table])
+        else:
+            self._db.restored.append((table, file_obj.read()))
+
+    def close(self):
+        pass
+
+
+class TestDatabaseBackup(TestCase):
+    def setUp(self):
+        self.catalog_snapshot = pg_utils.catalog_snapshot
+        pg_utils.catalog_snapshot = Catalog
+        database_backup.catalog_snapshot = Catalog
+        self.pg_tables = database_backup.pg_tables
+        database_backup.pg_tables = lambda: TABLE_COLUMNS.keys()
+
+        self.backup_dir = tempfile.mkdtemp()
+        self.db = Database()
+        self.db_backup = DatabaseBackup(self.backup_dir, engine=self.db)
+
+    def tearDown(self):
+        pg_utils.catalog_snapshot = self.catalog_snapshot
+        database_backup.catalog_snapshot = self.catalog_snapshot
+        database_backup.pg_tables = self.pg_tables
+
+        shutil.rmtree(self.backup_dir)
+
+    def _backup(self):
+        return self.db_backup.backup(['str', 'party', 'spatial_unit'])
+
+    def test_manifest_round_trip(self):
+        manifest = self._backup()
+        entries = manifest['tables']
+
+        self.assertEqual(self.db_backup.manifest(), manifest)
+        self.assertEqual([e['table'] for e in entries],
+                         ['party', 'spatial_unit', 'str'])
+        self.assertEqual([e['rows'] for e in entries], [2, 1, 2])
+        self.assertEqual(entries[2]['columns'], TABLE_COLUMNS['str'])
+        self.assertEqual(self.db_backup.verify(), [])
+
+    def test_verify_detects_changed_files(self):
+        manifest = self._backup()
+        manifest['tables'][0]['sha256'] = '0' * 64
+        self.db_backup._write_manifest(self.backup_dir, manifest)
+
+        self.assertEqual(self.db_backup.verify(), ['party'])
+
+    def test_restore_dependency_order(self):
+        manifest = self._backup()
+
+        #Restore does not rely on the order of the tables in the manifest
+        manifest['tables'].reverse()
+        self.db_backup._write_manifest(self.backup_dir, manifest)
+        self.db.statements = []
+
+        restored = self.db_backup.restore(truncate=True)
+
+        tables = [t for t, data in self.db.restored]
+
+        self.assertTrue(self.db.statements[0].startswith('TRUNCATE'))
+        self.assertEqual(tables[-1], 'str')
+        self.assertEqual(sorted(tables[:2]), ['party', 'spatial_unit'])
+        self.assertEqual(self.db.restored[-1][1], TABLE_DATA['str'])
+        self.assertEqual(restored,
+                         {'party': 2, 'spatial_unit': 1, 'str': 2})
+        self.assertTrue(self.db.committed)
+
+    def test_restore_checksum_mismatch(self):
+        manifest = self._backup()
+        manifest['tables'][1]['sha256'] = '0' * 64
+        self.db_backup._write_manifest(self.backup_dir, manifest)
+        self.db.rolled_back = False
+
+        self.assertRaises(BackupError, self.db_backup.restore)
+        self.assertFalse(self.db.committed)
+        self.assertTrue(self.db.rolled_back)
+
+    def test_incomplete_backup_has_no_manifest(self):
+        self._backup()
+        TABLE_COLUMNS['missing'] = ['id']
+
+        try:
+            self.assertRaises(KeyError, self.db_backup.backup,
+                              ['party', 'missing'])
+
+        finally:
+            del TABLE_COLUMNS['missing']
+
+        self.assertFalse(os.path.exists(self.db_backup.manifest_path))
+        self.assertRaises(BackupError, self.db_backup.manifest)
+
+    def test_backup_records_watermark(self):
+        manifest = self._backup()
+
+        self.assertEqual(manifest['watermark'], 100)
+        self.assertEqual(self.db_backup.watermark(), 100)
+
+    def test_backup_changes(self):
+        self._backup()
+
+        #Transaction 95 finished before the backup snapshot was taken while
+        #transaction 104 may have been in progress
+        self.db.changelog = [
+            ('str', 1, 'U', 95),
+            ('str', 2, 'I', 104),
+            ('party', 1, 'D', 110),
+            ('party', 2, 'U', 125)
+        ]
+        self.db.xmin = 120
+        self.db.statements = []
+
+        manifest = self.db_backup.backup_changes()
+        entries = manifest['tables']
+
+        self.assertEqual((manifest['since'], manifest['until']), (100, 120))
+        self.assertEqual([e['table'] for e in entries], ['party', 'str'])
+        self.assertEqual(entries[0]['deleted'], [1])
+        self.assertEqual(entries[0]['file'], None)
+        self.assertEqual(entries[1]['deleted'], [])
+        self.assertEqual(entries[1]['rows'], 2)
+        self.assertTrue(any(['txid >= 100 AND txid < 120' in s
+                             for s in self.db.statements]))
+        self.assertEqual(self.db_backup.watermark(), 120)
+
+        #The changes of the next transactions are left to the next delta
+        self.db.changelog[0] = ('str', 1, 'U', 130)
+        self.db.xmin = 140
+
+        manifest = self.db_backup.backup_changes()
+
+        self.assertEqual([e['table'] for e in manifest['tables']],
+                         ['party', 'str'])
+        self.assertEqual(len(self.db_backup.delta_dirs()), 2)
+
+    def test_backup_changes_without_changelog(self):
+        self._backup()
+        self.db.xmin = 120
+
+        self.assertEqual(self.db_backup.backup_changes(), None)
+        self.assertEqual(self.db_backup.watermark(), 100)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.backup_dir, DELTA_DIR))
+        )
+
+    def test_backup_changes_without_new_transactions(self):
+        self._backup()
+        self.db.changelog = [('str', 1, 'U', 95)]
+
+        self.assertEqual(self.db_backup.backup_changes(), None)
+
+
+def suite():
+    suite = makeSuite(TestDatabaseBackup, 'test')
+
+    return suite
@@ -0,0 +1,330 @@
+"""
+/***************************************************************************
+Name                 : Database Backup
+Description          : Prompts for the backup directory and runs the full or
+                       incremental backup or restore of the STDM database
+                       with a progress dialog.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import os
+
+from PyQt4.QtCore import Qt
+from PyQt4.QtGui import (
+    QApplication,
+    QFileDialog,
+    QMessageBox,
+    QProgressDialog
+)
+
+from stdm.settings.database_backup import (
+    BACKUP_DIR,
+    DatabaseBackup
+)
+from stdm.settings.registryconfig import change_tracking
+
+LOGGER = logging.getLogger('stdm')
+
+
+def _tr(msg):
+    return QApplication.translate('DatabaseBackup', msg)
+
+
+def _progress_dialog(parent, title):
+    #Backups and restores cannot be cancelled once started
+    progress = QProgressDialog(parent)
+    progress.setWindowTitle(title)
+    progress.setCancelButton(None)
+    progress.setWindowModality(Qt.WindowModal)
+    progress.setMinimumDuration(0)
+
+    def on_progress(table, num_done, num_tables):
+        progress.setMaximum(num_tables)
+        progress.setValue(num_done)
+        progress.setLabelText(
+            _tr('Processed {0} ({1} of {2})...').format(
+                table, num_done, num_tables
+            )
+        )
+        QApplication.processEvents()
+
+    return progress, on_progress
+
+
+def _backup_directory(parent, title):
+    if not os.path.isdir(BACKUP_DIR):
+        os.makedirs(BACKUP_DIR)
+
+    return QFileDialog.getExistingDirectory(parent, title, BACKUP_DIR)
+
+
+def create_database_backup(parent):
+    """
+    Backs up all the tables of the STDM database to a directory selected
+    by the user.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :return: True if the backup was created.
+    :rtype: bool
+    """
+    title = _tr('Backup Database')
+
+    backup_dir = _backup_directory(parent, title)
+    if not backup_dir:
+        return False
+
+    db_backup = DatabaseBackup(backup_dir)
+
+    if os.path.exists(db_backup.manifest_path):
+        result = QMessageBox.question(
+            parent,
+            title,
+            _tr('The directory contains a backup which will be replaced.\n'
+                'Click Yes to proceed or No to cancel.'),
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if result != QMessageBox.Yes:
+            return False
+
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        manifest = db_backup.backup(progress_callback=on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    QMessageBox.information(
+        parent,
+        title,
+        _tr('{0:d} row(s) in {1:d} table(s) have been backed up.').format(
+            sum([e['rows'] for e in manifest['tables']]),
+            len(manifest['tables'])
+        )
+    )
+
+    return True
+
+
+def restore_database_backup(parent):
+    """
+    Restores the tables of the STDM database from a backup directory
+    selected by the user. The existing rows in the tables are replaced.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :return: True if the backup was restored.
+    :rtype: bool
+    """
+    title = _tr('Restore Database')
+
+    backup_dir = _backup_directory(parent, title)
+    if not backup_dir:
+        return False
+
+    db_backup = DatabaseBackup(backup_dir)
+
+    try:
+        manifest = db_backup.manifest()
+        invalid = db_backup.verify()
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    if len(invalid) > 0:
+        QMessageBox.critical(
+            parent,
+            title,
+            _tr('The backup cannot be restored, the files of the following '
+                'tables are missing or corrupt:') + '\n' + '\n'.join(invalid)
+        )
+
+        return False
+
+    result = QMessageBox.warning(
+        parent,
+        title,
+        _tr('The existing rows in the {0:d} table(s) of the backup created '
+            'on {1} will be permanently replaced.\nClick Yes to proceed or '
+            'No to cancel.').format(
+            len(manifest['tables']), manifest['created']
+        ),
+        QMessageBox.Yes | QMessageBox.No
+    )
+    if result != QMessageBox.Yes:
+        return False
+
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        restored = db_backup.restore(True, on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    QMessageBox.information(
+        parent,
+        title,
+        _tr('{0:d} row(s) in {1:d} table(s) have been restored.').format(
+            sum(restored.values()), len(restored)
+        )
+    )
+
+    return True
+
+
+def create_changes_backup(parent):
+    """
+    Backs up the changes in the tracked tables since the most recent full
+    or incremental backup in a directory selected by the user.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :return: True if the incremental backup was created.
+    :rtype: bool
+    """
+    title = _tr('Backup Database Changes')
+
+    if not change_tracking():
+        QMessageBox.warning(
+            parent,
+            title,
+            _tr('Change tracking is not enabled, it can be enabled in the '
+                'options dialog.')
+        )
+
+        return False
+
+    backup_dir = _backup_directory(parent, title)
+    if not backup_dir:
+        return False
+
+    db_backup = DatabaseBackup(backup_dir)
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        manifest = db_backup.backup_changes(progress_callback=on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    if manifest is None:
+        QMessageBox.information(
+            parent,
+            title,
+            _tr('There are no changes since the most recent backup.')
+        )
+
+        return False
+
+    QMessageBox.information(
+        parent,
+        title,
+        _tr('{0:d} changed row(s) in {1:d} table(s) have been backed '
+            'up.').format(
+            sum([e['rows'] + len(e['deleted']) for e in manifest['tables']]),
+            len(manifest['tables'])
+        )
+    )
+
+    return True
+
+
+def apply_changes_backup(parent):
+    """
+    Applies an incremental backup, in a directory selected by the user, to
+    the tables of the STDM database.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :return: True if the changes were applied.
+    :rtype: bool
+    """
+    title = _tr('Apply Database Changes')
+
+    delta_dir = _backup_directory(parent, title)
+    if not delta_dir:
+        return False
+
+    db_backup = DatabaseBackup()
+
+    try:
+        manifest = db_backup.manifest(delta_dir)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    result = QMessageBox.warning(
+        parent,
+        title,
+        _tr('The changes in the {0:d} table(s) of the incremental backup '
+            'created on {1} will be applied. Incremental backups should be '
+            'applied in the order in which they were created.\nClick Yes to '
+            'proceed or No to cancel.').format(
+            len(manifest['tables']), manifest['created']
+        ),
+        QMessageBox.Yes | QMessageBox.No
+    )
+    if result != QMessageBox.Yes:
+        return False
+
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        applied = db_backup.apply_changes(delta_dir, on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    QMessageBox.information(
+        parent,
+        title,
+        _tr('{0:d} row(s) have been updated and {1:d} row(s) deleted in '
+            '{2:d} table(s).').format(
+            sum([a[0] for a in applied.values()]),
+            sum([a[1] for a in applied.values()]),
+            len(applied)
+        )
+    )
+
+    return True
@@ -42,6 +42,7 @@ from PyQt4.QtCore import (
 from stdm.settings import current_profile
 from stdm.data.configuration import entity_model
 from stdm.composer.document_generator import DocumentGenerator
+from stdm.data.query_stats import instrumented_action
 from stdm.ui.progress_dialog import STDMProgressDialog
 from stdm.utils.util import (
     getIndex,
@@ -488,6 +489,7 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
         else:
             self.cboImageType.setEnabled(False)
 
+    @instrumented_action('Generate documents')
     def onGenerate(self):
         """
         Slot raised to initiate the certificate generation process.
@@ -19,10 +19,28 @@ email                : stdm@unhabitat.org
  ***************************************************************************/
 """
 from datetime import date
-from collections import OrderedDict
+from collections import (
+    namedtuple,
+    OrderedDict
+)
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
+from sqlalchemy import (
+    and_,
+    cast,
+    false,
+    func,
+    or_,
+    String
+)
+from sqlalchemy.orm import (
+    aliased,
+    sessionmaker,
+    subqueryload
+)
+from sqlalchemy.sql.expression import nullslast
+
 from qgis.utils import (
     iface
 )
@@ -38,16 +56,27 @@ from stdm.data.configuration.columns import (
     VirtualColumn
 )
 from stdm.data.configuration.entity import Entity
+from stdm.data.database import STDMDb
 from stdm.data.pg_utils import(
     table_column_names,
     qgsgeometry_from_wkbelement
 )
 
 from stdm.data.qtmodels import (
-    BaseSTDMTableModel,
-    VerticalHeaderSortFilterProxyModel
+    ColumnarTableModel,
+    IndexedSortFilterProxyModel,
+    PAGE_SIZE,
+    PagedEntityTableModel
+)
+from stdm.data.query_stats import query_action
+from stdm.data.record_count import (
+    COUNT_AUTO,
+    ExactRecordCounter,
+    record_count
 )
+from stdm.data.tracing import traced
 
+from stdm.ui.customcontrols.relation_line_edit import RelatedEntityLineEdit
 from stdm.ui.forms.widgets import ColumnWidgetRegistry
 from stdm.navigation import TableContentGroup
 from stdm.network.filemanager import NetworkFileManager
@@ -74,6 +103,29 @@ from stdm.utils.util import (
 __all__ = ["EntityBrowser", "EntityBrowserWithEditor",
            "ContentGroupEntityBrowser"]
 
+#Milliseconds after the last keystroke before the records are filtered
+FILTER_DELAY = 300
+
+#Column types whose values are filtered using equality
+_NUMERIC_TYPES = ('SERIAL', 'INT', 'DOUBLE', 'PERCENT')
+
+#Column types which are filtered and sorted on the referenced table
+_JOINED_TYPES = ('LOOKUP', 'ADMIN_SPATIAL_UNIT', 'FOREIGN_KEY')
+
+#Column types which are not stored in the entity table
+_VIRTUAL_TYPES = ('VIRTUAL', 'MULTIPLE_SELECT')
+
+#Filter, sort and referenced models of the browser when the records are
+#queried, read on the main thread so that worker threads do not read the
+#state of the widgets
+_QueryState = namedtuple(
+    '_QueryState',
+    ['filter_column', 'filter_text', 'sort_name', 'ascending', 'ref_models']
+)
+
+#Sort value of a record which has not been loaded by the browser
+_UNKNOWN_VALUE = object()
+
 class _EntityDocumentViewerHandler(object):
     """
     Class that loads the document viewer to display all documents
@@ -218,6 +270,23 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         #ID of a record to select once records have been added to the table
         self._select_item = None
 
+        #Filter applied in the database when records are loaded in pages
+        self._filter_column = None
+        self._filter_text = u''
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY)
+        self._filter_timer.timeout.connect(self._apply_filter)
+
+        #Exact counts of large tables are loaded in a worker thread
+        self._count_request = 0
+
+        #Models of the tables joined by the queries of the worker threads,
+        #mapped on the main thread since mapping is not thread-safe
+        self._ref_models = {}
+        #Sort column, id and sort value of the last record of the last page
+        self._last_sort_value = None
+
         #Enable viewing of supporting documents
         if self.can_view_supporting_documents:
             self._add_view_supporting_docs_btn()
@@ -344,7 +413,8 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             return
         try:
             if not self._dbmodel is None:
-                self._initializeData()
+                with query_action('Open entity browser'):
+                    self._initializeData()
 
         except Exception as ex:
             pass
@@ -370,23 +440,89 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         """
         self._notifBar.clear()
 
-    def recomputeRecordCount(self):
+    def recomputeRecordCount(self, policy=COUNT_AUTO):
         '''
         Get the number of records in the specified table and updates the window title.
+        Large tables are not counted, the estimate of the database is shown
+        until the records have been counted in a worker thread.
+        :param policy: Count policy as defined in stdm.data.record_count.
+        :type policy: str
+        :return: Returns the exact or estimated number of records.
+        :rtype: int
         '''
-        entity = self._dbmodel()
+        self._count_request += 1
+        state = self._query_state()
+
+        numRecords, exact = record_count(
+            self._count_query(state=state),
+            self._entity.name,
+            policy
+        )
+
+        if not exact:
+            counter = ExactRecordCounter(
+                self._count_request,
+                lambda session: self._count_query(session, state)
+            )
+            counter.signals.counted.connect(self._on_records_counted)
+
+            QThreadPool.globalInstance().start(counter)
+
+        self._set_record_count(numRecords, exact)
+
+        return numRecords
+
+    def _count_query(self, session=None, state=None):
+        #Query of the records matching the filter applied in the database
+        if session is None:
+            query = self._dbmodel().queryObject()
+        else:
+            query = session.query(self._dbmodel)
 
-        #Get number of records
-        numRecords = entity.queryObject().count()
+        if state is None:
+            state = self._query_state()
 
+        if isinstance(self._tableModel, PagedEntityTableModel) and \
+                state.filter_text and not state.filter_column is None:
+            query = self._filter_query(query, state)
+
+        return query
+
+    def _query_state(self):
+        """
+        Reads the filter, sort and referenced models used to query the
+        records. It should be called on the main thread.
+        :return: Returns the state of the browser for the query.
+        :rtype: _QueryState
+        """
+        if isinstance(self._tableModel, PagedEntityTableModel):
+            sort_name = self._entity_attrs[self._tableModel.sort_column]
+            ascending = self._tableModel.sort_order == Qt.AscendingOrder
+        else:
+            sort_name, ascending = 'id', True
+
+        return _QueryState(
+            self._filter_column,
+            self._filter_text,
+            sort_name,
+            ascending,
+            dict(self._ref_models)
+        )
+
+    def _set_record_count(self, numRecords, exact=True):
+        #Shows the number of records in the window title
         rowStr = "row" if numRecords == 1 else "rows"
+        countStr = str(numRecords) if exact else '~{0}'.format(numRecords)
         windowTitle = "{0} - {1} {2}".format(
             unicode(self.title()),
             unicode(QApplication.translate("EntityBrowser",
-                                           str(numRecords))),rowStr)
+                                           countStr)),rowStr)
         self.setWindowTitle(windowTitle)
 
-        return numRecords
+    def _on_records_counted(self, request, numRecords):
+        #Slot raised when the worker has counted the records
+        if request == self._count_request:
+            self._set_record_count(numRecords)
 
     def _init_entity_columns(self):
         """
@@ -427,6 +563,11 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
 
                 self._entity_attrs.append(col_name)
 
+                if c.TYPE_INFO in _JOINED_TYPES:
+                    ref_model = self._reference_model(c)
+                    if not ref_model is None:
+                        self._ref_models[c.name] = ref_model
+
                 #Get widget factory so that we can use the value formatter
                 w_factory = ColumnWidgetRegistry.factory(c.TYPE_INFO)
                 if not w_factory is None:
@@ -459,6 +600,17 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 msg
             )
 
+    def _reference_model(self, column):
+        #Model of the value list, administrative units or parent entity
+        if column.TYPE_INFO == 'LOOKUP':
+            ref_entity = column.value_list
+        elif column.TYPE_INFO == 'FOREIGN_KEY':
+            ref_entity = column.entity_relation.parent
+        else:
+            ref_entity = self._entity.profile.administrative_spatial_unit
+
+        return entity_model(ref_entity, entity_only=True)
+
     def _select_record(self, id):
         #Selects record with the given ID.
         if id is None:
@@ -467,14 +619,26 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         m = self.tbEntity.model()
         s = self.tbEntity.selectionModel()
 
-        start_idx = m.index(0, 0)
-        idxs = m.match(
-            start_idx,
-            Qt.DisplayRole,
-            id,
-            1,
-            Qt.MatchExactly
-        )
+        if isinstance(self._tableModel, PagedEntityTableModel):
+            #Load the pages up to the record instead of searching all rows
+            row = self._tableModel.fetch_until(id)
+            idxs = []
+            if row != -1:
+                idxs.append(
+                    self._proxyModel.mapFromSource(
+                        self._tableModel.index(row, 0)
+                    )
+                )
+
+        else:
+            start_idx = m.index(0, 0)
+            idxs = m.match(
+                start_idx,
+                Qt.DisplayRole,
+                id,
+                1,
+                Qt.MatchExactly
+            )
 
         if len(idxs) > 0:
             sel_idx = idxs[0]
@@ -483,6 +647,7 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 sel_idx,
                 QItemSelectionModel.ClearAndSelect|QItemSelectionModel.Rows
             )
+            self.tbEntity.scrollTo(sel_idx)
 
     def on_load_document_viewer(self):
         #Slot raised to show the document viewer for the selected entity
@@ -516,6 +681,7 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
 
                 self._doc_viewer.load(docs)
 
+    @traced('EntityBrowser._initializeData', 'ui')
     def _initializeData(self):
         '''
         Set table model and load data into it.
@@ -535,62 +701,51 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
 
         else:
             self._init_entity_columns()
-            # Load entity data. There might be a better way in future in order
-            # to ensure that there is a balance between user data discovery
-            # experience and performance.
-            numRecords = self.recomputeRecordCount()
-            # Load progress dialog
-            progressLabel = QApplication.translate(
-                "EntityBrowser", "Fetching Records..."
-            )
-            progressDialog = QProgressDialog(
-                progressLabel, None, 0, numRecords, self
-            )
-            entity_cls = self._dbmodel()
-             # Only one filter is possible.
-            if not self.load_records:
-                entity_records = self.filtered_records
-            else:
-                entity_records = entity_cls.queryObject().filter().all()
-            #Add records to nested list for enumeration in table model
-
-            entity_records_collection = []
-            for i,er in enumerate(entity_records):
-                entity_row_info = []
-                progressDialog.setValue(i)
-                try:
-                    for attr in self._entity_attrs:
-                        attr_val = getattr(er, attr)
-                        # Check if there are display formatters and apply if
-                        # one exists for the given attribute.
-                        if attr in self._cell_formatters:
-                            formatter = self._cell_formatters[attr]
-                            attr_val = formatter.format_column_value(attr_val)
-                        entity_row_info.append(attr_val)
-                except Exception as ex:
-                    QMessageBox.critical(
-                        self,
-                        QApplication.translate(
-                            'EntityBrowser', 'Loading Records'
-                        ),
-                        unicode(ex.message))
-                    return
+            self.recomputeRecordCount()
 
-                entity_records_collection.append(entity_row_info)
-            # Set maximum value of the progress dialog
-            progressDialog.setValue(numRecords)
+            try:
+                if not self.load_records:
+                    # Only one filter is possible.
+                    self._tableModel = self._filtered_records_model(
+                        len(self.filtered_records)
+                    )
 
-            self._tableModel = BaseSTDMTableModel(entity_records_collection,
-                                                  self._headers, self)
+                else:
+                    # Pages are loaded in a worker thread as the view is
+                    # scrolled so that the browser opens immediately.
+                    self._tableModel = PagedEntityTableModel(
+                        self._fetch_records,
+                        self._headers,
+                        parent=self,
+                        request_page=self._request_records
+                    )
+                    self._tableModel.fetchMore()
+                    self.finished.connect(self._cancel_record_loading)
+
+            except Exception as ex:
+                QMessageBox.critical(
+                    self,
+                    QApplication.translate(
+                        'EntityBrowser', 'Loading Records'
+                    ),
+                    unicode(ex.message))
+                return
 
-            # Add filter columns
+            # Add filter columns, columns which are not stored in the
+            # entity table cannot be filtered in the database
+            paged = isinstance(self._tableModel, PagedEntityTableModel)
             for header, info in self._searchable_columns.iteritems():
                 column_name, index = info['name'], info['header_index']
+                column = self._entity.columns.get(column_name, None)
+                if paged and not column is None and \
+                        column.TYPE_INFO in _VIRTUAL_TYPES:
+                    continue
+
                 if column_name != 'id':
                     self.cboFilterColumn.addItem(header, info)
 
             #Use sortfilter proxy model for the view
-            self._proxyModel = VerticalHeaderSortFilterProxyModel()
+            self._proxyModel = IndexedSortFilterProxyModel()
             self._proxyModel.setDynamicSortFilter(True)
             self._proxyModel.setSourceModel(self._tableModel)
             self._proxyModel.setSortCaseSensitivity(Qt.CaseInsensitive)
@@ -600,8 +755,16 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 self.set_proxy_model_filter_column(0)
 
             self.tbEntity.setModel(self._proxyModel)
-            self.tbEntity.setSortingEnabled(True)
-            self.tbEntity.sortByColumn(1, Qt.AscendingOrder)
+
+            # Pages are initially loaded in the order of the record ids
+            if isinstance(self._tableModel, PagedEntityTableModel):
+                self.tbEntity.horizontalHeader().setSortIndicator(
+                    0, Qt.AscendingOrder
+                )
+                self.tbEntity.setSortingEnabled(True)
+            else:
+                self.tbEntity.setSortingEnabled(True)
+                self.tbEntity.sortByColumn(1, Qt.AscendingOrder)
 
             #First (ID) column will always be hidden
             self.tbEntity.hideColumn(0)
@@ -618,6 +781,349 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             if not self._select_item is None:
                 self._select_record(self._select_item)
 
+    def _entity_rows(self, entity_records):
+        """
+        Formats the values of the entity attributes of several records.
+        Each cell formatter resolves the values of all the records at once so
+        that a page of records costs a few queries instead of one per row.
+        :param entity_records: Records of the entity.
+        :type entity_records: list
+        :return: Returns a list with the formatted values of each record.
+        :rtype: list
+        """
+        rows = [[getattr(er, attr) for attr in self._entity_attrs]
+                for er in entity_records]
+
+        for i, attr in enumerate(self._entity_attrs):
+            # Check if there are display formatters and apply if
+            # one exists for the given attribute.
+            if not attr in self._cell_formatters:
+                continue
+
+            formatter = self._cell_formatters[attr]
+            values = formatter.format_column_values(
+                [row[i] for row in rows]
+            )
+
+            for row, attr_val in zip(rows, values):
+                row[i] = attr_val
+
+        return rows
+
+    def _filtered_records_model(self, numRecords):
+        #Creates a table model containing all the filtered records
+        progressLabel = QApplication.translate(
+            "EntityBrowser", "Fetching Records..."
+        )
+        progressDialog = QProgressDialog(
+            progressLabel, None, 0, numRecords, self
+        )
+
+        #Rows are formatted and added to the columns of the model in pages
+        table_model = ColumnarTableModel([], self._headers, self)
+        for i in range(0, len(self.filtered_records), PAGE_SIZE):
+            progressDialog.setValue(i)
+            table_model.append_rows(
+                self._entity_rows(self.filtered_records[i:i + PAGE_SIZE])
+            )
+
+        # Set maximum value of the progress dialog
+        progressDialog.setValue(numRecords)
+
+        return table_model
+
+    def _fetch_records(self, after_id, limit, ids=None):
+        """
+        Loads a page of records using the shared database session.
+        :param after_id: Id of the last loaded record, the first page is
+        loaded if None.
+        :type after_id: int
+        :param limit: Maximum number of records.
+        :type limit: int
+        :param ids: Ids of the records to load instead of a page.
+        :type ids: list
+        :return: Returns the formatted values of the records.
+        :rtype: list
+        """
+        state = self._query_state()
+
+        if not ids is None:
+            query = self._records_query(after_id, limit, state, ids)
+
+            return self._entity_rows(query.all())
+
+        query = self._records_query(after_id, limit, state,
+                                    after_value=self._after_value(state,
+                                                                  after_id))
+        rows, last_sort_value = self._page_rows(query.all(), state)
+        self._last_sort_value = last_sort_value
+
+        return rows
+
+    def _request_records(self, request, after_id, limit):
+        #Loads a page of records in a worker thread
+        state = self._query_state()
+        after_value = self._after_value(state, after_id)
+        loader = EntityRecordLoader(
+            self._tableModel,
+            request,
+            lambda session: self._records_query(after_id, limit, state,
+                                                session=session,
+                                                after_value=after_value),
+            lambda results: self._page_rows(results, state)
+        )
+        loader.signals.loaded.connect(self._on_records_loaded)
+        loader.signals.error.connect(self._on_records_error)
+
+        QThreadPool.globalInstance().start(loader)
+
+    def _page_rows(self, results, state):
+        """
+        Formats a page of records queried with their sort value.
+        :param results: Records of the page and their sort value.
+        :type results: list
+        :param state: State of the browser used to query the page.
+        :type state: _QueryState
+        :return: Returns the formatted values of the records and the sort
+        column, id and sort value of the last record, or None if the page is
+        empty.
+        :rtype: tuple
+        """
+        rows = self._entity_rows([r[0] for r in results])
+
+        if len(results) == 0:
+            return rows, None
+
+        last_record, last_value = results[-1]
+
+        return rows, (state.sort_name, last_record.id, last_value)
+
+    def _after_value(self, state, after_id):
+        #Sort value of the last loaded record, the records following it are
+        #queried without reading it again from the database
+        if self._last_sort_value is None:
+            return _UNKNOWN_VALUE
+
+        sort_name, record_id, value = self._last_sort_value
+        if sort_name != state.sort_name or record_id != after_id:
+            return _UNKNOWN_VALUE
+
+        return value
+
+    def _on_records_loaded(self, request, page):
+        #Slot raised when the worker has loaded a page of records
+        if not isinstance(self._tableModel, PagedEntityTableModel):
+            return
+
+        rows, last_sort_value = page
+        if self._tableModel.append_page(request, rows):
+            self._last_sort_value = last_sort_value
+
+    def _on_records_error(self, request, message):
+        #Slot raised when the worker could not load a page of records
+        if not isinstance(self._tableModel, PagedEntityTableModel) or \
+                request != self._tableModel.request:
+            return
+
+        #Rows can be requested again by scrolling
+        self._tableModel.cancel()
+
+        self._notifBar.clear()
+        self._notifBar.insertErrorNotification(message)
+
+    def _cancel_record_loading(self):
+        #Cancels the page of records being loaded in the worker thread
+        if isinstance(self._tableModel, PagedEntityTableModel):
+            self._tableModel.cancel()
+
+        #Records counted after closing the browser are ignored
+        self._count_request += 1
+
+    def _records_query(self, after_id, limit, state, ids=None,
+                       session=None, after_value=_UNKNOWN_VALUE):
+        """
+        Creates the query for a page of records, the filter text and sort
+        column are applied in the database. Pages follow each other using
+        keyset pagination on the sort value and id, the records of a page are
+        queried with their sort value.
+        :param after_id: Id of the last loaded record, the first page is
+        queried if None.
+        :type after_id: int
+        :param limit: Maximum number of records.
+        :type limit: int
+        :param state: Filter, sort and referenced models of the browser.
+        :type state: _QueryState
+        :param ids: Ids of the records to query instead of a page.
+        :type ids: list
+        :param session: Session used instead of the shared one, for queries
+        run in a worker thread.
+        :type session: Session
+        :param after_value: Sort value of the record with after_id, it is
+        read from the database if unknown.
+        :type after_value: object
+        :return: Returns the query.
+        :rtype: Query
+        """
+        pk = self._dbmodel.id
+
+        if session is None:
+            query = self._dbmodel().queryObject()
+        else:
+            query = session.query(self._dbmodel)
+
+        #Load the collections of multiple select columns with the page
+        collections = [
+            subqueryload(getattr(self._dbmodel, c.model_attribute_name))
+            for c in self._entity.columns.values()
+            if c.TYPE_INFO == 'MULTIPLE_SELECT' and
+            c.model_attribute_name in self._entity_attrs
+        ]
+        if len(collections) > 0:
+            query = query.options(*collections)
+
+        if not ids is None:
+            return query.filter(pk.in_(ids))
+
+        if state.filter_text and not state.filter_column is None:
+            query = self._filter_query(query, state)
+
+        sort_expr = None
+        sort_name = state.sort_name
+        sort_column = self._entity.columns.get(sort_name, None)
+        if sort_name != 'id' and not sort_column is None and \
+                not sort_column.TYPE_INFO in _VIRTUAL_TYPES:
+            query, sort_exprs = self._column_expressions(
+                query, sort_name, state.ref_models
+            )
+            sort_expr = sort_exprs[0]
+
+        ascending = state.ascending
+
+        if not after_id is None:
+            query = query.filter(
+                self._keyset_criterion(query, sort_expr, after_id, ascending,
+                                       after_value)
+            )
+
+        query = query.add_columns(pk if sort_expr is None else sort_expr)
+
+        if sort_expr is None:
+            order_by = [pk.asc() if ascending else pk.desc()]
+        elif ascending:
+            order_by = [nullslast(sort_expr.asc()), pk.asc()]
+        else:
+            order_by = [nullslast(sort_expr.desc()), pk.desc()]
+
+        return query.order_by(*order_by).limit(limit)
+
+    def _column_expressions(self, query, column_name, ref_models):
+        """
+        Joins the table of the value list, administrative units or parent
+        entity if the column references one.
+        :param ref_models: Models of the referenced tables by column name.
+        :type ref_models: dict
+        :return: Returns the query and the SQL expressions of the values
+        displayed for the column, the first one is used for sorting.
+        :rtype: tuple
+        """
+        column = self._entity.columns[column_name]
+        attr = getattr(self._dbmodel, column_name)
+
+        if not column_name in ref_models:
+            return query, [attr]
+
+        ref_model = aliased(ref_models[column_name])
+
+        if column.TYPE_INFO == 'LOOKUP':
+            exprs = [ref_model.value, ref_model.code]
+        elif column.TYPE_INFO == 'FOREIGN_KEY':
+            #Parent records are displayed using the display columns
+            exprs = [getattr(ref_model, c)
+                     for c in column.entity_relation.display_cols
+                     if hasattr(ref_model, c)]
+        else:
+            exprs = [ref_model.name, ref_model.code]
+
+        if len(exprs) == 0:
+            return query, [attr]
+
+        query = query.outerjoin(ref_model, ref_model.id == attr)
+
+        return query, exprs
+
+    def _filter_query(self, query, state):
+        #Filters the records using the text in the filter column
+        column = self._entity.columns[state.filter_column]
+        text = state.filter_text.strip()
+
+        if column.TYPE_INFO in _VIRTUAL_TYPES:
+            return query
+
+        if column.TYPE_INFO in _NUMERIC_TYPES:
+            try:
+                value = float(text)
+
+            except ValueError:
+                return query.filter(false())
+
+            return query.filter(getattr(self._dbmodel, column.name) == value)
+
+        query, exprs = self._column_expressions(
+            query, column.name, state.ref_models
+        )
+
+        #Wildcards typed by the user are matched literally
+        pattern = u'%{0}%'.format(
+            text.replace('\\', '\\\\').replace('%', '\\%').replace(
+                '_', '\\_'
+            )
+        )
+
+        #Display columns of parent entities may not be text columns
+        exprs = [cast(e, String) for e in exprs]
+
+        #Parent records are displayed as their display values joined
+        if column.TYPE_INFO == 'FOREIGN_KEY' and len(exprs) > 1:
+            exprs = [func.concat_ws(
+                RelatedEntityLineEdit.COLUMN_SEPARATOR, *exprs
+            )]
+
+        return query.filter(or_(*[e.ilike(pattern) for e in exprs]))
+
+    def _keyset_criterion(self, query, sort_expr, after_id, ascending,
+                          after_value):
+        #Criterion for the records following the given record in sort order
+        pk = self._dbmodel.id
+
+        if sort_expr is None:
+            return pk > after_id if ascending else pk < after_id
+
+        if after_value is _UNKNOWN_VALUE:
+            after_value = query.filter(pk == after_id).with_entities(
+                sort_expr
+            ).scalar()
+
+        after_pk = pk > after_id if ascending else pk < after_id
+
+        #Null values are sorted last
+        if after_value is None:
+            return and_(sort_expr == None, after_pk)
+
+        following = sort_expr > after_value if ascending else \
+            sort_expr < after_value
+
+        return or_(
+            following,
+            and_(sort_expr == after_value, after_pk),
+            sort_expr == None
+        )
+
+    def _apply_filter(self):
+        #Reloads and counts the records using the current filter text
+        if isinstance(self._tableModel, PagedEntityTableModel):
+            self._tableModel.refresh()
+            self.recomputeRecordCount()
+
     def _header_index_from_filter_combo_index(self, idx):
         col_info = self.cboFilterColumn.itemData(idx)
 
@@ -627,6 +1133,7 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         #Set the filter column for the proxy model using the combo index
         name, header_idx = self._header_index_from_filter_combo_index(index)
         self._proxyModel.setFilterKeyColumn(header_idx)
+        self._filter_column = name
 
     def onFilterColumnChanged(self, index):
         '''
@@ -634,12 +1141,23 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         '''
         self.set_proxy_model_filter_column(index)
 
+        if isinstance(self._tableModel, PagedEntityTableModel) and \
+                self._filter_text:
+            self._filter_timer.start()
+
     def onFilterRegExpChanged(self,text):
         '''
         Slot raised whenever the filter text changes.
         '''
-        regExp = QRegExp(text,Qt.CaseInsensitive,QRegExp.FixedString)
-        self._proxyModel.setFilterRegExp(regExp)
+        #Records loaded in pages are filtered in the database
+        if isinstance(self._tableModel, PagedEntityTableModel):
+            self._filter_text = unicode(text)
+            self._filter_timer.start()
+
+            return
+
+        #Loaded records are filtered using the index of the filter column
+        self._proxyModel.set_filter_text(text)
 
     def onDoubleClickView(self,modelindex):
         '''
@@ -1285,3 +1803,72 @@ class ForeignKeyBrowser(EntityBrowser):
     def title(self):
         return QApplication.translate("EnumeratorEntityBrowser",
                     "%s Entity Records")%(self._data_source_name).replace("_"," ").capitalize()
+
+
+class _RecordLoaderSignals(QObject):
+    """
+    Signals of the record loader, QRunnable is not a QObject.
+    """
+    loaded = pyqtSignal(int, object)
+    error = pyqtSignal(int, unicode)
+
+
+class EntityRecordLoader(QRunnable):
+    """
+    Loads and formats a page of records of a paged table model in a thread
+    of the global thread pool. Records are read using a separate database
+    session since the shared STDMDb session is not thread-safe. The page is
+    discarded as soon as the request of the model is cancelled.
+    The callables should only use models mapped on the main thread, e.g.
+    by the browser and the cell formatters, since reflecting and mapping
+    tables is not thread-safe.
+    """
+    def __init__(self, model, request, query_func, rows_func):
+        """
+        :param model: Model which requested the page.
+        :type model: PagedEntityTableModel
+        :param request: Request number of the model.
+        :type request: int
+        :param query_func: Callable which returns the query for the page
+        using the given session.
+        :type query_func: callable
+        :param rows_func: Callable which returns the page emitted with the
+        loaded signal from the records.
+        :type rows_func: callable
+        """
+        QRunnable.__init__(self)
+        self.signals = _RecordLoaderSignals()
+        self._model = model
+        self._request = request
+        self._query_func = query_func
+        self._rows_func = rows_func
+
+    def cancelled(self):
+        """
+        :return: Returns True if the request has been cancelled or replaced.
+        :rtype: bool
+        """
+        return self._model.request != self._request
+
+    def run(self):
+        if self.cancelled():
+            return
+
+        session = sessionmaker(bind=STDMDb.instance().engine)()
+
+        try:
+            records = self._query_func(session).all()
+            if self.cancelled():
+                return
+
+            rows = self._rows_func(records)
+            if self.cancelled():
+                return
+
+            self.signals.loaded.emit(self._request, rows)
+
+        except Exception as ex:
+            self.signals.error.emit(self._request, unicode(ex))
+
+        finally:
+            session.close()
@@ -31,11 +31,15 @@ from stdm.utils.util import getIndex
 from stdm.ui.reports import SqlHighlighter
 from stdm.data.pg_utils import (
     process_report_filter,
+    report_filter_count,
     table_column_names,
     unique_column_values,
     pg_tables
 )
-from stdm.data.importexport.writer import OGRWriter
+from stdm.data.importexport.writer import (
+    gdalExportSupported,
+    OGRWriter
+)
 
 from stdm.data.importexport import (
     vectorFileDir,
@@ -235,17 +239,38 @@ class ExportData(QWizard,Ui_frmExportWizard):
         
         targetFile = str(self.field("destFile"))
         writer = OGRWriter(targetFile)
-        resultSet = self.filter_buildQuery()
+        numRows = self.filter_countRows()
         
-        if resultSet is None:
+        if numRows is None:
             return succeed
         
-        if resultSet.rowcount == 0:
+        if numRows == 0:
             self.ErrorInfoMessage("There are no records to export")
             return succeed
         
         try:
-            writer.db2Feat(self,self.srcTab,resultSet,self.selectedColumns(),self.geomColumn)
+            if gdalExportSupported():
+                #Rows are copied by GDAL directly from the database
+                exported = writer.gdalDb2Feat(
+                    self,
+                    self.srcTab,
+                    self.selectedColumns(),
+                    self.geomColumn,
+                    self.txtWhereQuery.toPlainText()
+                )
+
+                if not exported:
+                    return succeed
+
+            else:
+                #Rows are streamed from the database rather than buffered
+                writer.streamDb2Feat(
+                    self,
+                    self.srcTab,
+                    self.selectedColumns(),
+                    self.geomColumn,
+                    self.txtWhereQuery.toPlainText()
+                )
             self.InfoMessage("Features in '%s' have been successfully exported!"%(self.srcTab))
 
             #Update directory info in the registry
@@ -268,10 +293,9 @@ class ExportData(QWizard,Ui_frmExportWizard):
             self.ErrorInfoMessage("No filter has been defined.")
             
         else:
-            results = self.filter_buildQuery()
+            rLen = self.filter_countRows()
             
-            if results != None:            
-                rLen = results.rowcount
+            if rLen != None:            
                 msg = "The SQL statement was successfully verified.\n" + str(rLen) + " record(s) returned."
                 self.InfoMessage(msg)
         
@@ -301,6 +325,24 @@ class ExportData(QWizard,Ui_frmExportWizard):
             
         return results    
         
+    def filter_countRows(self):
+        #Count the rows matching the filter without fetching them
+        whereStmnt = self.txtWhereQuery.toPlainText()
+        numRows = None
+
+        try:
+            numRows = report_filter_count(self.srcTab,whereStmnt)
+
+        except sqlalchemy.exc.DataError,e:
+            if e is None:
+                errMessage = "Database Error Message - NOT AVAILABLE"
+            else:
+                errMessage = e.message
+
+            self.ErrorInfoMessage("The SQL statement is invalid!\n" + errMessage)
+
+        return numRows
+
     def filter_insertField(self,lstItem):
         '''
         Inserts the text of the clicked field item into the
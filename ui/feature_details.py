@@ -391,28 +391,52 @@ class DetailsDBHandler:
         :type entity: Object
         """
         self._formatted_record.clear()
+        self._formatted_record.update(
+            self.formatted_records([model], entity)[0]
+        )
+
+    def formatted_records(self, models, entity):
+        """
+        Formats the values of the display columns of several records. Each
+        column formatter resolves the values of all the records at once.
+        :param models: The models or result dictionaries of the entity.
+        :type models: list
+        :param entity: The entity object
+        :type entity: Object
+        :return: Returns a dictionary of display values indexed by column
+        header for each record.
+        :rtype: list
+        """
+        records = [OrderedDict() for m in models]
 
         self.display_column_object(entity)
         for col in self.display_columns:
-            if isinstance(model, OrderedDict):
-                col_val = model[col.name]
-            else:
-                col_val = getattr(model, col.name)
+            col_vals = []
+            for model in models:
+                if isinstance(model, OrderedDict):
+                    col_val = model[col.name]
+                else:
+                    col_val = getattr(model, col.name)
+                if col_val == NULL:
+                    col_val = None
+                col_vals.append(col_val)
             # Check if there are display formatters and apply if
             # one exists for the given attribute.
-            if col_val == NULL:
-                col_val = None
             if col.name in self.column_formatter:
                 formatter = self.column_formatter[col.name]
 
-                col_val = formatter.format_column_value(col_val)
+                col_vals = formatter.format_column_values(col_vals)
             if col.header() == QApplication.translate(
                     'DetailsDBHandler', 'Tenure Share'
             ):
-                share = '{} (%)'.format(col.header())
-                self._formatted_record[share] = col_val
+                header = '{} (%)'.format(col.header())
             else:
-                self._formatted_record[col.header()] = col_val
+                header = col.header()
+
+            for record, col_val in zip(records, col_vals):
+                record[header] = col_val
+
+        return records
 
     def _supporting_doc_models(self, entity_table, model_obj):
         """
@@ -989,13 +1013,14 @@ class DetailsTreeView(DetailsDBHandler, DetailsDockWidget):
             return
         if str_records is None:
             return
-        for record in str_records:
+        formatted_records = self.formatted_records(
+            str_records, self.social_tenure
+        )
+        for record, formatted_record in zip(str_records, formatted_records):
             self.str_models[record.id] = record
             str_root = self.add_str_steam(parent, record.id)
             # add STR children
-            self.column_widget_registry(record, self.social_tenure)
-
-            for i, (col, row) in enumerate(self._formatted_record.iteritems()):
+            for i, (col, row) in enumerate(formatted_record.iteritems()):
                 str_child = QStandardItem(
                     '{}: {}'.format(col, row)
                 )
@@ -1008,7 +1033,7 @@ class DetailsTreeView(DetailsDBHandler, DetailsDockWidget):
                 party, party_id = self.current_party(record_dict)
                 party_model = getattr(record, party.name)
 
-                if i == len(self._formatted_record) - 1:
+                if i == len(formatted_record) - 1:
                     party_root = self.add_party_child(
                         str_root, party, party_model
                     )
@@ -37,7 +37,7 @@ from stdm.data.configuration.columns import (
 )
 from stdm.data.configuration import entity_model
 from stdm.data.pg_utils import table_column_names
-from stdm.data.qtmodels import BaseSTDMTableModel
+from stdm.data.qtmodels import ColumnarTableModel
 from stdm.utils.util import getIndex
 from stdm.ui.admin_unit_manager import SELECT
 from stdm.settings import current_profile
@@ -339,7 +339,7 @@ class ForeignKeyMapper(QWidget):
                 msg
             )
 
-        self._tableModel = BaseSTDMTableModel([], self._headers, self)
+        self._tableModel = ColumnarTableModel([], self._headers, self)
         self._tbFKEntity.setModel(self._tableModel)
         self._tbFKEntity.resizeColumnsToContents()
         #First (id) column will always be hidden
@@ -590,14 +590,13 @@ class ForeignKeyMapper(QWidget):
 
         columnValue = columnValue.strip()
 
-        proxy = QSortFilterProxyModel(self)
-        proxy.setSourceModel(self._tableModel)
-        proxy.setFilterKeyColumn(columnIndex)
-        proxy.setFilterFixedString(columnValue)
-        #Will return model index containing the primary key.
-        matchingIndex = proxy.mapToSource(proxy.index(0,0))
+        #Rows are looked up in the index of the column
+        row = self._tableModel.find_row(columnIndex, columnValue)
+        if row == -1:
+            return QModelIndex()
 
-        return matchingIndex
+        #Will return model index containing the primary key.
+        return self._tableModel.index(row, 0)
     
     def _modelInstanceFromIds(self,ids):
         '''
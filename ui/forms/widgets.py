@@ -57,7 +57,7 @@ from stdm.data.configuration.columns import (
     VarCharColumn,
     AutoGeneratedColumn
 )
-from stdm.data.configuration import entity_model
+from stdm.data.reference_cache import ReferenceDataCache
 from stdm.settings import current_profile
 from stdm.ui.customcontrols.relation_line_edit import (
     AdministrativeUnitLineEdit,
@@ -248,6 +248,39 @@ class EntityValueFormatter(object):
 
         return value_handler.format_column_value(value)
 
+    def column_display_values(self, name, values):
+        """
+        Formats several values of the given column name, the values which
+        are not cached are loaded in a single query.
+        :param name: Name of the column.
+        :type name: str
+        :param values: Column values
+        :type values: list
+        :return: Returns the friendly display values or the given values if
+        the column was not registered.
+        :rtype: list
+        """
+        if not name in self._registered_columns:
+            return values
+
+        value_handler = self._registered_columns.get(name)
+
+        return value_handler.format_column_values(values)
+
+    def load_display_values(self, records):
+        """
+        Resolves the display values of the registered columns for all the
+        records using one query per column, so that subsequent calls to
+        :func:`column_display_value` for these records use cached values.
+        :param records: Records containing the registered columns.
+        :type records: list
+        """
+        for name in self._registered_columns:
+            self.column_display_values(
+                name,
+                [getattr(r, name, None) for r in records]
+            )
+
 
 class ColumnWidgetRegistry(object):
     """
@@ -344,6 +377,22 @@ class ColumnWidgetRegistry(object):
         """
         return unicode(value)
 
+    def format_column_values(self, values):
+        """
+        Formats the column values of several records, such as a page of
+        records in a table view. Sub-classes which resolve display values
+        from the database should override it so that all the values which
+        are not cached are loaded in a single query. Values may be formatted
+        in a worker thread hence queries should go through the reference
+        data cache using models mapped in the constructor.
+        :param values: Column values.
+        :type values: list
+        :return: Returns the display values in the same order as the column
+        values.
+        :rtype: list
+        """
+        return [self.format_column_value(v) for v in values]
+
 
 class VarCharWidgetFactory(ColumnWidgetRegistry):
     """
@@ -578,9 +627,9 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
     def __init__(self, column):
         ColumnWidgetRegistry.__init__(self, column)
 
-        self._parent_entity_cache = {}
-
-        #Query all parent entities. Need for optimization
+        #Parent records are loaded on demand by the reference data cache,
+        #the parent table is mapped here since values may be formatted in a
+        #worker thread
         p_entity = self._column.entity_relation.parent
 
         if p_entity is None:
@@ -591,12 +640,8 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
             )
             raise WidgetException(msg)
 
-        self._p_entity_cls = entity_model(p_entity, entity_only=True)
-        self._p_entity_obj = self._p_entity_cls()
-
-        res = self._p_entity_obj.queryObject().filter().all()
-        for r in res:
-            self._parent_entity_cache[r.id] = r
+        self._p_entity = p_entity
+        self._p_model = ReferenceDataCache.instance().model(p_entity)
 
     @classmethod
     def _create_widget(cls, c, parent):
@@ -614,23 +659,34 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
         :return: Display extracted from the selected parent record.
         :rtype: str
         """
-        if value in self._parent_entity_cache:
-            rec = self._parent_entity_cache[value]
+        rec = ReferenceDataCache.instance().parent_record(
+            self._p_entity,
+            value,
+            self._p_model
+        )
 
-        else:
-            #Query value
-            rec = self._p_entity_obj.queryObject().filter(
-                self._p_entity_cls.id == value
-            ).first()
+        if rec is None:
+            return ''
 
-            if rec is None:
-                return ''
+        return RelatedEntityLineEdit.process_display(self._column, rec)
 
-            else:
-                #Add to cache
-                self._parent_entity_cache[rec.id] = rec
+    def format_column_values(self, values):
+        """
+        Loads the parent records which are not cached in a single query and
+        formats the values.
+        :param values: Primary key values of the parent entity.
+        :type values: list
+        :return: Returns the display values.
+        :rtype: list
+        """
+        records = ReferenceDataCache.instance().parent_records(
+            self._p_entity,
+            values,
+            self._p_model
+        )
 
-        return RelatedEntityLineEdit.process_display(self._column, rec)
+        return [RelatedEntityLineEdit.process_display(self._column, records[v])
+                if v in records else '' for v in values]
 
 RelatedEntityWidgetFactory.register()
 
@@ -641,21 +697,16 @@ class AdministrativeUnitWidgetFactory(ColumnWidgetRegistry):
     """
     COLUMN_TYPE_INFO = AdministrativeSpatialUnitColumn.TYPE_INFO
     _TYPE_PREFIX = 'aule_'
+    _AUS_ATTRS = ('name', 'code')
 
     def __init__(self, column):
-        from PyQt4.QtGui import QMessageBox
         ColumnWidgetRegistry.__init__(self, column)
 
-        self._aus_cache = {}
-
-        #Query all admin units on initializing
-        aus = self._column.entity.profile.administrative_spatial_unit
-        self._aus_cls = entity_model(aus, entity_only=True)
-        self._aus_obj = self._aus_cls()
-
-        res = self._aus_obj.queryObject().filter().all()
-        for r in res:
-            self._aus_cache[r.id] = [r.name, r.code]
+        #Admin units are loaded once per profile by the reference data
+        #cache, the table is mapped here since values may be formatted in a
+        #worker thread
+        self._aus = self._column.entity.profile.administrative_spatial_unit
+        self._aus_model = ReferenceDataCache.instance().model(self._aus)
 
     @classmethod
     def _create_widget(cls, c, parent):
@@ -672,29 +723,42 @@ class AdministrativeUnitWidgetFactory(ColumnWidgetRegistry):
         :return: Name and code corresponding to the given id.
         :rtype: str
         """
-        if value in self._aus_cache:
-            nc = self._aus_cache[value]
-            name, code = nc[0], nc[1]
-
-        else:
-            #Query value
-            res = self._aus_obj.queryObject().filter(
-                self._aus_cls.id == value
-            ).first()
+        aus_cache = ReferenceDataCache.instance().load_values(
+            self._aus,
+            self._AUS_ATTRS,
+            [value],
+            self._aus_model
+        )
 
-            if res is None:
-                return ''
+        if not value in aus_cache:
+            return ''
 
-            else:
-                #Add result to the cache
-                self._aus_cache[res.id] = res
-                name, code = res.name, res.code
+        nc = aus_cache[value]
+        name, code = nc[0], nc[1]
 
         if code:
             name = u'{0} ({1})'.format(name, code)
 
         return name
 
+    def format_column_values(self, values):
+        """
+        Loads the administrative units which are not cached in a single
+        query and formats the values.
+        :param values: Primary key values of the administrative units.
+        :type values: list
+        :return: Returns the display values.
+        :rtype: list
+        """
+        ReferenceDataCache.instance().load_values(
+            self._aus,
+            self._AUS_ATTRS,
+            values,
+            self._aus_model
+        )
+
+        return [self.format_column_value(v) for v in values]
+
 AdministrativeUnitWidgetFactory.register()
 
 
@@ -740,16 +804,19 @@ class LookupWidgetFactory(ColumnWidgetRegistry):
     def __init__(self, column):
         ColumnWidgetRegistry.__init__(self, column)
 
-        self._lookups = {}
-
-        #Query all lookups on initializing so as to reduce db roundtrips
-        lookup = self._column.value_list
-        lk_cls = entity_model(lookup, entity_only=True)
-        lk_obj = lk_cls()
-        res = lk_obj.queryObject().filter().all()
+        #Lookups are loaded once per profile by the reference data cache,
+        #the value list is mapped here since values may be formatted in a
+        #worker thread
+        self._vl_model = ReferenceDataCache.instance().model(
+            self._column.value_list
+        )
 
-        for r in res:
-            self._lookups[r.id] = [r.value, r.code]
+    @property
+    def _lookups(self):
+        return ReferenceDataCache.instance().lookup_values(
+            self._column.value_list,
+            self._vl_model
+        )
 
     def lookups(self):
         """
@@ -780,9 +847,7 @@ class LookupWidgetFactory(ColumnWidgetRegistry):
         cbo = QComboBox(parent)
         cbo.setObjectName(u'{0}_{1}'.format(cls._TYPE_PREFIX, c.name))
 
-        #Create a new instance of the class so that we can get the ids
-        cls_obj = cls(c)
-        lookups = cls_obj.lookups()
+        lookups = ReferenceDataCache.instance().lookup_values(c.value_list)
         cbo.addItem('', None)
         #Populate combobox
         for id, cd_val in lookups.iteritems():
@@ -809,6 +874,24 @@ class LookupWidgetFactory(ColumnWidgetRegistry):
 
         return lk_val
 
+    def format_column_values(self, values):
+        """
+        Loads the lookup values added since the value list was cached in a
+        single query and formats the values.
+        :param values: Primary key values of the lookup.
+        :type values: list
+        :return: Returns the display values.
+        :rtype: list
+        """
+        ReferenceDataCache.instance().load_values(
+            self._column.value_list,
+            ('value', 'code'),
+            values,
+            self._vl_model
+        )
+
+        return [self.format_column_value(v) for v in values]
+
 
 LookupWidgetFactory.register()
 
@@ -847,4 +930,16 @@ class MultipleSelectWidgetFactory(LookupWidgetFactory):
 
         return self.SEPARATOR.join(selection)
 
+    def format_column_values(self, values):
+        """
+        Formats the lookup collections of several records. The collections
+        should be eagerly loaded with the records, e.g. using subqueryload,
+        otherwise each one is loaded in a separate query.
+        :param values: Collections of lookup objects.
+        :type values: list
+        :return: Returns the display values.
+        :rtype: list
+        """
+        return [self.format_column_value(v) for v in values]
+
 MultipleSelectWidgetFactory.register()
@@ -43,12 +43,14 @@ from stdm.data.importexport import (
     setVectorFileDir
 )
 from stdm.data.importexport.value_translators import ValueTranslatorManager
+from stdm.data.importexport.checkpoint import ImportCheckpoint
 from stdm.data.importexport.reader import OGRReader
 from .importexport import (
     ValueTranslatorConfig,
     TranslatorWidgetManager
 )
 from stdm.settings import current_profile
+from stdm.settings.registryconfig import import_processes
 from stdm.utils.util import (
     profile_user_tables,
     profile_spatial_tables
@@ -453,7 +455,10 @@ class ImportData(QWizard, Ui_frmImport):
         value_translator_manager = self._trans_widget_mgr.translator_manager()
                
         try:
-            if self.field("optOverwrite"):
+            checkpoint = self._import_checkpoint(matchCols, geom_column)
+
+            #Resumed imports always append to the committed rows
+            if self.field("optOverwrite") and not checkpoint.has_progress:
                 entity = self.curr_profile.entity_by_name(self.targetTab)
                 dependencies = entity.dependencies()
                 view_dep = dependencies['views']
@@ -482,25 +487,29 @@ class ImportData(QWizard, Ui_frmImport):
                     )
 
                     if del_result == QMessageBox.Yes:
-                        self.dataReader.featToDb(
+                        import_report = self.dataReader.featToDb(
                             self.targetTab, matchCols, False, self, geom_column,
-                            translator_manager=value_translator_manager
+                            translator_manager=value_translator_manager,
+                            bulk=True,
+                            processes=import_processes(),
+                            checkpoint=checkpoint
                         )
                         # Update directory info in the registry
                         setVectorFileDir(self.field("srcFile"))
 
-                        self.InfoMessage(
-                            "All features have been imported successfully!")
+                        self._show_import_report(import_report)
 
                     else:
                         success = False
             else:
-                self.dataReader.featToDb(
+                import_report = self.dataReader.featToDb(
                     self.targetTab, matchCols, True, self, geom_column,
-                    translator_manager=value_translator_manager
+                    translator_manager=value_translator_manager,
+                    bulk=True,
+                    processes=import_processes(),
+                    checkpoint=checkpoint
                 )
-                self.InfoMessage(
-                    "All features have been imported successfully!")
+                self._show_import_report(import_report)
                 #Update directory info in the registry
                 setVectorFileDir(self.field("srcFile"))
                 success = True
@@ -509,6 +518,82 @@ class ImportData(QWizard, Ui_frmImport):
 
         return success
 
+    def _import_checkpoint(self, match_cols, geom_column):
+        """
+        Loads the checkpoint of a previous import of the source file and, if
+        the import was interrupted, asks the user whether to resume it.
+        :param match_cols: Source columns and corresponding destination
+        columns.
+        :type match_cols: dict
+        :param geom_column: Name of the destination geometry column.
+        :type geom_column: str
+        :return: Returns the checkpoint of the import.
+        :rtype: ImportCheckpoint
+        """
+        checkpoint = ImportCheckpoint.load(
+            self.field("srcFile"), self.targetTab, match_cols, geom_column
+        )
+
+        if not checkpoint.has_progress:
+            return checkpoint
+
+        resume_msg = QApplication.translate(
+            'ImportData',
+            'A previous import of this file into {0} was interrupted after '
+            '{1:d} feature(s).\nClick Yes to resume the import or No to '
+            'import all the features again.'.format(
+                self.targetTab, checkpoint.offset
+            )
+        )
+        resume_result = QMessageBox.question(
+            self,
+            QApplication.translate('ImportData', 'Resume Import'),
+            resume_msg,
+            QMessageBox.Yes | QMessageBox.No
+        )
+
+        if resume_result == QMessageBox.No:
+            checkpoint.reset()
+
+        return checkpoint
+
+    def _show_import_report(self, import_report):
+        #Notify the user of the outcome of the import
+        if import_report.cancelled:
+            self.WarningMessage(
+                QApplication.translate(
+                    'ImportData',
+                    'The import was cancelled after {0:d} feature(s) were '
+                    'committed. Import the file into {1} again to resume '
+                    'the import.'.format(
+                        import_report.resumed_offset +
+                        import_report.imported + import_report.failed,
+                        self.targetTab
+                    )
+                ) + '\n' + import_report.summary()
+            )
+
+        elif import_report.has_errors:
+            self.ErrorInfoMessage(
+                QApplication.translate(
+                    'ImportData',
+                    'Some features could not be imported.'
+                ) + '\n' + import_report.summary()
+            )
+
+        elif len(import_report.unresolved) > 0:
+            #Values which could not be translated were written as NULL
+            self.WarningMessage(
+                QApplication.translate(
+                    'ImportData',
+                    'All features have been imported but some values could '
+                    'not be resolved and have been left empty.'
+                ) + '\n' + import_report.summary()
+            )
+
+        else:
+            self.InfoMessage("All features have been imported successfully!")
+
     def _clear_dest_table_selections(self, exclude=None):
         #Clears checked items in destination table list view
         if exclude is None:
@@ -618,6 +703,13 @@ class ImportData(QWizard, Ui_frmImport):
         msg.setText(message)
         msg.exec_()
                   
+    def WarningMessage(self, message):
+        #Warning message box
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Warning)
+        msg.setText(message)
+        msg.exec_()
+
     def ErrorInfoMessage(self, message):
         #Error Message Box
         msg = QMessageBox()
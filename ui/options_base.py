@@ -33,6 +33,10 @@ from PyQt4.QtCore import(
     SIGNAL
 )
 
+from stdm.data.change_tracking import (
+    track_profile,
+    untrack_profile
+)
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.data.config import DatabaseConfig
 from stdm.data.connection import DatabaseConnection
@@ -41,11 +45,21 @@ from stdm.settings import (
     save_configuration,
     save_current_profile
 )
+from stdm.data.importexport.pipeline import (
+    default_processes,
+    MAX_PROCESSES
+)
+from stdm.data.query_stats import QueryStatistics
+from stdm.data.tracing import Tracer
 from stdm.settings.registryconfig import (
+    change_tracking,
     composer_output_path,
     composer_template_path,
     debug_logging,
+    import_processes,
+    set_change_tracking,
     set_debug_logging,
+    set_import_processes,
     source_documents_path,
     QGISRegistryConfig,
     RegistryConfig,
@@ -148,6 +162,22 @@ class OptionsDialog(QDialog, Ui_DlgOptions):
         else:
             self.chk_logging.setCheckState(Qt.Unchecked)
 
+        #Worker processes for large imports
+        self.spn_import_processes.setMaximum(MAX_PROCESSES)
+        processes = import_processes()
+        if processes > 1:
+            self.chk_import_processes.setCheckState(Qt.Checked)
+            self.spn_import_processes.setValue(processes)
+        else:
+            self.chk_import_processes.setCheckState(Qt.Unchecked)
+            self.spn_import_processes.setValue(max(default_processes(), 2))
+
+        #Change tracking for incremental backups
+        if change_tracking():
+            self.chk_change_tracking.setCheckState(Qt.Checked)
+        else:
+            self.chk_change_tracking.setCheckState(Qt.Unchecked)
+
     def load_profiles(self):
         """
         Load existing profiles into the combobox.
@@ -470,9 +500,50 @@ class OptionsDialog(QDialog, Ui_DlgOptions):
         if self.chk_logging.checkState() == Qt.Checked:
             logger.setLevel(logging.DEBUG)
             set_debug_logging(True)
+            QueryStatistics.instance().set_enabled(True)
+            Tracer.instance().set_enabled(True)
         else:
             logger.setLevel(logging.ERROR)
             set_debug_logging(False)
+            QueryStatistics.instance().set_enabled(False)
+            Tracer.instance().set_enabled(False)
+
+    def apply_import_processes(self):
+        # Save the number of worker processes for large imports
+        if self.chk_import_processes.checkState() == Qt.Checked:
+            set_import_processes(self.spn_import_processes.value())
+        else:
+            set_import_processes(1)
+
+    def apply_change_tracking(self):
+        """
+        Enables or disables change tracking, the existing tables of all
+        the profiles are tracked when it is enabled.
+        :return: True if the tables were updated, otherwise False.
+        :rtype: bool
+        """
+        state = self.chk_change_tracking.checkState() == Qt.Checked
+        if state == change_tracking():
+            return True
+
+        try:
+            for profile in self._config.profiles.values():
+                if state:
+                    track_profile(profile)
+                else:
+                    untrack_profile(profile)
+
+        except Exception as ex:
+            msg = self.tr(u'Change tracking could not be updated: {0}'.format(
+                unicode(ex)
+            ))
+            self.notif_bar.insertErrorNotification(msg)
+
+            return False
+
+        set_change_tracking(state)
+
+        return True
 
     def apply_settings(self):
         """
@@ -503,6 +574,11 @@ class OptionsDialog(QDialog, Ui_DlgOptions):
 
         self.apply_debug_logging()
 
+        self.apply_import_processes()
+
+        if not self.apply_change_tracking():
+            return False
+
         msg = self.tr('Settings successfully saved.')
         self.notif_bar.insertSuccessNotification(msg)
 
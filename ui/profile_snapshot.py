@@ -0,0 +1,186 @@
+"""
+/***************************************************************************
+Name                 : Profile Snapshot
+Description          : Prompts for the GeoPackage file and runs the export
+                       or import of a profile snapshot with a progress
+                       dialog.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+
+from PyQt4.QtCore import Qt
+from PyQt4.QtGui import (
+    QApplication,
+    QFileDialog,
+    QMessageBox,
+    QProgressDialog
+)
+
+from stdm.data.importexport import (
+    setVectorFileDir,
+    vectorFileDir
+)
+from stdm.data.importexport.snapshot import (
+    ProfileSnapshotReader,
+    ProfileSnapshotWriter
+)
+
+LOGGER = logging.getLogger('stdm')
+
+_SNAPSHOT_FILTER = 'GeoPackage (*.gpkg)'
+
+
+def _tr(msg):
+    return QApplication.translate('ProfileSnapshot', msg)
+
+
+def _progress_dialog(parent, title):
+    progress = QProgressDialog(parent)
+    progress.setWindowTitle(title)
+    progress.setCancelButtonText(_tr('&Cancel'))
+    progress.setWindowModality(Qt.WindowModal)
+    progress.setMinimumDuration(0)
+
+    def on_progress(table, position, num_tables):
+        progress.setMaximum(num_tables)
+        progress.setValue(position)
+        progress.setLabelText(
+            _tr('Processing {0} ({1} of {2})...').format(
+                table, position + 1, num_tables
+            )
+        )
+        QApplication.processEvents()
+
+        return not progress.wasCanceled()
+
+    return progress, on_progress
+
+
+def export_profile_snapshot(parent, profile):
+    """
+    Writes the tables of the profile to a GeoPackage selected by the user.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :param profile: Profile whose tables will be exported.
+    :type profile: Profile
+    :return: True if the snapshot was written.
+    :rtype: bool
+    """
+    path = QFileDialog.getSaveFileName(
+        parent,
+        _tr('Export Profile Snapshot'),
+        vectorFileDir(),
+        _SNAPSHOT_FILTER
+    )
+    if not path:
+        return False
+
+    title = _tr('Export Profile Snapshot')
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        writer = ProfileSnapshotWriter(profile, path)
+        completed = writer.write(on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    if not completed:
+        return False
+
+    setVectorFileDir(path)
+
+    QMessageBox.information(
+        parent,
+        title,
+        _tr('{0:d} row(s) in {1:d} table(s) have been exported.').format(
+            sum(writer.row_counts.values()), len(writer.row_counts)
+        )
+    )
+
+    return True
+
+
+def import_profile_snapshot(parent, profile):
+    """
+    Loads a GeoPackage snapshot selected by the user into the tables of the
+    profile. The tables should be empty, except for the value lists whose
+    lookups are merged with those in the snapshot.
+    :param parent: Parent widget.
+    :type parent: QWidget
+    :param profile: Profile whose tables will be loaded.
+    :type profile: Profile
+    :return: True if the snapshot was loaded.
+    :rtype: bool
+    """
+    title = _tr('Import Profile Snapshot')
+
+    path = QFileDialog.getOpenFileName(
+        parent,
+        title,
+        vectorFileDir(),
+        _SNAPSHOT_FILTER
+    )
+    if not path:
+        return False
+
+    try:
+        reader = ProfileSnapshotReader(profile, path)
+        msgs = reader.validate()
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    if len(msgs) > 0:
+        QMessageBox.critical(
+            parent,
+            title,
+            _tr('The snapshot cannot be imported:') + '\n' + '\n'.join(msgs)
+        )
+
+        return False
+
+    progress, on_progress = _progress_dialog(parent, title)
+
+    try:
+        report = reader.load(on_progress)
+
+    except Exception as ex:
+        LOGGER.debug(unicode(ex))
+        progress.close()
+        QMessageBox.critical(parent, title, unicode(ex))
+
+        return False
+
+    progress.close()
+
+    if report.cancelled:
+        return False
+
+    setVectorFileDir(path)
+
+    QMessageBox.information(parent, title, report.summary())
+
+    return True
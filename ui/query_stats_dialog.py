@@ -0,0 +1,158 @@
+"""
+/***************************************************************************
+Name                 : Query Statistics Dialog
+Description          : Shows the SQL statements executed by recent user
+                       actions and highlights probable N+1 queries.
+Date                 : 16/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from PyQt4.QtGui import (
+    QApplication,
+    QBrush,
+    QColor,
+    QDialog,
+    QDialogButtonBox,
+    QHeaderView,
+    QLabel,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout
+)
+
+from stdm.data.query_stats import QueryStatistics
+
+
+def _tr(msg):
+    return QApplication.translate('QueryStatisticsDialog', msg)
+
+
+def _ms(seconds):
+    return u'{0:.1f}'.format(seconds * 1000)
+
+
+class QueryStatisticsDialog(QDialog):
+    """
+    Lists the recent actions with the number and duration of their queries.
+    The statements of each action are grouped by fingerprint and those
+    executed often enough to be probable N+1 queries are highlighted.
+    """
+    def __init__(self, parent=None):
+        QDialog.__init__(self, parent)
+
+        self.setWindowTitle(_tr('Query Statistics'))
+        self.resize(800, 450)
+
+        self._lbl_status = QLabel(self)
+        self._lbl_status.setWordWrap(True)
+
+        self._tree = QTreeWidget(self)
+        self._tree.setHeaderLabels([
+            _tr('Action / Statement'),
+            _tr('Queries'),
+            _tr('Time (ms)'),
+            _tr('Max (ms)'),
+            _tr('Rows')
+        ])
+        self._tree.header().setResizeMode(0, QHeaderView.Stretch)
+        self._tree.header().setStretchLastSection(False)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Close, parent=self)
+        self._btn_refresh = button_box.addButton(
+            _tr('Refresh'), QDialogButtonBox.ActionRole
+        )
+        self._btn_clear = button_box.addButton(
+            _tr('Clear'), QDialogButtonBox.ResetRole
+        )
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self._lbl_status)
+        layout.addWidget(self._tree)
+        layout.addWidget(button_box)
+
+        button_box.rejected.connect(self.reject)
+        self._btn_refresh.clicked.connect(self.refresh)
+        self._btn_clear.clicked.connect(self._on_clear)
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reloads the statistics of the recent actions, most recent first.
+        """
+        stats = QueryStatistics.instance()
+
+        if stats.enabled:
+            self._lbl_status.setText(
+                _tr('Statements executed by the most recent actions. '
+                    'Highlighted statements are probable N+1 queries.')
+            )
+        else:
+            self._lbl_status.setText(
+                _tr('Query statistics are only recorded when debug logging '
+                    'is enabled in the options.')
+            )
+
+        self._tree.clear()
+
+        highlight = QBrush(QColor(255, 220, 200))
+
+        for action in reversed(list(stats.actions)):
+            action_item = QTreeWidgetItem([
+                action.name,
+                unicode(action.query_count),
+                _ms(action.query_time),
+                u'',
+                u''
+            ])
+            self._tree.addTopLevelItem(action_item)
+
+            tooltip = _tr('Completed in {0} ms').format(_ms(action.elapsed))
+
+            num_n_plus_one = len(action.n_plus_one())
+            if num_n_plus_one > 0:
+                tooltip += u'\n' + _tr(
+                    '{0} probable N+1 statement(s)'
+                ).format(num_n_plus_one)
+
+                for col in range(self._tree.columnCount()):
+                    action_item.setBackground(col, highlight)
+
+            action_item.setToolTip(0, tooltip)
+
+            #Most frequent statements first
+            statements = sorted(action.statements.values(),
+                                key=lambda s: s.count, reverse=True)
+            for s in statements:
+                item = QTreeWidgetItem([
+                    s.fingerprint,
+                    unicode(s.count),
+                    _ms(s.total_time),
+                    _ms(s.max_time),
+                    unicode(s.rows)
+                ])
+                item.setToolTip(0, s.fingerprint)
+
+                if s.is_n_plus_one:
+                    for col in range(self._tree.columnCount()):
+                        item.setBackground(col, highlight)
+
+                action_item.addChild(item)
+
+        for col in range(1, self._tree.columnCount()):
+            self._tree.resizeColumnToContents(col)
+
+    def _on_clear(self):
+        QueryStatistics.instance().clear()
+        self.refresh()
@@ -171,6 +171,18 @@ class Ui_DlgOptions(object):
         self.chk_logging = QtGui.QCheckBox(self.scrollAreaWidgetContents)
         self.chk_logging.setObjectName(_fromUtf8("chk_logging"))
         self.gridLayout_5.addWidget(self.chk_logging, 6, 0, 1, 1)
+        self.chk_import_processes = QtGui.QCheckBox(self.scrollAreaWidgetContents)
+        self.chk_import_processes.setObjectName(_fromUtf8("chk_import_processes"))
+        self.gridLayout_5.addWidget(self.chk_import_processes, 8, 0, 1, 2)
+        self.spn_import_processes = QtGui.QSpinBox(self.scrollAreaWidgetContents)
+        self.spn_import_processes.setEnabled(False)
+        self.spn_import_processes.setMinimum(2)
+        self.spn_import_processes.setMaximum(4)
+        self.spn_import_processes.setObjectName(_fromUtf8("spn_import_processes"))
+        self.gridLayout_5.addWidget(self.spn_import_processes, 8, 2, 1, 1)
+        self.chk_change_tracking = QtGui.QCheckBox(self.scrollAreaWidgetContents)
+        self.chk_change_tracking.setObjectName(_fromUtf8("chk_change_tracking"))
+        self.gridLayout_5.addWidget(self.chk_change_tracking, 9, 0, 1, 2)
         self.scrollArea.setWidget(self.scrollAreaWidgetContents)
         self.verticalLayout.addWidget(self.scrollArea)
         self.buttonBox = QtGui.QDialogButtonBox(DlgOptions)
@@ -181,6 +193,7 @@ class Ui_DlgOptions(object):
 
         self.retranslateUi(DlgOptions)
         QtCore.QObject.connect(self.buttonBox, QtCore.SIGNAL(_fromUtf8("rejected()")), DlgOptions.reject)
+        QtCore.QObject.connect(self.chk_import_processes, QtCore.SIGNAL(_fromUtf8("toggled(bool)")), self.spn_import_processes.setEnabled)
         QtCore.QMetaObject.connectSlotsByName(DlgOptions)
 
     def retranslateUi(self, DlgOptions):
@@ -209,5 +222,10 @@ class Ui_DlgOptions(object):
         self.btn_supporting_docs.setText(QtGui.QApplication.translate("DlgOptions", "...", None, QtGui.QApplication.UnicodeUTF8))
         self.upgradeButton.setText(QtGui.QApplication.translate("DlgOptions", "Upgrade", None, QtGui.QApplication.UnicodeUTF8))
         self.chk_logging.setText(QtGui.QApplication.translate("DlgOptions", "Debug logging", None, QtGui.QApplication.UnicodeUTF8))
+        self.chk_import_processes.setToolTip(QtGui.QApplication.translate("DlgOptions", "Translate the features of large data sources in separate worker processes when importing", None, QtGui.QApplication.UnicodeUTF8))
+        self.chk_import_processes.setText(QtGui.QApplication.translate("DlgOptions", "Use worker processes for large imports", None, QtGui.QApplication.UnicodeUTF8))
+        self.spn_import_processes.setToolTip(QtGui.QApplication.translate("DlgOptions", "Number of worker processes", None, QtGui.QApplication.UnicodeUTF8))
+        self.chk_change_tracking.setToolTip(QtGui.QApplication.translate("DlgOptions", "Log the changes in the profile tables so that incremental backups can be created", None, QtGui.QApplication.UnicodeUTF8))
+        self.chk_change_tracking.setText(QtGui.QApplication.translate("DlgOptions", "Track changes for incremental backups", None, QtGui.QApplication.UnicodeUTF8))
 
 from stdm import resources_rc
@@ -39,11 +39,13 @@ from stdm.ui.social_tenure.str_editor import STREditor, EditSTREditor
 import stdm.data
 
 from stdm.data.qtmodels import (
-    BaseSTDMTableModel,
+    ColumnarTableModel,
     STRTreeViewModel
 )
 
 from stdm.data.database import Content
+from stdm.data.query_stats import instrumented_action
+from stdm.data.tracing import traced
 
 from stdm.settings import current_profile
 from stdm.data.configuration import entity_model
@@ -390,6 +392,7 @@ class ViewSTRWidget(QMainWindow, Ui_frmManageSTR):
         if isinstance(entityWidget,EntitySearchItem):
             entityWidget.loadAsync()
 
+    @instrumented_action('STR search')
     def searchEntityRelations(self):
         """
         Slot that searches for matching items for
@@ -596,9 +599,14 @@ class ViewSTRWidget(QMainWindow, Ui_frmManageSTR):
         """
         Raised when a tree view item is expanded.
         Reset the document listing and map view if the hash
-        of the parent node is different.
+        of the parent node is different. Children which have not been
+        loaded are loaded in the background.
         """
         if modelindex.isValid():
+            strModel = self.tvSTRResults.model()
+            if strModel.canFetchMore(modelindex):
+                strModel.fetchMore(modelindex)
+
             node = modelindex.internalPointer()
             #Assert if node representing another entity has been clicked
             self._on_node_reference_changed(node.rootHash())
@@ -1041,6 +1049,7 @@ class STRViewEntityWidget(QWidget,Ui_frmSTRViewEntity,EntitySearchItem):
 
         return is_valid, message
 
+    @traced('STRViewEntityWidget.executeSearch', 'ui')
     def executeSearch(self):
         """
         Base class override.
@@ -1149,7 +1158,7 @@ class STRViewEntityWidget(QWidget,Ui_frmSTRViewEntity,EntitySearchItem):
 
         if self.formatter is not None:
             self.formatter.setData(results)
-            model_root_node = self.formatter.root(valid_str_ids)
+            model_root_node = self.formatter.root(valid_str_ids, lazy=True)
             prog_dialog.setValue(10)
             prog_dialog.hide()
         return model_root_node, results, search_term
@@ -1247,7 +1256,7 @@ class STRViewEntityWidget(QWidget,Ui_frmSTRViewEntity,EntitySearchItem):
 
             model_attr_mapping.append(f_model_values)
 
-        self._completer_model = BaseSTDMTableModel(model_attr_mapping, ["",""], self)
+        self._completer_model = ColumnarTableModel(model_attr_mapping, ["",""], self)
 
         #We will use the QSortFilterProxyModel for filtering purposes
         self._proxy_completer_model = QSortFilterProxyModel()